@@ -1,6 +1,9 @@
+import hmac
 from functools import wraps
+from django.conf import settings
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.http import JsonResponse
 
 
 def admin_login_required(view_func):
@@ -33,4 +36,25 @@ def superadmin_required(view_func):
             messages.error(request, 'No tienes permiso para acceder a esta sección.')
             return redirect('inicio')
         return view_func(request, *args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def pos_token_required(view_func):
+    """
+    Para endpoints que llaman las terminales POS (sin sesión ni CSRF).
+    Exige la cabecera Authorization: Bearer <token> con uno de los tokens
+    de settings.VENTAS_IMPORTACION_TOKENS. Responde JSON 401 si falta y
+    403 si no coincide, en vez de redirigir al login.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        esquema, _, token = request.headers.get('Authorization', '').partition(' ')
+        if esquema.lower() != 'bearer' or not token.strip():
+            respuesta = JsonResponse({'status': 'error', 'mensaje': 'Falta el token de la terminal.'}, status=401)
+            respuesta['WWW-Authenticate'] = 'Bearer'
+            return respuesta
+        tokens = getattr(settings, 'VENTAS_IMPORTACION_TOKENS', [])
+        if not any(hmac.compare_digest(token.strip().encode(), t.encode()) for t in tokens):
+            return JsonResponse({'status': 'error', 'mensaje': 'Token no válido.'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,122 @@
+"""
+Benchmark de la caché columnar de líneas de venta contra SQL.
+
+Siembra ventas de prueba (las mismas de benchmark_reportes), carga la caché
+columnar desde cero y compara, para la misma ventana, cada consulta
+vectorizada con el agregado SQL equivalente:
+
+  totales   SUM/COUNT de las líneas de la ventana
+  top       GROUP BY producto ORDER BY ingresos LIMIT n
+  mapa      GROUP BY día de la semana y hora local
+
+Reporta la mediana de las repeticiones y comprueba que ambos lados den lo
+mismo. Ejecutar contra una base de pruebas, nunca contra producción. Con
+--sin-siembra se mide sobre los datos existentes.
+
+Uso:
+    python manage.py benchmark_analitica
+    python manage.py benchmark_analitica --ventas 200000 --dias 180 --repeticiones 20
+    python manage.py benchmark_analitica --sin-siembra
+"""
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, Count, F, DecimalField
+from django.db.models.functions import ExtractIsoWeekDay, ExtractHour
+from app.models import DetalleVenta
+from app.management.commands.benchmark_reportes import sembrar, limpiar
+from app.services import columnar
+from app.services.series import zona, rango, limites
+
+
+class Command(BaseCommand):
+    help = 'Compara las consultas de la caché columnar con los agregados SQL equivalentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos',    type=int, default=2000)
+        parser.add_argument('--clientes',     type=int, default=500)
+        parser.add_argument('--ventas',       type=int, default=50000)
+        parser.add_argument('--dias',         type=int, default=90, help='Ventana de las consultas')
+        parser.add_argument('--top',          type=int, default=10)
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--sin-siembra',  action='store_true', help='Medir sobre los datos existentes')
+
+    def handle(self, *args, **options):
+        siembra = None
+        if not options['sin_siembra']:
+            inicio  = time.perf_counter()
+            siembra = sembrar({**options, 'proveedores': 1, 'compras': 0})
+            self.stdout.write(f'Siembra: {time.perf_counter() - inicio:.1f}s')
+        try:
+            self._medir(options)
+        finally:
+            if siembra:
+                limpiar(*siembra)
+                columnar.reiniciar()
+                self.stdout.write('Datos de prueba eliminados.')
+
+    def _medir(self, o):
+        columnar.reiniciar()
+        inicio = time.perf_counter()
+        datos  = columnar.columnas()
+        estado = columnar.estado()
+        self.stdout.write(f'Carga columnar: {estado["filas"]} líneas, {estado["mb"]} MB, '
+                          f'{time.perf_counter() - inicio:.2f}s')
+
+        desde, hasta = rango(None, None, 'dia', dias=o['dias'])
+        inicio, fin  = limites(desde, hasta)
+        lineas = DetalleVenta.objects.filter(venta__fecha__gte=inicio, venta__fecha__lt=fin)
+        importe = Sum(F('precio') * F('cantidad'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        n = o['top']
+
+        def sql_totales():
+            return lineas.aggregate(unidades=Sum('cantidad'), ingresos=importe, lineas=Count('pk'))
+
+        def sql_top():
+            return list(lineas.filter(producto__isnull=False).values('producto_id')
+                        .annotate(ingresos=importe).order_by('-ingresos', 'producto_id')[:n])
+
+        def sql_mapa():
+            return list(lineas.values(dia=ExtractIsoWeekDay('venta__fecha', tzinfo=zona()),
+                                      hora=ExtractHour('venta__fecha', tzinfo=zona()))
+                        .annotate(ingresos=importe).order_by())
+
+        casos = [
+            ('totales', sql_totales, lambda: columnar.totales(desde, hasta, datos=datos)),
+            ('top',     sql_top,     lambda: columnar.top_productos(n, desde, hasta, nombres=False, datos=datos)),
+            ('mapa',    sql_mapa,    lambda: columnar.mapa_calor(desde, hasta, datos=datos)),
+        ]
+
+        self.stdout.write('')
+        self.stdout.write(f'{"Consulta":<10}{"SQL (ms)":>12}{"Columnar (ms)":>16}{"Aceleración":>14}  Resultado')
+        for nombre, sql, vectorizada in casos:
+            t_sql, r_sql = _mediana(sql, o['repeticiones'])
+            t_col, r_col = _mediana(vectorizada, o['repeticiones'])
+            iguales = _comparar(nombre, r_sql, r_col)
+            self.stdout.write(f'{nombre:<10}{t_sql:>12.3f}{t_col:>16.3f}{t_sql / t_col:>13.0f}x  '
+                              f'{"iguales" if iguales else "DIFERENTES"}')
+        self.stdout.write(f'(ventana {desde} a {hasta}; mediana de {o["repeticiones"]} repeticiones)')
+
+
+def _mediana(funcion, repeticiones):
+    tiempos, resultado = [], None
+    for _ in range(max(1, repeticiones)):
+        inicio    = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def _comparar(nombre, sql, col):
+    centavo = Decimal('0.01')
+    if nombre == 'totales':
+        return ((sql['unidades'] or 0, Decimal(sql['ingresos'] or 0).quantize(centavo), sql['lineas'])
+                == (col['unidades'], Decimal(str(col['ingresos'])).quantize(centavo), col['lineas']))
+    if nombre == 'top':
+        return [f['producto_id'] for f in sql] == [f['producto_id'] for f in col]
+    mapa = {(f['dia'] - 1, f['hora']): Decimal(f['ingresos'] or 0).quantize(centavo) for f in sql}
+    return all(
+        mapa.get((dia, hora), Decimal(0)) == Decimal(str(valor)).quantize(centavo)
+        for dia, fila in enumerate(col['valores']) for hora, valor in enumerate(fila)
+    )
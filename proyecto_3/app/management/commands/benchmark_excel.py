@@ -0,0 +1,107 @@
+"""
+Benchmark de la exportación a Excel: streaming (write-only) vs. en memoria.
+
+Genera filas sintéticas con la forma de la exportación de ventas (sin
+tocar la base de datos) y escribe el libro con escribir_excel() de
+app/utils.py y, como referencia, con el método anterior: Workbook en
+memoria, estilos nuevos por celda y un segundo recorrido por columna para
+los anchos. Cada corrida va en un proceso hijo para medir su pico de
+memoria (RSS) por separado del resto.
+
+Uso:
+    python manage.py benchmark_excel
+    python manage.py benchmark_excel --filas 10000 100000 1000000 --max-memoria 100000
+"""
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from app.utils import escribir_excel
+
+COLUMNAS = ['ID', 'Cliente', 'Fecha', 'Total', 'Estado']
+
+
+def _filas(n):
+    for i in range(n):
+        yield (f'V{i:03d}', f'Cliente {i % 5000}', f'{i % 28 + 1:02d}/10/2026 {i % 24:02d}:15',
+               float(i % 100000) + 0.5, 'Completada' if i % 3 else 'Pendiente')
+
+
+def _rss_mb():
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def _excel_en_memoria(titulo, columnas, datos, destino):
+    """El método anterior, reducido a lo que pesa: estilos por celda y anchos con iter_rows."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+
+    workbook  = Workbook()
+    worksheet = workbook.active
+    borde     = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    fill_par  = PatternFill(start_color='DCE6F1', end_color='DCE6F1', fill_type='solid')
+    worksheet['A1'] = titulo
+    for col_num, columna in enumerate(columnas, 1):
+        cell = worksheet.cell(row=3, column=col_num, value=columna)
+        cell.font = Font(name='Arial', size=10, bold=True)
+    total = 0
+    for row_num, fila in enumerate(datos, 4):
+        for col_num, valor in enumerate(fila, 1):
+            cell        = worksheet.cell(row=row_num, column=col_num, value=valor)
+            cell.border = borde
+            cell.alignment = Alignment(horizontal='right' if isinstance(valor, (int, float)) else 'left',
+                                       vertical='center')
+            if (row_num - 4) % 2 == 0:
+                cell.fill = fill_par
+        worksheet.row_dimensions[row_num].height = 16
+        total += 1
+    for col_num, columna in enumerate(columnas, 1):
+        max_len = len(str(columna))
+        for row in worksheet.iter_rows(min_row=4, max_row=total + 3, min_col=col_num, max_col=col_num):
+            for cell in row:
+                if cell.value is not None:
+                    max_len = max(max_len, len(str(cell.value)))
+        worksheet.column_dimensions[get_column_letter(col_num)].width = min(max(max_len + 4, 12), 45)
+    workbook.save(destino)
+    return total
+
+
+def _corrida(modo, n, cola):
+    base     = _rss_mb()
+    escribir = escribir_excel if modo == 'streaming' else _excel_en_memoria
+    with tempfile.NamedTemporaryFile(suffix='.xlsx') as archivo:
+        inicio = time.perf_counter()
+        escribir('REPORTE DE VENTAS', COLUMNAS, _filas(n), archivo.name)
+        segundos = time.perf_counter() - inicio
+        tamano   = os.path.getsize(archivo.name) / 2 ** 20
+    pico = _rss_mb()
+    cola.put((segundos, pico, pico - base, tamano))
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y pico de memoria de la exportación a Excel por número de filas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas',       nargs='+', type=int, default=[10000, 100000, 1000000])
+        parser.add_argument('--max-memoria', type=int, default=100000,
+                            help='Mayor número de filas para el método en memoria (es lento y pesado)')
+
+    def handle(self, *args, **options):
+        contexto = multiprocessing.get_context('fork')
+        self.stdout.write(f'{"Filas":>10}  {"Modo":<10}{"Tiempo (s)":>12}{"RSS pico (MB)":>15}'
+                          f'{"Δ RSS (MB)":>12}{"Archivo (MB)":>14}')
+        for n in options['filas']:
+            modos = ['streaming'] + (['memoria'] if n <= options['max_memoria'] else [])
+            for modo in modos:
+                cola    = contexto.Queue()
+                proceso = contexto.Process(target=_corrida, args=(modo, n, cola))
+                proceso.start()
+                segundos, pico, delta, tamano = cola.get()
+                proceso.join()
+                self.stdout.write(f'{n:>10}  {modo:<10}{segundos:>12.2f}{pico:>15.1f}{delta:>12.1f}{tamano:>14.2f}')
@@ -0,0 +1,190 @@
+"""
+Benchmark de las secciones de reportes: serie vs. hilos.
+
+Siembra un conjunto de datos de prueba (productos, clientes, proveedores,
+ventas con sus líneas y compras), arma todas las secciones de la página
+en serie y con pools de distintos tamaños, y reporta el tiempo de cada
+sección y el tiempo total (reloj de pared) de cada modo. La caché de
+reportes no interviene: cada corrida recalcula todo.
+
+Los hilos usan sus propias conexiones y solo ven datos confirmados, por
+eso la siembra se confirma y se elimina al terminar. Ejecutar contra una
+base de pruebas, nunca contra producción. Con --sin-siembra se mide sobre los datos existentes.
+
+Uso:
+    python manage.py benchmark_reportes
+    python manage.py benchmark_reportes --ventas 50000 --hilos 2 4 8 --repeticiones 5
+    python manage.py benchmark_reportes --sin-siembra
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from app.models import (
+    Producto, Cliente, Proveedor, Venta, DetalleVenta, Compra, Marca, TipoProductos, UnidadMedida,
+)
+from app.services import cache_reportes, columnar
+from app.services.reportes import SECCIONES, calcular_secciones
+
+MARCA = '__bench_reportes__'
+
+
+class Command(BaseCommand):
+    help = 'Compara el tiempo de armar las secciones de reportes en serie y en paralelo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos',    type=int, default=2000)
+        parser.add_argument('--clientes',     type=int, default=2000)
+        parser.add_argument('--proveedores',  type=int, default=200)
+        parser.add_argument('--ventas',       type=int, default=20000)
+        parser.add_argument('--compras',      type=int, default=5000)
+        parser.add_argument('--hilos',        nargs='+', type=int, default=[2, 4, 8])
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--sin-siembra',  action='store_true', help='Medir sobre los datos existentes')
+
+    def handle(self, *args, **options):
+        siembra = None
+        if not options['sin_siembra']:
+            inicio  = time.perf_counter()
+            siembra = sembrar(options)
+            self.stdout.write(f'Siembra: {time.perf_counter() - inicio:.1f}s')
+        try:
+            self._medir(options)
+        finally:
+            if siembra:
+                limpiar(*siembra)
+                self.stdout.write('Datos de prueba eliminados.')
+
+    # ─────────────────────────────────────────────
+    # Medición
+    # ─────────────────────────────────────────────
+
+    def _medir(self, options):
+        nombres = [n for n in SECCIONES if n != 'datos']
+        modos   = [('serie', 1)] + [(f'{h} hilos', h) for h in options['hilos']]
+
+        # Calentamiento: conexiones y planes de consulta
+        calcular_secciones(nombres, hilos=1, usar_cache=False)
+
+        resultados = {}
+        for etiqueta, hilos in modos:
+            totales, por_seccion = [], {n: [] for n in nombres}
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                _, tiempos = calcular_secciones(nombres, hilos=hilos, usar_cache=False)
+                totales.append((time.perf_counter() - inicio) * 1000)
+                for nombre, ms in tiempos.items():
+                    por_seccion[nombre].append(ms)
+            resultados[etiqueta] = (statistics.median(totales), {n: statistics.median(v) for n, v in por_seccion.items()})
+
+        self.stdout.write('')
+        self.stdout.write(f'{"Sección":<14}' + ''.join(f'{e:>12}' for e, _ in modos))
+        for nombre in nombres:
+            self.stdout.write(f'{nombre:<14}' + ''.join(f'{resultados[e][1][nombre]:>12.1f}' for e, _ in modos))
+        self.stdout.write(f'{"TOTAL (pared)":<14}' + ''.join(f'{resultados[e][0]:>12.1f}' for e, _ in modos))
+
+        serie = resultados['serie'][0]
+        for etiqueta, _ in modos[1:]:
+            self.stdout.write(f'{etiqueta}: {serie / resultados[etiqueta][0]:.2f}x respecto a serie')
+        self.stdout.write('(ms, mediana de las repeticiones)')
+
+
+# ─────────────────────────────────────────────
+# Datos de prueba
+# ─────────────────────────────────────────────
+
+@transaction.atomic
+def sembrar(o):
+    """Siembra y confirma los datos de prueba. Retorna lo que limpiar() necesita para borrarlos."""
+    marca  = Marca.objects.create(nombreMarca=MARCA)
+    tipo   = TipoProductos.objects.create(nombre_tipo=MARCA)
+    unidad = UnidadMedida.objects.create(nombre_unidad=MARCA)
+
+    Producto.objects.bulk_create([
+        Producto(nombre=f'Bench {i}', precio=random.randint(1, 500) * 100, stock=random.randint(0, 300),
+                 idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        for i in range(o['productos'])
+    ], batch_size=1000)
+    Cliente.objects.bulk_create([
+        Cliente(nombre=f'{MARCA} {i}', telefono='0', email='bench@example.com',
+                estado=random.choice(['activo', 'activo', 'inactivo']))
+        for i in range(o['clientes'])
+    ], batch_size=1000)
+    Proveedor.objects.bulk_create([
+        Proveedor(nombre=f'{MARCA} {i}', telefono='0', email='bench@example.com')
+        for i in range(o['proveedores'])
+    ], batch_size=1000)
+
+    # MySQL no devuelve los pk de bulk_create: se vuelven a leer
+    productos   = list(Producto.objects.filter(idMarca=marca).values_list('pk', 'nombre', 'precio'))
+    clientes    = list(Cliente.objects.filter(nombre__startswith=MARCA).values_list('pk', 'nombre'))
+    proveedores = list(Proveedor.objects.filter(nombre__startswith=MARCA).values_list('pk', flat=True))
+
+    ahora  = timezone.now()
+    ventas, lineas = [], []
+    for i in range(o['ventas']):
+        cliente_id, nombre = random.choice(clientes)
+        elegidos = random.sample(productos, k=min(len(productos), random.randint(1, 4)))
+        detalle  = [(pid, nombre_p, precio, random.randint(1, 5)) for pid, nombre_p, precio in elegidos]
+        lineas.append(detalle)
+        ventas.append(Venta(
+            cliente=nombre, idCliente_id=cliente_id,
+            total=sum(precio * cantidad for _, _, precio, cantidad in detalle),
+            estado=random.choice(['Completada', 'Pendiente']),
+            fecha=ahora - timedelta(minutes=random.randint(0, 60 * 24 * 180)),
+            clave_idempotencia=f'{MARCA}{i}',
+        ))
+    Venta.objects.bulk_create(ventas, batch_size=1000)
+
+    pk_por_clave = dict(Venta.objects.filter(clave_idempotencia__startswith=MARCA)
+                        .values_list('clave_idempotencia', 'pk'))
+    DetalleVenta.objects.bulk_create([
+        DetalleVenta(venta_id=pk_por_clave[venta.clave_idempotencia], producto_id=pid,
+                     producto_nombre=nombre, precio=precio, cantidad=cantidad)
+        for venta, detalle in zip(ventas, lineas)
+        for pid, nombre, precio, cantidad in detalle
+    ], batch_size=2000)
+
+    Compra.objects.bulk_create([
+        Compra(Producto_id=random.choice(productos)[0], Proveedor_id=random.choice(proveedores),
+               cantidad=random.randint(1, 50), precio_unitario=random.randint(1, 200) * 100,
+               estado=random.choice(['Completada', 'Pendiente']),
+               fechaCompra=(ahora - timedelta(days=random.randint(0, 180))).date())
+        for _ in range(o['compras'])
+    ], batch_size=1000)
+
+    # bulk_create no dispara señales: ni KPIs ni libro de inventario ni
+    # caché se enteran, y la limpieza borra con SQL directo por la misma
+    # razón. Los KPIs de cabecera no incluyen la siembra; las secciones sí.
+    cache_reportes.invalidar()
+    return marca, tipo, unidad, [pk for pk, _, _ in productos], [pk for pk, _ in clientes], \
+        proveedores, list(pk_por_clave.values())
+
+
+def limpiar(marca, tipo, unidad, productos, clientes, proveedores, ventas):
+    """Borra la siembra de sembrar()."""
+    with transaction.atomic():
+        _borrar(DetalleVenta, 'venta',     ventas)
+        _borrar(Venta,        'id',        ventas)
+        _borrar(Compra,       'Proveedor', proveedores)
+        _borrar(Proveedor,    'id',        proveedores)
+        _borrar(Cliente,      'id',        clientes)
+        _borrar(Producto,     'idProducto', productos)
+        for catalogo in (marca, tipo, unidad):
+            catalogo.delete()
+        # El DELETE directo tampoco avisa a la caché columnar de líneas de venta
+        cache_reportes.invalidar()
+        columnar.marcar_cambio()
+
+
+def _borrar(modelo, campo, ids, lote=1000):
+    """DELETE directo por lotes de ids (sin señales, igual que la siembra)."""
+    tabla   = connection.ops.quote_name(modelo._meta.db_table)
+    columna = connection.ops.quote_name(modelo._meta.get_field(campo).column)
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(ids), lote):
+            parte = ids[inicio:inicio + lote]
+            cursor.execute(f'DELETE FROM {tabla} WHERE {columna} IN ({", ".join(["%s"] * len(parte))})', parte)
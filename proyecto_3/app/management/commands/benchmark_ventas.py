@@ -0,0 +1,95 @@
+"""
+Benchmark de creación de ventas.
+
+Compara la ruta anterior (una consulta por línea) con el servicio de
+reserva de stock por conjuntos, midiendo número de consultas y latencia
+para carritos de distintos tamaños. Todo se ejecuta dentro de una
+transacción que se revierte al final: la base de datos queda intacta.
+
+Uso:
+    python manage.py benchmark_ventas
+    python manage.py benchmark_ventas --tamanos 1 10 50 200 --repeticiones 5
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from app.models import Producto, Venta, DetalleVenta, Marca, TipoProductos, UnidadMedida
+from app.services.stock import normalizar_demanda, descontar_stock, crear_detalles
+
+
+class _Revertir(Exception):
+    pass
+
+
+def _ruta_por_linea(ids, nombres, precios, cantidades):
+    """Réplica de la implementación previa: lock + save + insert por línea."""
+    for pid, cant in zip(ids, cantidades):
+        producto = Producto.objects.select_for_update().get(pk=pid)
+        producto.stock -= cant
+        producto.save()
+    venta = Venta.objects.create(cliente='Benchmark', total=0)
+    for i in range(len(ids)):
+        DetalleVenta.objects.create(
+            venta=venta, producto_id=ids[i], producto_nombre=nombres[i],
+            precio=precios[i], cantidad=cantidades[i],
+        )
+
+
+def _ruta_por_conjuntos(ids, nombres, precios, cantidades):
+    descontar_stock(normalizar_demanda(ids, cantidades))
+    venta = Venta.objects.create(cliente='Benchmark', total=0)
+    crear_detalles(venta, ids, nombres, precios, cantidades)
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y latencia de la creación de ventas según el tamaño del carrito.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[1, 10, 50, 200])
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        tamanos      = options['tamanos']
+        repeticiones = options['repeticiones']
+
+        try:
+            with transaction.atomic():
+                productos = self._crear_productos(max(tamanos))
+                self.stdout.write(f'{"Líneas":>7} {"Ruta":<12} {"Consultas":>10} {"ms (media)":>11}')
+                for tamano in tamanos:
+                    lote       = productos[:tamano]
+                    ids        = [p.idProducto for p in lote]
+                    nombres    = [p.nombre for p in lote]
+                    precios    = [float(p.precio) for p in lote]
+                    cantidades = [1] * tamano
+                    for etiqueta, ruta in (('por línea', _ruta_por_linea), ('conjuntos', _ruta_por_conjuntos)):
+                        consultas, ms = self._medir(ruta, repeticiones, ids, nombres, precios, cantidades)
+                        self.stdout.write(f'{tamano:>7} {etiqueta:<12} {consultas:>10} {ms:>11.2f}')
+                raise _Revertir
+        except _Revertir:
+            pass
+
+    def _crear_productos(self, cantidad):
+        marca  = Marca.objects.create(nombreMarca='__benchmark__')
+        tipo   = TipoProductos.objects.create(nombre_tipo='__benchmark__')
+        unidad = UnidadMedida.objects.create(nombre_unidad='__benchmark__')
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Benchmark {i}', precio=1000, stock=1_000_000,
+                idMarca=marca, idTipo=tipo, idUnidad=unidad,
+            )
+            for i in range(cantidad)
+        ])
+        return list(Producto.objects.filter(idMarca=marca).order_by('pk'))
+
+    def _medir(self, ruta, repeticiones, *datos):
+        consultas = 0
+        inicio    = time.perf_counter()
+        for _ in range(repeticiones):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    ruta(*datos)
+            consultas = len(ctx.captured_queries)
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        return consultas, ms
@@ -0,0 +1,33 @@
+"""
+Cálculo nocturno de los puntos de reorden (tabla punto_reorden).
+
+Programar con cron una vez al día, después de medianoche: la ventana de
+demanda termina ayer, el último día completo.
+
+Uso:
+    python manage.py calcular_reorden
+    python manage.py calcular_reorden --hasta 2026-03-31
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from app.services.reabastecimiento import calcular_puntos_reorden, compras_sugeridas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la demanda diaria, el stock de seguridad y el punto de reorden de todos los productos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', help='Último día (YYYY-MM-DD) de la ventana de demanda; por defecto ayer')
+
+    def handle(self, *args, **options):
+        hasta = None
+        if options['hasta']:
+            hasta = parse_date(options['hasta'])
+            if hasta is None:
+                raise CommandError(f'Fecha no válida: {options["hasta"]}.')
+
+        productos = calcular_puntos_reorden(hasta=hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f'Puntos de reorden calculados para {productos} producto(s); '
+            f'{len(compras_sugeridas())} requieren compra.'
+        ))
@@ -0,0 +1,46 @@
+"""
+Conciliación del libro de movimientos contra Producto.stock.
+
+Compara, por bloques de productos, la suma de los movimientos de cada
+producto con su stock actual y lista los descuadres. Corre en serie; con
+--hilos N los bloques van en paralelo, con N conexiones a la base de datos.
+Con --corregir registra un movimiento 'conciliacion' por producto
+descuadrado (el stock no se modifica).
+
+Uso:
+    python manage.py conciliar_inventario
+    python manage.py conciliar_inventario --hilos 8 --bloque 5000
+    python manage.py conciliar_inventario --corregir
+"""
+from django.core.management.base import BaseCommand, CommandError
+from app.services.inventario import conciliar
+from app.services.stock import ejecutar_transaccion, conciliar_libro
+
+
+class Command(BaseCommand):
+    help = 'Compara el libro de movimientos con el stock de cada producto.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloque',   type=int, default=1000, help='Productos (rango de pk) por consulta')
+        parser.add_argument('--hilos',    type=int, default=1,    help='Bloques en paralelo (una conexión por hilo)')
+        parser.add_argument('--corregir', action='store_true',    help='Registrar movimientos de ajuste')
+        parser.add_argument('--limite',   type=int, default=50,   help='Máximo de descuadres a listar')
+
+    def handle(self, *args, **options):
+        diferencias = conciliar(bloque=options['bloque'], hilos=options['hilos'])
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('El libro de movimientos cuadra con el stock.'))
+            return
+
+        for d in diferencias[:options['limite']]:
+            self.stdout.write(
+                f'Producto #{d["producto_id"]}: stock {d["stock"]}, libro {d["libro"]} ({d["diferencia"]:+d})'
+            )
+        if len(diferencias) > options['limite']:
+            self.stdout.write(f'... y {len(diferencias) - options["limite"]} más')
+
+        if not options['corregir']:
+            raise CommandError(f'{len(diferencias)} producto(s) descuadrados.')
+
+        ajustes = ejecutar_transaccion(conciliar_libro, [d['producto_id'] for d in diferencias])
+        self.stdout.write(self.style.SUCCESS(f'Movimientos de conciliación registrados: {len(ajustes)}.'))
@@ -0,0 +1,174 @@
+"""
+Prueba de estrés de ventas concurrentes.
+
+Simula N cajeros que venden los mismos productos "calientes" a la vez a
+través de CrearVentaView (POST /ventas/crear/), primero con el modo de
+stock por bloqueo y luego con el modo optimista. Para cada modo reporta
+throughput, latencia p50/p99, ventas rechazadas y sobreventa (por
+producto, unidades vendidas por encima de su stock inicial, sumadas).
+
+Crea sus propios productos y ventas de prueba y los elimina al terminar.
+Ejecutar contra una base de datos de pruebas, nunca contra producción.
+
+Uso:
+    python manage.py estres_ventas --cajeros 16 --ventas 50 --stock 200
+"""
+import random
+import threading
+import time
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from app.models import (
+    Producto, Venta, DetalleVenta, Marca, TipoProductos, UnidadMedida, MovimientoInventario,
+)
+from app.services.stock import MODO_BLOQUEO, MODO_OPTIMISTA
+
+CLIENTE_PRUEBA = 'Prueba Estres'
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Simula cajeros concurrentes contra CrearVentaView en modo bloqueo y optimista.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cajeros',   type=int, default=8,   help='Hilos concurrentes')
+        parser.add_argument('--ventas',    type=int, default=25,  help='Ventas por cajero')
+        parser.add_argument('--productos', type=int, default=3,   help='Productos calientes')
+        parser.add_argument('--stock',     type=int, default=100, help='Stock inicial por producto')
+        parser.add_argument('--usuario',   default=None,          help='Usuario con el que se inicia sesión')
+        parser.add_argument('--modos', nargs='+', default=[MODO_BLOQUEO, MODO_OPTIMISTA],
+                            choices=[MODO_BLOQUEO, MODO_OPTIMISTA])
+
+    def handle(self, *args, **options):
+        usuario = self._usuario(options['usuario'])
+
+        # Correo en memoria y 'testserver' permitido para el Client
+        setup_test_environment()
+        try:
+            self.stdout.write(
+                f'{"Modo":<10} {"Ventas/s":>9} {"p50 ms":>8} {"p99 ms":>8} '
+                f'{"OK":>5} {"Rechaz.":>8} {"Vendido":>8} {"Sobreventa":>11}'
+            )
+            for modo in options['modos']:
+                with override_settings(STOCK_MODO=modo):
+                    r = self._ejecutar(usuario, options)
+                self.stdout.write(
+                    f'{modo:<10} {r["throughput"]:>9.1f} {r["p50"]:>8.1f} {r["p99"]:>8.1f} '
+                    f'{r["ok"]:>5} {r["rechazadas"]:>8} {r["vendido"]:>8} {r["sobreventa"]:>11}'
+                )
+        finally:
+            teardown_test_environment()
+
+    def _usuario(self, username):
+        qs = User.objects.filter(is_active=True)
+        usuario = qs.filter(username=username).first() if username else qs.filter(is_superuser=True).first()
+        if usuario is None:
+            raise CommandError('No hay un usuario activo para iniciar sesión (use --usuario).')
+        return usuario
+
+    def _crear_productos(self, cantidad, stock):
+        marca  = Marca.objects.create(nombreMarca='__estres__')
+        tipo   = TipoProductos.objects.create(nombre_tipo='__estres__')
+        unidad = UnidadMedida.objects.create(nombre_unidad='__estres__')
+        # create() uno a uno: bulk_create no dispara las señales de los KPIs
+        # y la limpieza (delete) sí, lo que descuadraría el contador
+        productos = [
+            Producto.objects.create(nombre=f'Estres {i}', precio=1000, stock=stock,
+                                    idMarca=marca, idTipo=tipo, idUnidad=unidad)
+            for i in range(cantidad)
+        ]
+        return productos, (marca, tipo, unidad)
+
+    def _ejecutar(self, usuario, options):
+        productos, catalogos = self._crear_productos(options['productos'], options['stock'])
+        ultima_venta = Venta.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        url          = reverse('crear_venta')
+        latencias    = []
+        resultados   = {'ok': 0, 'rechazadas': 0}
+        lock         = threading.Lock()
+
+        def cajero():
+            client = Client()
+            client.force_login(usuario)
+            try:
+                for _ in range(options['ventas']):
+                    # Mismos productos en orden aleatorio: el peor caso para deadlocks
+                    carrito = random.sample(productos, k=random.randint(1, len(productos)))
+                    datos = {
+                        'cliente':             CLIENTE_PRUEBA,
+                        'estado':              'Pendiente',
+                        'producto_id[]':       [p.idProducto for p in carrito],
+                        'producto_nombre[]':   [p.nombre for p in carrito],
+                        'producto_precio[]':   ['1000'] * len(carrito),
+                        'producto_cantidad[]': [str(random.randint(1, 3)) for _ in carrito],
+                    }
+                    inicio = time.perf_counter()
+                    respuesta = client.post(url, datos)
+                    ms = (time.perf_counter() - inicio) * 1000
+                    # Los mensajes se acumulan en la sesión: el último es el de esta venta
+                    mensajes = list(get_messages(respuesta.wsgi_request))
+                    exito    = bool(mensajes) and mensajes[-1].level_tag == 'success'
+                    with lock:
+                        latencias.append(ms)
+                        resultados['ok' if exito else 'rechazadas'] += 1
+            finally:
+                connection.close()
+
+        hilos  = [threading.Thread(target=cajero) for _ in range(options['cajeros'])]
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - inicio
+
+        # Por producto: un producto sobrevendido no se compensa con el stock sobrante de otro
+        ids     = [p.idProducto for p in productos]
+        vendido = dict(
+            DetalleVenta.objects.filter(venta_id__gt=ultima_venta, venta__cliente=CLIENTE_PRUEBA, producto_id__in=ids)
+            .order_by().values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't')
+        )
+        salidas = dict(
+            MovimientoInventario.objects.filter(producto_id__in=ids, motivo='venta')
+            .order_by().values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't')
+        )
+        finales = dict(Producto.objects.filter(pk__in=ids).values_list('pk', 'stock'))
+
+        sobreventa = 0
+        for pid in ids:
+            salida = -(salidas.get(pid) or 0)   # el libro guarda las salidas en negativo
+            if options['stock'] - salida != finales[pid] or salida != vendido.get(pid, 0):
+                self.stderr.write(
+                    f'Inconsistencia en el producto #{pid}: inicial {options["stock"]} - libro {salida} '
+                    f'!= final {finales[pid]} (vendido {vendido.get(pid, 0)})'
+                )
+            sobreventa += max(0, salida - options['stock'])
+
+        # Limpieza
+        Venta.objects.filter(pk__gt=ultima_venta, cliente=CLIENTE_PRUEBA).delete()
+        Producto.objects.filter(pk__in=ids).delete()
+        MovimientoInventario.objects.filter(producto_id__in=ids).delete()
+        for obj in catalogos:
+            obj.delete()
+
+        return {
+            'throughput': (resultados['ok'] + resultados['rechazadas']) / duracion if duracion else 0,
+            'p50':        _percentil(latencias, 50),
+            'p99':        _percentil(latencias, 99),
+            'ok':         resultados['ok'],
+            'rechazadas': resultados['rechazadas'],
+            'vendido':    sum(vendido.values()),
+            'sobreventa': sobreventa,
+        }
@@ -0,0 +1,54 @@
+"""
+Importación masiva de ventas desde archivos de terminales POS.
+
+Lee JSON (arreglo o {"ventas": [...]}) o NDJSON (.ndjson/.jsonl, una venta
+por línea) con el formato descrito en app/services/importacion.py. Reimportar
+el mismo archivo es seguro si las ventas traen "clave".
+
+Uso:
+    python manage.py importar_ventas caja3.ndjson caja4.json
+    python manage.py importar_ventas - --ndjson < caja3.ndjson
+    python manage.py importar_ventas caja3.ndjson --lote 1000
+"""
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from app.services.importacion import importar_ventas
+from app.views.Ventas.views import leer_lote_ventas
+
+
+class Command(BaseCommand):
+    help = 'Importa ventas fuera de línea desde archivos JSON o NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivos', nargs='+', help='Rutas de los archivos ("-" para la entrada estándar)')
+        parser.add_argument('--lote',   type=int, default=None, help='Ventas por transacción (VENTAS_IMPORTACION_LOTE)')
+        parser.add_argument('--ndjson', action='store_true',    help='Forzar lectura NDJSON')
+        parser.add_argument('--errores', type=int, default=20,  help='Máximo de rechazos a listar por archivo')
+
+    def handle(self, *args, **options):
+        for ruta in options['archivos']:
+            ndjson = options['ndjson'] or ruta.endswith(('.ndjson', '.jsonl'))
+            try:
+                if ruta == '-':
+                    contenido = sys.stdin.read()
+                else:
+                    with open(ruta, encoding='utf-8') as f:
+                        contenido = f.read()
+                registros = leer_lote_ventas(contenido, ndjson=ndjson)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'{ruta}: {e}')
+
+            inicio    = time.perf_counter()
+            resultado = importar_ventas(registros, lote=options['lote'])
+            duracion  = time.perf_counter() - inicio
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{ruta}: {resultado["creadas"]} creadas, {resultado["duplicadas"]} duplicadas, '
+                f'{len(resultado["rechazadas"])} rechazadas de {resultado["recibidas"]} '
+                f'en {duracion:.2f}s ({resultado["recibidas"] / duracion if duracion else 0:.0f} ventas/s)'
+            ))
+            for rechazo in resultado['rechazadas'][:options['errores']]:
+                self.stdout.write(f'  #{rechazo["indice"]} [{rechazo["clave"] or "-"}] {rechazo["error"]}')
+            if len(resultado['rechazadas']) > options['errores']:
+                self.stdout.write(f'  ... y {len(resultado["rechazadas"]) - options["errores"]} más')
@@ -0,0 +1,44 @@
+"""
+Worker de las exportaciones en segundo plano.
+
+Genera los ExportacionJob pendientes que el pool del proceso web no
+alcanzó (reinicios, EXPORTACIONES_INMEDIATO=False), reencola los que
+quedaron en proceso por un worker caído y borra los archivos vencidos.
+
+Uso:
+    python manage.py procesar_exportaciones                 # una pasada
+    python manage.py procesar_exportaciones --continuo      # bucle (cron/systemd)
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from app.services import exportaciones
+
+
+class Command(BaseCommand):
+    help = 'Genera las exportaciones pendientes y borra las vencidas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote',      type=int,   default=10, help='Trabajos por pasada')
+        parser.add_argument('--continuo',  action='store_true',    help='No terminar: seguir procesando')
+        parser.add_argument('--intervalo', type=float, default=5,  help='Segundos de espera cuando no hay trabajo')
+
+    def handle(self, *args, **options):
+        generadas = errores = 0
+        while True:
+            close_old_connections()
+            vencidas    = exportaciones.vencer()
+            reencoladas = exportaciones.reencolar_atascados()
+            if vencidas or reencoladas:
+                self.stdout.write(f'Vencidas: {vencidas}, reencoladas: {reencoladas}')
+            ids = exportaciones.pendientes(options['lote'])
+            for job_id in ids:
+                estado = exportaciones.procesar(job_id)
+                generadas += estado == 'lista'
+                errores   += estado == 'error'
+            if ids:
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+        self.stdout.write(self.style.SUCCESS(f'Exportaciones generadas: {generadas}, con error: {errores}'))
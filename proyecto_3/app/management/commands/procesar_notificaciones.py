@@ -0,0 +1,37 @@
+"""
+Worker de la bandeja de salida de notificaciones.
+
+Despacha los eventos de NotificacionOutbox que el despacho inmediato no
+alcanzó a enviar (reinicios, caídas del SMTP, despacho desactivado).
+
+Uso:
+    python manage.py procesar_notificaciones                 # una pasada
+    python manage.py procesar_notificaciones --continuo      # bucle (cron/systemd)
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from app.services.notifications import procesar_outbox
+
+
+class Command(BaseCommand):
+    help = 'Envía las notificaciones pendientes de la bandeja de salida.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote',      type=int,   default=50, help='Eventos por lote')
+        parser.add_argument('--hilos',     type=int,   default=4,  help='Envíos SMTP en paralelo')
+        parser.add_argument('--continuo',  action='store_true',    help='No terminar: seguir drenando')
+        parser.add_argument('--intervalo', type=float, default=5,  help='Segundos de espera cuando no hay trabajo')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            close_old_connections()
+            procesados = procesar_outbox(lote=options['lote'], hilos=options['hilos'])
+            total += procesados
+            if procesados:
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+        self.stdout.write(self.style.SUCCESS(f'Eventos procesados: {total}'))
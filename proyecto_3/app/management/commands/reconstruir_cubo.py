@@ -0,0 +1,39 @@
+"""
+Reconstrucción y verificación del cubo de ventas (tabla cubo_venta).
+
+Uso:
+    python manage.py reconstruir_cubo                        # recalcula desde detalle_venta
+    python manage.py reconstruir_cubo --hilos 8 --dias-bloque 7
+    python manage.py reconstruir_cubo --verificar            # solo compara; sale con error si hay diferencias
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from app.services.cubo import reconstruir, verificar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula (o verifica) el cubo de ventas por bloques de días en paralelo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos',       type=int, default=4, help='Bloques que se reconstruyen a la vez')
+        parser.add_argument('--dias-bloque', type=int, default=31, help='Días locales por bloque')
+        parser.add_argument('--verificar',   action='store_true',
+                            help='No escribir: comparar el cubo guardado con el recálculo completo')
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = verificar()
+            for linea in diferencias:
+                self.stdout.write(linea)
+            if diferencias:
+                raise CommandError(f'{len(diferencias)} diferencias entre el cubo y las ventas.')
+            self.stdout.write(self.style.SUCCESS('El cubo cuadra con las ventas.'))
+            return
+
+        if options['hilos'] < 1 or options['dias_bloque'] < 1:
+            raise CommandError('--hilos y --dias-bloque deben ser mayores que 0.')
+        inicio = time.perf_counter()
+        celdas, bloques = reconstruir(hilos=options['hilos'], dias_bloque=options['dias_bloque'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Cubo reconstruido: {celdas} celdas en {bloques} bloques ({time.perf_counter() - inicio:.1f}s).'
+        ))
@@ -0,0 +1,39 @@
+"""
+Reconstrucción y verificación de los KPIs incrementales.
+
+Uso:
+    python manage.py reconstruir_kpis              # recalcula desde ventas/compras/catálogos
+    python manage.py reconstruir_kpis --verificar  # solo compara; sale con error si hay diferencias
+    python manage.py reconstruir_kpis --plegar     # solo suma los deltas pendientes (plegado fallido)
+"""
+from django.core.management.base import BaseCommand, CommandError
+from app.services.kpis import reconstruir, verificar, plegar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula (o verifica) las tablas kpi_contador y kpi_diario.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='No escribir: comparar los KPIs guardados con el recálculo completo')
+        parser.add_argument('--plegar', action='store_true',
+                            help='Solo sumar los deltas de kpi_pendiente a los contadores y días')
+
+    def handle(self, *args, **options):
+        if options['plegar']:
+            self.stdout.write(self.style.SUCCESS(f'Deltas plegados: {plegar()}.'))
+            return
+
+        if options['verificar']:
+            diferencias = verificar()
+            for linea in diferencias:
+                self.stdout.write(linea)
+            if diferencias:
+                raise CommandError(f'{len(diferencias)} diferencias entre los KPIs y las tablas fuente.')
+            self.stdout.write(self.style.SUCCESS('Los KPIs cuadran con las tablas fuente.'))
+            return
+
+        num_contadores, num_dias = reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'KPIs reconstruidos: {num_contadores} contadores, {num_dias} días.'
+        ))
@@ -0,0 +1,24 @@
+"""
+Foto periódica del inventario a partir del libro de movimientos.
+
+Programar con cron (por ejemplo cada hora). Cuanto más frecuente, menos
+movimientos hay que sumar para responder el stock en un instante pasado.
+
+Uso:
+    python manage.py snapshot_inventario
+    python manage.py snapshot_inventario --retraso 120
+"""
+from django.core.management.base import BaseCommand
+from app.services.inventario import tomar_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Guarda el stock de todos los productos calculado desde el libro de movimientos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retraso', type=int, default=60,
+                            help='Antigüedad mínima de un hueco del libro para darlo por descartado')
+
+    def handle(self, *args, **options):
+        fecha, filas = tomar_snapshot(retraso=options['retraso'])
+        self.stdout.write(self.style.SUCCESS(f'Snapshot de {filas} productos al {fecha:%Y-%m-%d %H:%M:%S}.'))
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.3 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+def corregir_stock_negativo(apps, schema_editor):
+    """El constraint no se puede crear si quedan filas con stock < 0."""
+    Producto = apps.get_model('app', 'Producto')
+    corregidos = Producto.objects.filter(stock__lt=0).update(stock=0)
+    if corregidos:
+        print(f'\nProductos con stock negativo llevados a 0: {corregidos}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_alter_cliente_estado_alter_marca_nombremarca_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(corregir_stock_negativo, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='producto_stock_no_negativo'),
+        ),
+    ]
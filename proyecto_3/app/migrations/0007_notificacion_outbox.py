@@ -0,0 +1,47 @@
+# Generated by Django 6.0.3 on 2026-10-18 08:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_producto_stock_no_negativo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('mensaje', models.TextField()),
+                ('tipo', models.CharField(default='info', max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviada', 'Enviada'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('intentos', models.IntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_procesado', models.DateTimeField(blank=True, null=True)),
+                ('excluir_usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'notificación pendiente',
+                'verbose_name_plural': 'notificaciones pendientes',
+                'db_table': 'notificacion_outbox',
+            },
+        ),
+        migrations.AddField(
+            model_name='notificacionemail',
+            name='outbox',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='app.notificacionoutbox'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacionoutbox',
+            index=models.Index(fields=['estado', 'proximo_intento'], name='outbox_estado_proximo_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 6.0.3 on 2026-10-18 08:46
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def poblar_kpis(apps, schema_editor):
+    """
+    Carga inicial de los KPIs a partir del historial existente.
+    Copia de app.services.kpis.calcular_desde_cero() con modelos históricos.
+    """
+    m = {nombre: apps.get_model('app', nombre) for nombre in (
+        'Producto', 'Cliente', 'Proveedor', 'Reporte', 'Venta', 'Compra', 'KpiContador', 'KpiDiario',
+    )}
+    Venta, Compra = m['Venta'], m['Compra']
+
+    valores = {
+        'productos':   m['Producto'].objects.count(),
+        'clientes':    m['Cliente'].objects.count(),
+        'proveedores': m['Proveedor'].objects.count(),
+        'reportes':    m['Reporte'].objects.count(),
+    }
+    v = Venta.objects.aggregate(
+        n=Count('pk'), t=Sum('total'),
+        completadas=Count('pk', filter=Q(estado='Completada')),
+        pendientes=Count('pk', filter=Q(estado='Pendiente')),
+    )
+    c = Compra.objects.aggregate(
+        n=Count('pk'),
+        completadas=Count('pk', filter=Q(estado='Completada')),
+        pendientes=Count('pk', filter=Q(estado='Pendiente')),
+    )
+    valores.update(
+        ventas=v['n'], ingreso_total=v['t'] or Decimal(0),
+        ventas_completadas=v['completadas'], ventas_pendientes=v['pendientes'],
+        compras=c['n'], compras_completadas=c['completadas'], compras_pendientes=c['pendientes'],
+    )
+    m['KpiContador'].objects.bulk_create([m['KpiContador'](clave=k, valor=val) for k, val in valores.items()])
+
+    dias = {}
+    for fila in (Venta.objects.annotate(dia=TruncDate('fecha')).order_by()
+                 .values('dia').annotate(t=Sum('total'), n=Count('pk'))):
+        dias.setdefault(fila['dia'], {}).update(ventas_total=fila['t'] or Decimal(0), ventas_num=fila['n'])
+    for fila in (Compra.objects.order_by().values('fechaCompra')
+                 .annotate(t=Sum(F('cantidad') * F('precio_unitario')), n=Count('pk'))):
+        dias.setdefault(fila['fechaCompra'], {}).update(compras_total=Decimal(fila['t'] or 0), compras_num=fila['n'])
+    m['KpiDiario'].objects.bulk_create(
+        [m['KpiDiario'](fecha=fecha, **campos) for fecha, campos in dias.items()], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_notificacion_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiContador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=50, unique=True)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'kpi contador',
+                'verbose_name_plural': 'kpi contadores',
+                'db_table': 'kpi_contador',
+            },
+        ),
+        migrations.CreateModel(
+            name='KpiDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('ventas_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ventas_num', models.IntegerField(default=0)),
+                ('compras_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('compras_num', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'kpi diario',
+                'verbose_name_plural': 'kpis diarios',
+                'db_table': 'kpi_diario',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.RunPython(poblar_kpis, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 6.0.3 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LOTE = 1000
+
+
+def _clave(nombre):
+    return ' '.join((nombre or '').split()).lower()
+
+
+def poblar_cliente_fk(apps, schema_editor):
+    """
+    Enlaza cada venta con el cliente cuyo nombre coincide con Venta.cliente
+    (sin distinguir mayúsculas ni espacios repetidos). Si hay varios
+    clientes con el mismo nombre se usa el más antiguo.
+
+    Recorre las ventas por lotes de pk para no cargar la tabla completa y
+    hace un UPDATE por cliente y lote.
+    """
+    Venta   = apps.get_model('app', 'Venta')
+    Cliente = apps.get_model('app', 'Cliente')
+
+    por_nombre = {}
+    for pk, nombre in Cliente.objects.order_by('pk').values_list('pk', 'nombre'):
+        por_nombre.setdefault(_clave(nombre), pk)
+
+    enlazadas, sin_cliente = 0, {}
+    ultimo = 0
+    while True:
+        lote = list(
+            Venta.objects.filter(pk__gt=ultimo, idCliente__isnull=True)
+            .order_by('pk').values_list('pk', 'cliente')[:LOTE]
+        )
+        if not lote:
+            break
+        ultimo = lote[-1][0]
+
+        grupos = {}
+        for pk, nombre in lote:
+            cliente_id = por_nombre.get(_clave(nombre))
+            if cliente_id:
+                grupos.setdefault(cliente_id, []).append(pk)
+            else:
+                sin_cliente[nombre] = sin_cliente.get(nombre, 0) + 1
+
+        for cliente_id, ids in grupos.items():
+            enlazadas += Venta.objects.filter(pk__in=ids).update(idCliente_id=cliente_id)
+
+    print(f"\nMigración Venta.idCliente: {enlazadas} enlazada(s), {sum(sin_cliente.values())} sin cliente")
+    for nombre, cantidad in sorted(sin_cliente.items(), key=lambda x: -x[1])[:20]:
+        print(f"  - {nombre!r}: {cantidad} venta(s)")
+    if len(sin_cliente) > 20:
+        print(f"  ... y {len(sin_cliente) - 20} nombre(s) más")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_kpis'),
+    ]
+
+    operations = [
+        # 1. FK nullable (con índice) hacia cliente
+        migrations.AddField(
+            model_name='venta',
+            name='idCliente',
+            field=models.ForeignKey(blank=True, db_column='cliente_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas', to='app.cliente'),
+        ),
+
+        # 2. Migración de datos: enlazar por nombre. Al revertir, el AddField
+        #    elimina la columna, así que no hay nada que limpiar.
+        migrations.RunPython(poblar_cliente_fk, migrations.RunPython.noop),
+    ]
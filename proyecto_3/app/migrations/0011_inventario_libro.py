@@ -0,0 +1,72 @@
+# Generated by Django 6.0.3 on 2026-10-18 08:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def abrir_libro(apps, schema_editor):
+    """
+    Punto de partida del libro: un movimiento 'inicial' por producto con su
+    stock actual y una primera foto de inventario en el mismo instante.
+    """
+    Producto             = apps.get_model('app', 'Producto')
+    MovimientoInventario = apps.get_model('app', 'MovimientoInventario')
+    SnapshotInventario   = apps.get_model('app', 'SnapshotInventario')
+
+    ahora     = timezone.now()
+    productos = list(Producto.objects.order_by('pk').values_list('pk', 'stock'))
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(producto_id=pk, cantidad=stock, stock_resultante=stock,
+                             motivo='inicial', referencia='migracion', fecha=ahora)
+        for pk, stock in productos if stock
+    ], batch_size=1000)
+    SnapshotInventario.objects.bulk_create([
+        SnapshotInventario(producto_id=pk, fecha=ahora, stock=stock) for pk, stock in productos
+    ], batch_size=1000)
+    print(f"\nLibro de inventario abierto para {len(productos)} producto(s)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_venta_importacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('stock_resultante', models.IntegerField()),
+                ('motivo', models.CharField(choices=[('inicial', 'Stock inicial'), ('venta', 'Venta'), ('venta_edicion', 'Edición de venta'), ('venta_eliminada', 'Venta eliminada'), ('importacion', 'Importación POS'), ('compra', 'Compra'), ('compra_edicion', 'Edición de compra'), ('compra_eliminada', 'Compra eliminada'), ('escaner', 'Escáner'), ('ajuste', 'Ajuste manual'), ('conciliacion', 'Conciliación')], max_length=20)),
+                ('referencia', models.CharField(blank=True, default='', max_length=80)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(db_column='producto_id', db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos', to='app.producto')),
+            ],
+            options={
+                'verbose_name': 'movimiento de inventario',
+                'verbose_name_plural': 'movimientos de inventario',
+                'db_table': 'movimiento_inventario',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movinv_producto_fecha_idx'), models.Index(fields=['fecha'], name='movinv_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('producto', models.ForeignKey(db_column='producto_id', db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='snapshots', to='app.producto')),
+            ],
+            options={
+                'verbose_name': 'snapshot de inventario',
+                'verbose_name_plural': 'snapshots de inventario',
+                'db_table': 'snapshot_inventario',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'fecha'), name='snapshot_producto_fecha_uniq')],
+            },
+        ),
+        migrations.RunPython(abrir_libro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.3 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_inventario_libro'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha', 'id'], name='venta_fecha_id_idx'),
+        ),
+    ]
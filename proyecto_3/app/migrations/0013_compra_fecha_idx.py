@@ -0,0 +1,19 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_venta_fecha_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['fechaCompra'], name='compra_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_compra_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuntoReorden',
+            fields=[
+                ('producto', models.OneToOneField(db_column='producto_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorden', serialize=False, to='app.producto')),
+                ('demanda_diaria', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('desviacion', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('dias_entrega', models.IntegerField(default=0)),
+                ('stock_seguridad', models.IntegerField(default=0)),
+                ('punto_reorden', models.IntegerField(default=0)),
+                ('nivel_objetivo', models.IntegerField(default=0)),
+                ('fecha_calculo', models.DateTimeField()),
+                ('proveedor', models.ForeignKey(blank=True, db_column='proveedor_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.proveedor')),
+            ],
+            options={
+                'verbose_name': 'punto de reorden',
+                'verbose_name_plural': 'puntos de reorden',
+                'db_table': 'punto_reorden',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.3 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_punto_reorden'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuboVenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('producto', models.IntegerField(db_column='producto_id', default=0)),
+                ('marca', models.IntegerField(db_column='marca_id', default=0)),
+                ('tipo', models.IntegerField(db_column='tipo_id', default=0)),
+                ('cliente', models.IntegerField(db_column='cliente_id', default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('lineas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'celda del cubo de ventas',
+                'verbose_name_plural': 'cubo de ventas',
+                'db_table': 'cubo_venta',
+                'indexes': [models.Index(fields=['producto', 'dia'], name='cubo_venta_producto_idx'), models.Index(fields=['marca', 'dia'], name='cubo_venta_marca_idx'), models.Index(fields=['tipo', 'dia'], name='cubo_venta_tipo_idx'), models.Index(fields=['cliente', 'dia'], name='cubo_venta_cliente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'producto', 'marca', 'tipo', 'cliente'), name='cubo_venta_celda')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_cubo_venta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(max_length=30)),
+                ('formato', models.CharField(max_length=10)),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('clave_activa', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('lista', 'Lista'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo', models.CharField(blank=True, default='', max_length=255)),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=150)),
+                ('filas', models.IntegerField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('expira', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'exportación',
+                'verbose_name_plural': 'exportaciones',
+                'db_table': 'exportacion_job',
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='exportacion_estado_idx'), models.Index(fields=['expira'], name='exportacion_expira_idx')],
+            },
+        ),
+    ]
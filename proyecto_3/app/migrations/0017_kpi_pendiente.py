@@ -0,0 +1,27 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_exportacion_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=50)),
+                ('fecha', models.DateField(blank=True, null=True)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'kpi pendiente',
+                'verbose_name_plural': 'kpis pendientes',
+                'db_table': 'kpi_pendiente',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def marcar_fotos(apps, schema_editor):
+    """Las fotos anteriores se cortaron por fecha: incluyen los movimientos hasta esa fecha."""
+    MovimientoInventario = apps.get_model('app', 'MovimientoInventario')
+    SnapshotInventario   = apps.get_model('app', 'SnapshotInventario')
+    for fecha in SnapshotInventario.objects.values_list('fecha', flat=True).distinct():
+        hasta = MovimientoInventario.objects.filter(fecha__lte=fecha).aggregate(m=Max('pk'))['m'] or 0
+        SnapshotInventario.objects.filter(fecha=fecha).update(hasta_movimiento=hasta)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_kpi_pendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshotinventario',
+            name='hasta_movimiento',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(marcar_fotos, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from datetime import datetime
 
 
@@ -96,6 +97,10 @@ class Producto(models.Model):
         verbose_name_plural = 'productos'
         db_table            = 'producto'
         unique_together     = [('nombre', 'idMarca', 'idTipo')]
+        constraints         = [
+            # Red de seguridad para el modo optimista de app.services.stock
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='producto_stock_no_negativo'),
+        ]
 
 
 class Proveedor(models.Model):
@@ -120,10 +125,14 @@ class Venta(models.Model):
         ('Completada', 'Completada'),
         ('Pendiente',  'Pendiente'),
     ]
-    cliente = models.CharField(max_length=100)
-    fecha   = models.DateTimeField(auto_now_add=True)
-    total   = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    estado  = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Pendiente')
+    cliente   = models.CharField(max_length=100)
+    idCliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True,
+                                  db_column='cliente_id', related_name='ventas')
+    fecha     = models.DateTimeField(default=timezone.now)
+    total     = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    estado    = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Pendiente')
+    # Clave enviada por el terminal POS: reenviar un lote no duplica ventas
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
     def __str__(self):
         return f"Venta #{self.id} - {self.cliente}"
@@ -133,6 +142,10 @@ class Venta(models.Model):
         verbose_name_plural = 'ventas'
         db_table            = 'venta'
         ordering            = ['-fecha']
+        indexes             = [
+            # Cursor (fecha, id) de app.services.ventas_api
+            models.Index(fields=['fecha', 'id'], name='venta_fecha_id_idx'),
+        ]
 
 
 class DetalleVenta(models.Model):
@@ -187,6 +200,10 @@ class Compra(models.Model):
         verbose_name        = 'compra'
         verbose_name_plural = 'compras'
         ordering            = ['-fechaCompra']
+        indexes             = [
+            # Rangos de fecha de app.services.series
+            models.Index(fields=['fechaCompra'], name='compra_fecha_idx'),
+        ]
 
 
 class Pedidos(models.Model):
@@ -237,6 +254,39 @@ class Reporte(models.Model):
         db_table            = 'reporte'
 
 
+class NotificacionOutbox(models.Model):
+    """
+    Bandeja de salida transaccional: un evento de notificación por fila.
+    Se escribe dentro de la misma transacción que lo origina (una sola
+    inserción, sin importar cuántos usuarios lo recibirán) y lo despacha
+    después app.services.notifications.procesar_outbox().
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviada',   'Enviada'),
+        ('error',     'Error'),
+    ]
+    asunto          = models.CharField(max_length=255)
+    mensaje         = models.TextField()
+    tipo            = models.CharField(max_length=20, default='info')
+    excluir_usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    estado          = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos        = models.IntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error    = models.TextField(blank=True, default='')
+    fecha_creacion  = models.DateTimeField(auto_now_add=True)
+    fecha_procesado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.asunto} ({self.estado})"
+
+    class Meta:
+        verbose_name        = 'notificación pendiente'
+        verbose_name_plural = 'notificaciones pendientes'
+        db_table            = 'notificacion_outbox'
+        indexes             = [models.Index(fields=['estado', 'proximo_intento'], name='outbox_estado_proximo_idx')]
+
+
 class NotificacionEmail(models.Model):
     TIPO_CHOICES = [
         ('alerta',  'Alerta'),
@@ -252,6 +302,7 @@ class NotificacionEmail(models.Model):
     enviada        = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_envio    = models.DateTimeField(null=True, blank=True)
+    outbox         = models.ForeignKey(NotificacionOutbox, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
 
     def __str__(self):
         return f"{self.asunto} - {self.usuario.username}"
@@ -260,4 +311,234 @@ class NotificacionEmail(models.Model):
         verbose_name        = 'notificación email'
         verbose_name_plural = 'notificaciones email'
         db_table            = 'notificacion_email'
-        ordering            = ['-fecha_creacion']
\ No newline at end of file
+        ordering            = ['-fecha_creacion']
+
+
+class KpiDiario(models.Model):
+    """
+    Totales por día (fecha local) mantenidos de forma incremental por
+    app.services.kpis. Los tableros leen estas filas en vez de sumar el
+    historial completo de ventas y compras.
+    """
+    fecha         = models.DateField(unique=True)
+    ventas_total  = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ventas_num    = models.IntegerField(default=0)
+    compras_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    compras_num   = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"KPI {self.fecha}"
+
+    class Meta:
+        verbose_name        = 'kpi diario'
+        verbose_name_plural = 'kpis diarios'
+        db_table            = 'kpi_diario'
+        ordering            = ['-fecha']
+
+
+class KpiContador(models.Model):
+    """Contadores globales (número de productos, ventas, ingreso total...)."""
+    clave = models.CharField(max_length=50, unique=True)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
+
+    class Meta:
+        verbose_name        = 'kpi contador'
+        verbose_name_plural = 'kpi contadores'
+        db_table            = 'kpi_contador'
+
+
+class KpiPendiente(models.Model):
+    """
+    Deltas de KPI aún no sumados (solo inserción). Las ventas y compras los
+    insertan dentro de su transacción sin bloquear filas compartidas;
+    app.services.kpis.plegar() los suma a KpiContador y KpiDiario después
+    del commit y los borra.
+    """
+    clave = models.CharField(max_length=50)                 # contador, o campo de KpiDiario si hay fecha
+    fecha = models.DateField(null=True, blank=True)
+    valor = models.DecimalField(max_digits=16, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.clave} {self.fecha or ''} {self.valor:+}"
+
+    class Meta:
+        verbose_name        = 'kpi pendiente'
+        verbose_name_plural = 'kpis pendientes'
+        db_table            = 'kpi_pendiente'
+
+
+class MovimientoInventario(models.Model):
+    """
+    Libro de movimientos de stock (solo inserción). Cada cambio de
+    Producto.stock hecho por app.services.stock deja aquí una fila con la
+    cantidad firmada, el stock resultante y el motivo. La suma de
+    `cantidad` por producto es igual a su stock actual.
+    """
+    MOTIVO_CHOICES = [
+        ('inicial',          'Stock inicial'),
+        ('venta',            'Venta'),
+        ('venta_edicion',    'Edición de venta'),
+        ('venta_eliminada',  'Venta eliminada'),
+        ('importacion',      'Importación POS'),
+        ('compra',           'Compra'),
+        ('compra_edicion',   'Edición de compra'),
+        ('compra_eliminada', 'Compra eliminada'),
+        ('escaner',          'Escáner'),
+        ('ajuste',           'Ajuste manual'),
+        ('conciliacion',     'Conciliación'),
+    ]
+    # Sin FK real: el historial se conserva aunque el producto se elimine.
+    # El índice (producto, fecha) de Meta cubre las búsquedas por producto.
+    producto         = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                                         db_column='producto_id', related_name='movimientos')
+    cantidad         = models.IntegerField()
+    stock_resultante = models.IntegerField()
+    motivo           = models.CharField(max_length=20, choices=MOTIVO_CHOICES)
+    referencia       = models.CharField(max_length=80, blank=True, default='')   # 'venta:12', 'pos:<clave>'...
+    fecha            = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_motivo_display()} {self.cantidad:+d} → {self.stock_resultante}"
+
+    class Meta:
+        verbose_name        = 'movimiento de inventario'
+        verbose_name_plural = 'movimientos de inventario'
+        db_table            = 'movimiento_inventario'
+        indexes             = [
+            models.Index(fields=['producto', 'fecha'], name='movinv_producto_fecha_idx'),
+            models.Index(fields=['fecha'],             name='movinv_fecha_idx'),
+        ]
+
+
+class SnapshotInventario(models.Model):
+    """
+    Foto periódica del stock de cada producto, calculada a partir del libro
+    de movimientos (comando snapshot_inventario). Incluye los movimientos
+    hasta `hasta_movimiento` (id del libro). El stock en un instante pasado
+    es el de la última foto anterior más los movimientos que no incluye.
+    """
+    producto         = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                                         db_column='producto_id', related_name='snapshots')
+    fecha            = models.DateTimeField()
+    stock            = models.IntegerField()
+    hasta_movimiento = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Snapshot {self.producto_id} @ {self.fecha}: {self.stock}"
+
+    class Meta:
+        verbose_name        = 'snapshot de inventario'
+        verbose_name_plural = 'snapshots de inventario'
+        db_table            = 'snapshot_inventario'
+        constraints         = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='snapshot_producto_fecha_uniq'),
+        ]
+
+
+class PuntoReorden(models.Model):
+    """
+    Punto de reorden de cada producto, recalculado cada noche por el comando
+    calcular_reorden (app.services.reabastecimiento) a partir de la demanda
+    diaria reciente y los días de entrega del último proveedor. Un producto
+    necesita compra cuando su stock actual es <= punto_reorden; la cantidad
+    sugerida es nivel_objetivo - stock.
+    """
+    producto        = models.OneToOneField(Producto, on_delete=models.CASCADE, primary_key=True,
+                                           db_column='producto_id', related_name='reorden')
+    proveedor       = models.ForeignKey(Proveedor, on_delete=models.SET_NULL, null=True, blank=True,
+                                        db_column='proveedor_id', related_name='+')
+    demanda_diaria  = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    desviacion      = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    dias_entrega    = models.IntegerField(default=0)
+    stock_seguridad = models.IntegerField(default=0)
+    punto_reorden   = models.IntegerField(default=0)
+    nivel_objetivo  = models.IntegerField(default=0)
+    fecha_calculo   = models.DateTimeField()
+
+    def __str__(self):
+        return f"Reorden {self.producto_id}: {self.punto_reorden}"
+
+    class Meta:
+        verbose_name        = 'punto de reorden'
+        verbose_name_plural = 'puntos de reorden'
+        db_table            = 'punto_reorden'
+
+
+class CuboVenta(models.Model):
+    """
+    Cubo de ventas: unidades, ingresos y líneas por (día local, producto,
+    marca, tipo, cliente), mantenido de forma incremental por
+    app.services.cubo. Las dimensiones son ids sueltos, sin FK, para que
+    borrar un catálogo no toque el cubo; 0 = sin producto / sin cliente.
+    """
+    dia      = models.DateField()
+    producto = models.IntegerField(default=0, db_column='producto_id')
+    marca    = models.IntegerField(default=0, db_column='marca_id')
+    tipo     = models.IntegerField(default=0, db_column='tipo_id')
+    cliente  = models.IntegerField(default=0, db_column='cliente_id')
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    lineas   = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Cubo {self.dia} p{self.producto} c{self.cliente}"
+
+    class Meta:
+        verbose_name        = 'celda del cubo de ventas'
+        verbose_name_plural = 'cubo de ventas'
+        db_table            = 'cubo_venta'
+        constraints         = [
+            models.UniqueConstraint(fields=['dia', 'producto', 'marca', 'tipo', 'cliente'], name='cubo_venta_celda'),
+        ]
+        indexes             = [
+            # El índice único ya cubre los filtros por rango de días
+            models.Index(fields=['producto', 'dia'], name='cubo_venta_producto_idx'),
+            models.Index(fields=['marca', 'dia'],    name='cubo_venta_marca_idx'),
+            models.Index(fields=['tipo', 'dia'],     name='cubo_venta_tipo_idx'),
+            models.Index(fields=['cliente', 'dia'],  name='cubo_venta_cliente_idx'),
+        ]
+
+
+class ExportacionJob(models.Model):
+    """
+    Exportación (PDF/Excel) generada fuera de la petición por
+    app.services.exportaciones. `clave_activa` es el hash de entidad,
+    formato y filtros mientras el trabajo está pendiente o en proceso: el
+    índice único hace que dos pedidos iguales compartan la fila. Al quedar
+    listo o fallar vuelve a NULL y el siguiente pedido crea otra.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente',  'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('lista',      'Lista'),
+        ('error',      'Error'),
+    ]
+    entidad        = models.CharField(max_length=30)
+    formato        = models.CharField(max_length=10)
+    filtros        = models.JSONField(default=dict, blank=True)
+    clave_activa   = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    estado         = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    usuario        = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    archivo        = models.CharField(max_length=255, blank=True, default='')   # relativo a EXPORTACIONES_DIR
+    nombre_archivo = models.CharField(max_length=150, blank=True, default='')
+    filas          = models.IntegerField(null=True, blank=True)
+    ultimo_error   = models.TextField(blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio   = models.DateTimeField(null=True, blank=True)
+    fecha_fin      = models.DateTimeField(null=True, blank=True)
+    expira         = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Exportación {self.entidad}.{self.formato} ({self.estado})"
+
+    class Meta:
+        verbose_name        = 'exportación'
+        verbose_name_plural = 'exportaciones'
+        db_table            = 'exportacion_job'
+        indexes             = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='exportacion_estado_idx'),
+            models.Index(fields=['expira'],                   name='exportacion_expira_idx'),
+        ]
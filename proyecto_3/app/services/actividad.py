@@ -0,0 +1,164 @@
+"""
+Feed unificado de movimientos (ventas y compras), del más reciente al más
+antiguo.
+
+Una sola consulta UNION ALL arma el feed en la base de datos: cada rama
+proyecta las mismas columnas (tipo, orden, ref, momento, ...) y el ORDER
+BY / LIMIT se aplica al resultado combinado. El orden es (momento, orden,
+ref) descendente:
+
+  - momento: venta.fecha tal cual; compra.fecha (un DateField) normalizada
+    a la medianoche local de su día, así fechas y fechas con hora se
+    comparan en el mismo eje en lugar de como texto
+  - orden: 1 venta, 0 compra, desempata movimientos del mismo instante
+  - ref: id de la fila
+
+La paginación es por clave (keyset): el cursor opaco lleva (momento,
+orden, ref) del último movimiento entregado, y cada rama se filtra con
+condiciones sobre sus propias columnas (venta.fecha, compra.fecha) antes
+del UNION, así usan sus índices y la página 1000 cuesta lo mismo que la
+primera. Donde el motor lo permite (MySQL), cada rama además se ordena y
+se limita por su cuenta antes de combinarse.
+
+La medianoche local usa el desfase actual de settings.TIME_ZONE; Bogotá no
+tiene horario de verano.
+"""
+import base64
+import datetime
+from django.db import connection
+from django.db.models import F, Q, Value, OuterRef, Subquery, CharField, IntegerField, DateTimeField, \
+    DecimalField, ExpressionWrapper
+from django.db.models.functions import Cast
+from django.utils import timezone
+from app.models import Venta, DetalleVenta, Compra
+from app.services.series import zona
+
+ORDEN_VENTA  = 1
+ORDEN_COMPRA = 0
+COLUMNAS     = ('tipo', 'orden', 'ref', 'momento', 'articulo', 'unidades', 'contraparte', 'valor', 'situacion')
+
+
+# ─────────────────────────────────────────────
+# Cursor
+# ─────────────────────────────────────────────
+
+def codificar_cursor(momento, orden, ref):
+    texto = f'{momento.isoformat()}|{orden}|{ref}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (momento, orden, ref). Lanza ValueError si el cursor no es válido."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        momento, orden, ref = texto.split('|')
+        momento = datetime.datetime.fromisoformat(momento)
+        if timezone.is_naive(momento):
+            raise ValueError
+        return momento, int(orden), int(ref)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor no válido.')
+
+
+# ─────────────────────────────────────────────
+# Ramas del UNION
+# ─────────────────────────────────────────────
+
+def _desfase():
+    """Lo que hay que sumar a una fecha a las 00:00 UTC para llegar a la medianoche local."""
+    return -zona().utcoffset(datetime.datetime.now())
+
+
+def _ventas(cursor):
+    primera = DetalleVenta.objects.filter(venta=OuterRef('pk')).order_by('pk')
+    qs = Venta.objects.all()
+    if cursor:
+        momento, orden, ref = cursor
+        if ORDEN_VENTA < orden:
+            qs = qs.filter(fecha__lte=momento)
+        elif ORDEN_VENTA == orden:
+            qs = qs.filter(Q(fecha__lt=momento) | Q(fecha=momento, id__lt=ref))
+        else:
+            qs = qs.filter(fecha__lt=momento)
+    return qs.annotate(
+        tipo=Value('venta', output_field=CharField()),
+        orden=Value(ORDEN_VENTA, output_field=IntegerField()),
+        ref=F('id'),
+        momento=F('fecha'),
+        articulo=Subquery(primera.values('producto_nombre')[:1]),
+        unidades=Subquery(primera.values('cantidad')[:1]),
+        contraparte=F('cliente'),
+        valor=F('total'),
+        situacion=F('estado'),
+    ).values(*COLUMNAS).order_by()
+
+
+def _compras(cursor):
+    desfase = _desfase()
+    qs = Compra.objects.all()
+    if cursor:
+        # momento(d) = d 00:00 UTC + desfase: se traduce el cursor a un límite sobre compra.fecha
+        momento, orden, ref = cursor
+        dia    = (momento.astimezone(datetime.timezone.utc) - desfase).date()
+        exacto = datetime.datetime.combine(dia, datetime.time.min, datetime.timezone.utc) + desfase == momento
+        if ORDEN_COMPRA < orden or not exacto:
+            qs = qs.filter(fechaCompra__lte=dia)
+        elif ORDEN_COMPRA == orden:
+            qs = qs.filter(Q(fechaCompra__lt=dia) | Q(fechaCompra=dia, idCompra__lt=ref))
+        else:
+            qs = qs.filter(fechaCompra__lt=dia)
+    return qs.annotate(
+        tipo=Value('compra', output_field=CharField()),
+        orden=Value(ORDEN_COMPRA, output_field=IntegerField()),
+        ref=F('idCompra'),
+        momento=ExpressionWrapper(Cast('fechaCompra', DateTimeField()) + Value(desfase),
+                                  output_field=DateTimeField()),
+        articulo=F('Producto__nombre'),
+        unidades=F('cantidad'),
+        contraparte=F('Proveedor__nombre'),
+        valor=ExpressionWrapper(F('cantidad') * F('precio_unitario'),
+                                output_field=DecimalField(max_digits=14, decimal_places=2)),
+        situacion=F('estado'),
+    ).values(*COLUMNAS).order_by()
+
+
+# ─────────────────────────────────────────────
+# Página
+# ─────────────────────────────────────────────
+
+def _movimiento(fila):
+    es_venta = fila['tipo'] == 'venta'
+    local    = timezone.localtime(fila['momento'], zona())
+    if es_venta:
+        descripcion = (f"{fila['articulo']} × {fila['unidades']} — {fila['contraparte']}"
+                       if fila['articulo'] is not None else fila['contraparte'])
+    else:
+        descripcion = f"{fila['articulo'] or '-'} — {fila['contraparte'] or '-'}"
+    return {
+        'id':          f"{'V' if es_venta else 'C'}{str(fila['ref']).zfill(3)}",
+        'modulo':      'Venta' if es_venta else 'Compra',
+        'tipo':        fila['tipo'],
+        'descripcion': descripcion,
+        'valor':       float(fila['valor'] or 0),
+        'fecha':       local.strftime('%Y-%m-%d %H:%M' if es_venta else '%Y-%m-%d'),
+        'estado':      fila['situacion'],
+        'cursor':      codificar_cursor(fila['momento'], fila['orden'], fila['ref']),
+    }
+
+
+def pagina_actividad(cursor=None, limite=100):
+    """
+    Retorna (movimientos, cursor_siguiente) con una sola consulta;
+    cursor_siguiente es None en la última página. `cursor` es el string
+    opaco de un movimiento anterior (ValueError si no es válido).
+    """
+    cursor = decodificar_cursor(cursor) if cursor else None
+    ventas, compras = _ventas(cursor), _compras(cursor)
+    if connection.features.supports_slicing_ordering_in_compound:
+        ventas  = ventas.order_by('-fecha', '-id')[:limite + 1]
+        compras = compras.order_by('-fechaCompra', '-idCompra')[:limite + 1]
+
+    filas   = list(ventas.union(compras, all=True).order_by('-momento', '-orden', '-ref')[:limite + 1])
+    hay_mas = len(filas) > limite
+    movimientos = [_movimiento(f) for f in filas[:limite]]
+    return movimientos, (movimientos[-1]['cursor'] if hay_mas else None)
@@ -0,0 +1,140 @@
+"""
+Caché de los reportes con versión global de datos.
+
+Cada vez que cambian ventas, detalles, compras, productos, clientes o
+proveedores (señales de app/signals.py) o se mueve stock (libro de
+inventario en app/services/stock.py) se incrementa un número de versión
+guardado en el backend de caché settings.REPORTES_CACHE. Las entradas
+guardan la versión con la que se calcularon; una entrada de otra versión
+está obsoleta. El incremento se hace al confirmar la transacción, así un
+worker nunca guarda bajo la versión nueva datos leídos antes del commit.
+
+Con settings.REPORTES_CACHE_SWR (stale-while-revalidate) solo un worker
+recalcula una entrada obsoleta; los demás siguen sirviendo la anterior
+mientras tanto. Sin SWR cada worker que encuentra la entrada obsoleta la
+recalcula.
+
+REPORTES_CACHE_TTL = 0 desactiva la caché.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+CLAVE_VERSION    = 'reportes:version'
+CLAVE_MODIFICADO = 'reportes:modificado'
+
+_metricas = {
+    'aciertos': 0, 'fallos': 0, 'obsoletas_servidas': 0, 'reconstrucciones': 0,
+    'reconstruccion_total_ms': 0.0, 'reconstruccion_max_ms': 0.0, 'reconstruccion_ultima_ms': 0.0,
+}
+_metricas_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'REPORTES_CACHE', 'default')]
+
+
+def _contar(clave, n=1):
+    with _metricas_lock:
+        _metricas[clave] += n
+
+
+def metricas_cache():
+    """Copia de los contadores del proceso actual (aciertos, fallos, tiempos de reconstrucción)."""
+    with _metricas_lock:
+        datos = dict(_metricas)
+    consultas = datos['aciertos'] + datos['fallos'] + datos['obsoletas_servidas']
+    datos['tasa_aciertos'] = round((datos['aciertos'] + datos['obsoletas_servidas']) / consultas, 4) if consultas else None
+    if datos['reconstrucciones']:
+        datos['reconstruccion_promedio_ms'] = round(datos['reconstruccion_total_ms'] / datos['reconstrucciones'], 2)
+    return datos
+
+
+# ─────────────────────────────────────────────
+# Versión global de los datos
+# ─────────────────────────────────────────────
+
+def version_datos():
+    """
+    Versión actual. Se inicializa con la hora en milisegundos: si el backend
+    pierde la clave, la versión nueva no coincide con ninguna entrada vieja.
+    """
+    cache   = _cache()
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def _incrementar_version():
+    cache = _cache()
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns() // 1_000_000, timeout=None)
+    cache.set(CLAVE_MODIFICADO, timezone.now(), timeout=None)
+
+
+def ultima_modificacion():
+    """Momento del último cambio confirmado que vio este backend de caché (o None)."""
+    return _cache().get(CLAVE_MODIFICADO)
+
+
+def invalidar():
+    """Marca los reportes como obsoletos cuando la transacción en curso se confirme."""
+    transaction.on_commit(_incrementar_version)
+
+
+# ─────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────
+
+def _reconstruir(cache, clave, version, calcular, ttl):
+    inicio = time.perf_counter()
+    datos  = calcular()
+    ms     = (time.perf_counter() - inicio) * 1000
+    cache.set(clave, {'version': version, 'datos': datos}, timeout=ttl)
+    with _metricas_lock:
+        _metricas['reconstrucciones']         += 1
+        _metricas['reconstruccion_total_ms']  += ms
+        _metricas['reconstruccion_ultima_ms']  = round(ms, 2)
+        _metricas['reconstruccion_max_ms']     = round(max(_metricas['reconstruccion_max_ms'], ms), 2)
+    return datos
+
+
+def obtener(nombre, calcular):
+    """
+    Retorna calcular() cacheado bajo `nombre` para la versión de datos actual.
+    calcular no recibe argumentos y debe retornar algo serializable por pickle.
+    """
+    ttl = getattr(settings, 'REPORTES_CACHE_TTL', 300)
+    if not ttl:
+        return calcular()
+
+    cache   = _cache()
+    clave   = f'reportes:{nombre}'
+    version = version_datos()
+    entrada = cache.get(clave)
+
+    if entrada and entrada['version'] == version:
+        _contar('aciertos')
+        return entrada['datos']
+
+    if entrada and getattr(settings, 'REPORTES_CACHE_SWR', False):
+        # Solo quien toma el candado recalcula; el resto sirve la copia anterior
+        candado = f'{clave}:reconstruyendo'
+        if not cache.add(candado, 1, timeout=getattr(settings, 'REPORTES_CACHE_CANDADO', 30)):
+            _contar('obsoletas_servidas')
+            return entrada['datos']
+        try:
+            _contar('fallos')
+            return _reconstruir(cache, clave, version, calcular, ttl)
+        finally:
+            cache.delete(candado)
+
+    _contar('fallos')
+    return _reconstruir(cache, clave, version, calcular, ttl)
@@ -0,0 +1,348 @@
+"""
+Caché columnar en memoria de las líneas de venta.
+
+Cada proceso guarda detalle_venta unido a venta.fecha como arrays NumPy
+paralelos, una posición por línea:
+
+  ids       id de la línea (creciente)
+  producto  id del producto (0 si se eliminó)
+  cantidad  unidades
+  precio    precio unitario
+  momento   venta.fecha en segundos epoch (UTC)
+
+Sobre esos arrays top_productos(), mapa_calor() y totales() se calculan
+con máscaras y bincount, sin consultas (salvo los nombres del top).
+
+Carga y refresco:
+
+  - la primera consulta carga todo por lotes de settings.COLUMNAR_LOTE
+    filas, paginando por id
+  - cada settings.COLUMNAR_REFRESCO segundos se anexan las líneas con id
+    mayor que el último cargado (marca de agua). Los ids que faltan justo
+    debajo de la marca pueden ser transacciones aún sin confirmar: se
+    vuelven a pedir en los refrescos siguientes durante HUECOS_TTL segundos
+  - editar o borrar líneas, cambiar la fecha de una venta o eliminar un
+    producto incrementa un contador de generación compartido (backend de
+    settings.REPORTES_CACHE, ver app/signals.py); un proceso que ve otra
+    generación recarga todo
+  - con más de settings.COLUMNAR_MAX_MB se conservan solo las líneas más
+    recientes; estado()['desde'] dice desde cuándo hay datos
+
+El refresco lo hace un solo hilo; los demás siguen leyendo la instantánea
+anterior, que nunca se modifica en sitio.
+
+La hora local usa el desfase actual de settings.TIME_ZONE; Bogotá no
+tiene horario de verano.
+"""
+import datetime
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from app.models import DetalleVenta, Producto
+from app.services.series import zona, rango, limites
+
+CLAVE_GENERACION = 'columnar:generacion'
+
+# int64 id + int32 producto + int32 cantidad + float64 precio + int64 momento
+BYTES_POR_FILA = 8 + 4 + 4 + 8 + 8
+
+# Ids faltantes que se vuelven a pedir: solo los más cercanos a la marca, por este tiempo
+MARGEN_HUECOS = 1000
+HUECOS_TTL    = 300
+
+# Ventana por defecto de las consultas (días hacia atrás desde hoy, inclusive)
+DIAS_ANALISIS = 30
+
+DIAS_SEMANA = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+
+Columnas = namedtuple('Columnas', 'ids producto cantidad precio momento')
+
+_estado = {
+    'columnas':   None,
+    'generacion': None,
+    'revisado':   0.0,
+    'cargado':    None,
+    'huecos':     {},
+    'recortado':  False,
+    'cargas':     0,
+    'anexos':     0,
+}
+_lock = threading.Lock()
+
+
+def _vacias():
+    return Columnas(np.zeros(0, np.int64), np.zeros(0, np.int32), np.zeros(0, np.int32),
+                    np.zeros(0, np.float64), np.zeros(0, np.int64))
+
+
+def _cache():
+    return caches[getattr(settings, 'REPORTES_CACHE', 'default')]
+
+
+# ─────────────────────────────────────────────
+# Generación compartida
+# ─────────────────────────────────────────────
+
+def _generacion():
+    cache      = _cache()
+    generacion = cache.get(CLAVE_GENERACION)
+    if generacion is None:
+        cache.add(CLAVE_GENERACION, time.time_ns() // 1_000_000, timeout=None)
+        generacion = cache.get(CLAVE_GENERACION)
+    return generacion
+
+
+def _incrementar_generacion():
+    cache = _cache()
+    try:
+        cache.incr(CLAVE_GENERACION)
+    except ValueError:
+        cache.add(CLAVE_GENERACION, time.time_ns() // 1_000_000, timeout=None)
+
+
+def marcar_cambio():
+    """Obliga a recargar la caché columnar de todos los procesos al confirmar la transacción en curso."""
+    transaction.on_commit(_incrementar_generacion)
+
+
+# ─────────────────────────────────────────────
+# Carga
+# ─────────────────────────────────────────────
+
+def _a_columnas(filas):
+    n = len(filas)
+    return Columnas(
+        np.fromiter((f[0] for f in filas), np.int64, n),
+        np.fromiter((f[1] or 0 for f in filas), np.int32, n),
+        np.fromiter((f[2] or 0 for f in filas), np.int32, n),
+        np.fromiter((float(f[3] or 0) for f in filas), np.float64, n),
+        np.fromiter((int(f[4].timestamp()) for f in filas), np.int64, n),
+    )
+
+
+def _consulta():
+    return DetalleVenta.objects.values_list('pk', 'producto_id', 'cantidad', 'precio', 'venta__fecha')
+
+
+def _leer(desde_id, lote):
+    """Lista de Columnas con las líneas de id > desde_id, un elemento por lote (paginado por id)."""
+    partes = []
+    while True:
+        filas = list(_consulta().filter(pk__gt=desde_id).order_by('pk')[:lote])
+        if not filas:
+            return partes
+        partes.append(_a_columnas(filas))
+        desde_id = filas[-1][0]
+        if len(filas) < lote:
+            return partes
+
+
+def _unir(base, partes):
+    partes = [base] + [p for p in partes if len(p.ids)]
+    if len(partes) == 1:
+        return base
+    columnas = Columnas(*(np.concatenate(arrays) for arrays in zip(*partes)))
+    if np.any(np.diff(columnas.ids) < 0):
+        # Huecos recuperados: quedan en su lugar por id
+        orden    = np.argsort(columnas.ids, kind='stable')
+        columnas = Columnas(*(array[orden] for array in columnas))
+    return columnas
+
+
+def _max_filas():
+    return max(1, int(settings.COLUMNAR_MAX_MB * 2 ** 20 // BYTES_POR_FILA))
+
+
+def _recortar(columnas):
+    limite = _max_filas()
+    if len(columnas.ids) <= limite:
+        return columnas
+    _estado['recortado'] = True
+    return Columnas(*(array[-limite:].copy() for array in columnas))
+
+
+def _anotar_huecos(columnas, tope_anterior):
+    """Registra los ids que faltan entre la marca anterior y la nueva (solo los MARGEN_HUECOS más altos)."""
+    if not len(columnas.ids):
+        return
+    tope   = int(columnas.ids[-1])
+    inicio = max(tope_anterior + 1, tope - MARGEN_HUECOS)
+    ahora  = time.monotonic()
+    for pk in np.setdiff1d(np.arange(inicio, tope + 1), columnas.ids[columnas.ids >= inicio]):
+        _estado['huecos'].setdefault(int(pk), ahora)
+
+
+def _cargar_todo(generacion):
+    lote  = settings.COLUMNAR_LOTE
+    total = DetalleVenta.objects.count()
+    desde = 0
+    _estado['recortado'] = total > _max_filas()
+    if _estado['recortado']:
+        desde = DetalleVenta.objects.order_by('-pk').values_list('pk', flat=True)[_max_filas()]
+
+    columnas = _unir(_vacias(), _leer(desde, lote))
+    _estado['huecos'] = {}
+    _anotar_huecos(columnas, 0)
+    _estado.update(columnas=_recortar(columnas), generacion=generacion,
+                   cargado=datetime.datetime.now(datetime.timezone.utc))
+    _estado['cargas'] += 1
+
+
+def _anexar():
+    actual = _estado['columnas']
+    tope   = int(actual.ids[-1]) if len(actual.ids) else 0
+    nuevas = _unir(_vacias(), _leer(tope, settings.COLUMNAR_LOTE))
+
+    ahora  = time.monotonic()
+    huecos = {pk: visto for pk, visto in _estado['huecos'].items() if ahora - visto < HUECOS_TTL}
+    recuperadas = _vacias()
+    if huecos:
+        recuperadas = _a_columnas(list(_consulta().filter(pk__in=list(huecos)).order_by('pk')))
+        for pk in recuperadas.ids:
+            huecos.pop(int(pk), None)
+    _estado['huecos'] = huecos
+    _anotar_huecos(nuevas, tope)
+
+    if len(nuevas.ids) or len(recuperadas.ids):
+        _estado['columnas'] = _recortar(_unir(actual, [recuperadas, nuevas]))
+        _estado['anexos'] += 1
+
+
+def _refrescar():
+    # La generación se lee antes que los datos: un cambio durante la carga fuerza otra recarga
+    generacion = _generacion()
+    if _estado['columnas'] is None or generacion != _estado['generacion']:
+        _cargar_todo(generacion)
+    else:
+        _anexar()
+    _estado['revisado'] = time.monotonic()
+
+
+def columnas():
+    """
+    Instantánea actual (Columnas), refrescada si pasó settings.COLUMNAR_REFRESCO.
+    Solo la primera carga bloquea; mientras un hilo refresca, el resto lee la anterior.
+    """
+    if _estado['columnas'] is not None and time.monotonic() - _estado['revisado'] < settings.COLUMNAR_REFRESCO:
+        return _estado['columnas']
+    if not _lock.acquire(blocking=_estado['columnas'] is None):
+        return _estado['columnas']
+    try:
+        if _estado['columnas'] is None or time.monotonic() - _estado['revisado'] >= settings.COLUMNAR_REFRESCO:
+            _refrescar()
+        return _estado['columnas']
+    finally:
+        _lock.release()
+
+
+def reiniciar():
+    """Descarta la caché de este proceso (la próxima consulta recarga todo)."""
+    with _lock:
+        _estado.update(columnas=None, generacion=None, revisado=0.0, cargado=None, huecos={}, recortado=False)
+
+
+def estado():
+    """Tamaño y frescura de la caché de este proceso."""
+    datos = _estado['columnas']
+    filas = len(datos.ids) if datos is not None else 0
+    return {
+        'filas':      filas,
+        'mb':         round(sum(array.nbytes for array in datos) / 2 ** 20, 2) if datos is not None else 0.0,
+        'max_mb':     settings.COLUMNAR_MAX_MB,
+        'desde':      (datetime.datetime.fromtimestamp(int(datos.momento.min()), zona()).isoformat()
+                       if filas else None),
+        'recortado':  _estado['recortado'],
+        'cargado':    _estado['cargado'].isoformat() if _estado['cargado'] else None,
+        'cargas':     _estado['cargas'],
+        'anexos':     _estado['anexos'],
+        'huecos':     len(_estado['huecos']),
+    }
+
+
+# ─────────────────────────────────────────────
+# Consultas vectorizadas
+# ─────────────────────────────────────────────
+
+def _mascara(datos, desde, hasta):
+    desde, hasta = rango(desde, hasta, 'dia', dias=DIAS_ANALISIS)
+    inicio, fin  = limites(desde, hasta)
+    mascara = (datos.momento >= int(inicio.timestamp())) & (datos.momento < int(fin.timestamp()))
+    return mascara, desde, hasta
+
+
+def totales(desde=None, hasta=None, datos=None):
+    """{'unidades', 'ingresos', 'lineas'} entre dos días locales (por defecto los últimos DIAS_ANALISIS)."""
+    datos = columnas() if datos is None else datos
+    mascara, desde, hasta = _mascara(datos, desde, hasta)
+    cantidad = datos.cantidad[mascara]
+    return {
+        'desde':    desde.isoformat(),
+        'hasta':    hasta.isoformat(),
+        'unidades': int(cantidad.sum()),
+        'ingresos': round(float(np.dot(cantidad, datos.precio[mascara])), 2),
+        'lineas':   int(mascara.sum()),
+    }
+
+
+def top_productos(n=10, desde=None, hasta=None, por='ingresos', nombres=True, datos=None):
+    """
+    Los `n` productos con más ingresos (o unidades, por='unidades') en la
+    ventana. Con nombres=True hace 1 consulta para los nombres actuales.
+    """
+    if por not in ('ingresos', 'unidades'):
+        raise ValueError('Ordene por ingresos o unidades.')
+    datos = columnas() if datos is None else datos
+    mascara, _, _ = _mascara(datos, desde, hasta)
+    mascara &= datos.producto > 0
+    producto = datos.producto[mascara]
+    cantidad = datos.cantidad[mascara]
+    if not len(producto):
+        return []
+
+    unidades = np.bincount(producto, weights=cantidad)
+    ingresos = np.bincount(producto, weights=cantidad * datos.precio[mascara])
+    valores  = ingresos if por == 'ingresos' else unidades
+    con_ventas = np.flatnonzero(unidades)
+    n     = min(n, len(con_ventas))
+    if n < 1:
+        return []
+    top   = con_ventas[np.argpartition(-valores[con_ventas], n - 1)[:n]]
+    top   = top[np.lexsort((top, -valores[top]))]
+    textos = dict(Producto.objects.filter(pk__in=top.tolist()).values_list('pk', 'nombre')) if nombres else {}
+    return [
+        {'producto_id': int(pid), 'nombre': textos.get(int(pid)),
+         'unidades': int(unidades[pid]), 'ingresos': round(float(ingresos[pid]), 2)}
+        for pid in top
+    ]
+
+
+def mapa_calor(desde=None, hasta=None, medida='ingresos', datos=None):
+    """
+    Matriz 7 × 24 (lunes a domingo × hora local) con los ingresos, las
+    unidades o las líneas de la ventana.
+    """
+    if medida not in ('ingresos', 'unidades', 'lineas'):
+        raise ValueError('Medida no válida: use ingresos, unidades o lineas.')
+    datos = columnas() if datos is None else datos
+    mascara, desde, hasta = _mascara(datos, desde, hasta)
+    local = datos.momento[mascara] + int(zona().utcoffset(datetime.datetime.now()).total_seconds())
+    # 1970-01-01 fue jueves: (días + 3) % 7 da 0 = lunes
+    celda = ((local // 86400 + 3) % 7) * 24 + (local // 3600) % 24
+    pesos = {
+        'ingresos': lambda: datos.cantidad[mascara] * datos.precio[mascara],
+        'unidades': lambda: datos.cantidad[mascara],
+        'lineas':   lambda: None,
+    }[medida]()
+    matriz = np.bincount(celda, weights=pesos, minlength=7 * 24).reshape(7, 24)
+    return {
+        'desde':   desde.isoformat(),
+        'hasta':   hasta.isoformat(),
+        'medida':  medida,
+        'dias':    DIAS_SEMANA,
+        'horas':   list(range(24)),
+        'valores': np.round(matriz, 2).tolist() if medida == 'ingresos' else matriz.astype(np.int64).tolist(),
+    }
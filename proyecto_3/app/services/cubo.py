@@ -0,0 +1,372 @@
+"""
+Cubo de ventas para análisis por dimensiones.
+
+La tabla cubo_venta guarda unidades, ingresos y número de líneas por
+celda (día local, producto, marca, tipo, cliente). consultar() agrupa y
+filtra por cualquier subconjunto de esas dimensiones, más un nivel de
+tiempo (día, semana o mes), leyendo solo el cubo: sin JOIN con venta,
+detalle_venta ni producto.
+
+El cubo se mantiene de forma incremental, dentro de la misma transacción
+que modifica las ventas, con una sola sentencia por operación (las
+celdas se agrupan y se suman con INSERT ... ON DUPLICATE KEY UPDATE):
+
+  - líneas creadas, editadas o eliminadas una a una: señales de
+    DetalleVenta (app/signals.py)
+  - bulk_create() / bulk_update() de líneas, que no disparan señales:
+    registrar_lineas() desde app.services.stock y app.services.importacion
+  - venta que cambia de día o de cliente: mover_venta()
+  - producto que cambia de marca o tipo, producto o cliente eliminado:
+    reasignar()
+
+La marca y el tipo de una celda son los actuales del producto; las líneas
+de productos eliminados quedan en producto, marca y tipo 0, y las ventas
+sin cliente en cliente 0.
+
+Si el cubo se desalinea (restauración de backup, SQL manual) se
+reconstruye por bloques de días en paralelo con
+`python manage.py reconstruir_cubo` y se verifica con
+`python manage.py reconstruir_cubo --verificar`.
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Sum, Count, Min, Max, F, DateField, DecimalField
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+from app.models import CuboVenta, Venta, DetalleVenta, Producto, Marca, TipoProductos, Cliente
+from app.services.series import zona, rango, limites, etiqueta
+
+DIMENSIONES = ('producto', 'marca', 'tipo', 'cliente')
+CLAVE       = ('dia',) + DIMENSIONES
+MEDIDAS     = ('unidades', 'ingresos', 'lineas')
+TIEMPOS     = {'dia': None, 'semana': 'week', 'mes': 'month'}
+
+# Rango por defecto de consultar() (días hacia atrás desde hoy, inclusive)
+DIAS_CUBO = 90
+
+# Tope de filas por consulta: agrupar por producto × cliente × día puede ser enorme
+MAX_FILAS = 5000
+
+# Celdas por sentencia al sumar al cubo
+CUBO_LOTE = 500
+
+# Dimensión → (modelo, campo con el nombre legible, nombre del id 0)
+NOMBRES = {
+    'producto': (Producto,      'nombre',      'Producto eliminado'),
+    'marca':    (Marca,         'nombreMarca', 'Sin marca'),
+    'tipo':     (TipoProductos, 'nombre_tipo', 'Sin tipo'),
+    'cliente':  (Cliente,       'nombre',      'Sin cliente'),
+}
+
+
+# ─────────────────────────────────────────────
+# Escritura incremental
+# ─────────────────────────────────────────────
+
+def linea(detalle):
+    """(venta_id, producto_id, precio, cantidad) de un DetalleVenta, el formato de registrar_lineas()."""
+    return detalle.venta_id, detalle.producto_id, detalle.precio, detalle.cantidad
+
+
+def dia_local(fecha):
+    return timezone.localdate(fecha, zona())
+
+
+def _celdas(grupos, ventas=None, celdas=None):
+    """
+    Agrupa líneas por celda: {(dia, producto, marca, tipo, cliente):
+    [unidades, ingresos, lineas]}. `grupos` es [(lineas, signo)]; los
+    grupos se netean, así una edición que quita y agrega líneas de la
+    misma celda la escribe una sola vez. `ventas` ({venta_id: (dia,
+    cliente_id)}) reemplaza el día y el cliente guardados; si falta se
+    leen (1 consulta, más 1 para la marca y el tipo de los productos).
+    `celdas` acumula sobre un resultado anterior.
+    """
+    lineas = [l for grupo, _ in grupos for l in grupo]
+    if ventas is None:
+        ventas = {
+            pk: (dia_local(fecha), cliente_id)
+            for pk, fecha, cliente_id in Venta.objects.filter(pk__in={l[0] for l in lineas})
+            .order_by().values_list('pk', 'fecha', 'idCliente_id')
+        } if lineas else {}
+    ids       = {l[1] for l in lineas if l[1]}
+    productos = {
+        pk: (marca, tipo)
+        for pk, marca, tipo in Producto.objects.filter(pk__in=ids).values_list('pk', 'idMarca_id', 'idTipo_id')
+    } if ids else {}
+
+    celdas = {} if celdas is None else celdas
+    for grupo, signo in grupos:
+        for venta_id, producto_id, precio, cantidad in grupo:
+            if venta_id not in ventas:
+                continue
+            dia, cliente_id = ventas[venta_id]
+            if producto_id not in productos:
+                producto_id = 0
+            marca, tipo = productos.get(producto_id, (0, 0))
+            celda = celdas.setdefault((dia, producto_id, marca, tipo, cliente_id or 0), [0, Decimal(0), 0])
+            celda[0] += signo * (cantidad or 0)
+            celda[1] += signo * Decimal(str(precio or 0)).quantize(Decimal('0.01')) * (cantidad or 0)
+            celda[2] += signo
+    return celdas
+
+
+def _sql_sumar(filas):
+    """
+    INSERT de `filas` celdas que, si la celda ya existe, suma las medidas:
+    ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT en SQLite y PostgreSQL.
+    """
+    q        = connection.ops.quote_name
+    tabla    = q(CuboVenta._meta.db_table)
+    columnas = [q(CuboVenta._meta.get_field(campo).column) for campo in CLAVE + MEDIDAS]
+    clave, medidas = columnas[:len(CLAVE)], columnas[len(CLAVE):]
+    valores  = ', '.join(['(' + ', '.join(['%s'] * len(columnas)) + ')'] * filas)
+    if connection.vendor == 'mysql':
+        conflicto = 'AS nueva ON DUPLICATE KEY UPDATE ' + ', '.join(f'{c} = {c} + nueva.{c}' for c in medidas)
+    else:
+        conflicto = (f'ON CONFLICT ({", ".join(clave)}) DO UPDATE SET '
+                     + ', '.join(f'{c} = {tabla}.{c} + excluded.{c}' for c in medidas))
+    return f'INSERT INTO {tabla} ({", ".join(columnas)}) VALUES {valores} {conflicto}'
+
+
+def _aplicar(celdas):
+    """
+    Suma las celdas al cubo con una sentencia por bloque de CUBO_LOTE
+    celdas, en orden de índice único: dos transacciones nunca se cruzan en
+    orden inverso. Las celdas que se quedan sin líneas se borran.
+    """
+    filas = [clave + tuple(celdas[clave]) for clave in sorted(celdas) if any(celdas[clave])]
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(filas), CUBO_LOTE):
+            bloque = filas[inicio:inicio + CUBO_LOTE]
+            cursor.execute(_sql_sumar(len(bloque)), [valor for fila in bloque for valor in fila])
+    if any(celda[2] < 0 for celda in celdas.values()):
+        CuboVenta.objects.filter(dia__in={clave[0] for clave in celdas}, lineas__lte=0).delete()
+
+
+def _lineas(lineas):
+    return [l if isinstance(l, tuple) else linea(l) for l in lineas]
+
+
+def registrar_lineas(lineas, signo=1, ventas=None):
+    """
+    Aplica (signo=1) o revierte (signo=-1) líneas de venta, como tuplas
+    linea() o DetalleVenta. Es lo que deben llamar quienes escriben líneas
+    con bulk_create() o bulk_update(). `ventas` ({venta_id: (dia,
+    cliente_id)}) evita leer las ventas cuando quien llama ya las tiene.
+    """
+    lineas = _lineas(lineas)
+    if lineas:
+        _aplicar(_celdas([(lineas, signo)], ventas))
+
+
+def registrar_cambio(quitar, agregar):
+    """registrar_lineas(quitar, signo=-1) y registrar_lineas(agregar) en una sola escritura."""
+    quitar, agregar = _lineas(quitar), _lineas(agregar)
+    if quitar or agregar:
+        _aplicar(_celdas([(quitar, -1), (agregar, 1)]))
+
+
+def mover_venta(venta_id, antes, despues):
+    """Pasa las líneas de una venta de (dia, cliente_id) `antes` a `despues`."""
+    lineas = list(DetalleVenta.objects.filter(venta_id=venta_id)
+                  .values_list('venta_id', 'producto_id', 'precio', 'cantidad'))
+    if lineas:
+        celdas = _celdas([(lineas, -1)], {venta_id: antes})
+        _aplicar(_celdas([(lineas, 1)], {venta_id: despues}, celdas))
+
+
+def reasignar(filtro, **nuevos):
+    """
+    Mueve las celdas que cumplen `filtro` a otros valores de dimensión, p.
+    ej. reasignar({'producto': 5}, marca=2, tipo=1). Poco frecuente: lee
+    las celdas, las borra y las vuelve a sumar con la nueva clave.
+    """
+    with transaction.atomic():
+        filas = list(CuboVenta.objects.select_for_update().filter(**filtro).values_list(*CLAVE, *MEDIDAS))
+        if not filas:
+            return
+        CuboVenta.objects.filter(**filtro).delete()
+        celdas = {}
+        for fila in filas:
+            clave = {**dict(zip(CLAVE, fila)), **nuevos}
+            celda = celdas.setdefault(tuple(clave[c] for c in CLAVE), [0, Decimal(0), 0])
+            for i, valor in enumerate(fila[len(CLAVE):]):
+                celda[i] += valor
+        _aplicar(celdas)
+
+
+# ─────────────────────────────────────────────
+# Reconstrucción y verificación
+# ─────────────────────────────────────────────
+
+def calcular(desde=None, hasta=None):
+    """
+    Recalcula las celdas a partir de detalle_venta entre dos días locales
+    (todo el historial si no se pasan). Retorna {clave: (unidades,
+    ingresos, lineas)} con una sola consulta. No escribe nada.
+    """
+    qs = DetalleVenta.objects.all()
+    if desde:
+        inicio, fin = limites(desde, hasta)
+        qs = qs.filter(venta__fecha__gte=inicio, venta__fecha__lt=fin)
+    filas = (
+        qs.values('producto_id', dia=TruncDate('venta__fecha', tzinfo=zona()), marca=F('producto__idMarca'),
+                  tipo=F('producto__idTipo'), cliente=F('venta__idCliente'))
+        .annotate(
+            unidades=Sum('cantidad'),
+            ingresos=Sum(F('precio') * F('cantidad'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            lineas=Count('pk'),
+        )
+        .order_by()
+    )
+    return {
+        (f['dia'], f['producto_id'] or 0, f['marca'] or 0, f['tipo'] or 0, f['cliente'] or 0):
+            (f['unidades'] or 0, f['ingresos'] or Decimal(0), f['lineas'])
+        for f in filas
+    }
+
+
+def _reconstruir_bloque(desde, hasta):
+    celdas = calcular(desde, hasta)
+    with transaction.atomic():
+        CuboVenta.objects.filter(dia__range=(desde, hasta)).delete()
+        CuboVenta.objects.bulk_create([
+            CuboVenta(**dict(zip(CLAVE, clave)), **dict(zip(MEDIDAS, medidas)))
+            for clave, medidas in celdas.items()
+        ], batch_size=1000)
+    return len(celdas)
+
+
+def _bloque_en_hilo(bloque):
+    try:
+        return _reconstruir_bloque(*bloque)
+    finally:
+        # Cada hilo abre su propia conexión; se cierra para no dejarla colgada
+        connection.close()
+
+
+def reconstruir(hilos=4, dias_bloque=31):
+    """
+    Reemplaza el contenido del cubo por el recálculo completo, en bloques
+    de `dias_bloque` días. Con hilos > 1 los bloques se reparten en un pool
+    y cada uno se calcula y se escribe en su propia conexión y transacción.
+    Retorna (celdas, bloques).
+    """
+    extremos = Venta.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+    if extremos['primera'] is None:
+        CuboVenta.objects.all().delete()
+        return 0, 0
+
+    desde, hasta = dia_local(extremos['primera']), dia_local(extremos['ultima'])
+    bloques = []
+    while desde <= hasta:
+        fin = min(desde + datetime.timedelta(days=dias_bloque - 1), hasta)
+        bloques.append((desde, fin))
+        desde = fin + datetime.timedelta(days=1)
+    CuboVenta.objects.exclude(dia__range=(bloques[0][0], hasta)).delete()
+
+    if hilos <= 1 or len(bloques) <= 1:
+        celdas = [_reconstruir_bloque(*bloque) for bloque in bloques]
+    else:
+        with ThreadPoolExecutor(max_workers=min(hilos, len(bloques))) as pool:
+            celdas = list(pool.map(_bloque_en_hilo, bloques))
+    return sum(celdas), len(bloques)
+
+
+def verificar():
+    """
+    Compara el cubo guardado con el recálculo completo.
+    Retorna una lista de diferencias (vacía si todo cuadra).
+    """
+    esperado = calcular()
+    guardado = {fila[:len(CLAVE)]: fila[len(CLAVE):] for fila in CuboVenta.objects.values_list(*CLAVE, *MEDIDAS)}
+    vacia    = (0, Decimal(0), 0)
+    diferencias = []
+    for clave in sorted(set(esperado) | set(guardado)):
+        e, g = esperado.get(clave, vacia), guardado.get(clave, vacia)
+        if [Decimal(v) for v in e] != [Decimal(v) for v in g]:
+            celda = ', '.join(f'{nombre} {valor}' for nombre, valor in zip(CLAVE, clave))
+            diferencias.append(f'{celda}: guardado {tuple(g)}, esperado {tuple(e)}')
+    return diferencias
+
+
+# ─────────────────────────────────────────────
+# Consulta
+# ─────────────────────────────────────────────
+
+def consultar(agrupar=(), filtros=None, desde=None, hasta=None, limite=MAX_FILAS):
+    """
+    Agrega el cubo por las dimensiones de `agrupar` (subconjunto de
+    DIMENSIONES más, opcional, un nivel de tiempo: dia, semana o mes) con
+    `filtros` {dimensión: [ids]} entre dos días locales (por defecto los
+    últimos DIAS_CUBO). Retorna {'agrupar', 'filtros', 'desde', 'hasta',
+    'filas', 'total', 'truncado'}; las filas van por periodo y de mayor a
+    menor ingreso, con el nombre de cada dimensión. 2 consultas más 1 por
+    dimensión agrupada. Lanza ValueError si algún parámetro no es válido.
+    """
+    agrupar = list(dict.fromkeys(agrupar))
+    for nombre in agrupar:
+        if nombre not in DIMENSIONES and nombre not in TIEMPOS:
+            raise ValueError(f'Dimensión no válida: {nombre}. Use {", ".join(DIMENSIONES + tuple(TIEMPOS))}.')
+    tiempos = [nombre for nombre in agrupar if nombre in TIEMPOS]
+    if len(tiempos) > 1:
+        raise ValueError('Agrupe por un solo nivel de tiempo: dia, semana o mes.')
+    filtros = {dim: list(ids) for dim, ids in (filtros or {}).items()}
+    for dim in filtros:
+        if dim not in DIMENSIONES:
+            raise ValueError(f'No se puede filtrar por {dim}. Use {", ".join(DIMENSIONES)}.')
+    desde, hasta = rango(desde, hasta, 'dia', dias=DIAS_CUBO)
+
+    qs = CuboVenta.objects.filter(dia__range=(desde, hasta), **{f'{dim}__in': ids for dim, ids in filtros.items()})
+    medidas = {medida: Sum(medida) for medida in MEDIDAS}
+    total   = qs.aggregate(**medidas)
+
+    dims   = [nombre for nombre in agrupar if nombre in DIMENSIONES]
+    tiempo = tiempos[0] if tiempos else None
+    filas  = []
+    if agrupar:
+        # El día es la propia columna; semana y mes se truncan en la base de datos
+        campos  = dims + (['dia'] if tiempo == 'dia' else [])
+        periodo = {tiempo: Trunc('dia', TIEMPOS[tiempo], output_field=DateField())} if TIEMPOS.get(tiempo) else {}
+        orden   = ([tiempo] if tiempo else []) + ['-ingresos'] + dims
+        filas   = list(qs.values(*campos, **periodo).annotate(**medidas).order_by(*orden)[:limite + 1])
+    truncado = len(filas) > limite
+    filas    = filas[:limite]
+
+    nombres = {}
+    for dim in dims:
+        modelo, campo, _ = NOMBRES[dim]
+        ids = {fila[dim] for fila in filas if fila[dim]}
+        nombres[dim] = dict(modelo.objects.filter(pk__in=ids).values_list('pk', campo)) if ids else {}
+
+    resultado = []
+    for fila in filas:
+        salida = {}
+        for dim in dims:
+            salida[dim]             = fila[dim]
+            salida[f'{dim}_nombre'] = nombres[dim].get(fila[dim], NOMBRES[dim][2])
+        if tiempo:
+            salida[tiempo] = etiqueta(fila[tiempo], tiempo)
+        salida.update(_medidas(fila))
+        resultado.append(salida)
+
+    return {
+        'agrupar':  agrupar,
+        'filtros':  filtros,
+        'desde':    desde.isoformat(),
+        'hasta':    hasta.isoformat(),
+        'filas':    resultado,
+        'total':    _medidas(total),
+        'truncado': truncado,
+    }
+
+
+def _medidas(fila):
+    return {
+        'unidades': fila['unidades'] or 0,
+        'ingresos': float(fila['ingresos'] or 0),
+        'lineas':   fila['lineas'] or 0,
+    }
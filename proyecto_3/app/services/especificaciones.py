@@ -0,0 +1,339 @@
+"""
+Especificaciones declarativas de las exportaciones.
+
+Cada entidad exportable se describe una sola vez: columnas (título, campo
+de origen, formato y total), orden, filtros de su lista y, si hace falta,
+anotaciones. El motor compila la especificación a una única consulta
+values_list() con solo los joins que piden los campos (sin instanciar
+modelos ni select_related) y entrega las filas, ya formateadas, a
+cualquiera de los backends registrados (PDF, Excel, CSV).
+
+Agregar una entidad es agregar una Especificacion a ESPECIFICACIONES;
+agregar un formato es registrar un Backend en BACKENDS. Las vistas de
+/reporte/<entidad>/<formato> y los trabajos en segundo plano
+(app.services.exportaciones) usan ambos registros.
+
+Cada backend pide las filas en un modo:
+  texto  para leer (PDF): importes '$1,234.50', fechas dd/mm/aaaa
+  valor  para operar (Excel): importes como número, fechas dd/mm/aaaa
+  dato   para procesar (CSV): valores crudos, fechas ISO
+"""
+from collections import namedtuple
+from django.db.models import F, DecimalField, ExpressionWrapper
+from django.utils import timezone
+from app.models import Proveedor, Producto, Cliente, Venta, DetalleVenta, Compra
+from app.services import filtros as filtros_lista
+from app.services.ranking import ranking_cacheado, ventana
+from app.utils import (
+    escribir_pdf, escribir_excel, escribir_csv, exportar_pdf, exportar_excel, exportar_csv, filas_por_lotes,
+)
+from datetime import datetime
+
+
+# ─────────────────────────────────────────────
+# Formatos de columna
+# ─────────────────────────────────────────────
+# Una función por modo; None llega solo a las de 'dato' (el CSV lo deja vacío).
+
+Formato = namedtuple('Formato', 'texto valor dato')
+
+
+def _sin_nulos(funcion, vacio=''):
+    return lambda v: vacio if v is None else funcion(v)
+
+
+def _crudo(v):
+    return v
+
+
+def _local(v):
+    return timezone.localtime(v) if timezone.is_aware(v) else v
+
+
+FORMATOS = {
+    'texto':      Formato(_sin_nulos(str), _crudo, _crudo),
+    'guion':      Formato(_sin_nulos(str, '—'), _sin_nulos(_crudo, '—'), _crudo),
+    'moneda':     Formato(_sin_nulos(lambda v: f'${float(v):,.2f}'), _sin_nulos(float, None), _crudo),
+    'moneda_int': Formato(_sin_nulos(lambda v: f'${v:,}'), _crudo, _crudo),
+    'porcentaje': Formato(_sin_nulos(lambda v: f'{v:.2f}%'), _crudo, _crudo),
+    'fecha':      Formato(_sin_nulos(lambda v: v.strftime('%d/%m/%Y')),
+                          _sin_nulos(lambda v: v.strftime('%d/%m/%Y'), None), _sin_nulos(lambda v: v.isoformat())),
+    'fecha_hora': Formato(_sin_nulos(lambda v: _local(v).strftime('%d/%m/%Y %H:%M')),
+                          _sin_nulos(lambda v: _local(v).strftime('%d/%m/%Y %H:%M'), None),
+                          _sin_nulos(lambda v: _local(v).strftime('%Y-%m-%d %H:%M:%S'))),
+    'capital':    Formato(_sin_nulos(str.capitalize), _sin_nulos(str.capitalize, None), _crudo),
+    'venta':      Formato(_sin_nulos(lambda v: f'V{v:03d}'), _sin_nulos(lambda v: f'V{v:03d}', None), _crudo),
+    'compra':     Formato(_sin_nulos(lambda v: f'C{v:03d}'), _sin_nulos(lambda v: f'C{v:03d}', None), _crudo),
+}
+
+
+# ─────────────────────────────────────────────
+# Especificaciones
+# ─────────────────────────────────────────────
+# Columna.campo es una ruta del ORM ('idMarca__nombreMarca'), el nombre de
+# una anotación o, para orígenes que no son consultas, la clave del dict.
+# Columna.total = True suma la columna en la fila de totales (PDF, Excel).
+# Columna.solo limita la columna a ciertos modos.
+
+Columna = namedtuple('Columna', 'titulo campo formato total solo', defaults=('texto', False, None))
+
+Especificacion = namedtuple(
+    'Especificacion',
+    'titulo archivo columnas modelo orden anotaciones filtros prefijo origen normalizar',
+    defaults=(None, (), None, None, '', None, None),
+)
+
+
+def _importe():
+    return ExpressionWrapper(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _importe_linea():
+    return ExpressionWrapper(F('cantidad') * F('precio'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _ventana_ranking(parametros):
+    # La ventana por defecto se resuelve a fechas concretas: "sin fechas"
+    # y "los últimos 90 días" escritos a mano son el mismo pedido
+    desde, hasta = ventana((parametros.get('desde') or '').strip(), (parametros.get('hasta') or '').strip())
+    return {'desde': desde.isoformat(), 'hasta': hasta.isoformat()}
+
+
+def _filas_ranking(filtros):
+    return ranking_cacheado(filtros['desde'], filtros['hasta'])['productos']
+
+
+ESPECIFICACIONES = {
+    'proveedores': Especificacion(
+        titulo='REPORTE DE PROVEEDORES', archivo='Reporte_Proveedores', modelo=Proveedor,
+        orden=('nombre',), filtros='proveedores',
+        columnas=(
+            Columna('ID',             'id'),
+            Columna('Nombre',         'nombre'),
+            Columna('Teléfono',       'telefono'),
+            Columna('Email',          'email'),
+            Columna('Costo Envío',    'envio',         'moneda_int'),
+            Columna('Fecha Registro', 'fechaRegistro', 'fecha'),
+        ),
+    ),
+    'productos': Especificacion(
+        titulo='REPORTE DE PRODUCTOS', archivo='Reporte_Productos', modelo=Producto,
+        orden=('nombre',), filtros='productos',
+        columnas=(
+            Columna('ID',     'idProducto'),
+            Columna('Nombre', 'nombre'),
+            Columna('Marca',  'idMarca__nombreMarca'),
+            Columna('Tipo',   'idTipo__nombre_tipo'),
+            Columna('Unidad', 'idUnidad__nombre_unidad'),
+            Columna('Precio', 'precio', 'moneda'),
+            Columna('Stock',  'stock',  total=True),
+        ),
+    ),
+    'clientes': Especificacion(
+        titulo='REPORTE DE CLIENTES', archivo='Reporte_Clientes', modelo=Cliente,
+        orden=('nombre',), filtros='clientes',
+        columnas=(
+            Columna('ID',        'id'),
+            Columna('Nombre',    'nombre'),
+            Columna('Documento', 'documento'),
+            Columna('Teléfono',  'telefono'),
+            Columna('Email',     'email'),
+            Columna('Dirección', 'direccion',     'guion'),
+            Columna('Estado',    'estado',        'capital'),
+            Columna('Registro',  'fechaRegistro', 'fecha'),
+        ),
+    ),
+    'ventas': Especificacion(
+        titulo='REPORTE DE VENTAS', archivo='Reporte_Ventas', modelo=Venta,
+        orden=('-fecha',), filtros='ventas',
+        columnas=(
+            Columna('ID',      'id',     'venta'),
+            Columna('Cliente', 'cliente'),
+            Columna('Fecha',   'fecha',  'fecha_hora'),
+            Columna('Total',   'total',  'moneda', total=True),
+            Columna('Estado',  'estado'),
+        ),
+    ),
+    'ventas_lineas': Especificacion(
+        titulo='REPORTE DE VENTAS POR LÍNEA', archivo='Reporte_Ventas_Lineas', modelo=DetalleVenta,
+        orden=('-venta__fecha', 'venta_id', 'id'), filtros='ventas', prefijo='venta__',
+        anotaciones={'importe': _importe_linea},
+        columnas=(
+            Columna('ID Línea',    'id'),
+            Columna('ID Venta',    'venta_id',        'venta'),
+            Columna('Fecha',       'venta__fecha',    'fecha_hora'),
+            Columna('Cliente',     'venta__cliente'),
+            Columna('Estado',      'venta__estado'),
+            Columna('ID Producto', 'producto_id'),
+            Columna('Producto',    'producto_nombre'),
+            Columna('Cantidad',    'cantidad', total=True),
+            Columna('Precio',      'precio',   'moneda'),
+            Columna('Importe',     'importe',  'moneda', total=True),
+        ),
+    ),
+    'compras': Especificacion(
+        titulo='REPORTE DE COMPRAS', archivo='Reporte_Compras', modelo=Compra,
+        orden=('-fechaCompra',), filtros='compras',
+        anotaciones={'importe': _importe},
+        columnas=(
+            Columna('ID',           'idCompra',          'compra'),
+            Columna('Fecha',        'fechaCompra',       'fecha'),
+            Columna('Producto',     'Producto__nombre',  'guion'),
+            Columna('Proveedor',    'Proveedor__nombre', 'guion'),
+            Columna('Cantidad',     'cantidad',          total=True),
+            Columna('Precio Unit.', 'precio_unitario',   'moneda'),
+            Columna('Total',        'importe',           'moneda', total=True),
+            Columna('Estado',       'estado'),
+        ),
+    ),
+    'ranking': Especificacion(
+        titulo='RANKING ABC DE PRODUCTOS ({desde} a {hasta})', archivo='Ranking_ABC',
+        origen=_filas_ranking, normalizar=_ventana_ranking,
+        columnas=(
+            Columna('#',           'posicion'),
+            Columna('ID Producto', 'producto_id',   solo=('valor', 'dato')),
+            Columna('Producto',    'nombre'),
+            Columna('Unidades',    'unidades',      total=True),
+            Columna('Ingresos',    'ingresos',      'moneda', total=True),
+            Columna('% Part.',     'participacion', 'porcentaje'),
+            Columna('% Acum.',     'acumulado',     'porcentaje'),
+            Columna('Clase',       'clase'),
+        ),
+    ),
+}
+
+
+# ─────────────────────────────────────────────
+# Backends
+# ─────────────────────────────────────────────
+# escribir(titulo, columnas, datos, destino, filtros, totales) → filas
+# responder(documento, parametros GET) → HttpResponse
+# por_id: recorrer la consulta por id (el orden más barato) en vez del
+# de la especificación. En los dos casos se lee por páginas (keyset) con
+# filas_por_lotes: memoria constante también en MySQL.
+
+Backend = namedtuple('Backend', 'extension modo por_id escribir responder')
+
+BACKENDS = {
+    'pdf': Backend('pdf', 'texto', False, escribir_pdf,
+                   lambda doc, parametros: exportar_pdf(doc.titulo, doc.columnas, doc.filas, doc.nombre,
+                                                        doc.filtros, doc.totales)),
+    'excel': Backend('xlsx', 'valor', False, escribir_excel,
+                     lambda doc, parametros: exportar_excel(doc.titulo, doc.columnas, doc.filas, doc.nombre,
+                                                            doc.filtros, doc.totales)),
+    'csv': Backend('csv', 'dato', True, escribir_csv,
+                   lambda doc, parametros: exportar_csv(doc.columnas, doc.filas, doc.nombre,
+                                                        comprimir=parametros.get('gzip') == '1')),
+}
+
+
+# ─────────────────────────────────────────────
+# Motor
+# ─────────────────────────────────────────────
+
+# filas es un iterador; totales() da la fila de totales una vez recorrido
+Documento = namedtuple('Documento', 'titulo columnas filas nombre filtros totales')
+
+
+def normalizar_filtros(entidad, parametros):
+    """
+    Filtros válidos de `entidad` tomados de `parametros` (p. ej. request.GET):
+    los mismos de su lista. ValueError si la entidad no existe o si los
+    filtros propios de la especificación (fechas del ranking) no son válidos.
+    """
+    spec = _especificacion(entidad)
+    if spec.normalizar:
+        return spec.normalizar(parametros)
+    return filtros_lista.normalizar(spec.filtros, parametros) if spec.filtros else {}
+
+
+def consulta(spec, filtros, *previos):
+    """
+    values_list() con `previos` y los campos de todas las columnas, filtrado
+    y ordenado según la especificación. Los joins salen solo de las rutas
+    de los campos y de los filtros activos.
+    """
+    queryset = spec.modelo.objects.all()
+    if spec.anotaciones:
+        queryset = queryset.annotate(**{nombre: expresion() for nombre, expresion in spec.anotaciones.items()})
+    if spec.filtros:
+        queryset = filtros_lista.aplicar(spec.filtros, queryset, filtros, spec.prefijo)
+    return queryset.values_list(*previos, *[columna.campo for columna in spec.columnas]).order_by(*spec.orden)
+
+
+def documento(entidad, formato, filtros):
+    """Documento listo para el backend `formato`: la consulta todavía no corrió."""
+    spec, backend = _especificacion(entidad), _backend(formato)
+    visibles = [i for i, c in enumerate(spec.columnas) if not c.solo or backend.modo in c.solo]
+    columnas = [spec.columnas[i] for i in visibles]
+    formatos = [getattr(FORMATOS[c.formato], backend.modo) for c in columnas]
+    sumas    = {i: 0 for i, c in enumerate(columnas) if c.total}
+
+    if spec.modelo is None:
+        crudas = _origen(spec, filtros)
+    elif backend.por_id:
+        # filas_por_lotes pagina por la primera columna: se antepone el pk
+        crudas = (fila[1:] for fila in filas_por_lotes(consulta(spec, filtros, 'pk')))
+    else:
+        # Se anteponen los campos del orden y el pk para paginar sin perderlo
+        claves = [campo.lstrip('-') for campo in spec.orden] + ['pk']
+        crudas = (fila[len(claves):]
+                  for fila in filas_por_lotes(consulta(spec, filtros, *claves), orden=spec.orden))
+
+    contadas = 0
+
+    def filas():
+        nonlocal contadas
+        for cruda in crudas:
+            contadas += 1
+            fila = [cruda[i] for i in visibles]
+            for i in sumas:
+                sumas[i] += fila[i] or 0
+            yield [formatear(valor) for formatear, valor in zip(formatos, fila)]
+
+    def totales():
+        if not sumas or not contadas:
+            return None
+        fila = [formatos[i](sumas[i]) if i in sumas else '' for i in range(len(columnas))]
+        if 0 not in sumas:
+            fila[0] = 'TOTAL'
+        return fila
+
+    return Documento(
+        titulo   = spec.titulo.format(**filtros),
+        columnas = [c.titulo for c in columnas],
+        filas    = filas(),
+        nombre   = f'{spec.archivo}_{datetime.now().strftime("%d_%m_%Y")}',
+        filtros  = filtros_lista.descripcion(spec.filtros, filtros) if spec.filtros else '',
+        totales  = totales,
+    )
+
+
+def escribir(entidad, formato, filtros, destino):
+    """Escribe el archivo en `destino`. Retorna (filas, nombre_archivo sin extensión)."""
+    doc = documento(entidad, formato, filtros)
+    filas = _backend(formato).escribir(doc.titulo, doc.columnas, doc.filas, destino, doc.filtros, doc.totales)
+    return filas, doc.nombre
+
+
+def responder(entidad, formato, filtros, parametros=None):
+    """HttpResponse con la exportación generada dentro de la petición."""
+    return _backend(formato).responder(documento(entidad, formato, filtros), parametros or {})
+
+
+def _origen(spec, filtros):
+    # Generador: el origen (p. ej. el ranking) recién corre al recorrer las filas
+    for fila in spec.origen(filtros):
+        yield tuple(fila[c.campo] for c in spec.columnas)
+
+
+def _especificacion(entidad):
+    if entidad not in ESPECIFICACIONES:
+        raise ValueError(f'Entidad no válida: {entidad}. Use {", ".join(ESPECIFICACIONES)}.')
+    return ESPECIFICACIONES[entidad]
+
+
+def _backend(formato):
+    if formato not in BACKENDS:
+        raise ValueError(f'Formato no válido: {formato}. Use {", ".join(BACKENDS)}.')
+    return BACKENDS[formato]
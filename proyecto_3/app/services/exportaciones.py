@@ -0,0 +1,221 @@
+"""
+Exportaciones de reportes (PDF, Excel y CSV) en segundo plano.
+
+Las vistas /reporte/<entidad>/<formato> generan el archivo dentro de la
+petición: con tablas grandes WeasyPrint u openpyxl ocupan el worker de
+gunicorn durante todo el render y el proxy corta por timeout. Con
+POST /reportes/exportar/ el pedido se guarda como ExportacionJob, se
+genera en un pool de procesos después del commit y la interfaz consulta
+su estado hasta poder descargar el archivo.
+
+  - Pedidos iguales (entidad, formato y filtros) mientras hay uno
+    pendiente o en proceso comparten el mismo trabajo. Uno ya listo no
+    se reutiliza: el siguiente pedido genera el archivo con los datos
+    actuales.
+  - Los archivos quedan en EXPORTACIONES_DIR y vencen a los
+    EXPORTACIONES_TTL segundos.
+  - `python manage.py procesar_exportaciones` genera los pendientes que el
+    pool no alcanzó (reinicios, despacho desactivado), reencola los
+    atascados y borra los vencidos.
+
+Qué se exporta y cómo se escribe cada formato lo definen las
+especificaciones y los backends de app.services.especificaciones.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+import django
+from django.conf import settings
+from django.db import IntegrityError, transaction, close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from app.models import ExportacionJob
+from app.services import especificaciones
+
+
+# ─────────────────────────────────────────────
+# Pedidos
+# ─────────────────────────────────────────────
+
+def clave(entidad, formato, filtros):
+    texto = json.dumps([entidad, formato, filtros], sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def solicitar(entidad, formato, filtros=None, usuario=None):
+    """
+    Encola una exportación o retorna la que ya cubre el mismo pedido.
+    Retorna (job, creado). ValueError si la entidad o el formato no existen.
+    """
+    if entidad not in especificaciones.ESPECIFICACIONES:
+        raise ValueError(f'Entidad no válida: {entidad}. Use {", ".join(especificaciones.ESPECIFICACIONES)}.')
+    if formato not in especificaciones.BACKENDS:
+        raise ValueError(f'Formato no válido: {formato}. Use {", ".join(especificaciones.BACKENDS)}.')
+    filtros = filtros or {}
+    activa  = clave(entidad, formato, filtros)
+
+    existente = ExportacionJob.objects.filter(clave_activa=activa).first()
+    if existente:
+        return existente, False
+    try:
+        with transaction.atomic():
+            job = ExportacionJob.objects.create(
+                entidad=entidad, formato=formato, filtros=filtros, clave_activa=activa, usuario=usuario,
+            )
+    except IntegrityError:
+        # Otro pedido igual creó la fila entre la búsqueda y el INSERT
+        return ExportacionJob.objects.get(clave_activa=activa), False
+
+    if getattr(settings, 'EXPORTACIONES_INMEDIATO', True):
+        transaction.on_commit(lambda: _enviar(job.pk))
+    return job, True
+
+
+def ruta(job):
+    return Path(settings.EXPORTACIONES_DIR) / job.archivo
+
+
+def disponible(job):
+    """True si el archivo del trabajo está listo, vigente y en disco."""
+    return (job.estado == 'lista' and job.expira and job.expira > timezone.now()
+            and bool(job.archivo) and ruta(job).is_file())
+
+
+def estado(job):
+    return {
+        'id':       job.pk,
+        'entidad':  job.entidad,
+        'formato':  job.formato,
+        'filtros':  job.filtros,
+        'estado':   job.estado,
+        'filas':    job.filas,
+        'error':    job.ultimo_error or None,
+        'creado':   job.fecha_creacion.isoformat(),
+        'expira':   job.expira.isoformat() if job.expira else None,
+    }
+
+
+# ─────────────────────────────────────────────
+# Generación
+# ─────────────────────────────────────────────
+
+def procesar(job_id):
+    """
+    Genera el archivo de un trabajo pendiente. El trabajo se toma con un
+    UPDATE condicional, así el pool y el comando nunca generan el mismo.
+    El cierre también es condicional: si reencolar_atascados() lo devolvió
+    a la cola mientras corría, otra ejecución lo tomó con otra fecha_inicio
+    y esta descarta su archivo. Retorna el estado final, o None si el
+    trabajo ya no estaba pendiente o lo cerró otra ejecución.
+    """
+    inicio = timezone.now()
+    tomado = ExportacionJob.objects.filter(pk=job_id, estado='pendiente').update(
+        estado='procesando', fecha_inicio=inicio,
+    )
+    if not tomado:
+        return None
+    job    = ExportacionJob.objects.get(pk=job_id)
+    propio = ExportacionJob.objects.filter(pk=job_id, estado='procesando', fecha_inicio=inicio)
+
+    directorio = Path(settings.EXPORTACIONES_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    extension = especificaciones.BACKENDS[job.formato].extension
+    archivo   = f'{job.pk}_{uuid.uuid4().hex}.{extension}'
+    temporal  = directorio / f'{archivo}.tmp'
+    try:
+        with open(temporal, 'wb') as destino:
+            filas, nombre = especificaciones.escribir(job.entidad, job.formato, job.filtros, destino)
+        os.replace(temporal, directorio / archivo)
+    except Exception as e:
+        temporal.unlink(missing_ok=True)
+        cerrado = propio.update(
+            estado='error', clave_activa=None, ultimo_error=f'{type(e).__name__}: {e}', fecha_fin=timezone.now(),
+        )
+        return 'error' if cerrado else None
+
+    fin = timezone.now()
+    # Listo: se libera la clave y un pedido igual ya no lo comparte
+    cerrado = propio.update(
+        estado='lista', clave_activa=None, archivo=archivo, nombre_archivo=f'{nombre}.{extension}', filas=filas,
+        fecha_fin=fin, expira=fin + timedelta(seconds=settings.EXPORTACIONES_TTL),
+    )
+    if not cerrado:
+        (directorio / archivo).unlink(missing_ok=True)
+        return None
+    return 'lista'
+
+
+def pendientes(lote=20):
+    return list(ExportacionJob.objects.filter(estado='pendiente')
+                .order_by('fecha_creacion', 'pk').values_list('pk', flat=True)[:lote])
+
+
+def reencolar_atascados(segundos=None):
+    """Vuelve a 'pendiente' los trabajos en proceso desde hace más de `segundos` (worker caído)."""
+    segundos = settings.EXPORTACIONES_ATASCO if segundos is None else segundos
+    limite   = timezone.now() - timedelta(seconds=segundos)
+    return ExportacionJob.objects.filter(estado='procesando', fecha_inicio__lt=limite).update(estado='pendiente')
+
+
+def vencer():
+    """Borra los archivos listos vencidos y los errores viejos. Retorna cuántos trabajos borró."""
+    ahora = timezone.now()
+    return _vencer(ExportacionJob.objects.filter(
+        Q(estado='lista', expira__lte=ahora)
+        | Q(estado='error', fecha_fin__lte=ahora - timedelta(seconds=settings.EXPORTACIONES_TTL))
+    ))
+
+
+def _vencer(trabajos):
+    borrados = 0
+    for job in trabajos:
+        if job.archivo:
+            ruta(job).unlink(missing_ok=True)
+        borrados += ExportacionJob.objects.filter(pk=job.pk, estado=job.estado).delete()[0]
+    return borrados
+
+
+# ─────────────────────────────────────────────
+# Pool de procesos
+# ─────────────────────────────────────────────
+# Un pool por proceso web, creado con el primer pedido. Los workers se
+# lanzan con 'spawn' (no heredan las conexiones a la BD del proceso web)
+# y ejecutan django.setup() antes de recibir trabajos.
+
+_pool       = None
+_pool_mutex = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_mutex:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.EXPORTACIONES_PROCESOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _tarea(job_id):
+    close_old_connections()
+    return procesar(job_id)
+
+
+def _enviar(job_id):
+    global _pool
+    try:
+        _obtener_pool().submit(_tarea, job_id)
+    except Exception as e:
+        # Pool roto (un worker murió): se descarta y el trabajo queda
+        # pendiente para el próximo pedido o para procesar_exportaciones
+        print(f"Error enviando la exportación {job_id} al pool: {e}")
+        with _pool_mutex:
+            _pool = None
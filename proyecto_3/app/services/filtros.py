@@ -0,0 +1,126 @@
+"""
+Filtros de las listas (ventas, compras, productos, clientes, proveedores).
+
+Una sola especificación por entidad que usan la vista de la lista y sus
+exportaciones (PDF, Excel, CSV y trabajos en segundo plano): lo que se
+exporta son exactamente las filas que se ven, filtradas en la base de
+datos. Cada filtro es un parámetro GET con una etiqueta para el reporte
+y una función valor → Q; `prefijo` permite aplicarlo desde un modelo
+relacionado (las líneas de venta se filtran por 'venta__').
+
+Los valores vacíos o no válidos se descartan, como siempre hicieron las
+listas: una fecha mal escrita no filtra en vez de dar error.
+"""
+import datetime
+from collections import namedtuple
+from urllib.parse import urlencode
+from django.db.models import Q
+from django.utils import timezone
+from app.services.reabastecimiento import stock_bajo_q
+
+
+Filtro = namedtuple('Filtro', 'parametro etiqueta opciones q')
+
+
+def _fecha(valor):
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        return None
+
+
+def _inicio_dia(valor):
+    return timezone.make_aware(datetime.datetime.combine(_fecha(valor), datetime.time.min))
+
+
+def _fin_dia(valor):
+    return timezone.make_aware(datetime.datetime.combine(_fecha(valor), datetime.time.max))
+
+
+ENVIO = {
+    'rapido': lambda p: Q(**{f'{p}envio__lte': 7}),
+    'normal': lambda p: Q(**{f'{p}envio__gte': 8, f'{p}envio__lte': 15}),
+    'lento':  lambda p: Q(**{f'{p}envio__gt': 15}),
+}
+
+STOCK = {
+    'disponible': lambda p: Q(**{f'{p}stock__gt': 0}) & ~stock_bajo_q(p),
+    'bajo':       lambda p: Q(**{f'{p}stock__gt': 0}) & stock_bajo_q(p),
+    'agotado':    lambda p: Q(**{f'{p}stock': 0}),
+}
+
+# opciones: None = texto libre, 'fecha' = YYYY-MM-DD, o los valores admitidos
+FILTROS = {
+    'ventas': (
+        Filtro('buscar',      'Cliente', None,    lambda v, p: Q(**{f'{p}cliente__icontains': v})),
+        Filtro('fecha_desde', 'Desde',   'fecha', lambda v, p: Q(**{f'{p}fecha__gte': _inicio_dia(v)})),
+        Filtro('fecha_hasta', 'Hasta',   'fecha', lambda v, p: Q(**{f'{p}fecha__lte': _fin_dia(v)})),
+    ),
+    'compras': (
+        Filtro('busqueda',    'Búsqueda', None, lambda v, p: (Q(**{f'{p}Proveedor__nombre__icontains': v})
+                                                             | Q(**{f'{p}Producto__nombre__icontains': v}))),
+        Filtro('estado',      'Estado',  ('Completada', 'Pendiente'), lambda v, p: Q(**{f'{p}estado': v})),
+        Filtro('fecha_desde', 'Desde',   'fecha', lambda v, p: Q(**{f'{p}fechaCompra__gte': _fecha(v)})),
+        Filtro('fecha_hasta', 'Hasta',   'fecha', lambda v, p: Q(**{f'{p}fechaCompra__lte': _fecha(v)})),
+    ),
+    'productos': (
+        Filtro('q',     'Búsqueda', None,         lambda v, p: Q(**{f'{p}nombre__icontains': v})),
+        Filtro('stock', 'Stock',    tuple(STOCK), lambda v, p: STOCK[v](p)),
+    ),
+    'clientes': (
+        Filtro('busqueda', 'Búsqueda', None,                    lambda v, p: Q(**{f'{p}nombre__icontains': v})),
+        Filtro('estado',   'Estado',   ('activo', 'inactivo'), lambda v, p: Q(**{f'{p}estado': v})),
+    ),
+    'proveedores': (
+        Filtro('busqueda',    'Búsqueda', None,         lambda v, p: Q(**{f'{p}nombre__icontains': v})),
+        Filtro('envio',       'Envío',    tuple(ENVIO), lambda v, p: ENVIO[v](p)),
+        Filtro('fecha_desde', 'Desde',    'fecha',      lambda v, p: Q(**{f'{p}fechaRegistro__gte': _fecha(v)})),
+        Filtro('fecha_hasta', 'Hasta',    'fecha',      lambda v, p: Q(**{f'{p}fechaRegistro__lte': _fecha(v)})),
+    ),
+}
+
+
+def _valido(filtro, valor):
+    if filtro.opciones == 'fecha':
+        return _fecha(valor) is not None
+    return filtro.opciones is None or valor in filtro.opciones
+
+
+def normalizar(entidad, parametros):
+    """{parametro: valor} con los filtros de `entidad` presentes y válidos en `parametros`."""
+    filtros = {}
+    for filtro in FILTROS.get(entidad, ()):
+        valor = (parametros.get(filtro.parametro) or '').strip()
+        if valor and _valido(filtro, valor):
+            filtros[filtro.parametro] = valor
+    return filtros
+
+
+def aplicar(entidad, queryset, filtros, prefijo=''):
+    """Filtra `queryset` con filtros ya normalizados."""
+    condiciones = [filtro.q(filtros[filtro.parametro], prefijo)
+                   for filtro in FILTROS.get(entidad, ()) if filtro.parametro in filtros]
+    return queryset.filter(*condiciones) if condiciones else queryset
+
+
+def filtrar(entidad, queryset, parametros, prefijo=''):
+    """normalizar() + aplicar() en un paso, para las vistas."""
+    return aplicar(entidad, queryset, normalizar(entidad, parametros), prefijo)
+
+
+def descripcion(entidad, filtros):
+    """'Cliente: ana · Desde: 01/10/2026' para el encabezado del reporte; '' sin filtros."""
+    partes = []
+    for filtro in FILTROS.get(entidad, ()):
+        valor = filtros.get(filtro.parametro)
+        if valor:
+            if filtro.opciones == 'fecha':
+                valor = _fecha(valor).strftime('%d/%m/%Y')
+            partes.append(f'{filtro.etiqueta}: {valor}')
+    return ' · '.join(partes)
+
+
+def query(entidad, parametros):
+    """'?buscar=ana&...' con los filtros activos, para los enlaces de exportación; '' sin filtros."""
+    filtros = normalizar(entidad, parametros)
+    return f'?{urlencode(filtros)}' if filtros else ''
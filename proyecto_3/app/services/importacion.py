@@ -0,0 +1,252 @@
+"""
+Importación masiva de ventas desde terminales POS.
+
+Recibe lotes de ventas ya registradas fuera de línea (JSON o NDJSON, ver
+ImportarVentasView y el comando importar_ventas) con este formato:
+
+    {
+        "clave":      "pos3-000154",          # idempotencia, opcional
+        "cliente_id": 12,                     # o "cliente": "Nombre"
+        "estado":     "Completada",           # opcional, Pendiente por defecto
+        "fecha":      "2026-10-18T09:30:00",  # opcional, ahora por defecto
+        "lineas": [
+            {"producto_id": 5, "cantidad": 2, "precio": 3500},   # precio opcional
+        ]
+    }
+
+Todo el lote se valida antes de tocar la base de datos. Las ventas válidas
+se procesan por bloques de settings.VENTAS_IMPORTACION_LOTE: por bloque se
+bloquean los productos una sola vez (en orden de pk), se reparte el stock,
+y ventas y detalles se insertan con bulk_create. Una venta sin stock se
+rechaza sin afectar a las demás.
+
+Reenviar un lote es seguro: las ventas cuya clave ya existe se cuentan como
+duplicadas y no se vuelven a crear.
+"""
+import uuid
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from app.models import Venta, DetalleVenta, Cliente
+from app.services import kpis, cubo
+from app.services.stock import ejecutar_transaccion, repartir_stock
+
+ESTADOS = {estado for estado, _ in Venta.ESTADO_CHOICES}
+
+
+def importar_ventas(registros, lote=None):
+    """
+    Importa una lista de ventas (dicts). Retorna un resumen:
+        {'recibidas', 'creadas', 'duplicadas', 'rechazadas': [{'indice', 'clave', 'error'}]}
+    """
+    lote      = lote or getattr(settings, 'VENTAS_IMPORTACION_LOTE', 500)
+    resultado = {'recibidas': len(registros), 'creadas': 0, 'duplicadas': 0, 'rechazadas': []}
+
+    pedidos, vistas = [], set()
+    for indice, registro in enumerate(registros):
+        pedido, error = _validar(indice, registro)
+        if error:
+            resultado['rechazadas'].append({'indice': indice, 'clave': _clave_de(registro), 'error': error})
+        elif pedido['clave'] in vistas:
+            resultado['duplicadas'] += 1
+        else:
+            vistas.add(pedido['clave'])
+            pedidos.append(pedido)
+
+    error_cliente = _resolver_clientes(pedidos)
+    for pedido in [p for p in pedidos if p['indice'] in error_cliente]:
+        resultado['rechazadas'].append({
+            'indice': pedido['indice'], 'clave': pedido['clave'], 'error': error_cliente[pedido['indice']],
+        })
+    pedidos = [p for p in pedidos if p['indice'] not in error_cliente]
+
+    for inicio in range(0, len(pedidos), lote):
+        bloque = pedidos[inicio:inicio + lote]
+        try:
+            creadas, duplicadas, rechazadas = ejecutar_transaccion(_importar_bloque, bloque)
+        except IntegrityError:
+            # Otro proceso insertó alguna de las claves a la vez: al repetir
+            # el bloque esas ventas se detectan como duplicadas
+            creadas, duplicadas, rechazadas = ejecutar_transaccion(_importar_bloque, bloque)
+        resultado['creadas']    += creadas
+        resultado['duplicadas'] += duplicadas
+        resultado['rechazadas'] += rechazadas
+
+    resultado['rechazadas'].sort(key=lambda r: r['indice'])
+    return resultado
+
+
+# ─────────────────────────────────────────────
+# Validación
+# ─────────────────────────────────────────────
+
+def _clave_de(registro):
+    return registro.get('clave') if isinstance(registro, dict) else None
+
+
+def _validar(indice, registro):
+    """Retorna (pedido, None) o (None, mensaje). No consulta la base de datos."""
+    if not isinstance(registro, dict):
+        return None, 'La venta debe ser un objeto JSON.'
+
+    clave = registro.get('clave')
+    if clave is None or clave == '':
+        clave = uuid.uuid4().hex
+    elif not isinstance(clave, str) or len(clave) > 64:
+        return None, 'La clave debe ser un texto de máximo 64 caracteres.'
+
+    cliente_id = registro.get('cliente_id')
+    cliente    = registro.get('cliente')
+    cliente    = cliente.strip() if isinstance(cliente, str) else ''
+    if cliente_id not in (None, ''):
+        try:
+            cliente_id = int(cliente_id)
+        except (TypeError, ValueError):
+            return None, 'cliente_id debe ser un número entero.'
+    elif not cliente or len(cliente) > 100:
+        return None, 'Debe indicar cliente_id o el nombre del cliente (máximo 100 caracteres).'
+    else:
+        cliente_id = None
+
+    estado = registro.get('estado') or 'Pendiente'
+    if estado not in ESTADOS:
+        return None, f'Estado no válido: {estado}.'
+
+    fecha = registro.get('fecha')
+    if fecha:
+        fecha = parse_datetime(str(fecha))
+        if fecha is None:
+            return None, 'La fecha debe estar en formato ISO 8601.'
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+    else:
+        fecha = timezone.now()
+
+    lineas = registro.get('lineas')
+    if not isinstance(lineas, list) or not lineas:
+        return None, 'La venta debe tener al menos una línea.'
+
+    normalizadas, demanda = [], {}
+    for linea in lineas:
+        if not isinstance(linea, dict):
+            return None, 'Cada línea debe ser un objeto JSON.'
+        try:
+            producto_id = int(linea.get('producto_id'))
+            cantidad    = int(linea.get('cantidad'))
+            precio      = linea.get('precio')
+            precio      = None if precio in (None, '') else Decimal(str(precio)).quantize(Decimal('0.01'))
+        except (TypeError, ValueError, InvalidOperation):
+            return None, 'Las líneas necesitan producto_id y cantidad enteros y un precio numérico.'
+        if cantidad < 1:
+            return None, 'Las cantidades deben ser mayores a 0.'
+        if precio is not None and precio <= 0:
+            return None, 'Los precios deben ser mayores a 0.'
+        normalizadas.append((producto_id, cantidad, precio))
+        demanda[producto_id] = demanda.get(producto_id, 0) + cantidad
+
+    return {
+        'indice':     indice,
+        'clave':      clave,
+        'cliente_id': cliente_id,
+        'cliente':    cliente,
+        'estado':     estado,
+        'fecha':      fecha,
+        'lineas':     normalizadas,
+        'demanda':    demanda,
+    }, None
+
+
+def _resolver_clientes(pedidos):
+    """
+    Completa cliente/cliente_id de todos los pedidos con dos consultas.
+    Los nombres se comparan sin distinguir mayúsculas, como al registrar
+    una venta a mano (nombre__iexact). Retorna {indice: error} para los
+    cliente_id que no existen.
+    """
+    ids     = {p['cliente_id'] for p in pedidos if p['cliente_id']}
+    nombres = {p['cliente'].lower() for p in pedidos if not p['cliente_id']}
+
+    por_id     = dict(Cliente.objects.filter(pk__in=ids).values_list('pk', 'nombre')) if ids else {}
+    por_nombre = {}
+    if nombres:
+        for pk, nombre in (Cliente.objects.annotate(nombre_min=Lower('nombre')).filter(nombre_min__in=nombres)
+                           .order_by('-pk').values_list('pk', 'nombre')):
+            por_nombre[nombre.casefold()] = pk   # queda el más antiguo
+
+    errores = {}
+    for pedido in pedidos:
+        if pedido['cliente_id']:
+            if pedido['cliente_id'] not in por_id:
+                errores[pedido['indice']] = f'El cliente #{pedido["cliente_id"]} no existe.'
+            else:
+                pedido['cliente'] = por_id[pedido['cliente_id']]
+        else:
+            pedido['cliente_id'] = por_nombre.get(pedido['cliente'].casefold())
+    return errores
+
+
+# ─────────────────────────────────────────────
+# Escritura
+# ─────────────────────────────────────────────
+
+def _importar_bloque(pedidos):
+    """
+    Inserta un bloque de ventas dentro de una transacción.
+    Retorna (creadas, duplicadas, rechazadas).
+    """
+    claves     = [p['clave'] for p in pedidos]
+    existentes = set(Venta.objects.filter(clave_idempotencia__in=claves).values_list('clave_idempotencia', flat=True))
+    nuevos     = [p for p in pedidos if p['clave'] not in existentes]
+
+    errores, productos = repartir_stock(
+        [p['demanda'] for p in nuevos], referencias=[f'pos:{p["clave"]}' for p in nuevos],
+    )
+
+    rechazadas, aceptados = [], []
+    for pedido, error in zip(nuevos, errores):
+        if error:
+            rechazadas.append({'indice': pedido['indice'], 'clave': pedido['clave'], 'error': error})
+        else:
+            aceptados.append(pedido)
+
+    ventas = []
+    for pedido in aceptados:
+        pedido['lineas'] = [
+            (pid, cantidad, precio if precio is not None else productos[pid].precio)
+            for pid, cantidad, precio in pedido['lineas']
+        ]
+        ventas.append(Venta(
+            cliente            = pedido['cliente'],
+            idCliente_id       = pedido['cliente_id'],
+            fecha              = pedido['fecha'],
+            estado             = pedido['estado'],
+            total              = sum(Decimal(str(precio)) * cantidad for _, cantidad, precio in pedido['lineas']),
+            clave_idempotencia = pedido['clave'],
+        ))
+    Venta.objects.bulk_create(ventas, batch_size=len(ventas) or 1)
+
+    # MySQL no devuelve los pk de bulk_create: se recuperan por la clave
+    pk_por_clave = dict(
+        Venta.objects.filter(clave_idempotencia__in=[p['clave'] for p in aceptados])
+        .values_list('clave_idempotencia', 'pk')
+    )
+    detalles = [
+        DetalleVenta(
+            venta_id        = pk_por_clave[pedido['clave']],
+            producto_id     = pid,
+            producto_nombre = productos[pid].nombre,
+            precio          = precio,
+            cantidad        = cantidad,
+        )
+        for pedido in aceptados
+        for pid, cantidad, precio in pedido['lineas']
+    ]
+    DetalleVenta.objects.bulk_create(detalles, batch_size=1000)
+
+    # bulk_create no dispara las señales de los KPIs ni del cubo de ventas
+    kpis.registrar_ventas_lote(ventas)
+    cubo.registrar_lineas(detalles)
+    return len(ventas), len(pedidos) - len(nuevos), rechazadas
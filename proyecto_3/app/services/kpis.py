@@ -0,0 +1,357 @@
+"""
+Almacén incremental de KPIs.
+
+Mantiene KpiDiario (totales por día local) y KpiContador (contadores
+globales) a partir de las señales de app/signals.py. Los tableros leen
+unas pocas filas de estas tablas en lugar de recorrer el historial.
+
+Las ventas, compras y catálogos no tocan esas filas dentro de su
+transacción: insertan sus deltas en KpiPendiente (solo inserción, sin
+bloquear nada compartido) y, al confirmar, plegar() los suma en una
+transacción corta. Así las transacciones de stock no se encolan detrás
+de las mismas filas de contadores ni se cruzan con ellas en orden
+inverso. Los tableros ven los cambios en cuanto se pliegan (milisegundos
+después del commit).
+
+Si los KPIs se desalinean (restauración de backup, SQL manual) se
+reconstruyen con `python manage.py reconstruir_kpis` y se verifican con
+`python manage.py reconstruir_kpis --verificar`; ambos leen los
+pendientes y las tablas fuente en el mismo instante.
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Sum, Count, F, Q, Case, When, Value, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from app.models import (
+    KpiDiario, KpiContador, KpiPendiente, Producto, Cliente, Proveedor, Reporte, Venta, Compra,
+)
+from app.services import cache_reportes
+
+
+CONTADORES = [
+    'productos', 'clientes', 'proveedores', 'reportes',
+    'ventas', 'ventas_completadas', 'ventas_pendientes', 'ingreso_total',
+    'compras', 'compras_completadas', 'compras_pendientes',
+]
+
+# Campos de KpiDiario
+CAMPOS_DIA = ['ventas_total', 'ventas_num', 'compras_total', 'compras_num']
+
+# Fila de KpiContador que plegar() y reconstruir() bloquean antes que
+# cualquier otra: nunca corren a la vez y siempre bloquean en el mismo orden
+CERROJO = 'ventas'
+
+# Deltas por transacción de plegar()
+PLEGAR_LOTE = 5000
+
+# Modelos de catálogo que solo llevan un contador de filas
+CONTADOR_POR_MODELO = {
+    Producto:  'productos',
+    Cliente:   'clientes',
+    Proveedor: 'proveedores',
+    Reporte:   'reportes',
+}
+
+# Sufijo del contador por estado de venta/compra
+SUFIJO_ESTADO = {
+    'Completada': 'completadas',
+    'Pendiente':  'pendientes',
+}
+
+
+# ─────────────────────────────────────────────
+# Escritura incremental (diferida)
+# ─────────────────────────────────────────────
+
+def _anotar(filas):
+    """
+    Inserta [(clave, fecha o None, delta)] en KpiPendiente con un solo
+    INSERT y pide plegar() al confirmar la transacción.
+    """
+    filas = [(clave, fecha, valor) for clave, fecha, valor in filas if valor]
+    if not filas:
+        return
+    KpiPendiente.objects.bulk_create([
+        KpiPendiente(clave=clave, fecha=fecha, valor=Decimal(valor)) for clave, fecha, valor in filas
+    ], batch_size=1000)
+    # robust: si el plegado falla, los deltas quedan pendientes para el siguiente
+    transaction.on_commit(plegar, robust=True)
+
+
+def sumar_contadores(deltas):
+    """Suma {clave: delta} a los contadores (al confirmar, ver plegar())."""
+    _anotar([(clave, None, valor) for clave, valor in deltas.items()])
+
+
+def sumar_dia(fecha, **deltas):
+    """Suma los deltas (ventas_total=..., ventas_num=...) a la fila del día (al confirmar)."""
+    _anotar([(campo, fecha, valor) for campo, valor in deltas.items()])
+
+
+def crear_o_sumar(modelo, filtro, deltas):
+    """
+    Suma los deltas a la fila que cumple `filtro` (un UPDATE con F), o la
+    crea si no existe. `filtro` debe corresponder a un índice único.
+    """
+    cambios = {campo: F(campo) + valor for campo, valor in deltas.items()}
+    if modelo.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**filtro, **deltas)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        modelo.objects.filter(**filtro).update(**cambios)
+
+
+def _deltas_venta(fecha, total, estado, signo):
+    total = Decimal(str(total or 0))
+    dia   = timezone.localdate(fecha)
+    return [
+        ('ventas',                                       None, signo),
+        (f'ventas_{SUFIJO_ESTADO.get(estado, "otras")}', None, signo),
+        ('ingreso_total',                                None, signo * total),
+        ('ventas_total',                                 dia,  signo * total),
+        ('ventas_num',                                   dia,  signo),
+    ]
+
+
+def registrar_venta(fecha, total, estado, signo=1):
+    """Aplica (signo=1) o revierte (signo=-1) el efecto de una venta."""
+    _anotar(_deltas_venta(fecha, total, estado, signo))
+
+
+def registrar_compra(fecha, total, estado, signo=1):
+    """Aplica (signo=1) o revierte (signo=-1) el efecto de una compra. fecha es un date."""
+    total = Decimal(str(total or 0))
+    _anotar([
+        ('compras',                                       None,  signo),
+        (f'compras_{SUFIJO_ESTADO.get(estado, "otras")}', None,  signo),
+        ('compras_total',                                 fecha, signo * total),
+        ('compras_num',                                   fecha, signo),
+    ])
+
+
+def registrar_ventas_lote(ventas):
+    """
+    Equivalente a registrar_venta() para ventas creadas con bulk_create(),
+    que no dispara señales. Agrupa por día y por contador: un solo INSERT
+    de pendientes para todo el lote.
+    """
+    agrupados = {}
+    for venta in ventas:
+        for clave, fecha, valor in _deltas_venta(venta.fecha, venta.total, venta.estado, 1):
+            agrupados[(clave, fecha)] = agrupados.get((clave, fecha), 0) + valor
+    _anotar([(clave, fecha, valor) for (clave, fecha), valor in agrupados.items()])
+
+
+# ─────────────────────────────────────────────
+# Plegado de pendientes
+# ─────────────────────────────────────────────
+
+def _cerrojo():
+    """Bloquea (y si hace falta crea) la fila CERROJO de KpiContador."""
+    bloqueo = KpiContador.objects.select_for_update().filter(clave=CERROJO).values_list('pk', flat=True)
+    if not list(bloqueo):
+        crear_o_sumar(KpiContador, {'clave': CERROJO}, {'valor': 0})
+        list(bloqueo.all())
+
+
+def _sumar_contadores(deltas):
+    """Suma {clave: delta} a los contadores con un único UPDATE, creando los que falten."""
+    deltas = {clave: valor for clave, valor in deltas.items() if valor}
+    if not deltas:
+        return
+    expresion = Case(
+        *[When(clave=clave, then=F('valor') + Value(Decimal(valor))) for clave, valor in deltas.items()],
+        default=F('valor'),
+        output_field=DecimalField(max_digits=16, decimal_places=2),
+    )
+    actualizados = KpiContador.objects.filter(clave__in=deltas.keys()).update(valor=expresion)
+    if actualizados < len(deltas):
+        existentes = set(KpiContador.objects.filter(clave__in=deltas.keys()).values_list('clave', flat=True))
+        for clave in sorted(set(deltas) - existentes):
+            crear_o_sumar(KpiContador, {'clave': clave}, {'valor': deltas[clave]})
+
+
+def plegar(lote=PLEGAR_LOTE):
+    """
+    Suma los deltas pendientes a KpiContador y KpiDiario y los borra, en
+    transacciones de hasta `lote` deltas. Bloquea en orden fijo: CERROJO,
+    los demás contadores (índice único) y los días en orden de fecha.
+    Retorna cuántos deltas plegó.
+    """
+    plegados = 0
+    while True:
+        with transaction.atomic():
+            _cerrojo()
+            filas = list(KpiPendiente.objects.order_by('pk').values_list('pk', 'clave', 'fecha', 'valor')[:lote])
+            globales, dias = {}, {}
+            for _, clave, fecha, valor in filas:
+                destino = globales if fecha is None else dias.setdefault(fecha, {})
+                destino[clave] = destino.get(clave, 0) + valor
+            _sumar_contadores(globales)
+            for fecha in sorted(dias):
+                deltas = {campo: int(v) if campo.endswith('_num') else v for campo, v in dias[fecha].items() if v}
+                if deltas:
+                    crear_o_sumar(KpiDiario, {'fecha': fecha}, deltas)
+            if filas:
+                KpiPendiente.objects.filter(pk__in=[f[0] for f in filas]).delete()
+        plegados += len(filas)
+        if len(filas) < lote:
+            break
+    if plegados:
+        cache_reportes.invalidar()
+    return plegados
+
+
+# ─────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────
+
+def contadores(*claves):
+    """Retorna {clave: valor} con una sola consulta; las claves ausentes valen 0."""
+    claves  = claves or CONTADORES
+    valores = dict(KpiContador.objects.filter(clave__in=claves).values_list('clave', 'valor'))
+    return {
+        clave: (valores.get(clave) or Decimal(0)) if clave == 'ingreso_total' else int(valores.get(clave) or 0)
+        for clave in claves
+    }
+
+
+def ventas_entre(desde, hasta):
+    """(total, número de ventas) entre dos fechas locales inclusive."""
+    r = KpiDiario.objects.filter(fecha__range=(desde, hasta)).aggregate(t=Sum('ventas_total'), n=Sum('ventas_num'))
+    return r['t'] or Decimal(0), r['n'] or 0
+
+
+def resumen_ventas():
+    """Ventas de hoy, del mes en curso y número total de ventas."""
+    hoy = timezone.localdate()
+    total_hoy, _ = ventas_entre(hoy, hoy)
+    total_mes, transacciones_mes = ventas_entre(hoy.replace(day=1), hoy)
+    return {
+        'ventas_hoy':        total_hoy,
+        'total_mes':         total_mes,
+        'transacciones_mes': transacciones_mes,
+        'total_ventas':      contadores('ventas')['ventas'],
+    }
+
+
+# ─────────────────────────────────────────────
+# Reconstrucción y verificación
+# ─────────────────────────────────────────────
+
+def calcular_desde_cero():
+    """
+    Recalcula todos los KPIs a partir de las tablas fuente.
+    Retorna (contadores, {fecha: {campo: valor}}). No escribe nada.
+    """
+    valores = {clave: 0 for clave in CONTADORES}
+    for modelo, clave in CONTADOR_POR_MODELO.items():
+        valores[clave] = modelo.objects.count()
+
+    v = Venta.objects.aggregate(
+        n=Count('pk'), t=Sum('total'),
+        completadas=Count('pk', filter=Q(estado='Completada')),
+        pendientes=Count('pk', filter=Q(estado='Pendiente')),
+    )
+    valores.update(ventas=v['n'], ingreso_total=v['t'] or Decimal(0),
+                   ventas_completadas=v['completadas'], ventas_pendientes=v['pendientes'])
+
+    c = Compra.objects.aggregate(
+        n=Count('pk'),
+        completadas=Count('pk', filter=Q(estado='Completada')),
+        pendientes=Count('pk', filter=Q(estado='Pendiente')),
+    )
+    valores.update(compras=c['n'], compras_completadas=c['completadas'], compras_pendientes=c['pendientes'])
+
+    dias = {}
+    for fila in (Venta.objects.annotate(dia=TruncDate('fecha')).order_by()
+                 .values('dia').annotate(t=Sum('total'), n=Count('pk'))):
+        dias.setdefault(fila['dia'], {})
+        dias[fila['dia']].update(ventas_total=fila['t'] or Decimal(0), ventas_num=fila['n'])
+    for fila in (Compra.objects.order_by().values('fechaCompra')
+                 .annotate(t=Sum(F('cantidad') * F('precio_unitario')), n=Count('pk'))):
+        dias.setdefault(fila['fechaCompra'], {})
+        dias[fila['fechaCompra']].update(compras_total=Decimal(fila['t'] or 0), compras_num=fila['n'])
+    return valores, dias
+
+
+@contextmanager
+def instantanea():
+    """
+    transaction.atomic() en el que todas las lecturas ven el mismo instante.
+    Django abre las transacciones de MySQL en READ COMMITTED; aquí la
+    siguiente se pide en REPEATABLE READ, así una venta confirmada a mitad
+    del recálculo no aparece en las tablas fuente sin sus pendientes (ni al
+    revés). La instantánea se toma en la primera lectura sin bloqueo.
+    """
+    if connection.vendor == 'mysql' and not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+    with transaction.atomic():
+        yield
+
+
+def reconstruir():
+    """
+    Reemplaza el contenido de las tablas KPI por el recálculo completo.
+
+    Con CERROJO bloqueado (ningún plegar() corre a la vez) se leen, en la
+    misma instantánea, los pendientes y las tablas fuente: los pendientes
+    visibles ya están en el recálculo y se borran; los que se confirmen
+    después quedan para el siguiente plegar().
+    """
+    with instantanea():
+        _cerrojo()
+        pendientes    = list(KpiPendiente.objects.values_list('pk', flat=True))
+        valores, dias = calcular_desde_cero()
+
+        # La fila CERROJO no se borra: otros plegar() pueden estar esperándola
+        KpiContador.objects.exclude(clave__in=valores).delete()
+        for clave in sorted(valores):
+            if not KpiContador.objects.filter(clave=clave).update(valor=valores[clave]):
+                KpiContador.objects.create(clave=clave, valor=valores[clave])
+        KpiDiario.objects.all().delete()
+        KpiDiario.objects.bulk_create([KpiDiario(fecha=f, **campos) for f, campos in dias.items()], batch_size=500)
+        for inicio in range(0, len(pendientes), 1000):
+            KpiPendiente.objects.filter(pk__in=pendientes[inicio:inicio + 1000]).delete()
+    cache_reportes.invalidar()
+    return len(valores), len(dias)
+
+
+def verificar():
+    """
+    Compara los KPIs almacenados, más los deltas aún pendientes, con el
+    recálculo completo (todo en la misma instantánea).
+    Retorna una lista de diferencias (vacía si todo cuadra).
+    """
+    with instantanea():
+        guardados   = {clave: Decimal(valor) for clave, valor in contadores(*CONTADORES).items()}
+        almacenados = {k['fecha']: {c: Decimal(k[c] or 0) for c in CAMPOS_DIA}
+                       for k in KpiDiario.objects.values('fecha', *CAMPOS_DIA)}
+        for clave, fecha, valor in KpiPendiente.objects.values_list('clave', 'fecha', 'valor'):
+            if fecha is None:
+                guardados[clave] = guardados.get(clave, Decimal(0)) + valor
+            else:
+                dia = almacenados.setdefault(fecha, {c: Decimal(0) for c in CAMPOS_DIA})
+                dia[clave] += valor
+        valores, dias = calcular_desde_cero()
+
+    diferencias = []
+    for clave, esperado in valores.items():
+        if guardados.get(clave, Decimal(0)) != Decimal(esperado):
+            diferencias.append(f'contador {clave}: guardado {guardados.get(clave, 0)}, esperado {esperado}')
+
+    for fecha in sorted(set(dias) | set(almacenados)):
+        esperado = dias.get(fecha, {})
+        guardado = almacenados.get(fecha, {})
+        for campo in CAMPOS_DIA:
+            if Decimal(guardado.get(campo) or 0) != Decimal(esperado.get(campo) or 0):
+                diferencias.append(
+                    f'{fecha} {campo}: guardado {guardado.get(campo) or 0}, esperado {esperado.get(campo) or 0}'
+                )
+    return diferencias
@@ -1,17 +1,27 @@
 """
 Servicio de notificaciones por email.
 Envía notificaciones a usuarios activos (logged in).
+
+Las notificaciones masivas no se envían dentro de la petición: se escribe
+una fila en NotificacionOutbox (en la misma transacción que las origina) y
+se despachan después del commit, en segundo plano o con el comando
+`python manage.py procesar_notificaciones`. Así la latencia de una venta
+no depende del servidor SMTP ni del número de usuarios.
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
-from app.models import NotificacionEmail
+from app.models import NotificacionEmail, NotificacionOutbox
 
 
 def enviar_notificacion_email(usuario, asunto, mensaje, tipo='info'):
     """
-    Envía una notificación por email a un usuario.
+    Envía una notificación por email a un usuario (de forma síncrona).
 
     Args:
         usuario: Usuario Django
@@ -50,7 +60,9 @@ def enviar_notificacion_email(usuario, asunto, mensaje, tipo='info'):
 
 def enviar_notificacion_a_activos(asunto, mensaje, tipo='info', excluir_usuario=None):
     """
-    Envía una notificación a todos los usuarios activos (is_active=True).
+    Encola una notificación para todos los usuarios activos (is_active=True).
+    Escribe una sola fila en la bandeja de salida; el envío ocurre después
+    del commit de la transacción actual.
 
     Args:
         asunto: Asunto del email
@@ -58,19 +70,143 @@ def enviar_notificacion_a_activos(asunto, mensaje, tipo='info', excluir_usuario=
         tipo: Tipo de notificación
         excluir_usuario: Usuario a excluir (opcional)
     """
-    usuarios = User.objects.filter(is_active=True)
-    if excluir_usuario is not None:
-        usuarios = usuarios.exclude(pk=excluir_usuario.pk)
+    outbox = NotificacionOutbox.objects.create(
+        asunto=asunto,
+        mensaje=mensaje,
+        tipo=tipo,
+        excluir_usuario=excluir_usuario,
+    )
+    if getattr(settings, 'NOTIFICACIONES_DESPACHO_INMEDIATO', True):
+        transaction.on_commit(lambda: _despachar_en_segundo_plano(outbox.pk))
+    return outbox
+
+
+# ─────────────────────────────────────────────
+# Despacho de la bandeja de salida
+# ─────────────────────────────────────────────
+
+_despachador      = None
+_despachador_lock = threading.Lock()
+
+
+def _despachar_en_segundo_plano(outbox_id):
+    """Entrega el evento a un hilo del proceso; si falla, lo recoge el comando."""
+    global _despachador
+    with _despachador_lock:
+        if _despachador is None:
+            _despachador = ThreadPoolExecutor(max_workers=2, thread_name_prefix='outbox')
+    _despachador.submit(_procesar_en_hilo, outbox_id)
+
+
+def _procesar_en_hilo(outbox_id):
+    try:
+        procesar_outbox(ids=[outbox_id])
+    except Exception as e:
+        print(f"Error despachando notificación {outbox_id}: {e}")
+    finally:
+        connection.close()
+
+
+def _reclamar(ids, lote):
+    """
+    Toma hasta `lote` eventos vencidos y los aparta durante unos minutos
+    (proximo_intento en el futuro) para que otro proceso no los duplique.
+    Los bloqueos se sueltan al salir de la transacción, antes de enviar.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        qs = NotificacionOutbox.objects.filter(estado='pendiente', proximo_intento__lte=ahora)
+        if ids is not None:
+            qs = qs.filter(pk__in=ids)
+        eventos = list(qs.order_by('proximo_intento').select_for_update(skip_locked=True)[:lote])
+        if eventos:
+            NotificacionOutbox.objects.filter(pk__in=[e.pk for e in eventos]).update(
+                proximo_intento=ahora + timedelta(minutes=5),
+            )
+    return eventos
+
+
+def _expandir(evento):
+    """Crea (una sola vez) las NotificacionEmail de cada destinatario del evento."""
+    if NotificacionEmail.objects.filter(outbox=evento).exists():
+        return
+    usuarios = User.objects.filter(is_active=True).exclude(email='')
+    if evento.excluir_usuario_id is not None:
+        usuarios = usuarios.exclude(pk=evento.excluir_usuario_id)
+    NotificacionEmail.objects.bulk_create([
+        NotificacionEmail(
+            usuario_id=uid, asunto=evento.asunto, mensaje=evento.mensaje,
+            tipo=evento.tipo, outbox=evento,
+        )
+        for uid in usuarios.values_list('pk', flat=True)
+    ], batch_size=500)
+
+
+def _enviar(destino, asunto, mensaje):
+    send_mail(
+        subject=asunto,
+        message=mensaje,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[destino],
+        fail_silently=False,
+    )
+
+
+def procesar_outbox(ids=None, lote=50, hilos=4):
+    """
+    Despacha eventos pendientes de la bandeja de salida.
+
+    Para cada evento crea las NotificacionEmail de los destinatarios, envía
+    las que aún no se enviaron usando un pool de `hilos` conexiones SMTP y
+    marca enviada/fecha_envio. Si algún envío falla, el evento se reintenta
+    más tarde con backoff exponencial hasta NOTIFICACIONES_MAX_INTENTOS.
+    Retorna el número de eventos procesados.
+    """
+    max_intentos = getattr(settings, 'NOTIFICACIONES_MAX_INTENTOS', 5)
+    espera_base  = getattr(settings, 'NOTIFICACIONES_REINTENTO_ESPERA', 60)
+
+    eventos = _reclamar(ids, lote)
+    if not eventos:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for evento in eventos:
+            _expandir(evento)
+            pendientes = list(
+                NotificacionEmail.objects.filter(outbox=evento, enviada=False)
+                .select_related('usuario').only('pk', 'usuario__email')
+            )
+            futuros = {
+                n.pk: pool.submit(_enviar, n.usuario.email, evento.asunto, evento.mensaje)
+                for n in pendientes
+            }
+            enviadas, errores = [], []
+            for pk, futuro in futuros.items():
+                try:
+                    futuro.result()
+                    enviadas.append(pk)
+                except Exception as e:
+                    errores.append(str(e))
+
+            ahora = timezone.now()
+            if enviadas:
+                NotificacionEmail.objects.filter(pk__in=enviadas).update(enviada=True, fecha_envio=ahora)
 
-    resultado = []
-    for usuario in usuarios:
-        enviada = enviar_notificacion_email(usuario, asunto, mensaje, tipo)
-        resultado.append({
-            'usuario': usuario.username,
-            'enviada': enviada,
-        })
+            evento.intentos += 1
+            if not errores:
+                evento.estado          = 'enviada'
+                evento.fecha_procesado = ahora
+                evento.ultimo_error    = ''
+            elif evento.intentos >= max_intentos:
+                evento.estado          = 'error'
+                evento.fecha_procesado = ahora
+                evento.ultimo_error    = errores[0]
+            else:
+                evento.proximo_intento = ahora + timedelta(seconds=espera_base * (2 ** (evento.intentos - 1)))
+                evento.ultimo_error    = errores[0]
+            evento.save(update_fields=['intentos', 'estado', 'fecha_procesado', 'proximo_intento', 'ultimo_error'])
 
-    return resultado
+    return len(eventos)
 
 
 def notificacion_stock_bajo(producto):
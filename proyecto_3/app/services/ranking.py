@@ -0,0 +1,101 @@
+"""
+Ranking de productos por ingresos y clasificación ABC (Pareto).
+
+Las unidades y los ingresos por producto salen de un solo GROUP BY sobre
+detalle_venta (JOIN venta para la ventana de fechas, JOIN producto para el
+nombre actual), ordenado por ingresos en la base de datos. En Python solo
+se recorre el resultado ya agrupado, una fila por producto, para acumular
+la participación:
+
+  - A: productos que, en orden, completan el primer UMBRAL_A (80 %) de los
+    ingresos de la ventana
+  - B: los que siguen hasta UMBRAL_B (95 %)
+  - C: el resto
+
+Un producto entra en la clase del tramo donde empieza su aporte, así el
+que cruza el 80 % todavía es A. Las líneas de productos eliminados
+(producto_id nulo) no se clasifican.
+
+ranking_cacheado() guarda el resultado por ventana en la caché de
+reportes (app/services/cache_reportes.py).
+"""
+from decimal import Decimal
+from django.db.models import Sum, F, DecimalField
+from app.models import DetalleVenta
+from app.services import cache_reportes
+from app.services.series import rango, limites
+
+UMBRAL_A     = Decimal('0.80')
+UMBRAL_B     = Decimal('0.95')
+DIAS_RANKING = 90
+
+
+def ventana(desde=None, hasta=None):
+    """(desde, hasta) locales del ranking; por defecto los últimos DIAS_RANKING días."""
+    return rango(desde, hasta, 'dia', dias=DIAS_RANKING)
+
+
+def _clase(previo):
+    if previo < UMBRAL_A:
+        return 'A'
+    if previo < UMBRAL_B:
+        return 'B'
+    return 'C'
+
+
+def ranking_productos(desde=None, hasta=None):
+    """
+    Retorna {'desde', 'hasta', 'total_ingresos', 'total_unidades',
+    'productos': [...], 'resumen': {'A'|'B'|'C': {...}}} (1 consulta).
+    Lanza ValueError si la ventana no es válida.
+    """
+    desde, hasta = ventana(desde, hasta)
+    inicio, fin  = limites(desde, hasta)
+    filas = list(
+        DetalleVenta.objects
+        .filter(venta__fecha__gte=inicio, venta__fecha__lt=fin, producto__isnull=False)
+        .values('producto_id', 'producto__nombre')
+        .annotate(
+            unidades=Sum('cantidad'),
+            ingresos=Sum(F('precio') * F('cantidad'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        )
+        .order_by('-ingresos', 'producto_id')
+    )
+
+    total     = sum((f['ingresos'] or Decimal(0) for f in filas), Decimal(0))
+    acumulado = Decimal(0)
+    resumen   = {clase: {'productos': 0, 'unidades': 0, 'ingresos': 0.0} for clase in 'ABC'}
+    productos = []
+    for posicion, fila in enumerate(filas, start=1):
+        ingresos = fila['ingresos'] or Decimal(0)
+        previo   = acumulado / total if total else Decimal(1)
+        acumulado += ingresos
+        clase = _clase(previo) if ingresos else 'C'
+        productos.append({
+            'posicion':      posicion,
+            'producto_id':   fila['producto_id'],
+            'nombre':        fila['producto__nombre'],
+            'unidades':      fila['unidades'],
+            'ingresos':      float(ingresos),
+            'participacion': round(float(ingresos / total) * 100, 2) if total else 0.0,
+            'acumulado':     round(float(acumulado / total) * 100, 2) if total else 0.0,
+            'clase':         clase,
+        })
+        resumen[clase]['productos'] += 1
+        resumen[clase]['unidades']  += fila['unidades']
+        resumen[clase]['ingresos']  += float(ingresos)
+
+    return {
+        'desde':          desde.isoformat(),
+        'hasta':          hasta.isoformat(),
+        'total_ingresos': float(total),
+        'total_unidades': sum(p['unidades'] for p in productos),
+        'productos':      productos,
+        'resumen':        resumen,
+    }
+
+
+def ranking_cacheado(desde=None, hasta=None):
+    """ranking_productos() cacheado por ventana bajo la versión de datos actual."""
+    desde, hasta = ventana(desde, hasta)
+    return cache_reportes.obtener(f'ranking:{desde}:{hasta}', lambda: ranking_productos(desde, hasta))
@@ -0,0 +1,169 @@
+"""
+Puntos de reorden calculados en lote con NumPy.
+
+calcular_puntos_reorden() (comando calcular_reorden, pensado para cron
+nocturno) arma una matriz productos × días con las unidades vendidas en
+los últimos settings.REORDEN_DIAS_DEMANDA días locales, a partir de un
+solo GROUP BY (producto, día) sobre detalle_venta; los días sin ventas
+quedan en 0. Sobre la matriz se calcula todo de una vez, sin recorrer
+productos en Python:
+
+  demanda diaria   media móvil de la ventana (media por fila)
+  desviación       desviación estándar muestral por fila
+  stock seguridad  z · desviación · √(días de entrega)
+  punto reorden    demanda · días de entrega + stock de seguridad
+  nivel objetivo   punto de reorden + demanda · REORDEN_DIAS_COBERTURA
+
+Los días de entrega son Proveedor.envio del proveedor de la última compra
+de cada producto (REORDEN_DIAS_ENTREGA si no hay compras o el proveedor no
+lo tiene cargado).
+
+El resultado se guarda en la tabla punto_reorden (una fila por producto,
+upsert por lotes). Las alertas, los reportes y la vista de compras
+sugeridas la leen con una sola consulta unida a producto por su clave
+primaria, comparando contra el stock actual; stock_bajo_q() da el filtro.
+"""
+import datetime
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from app.models import Producto, Compra, DetalleVenta, PuntoReorden
+from app.services import cache_reportes
+from app.services.series import zona, limites
+
+# Sin punto de reorden calculado, un producto está bajo con este stock o
+# menos. Es el único umbral fijo: alertas, filtros, reportes y el asistente
+# pasan por stock_bajo_q() / esta_bajo().
+STOCK_BAJO_DEFECTO = 10
+
+
+def stock_bajo_q(prefijo=''):
+    """
+    Filtro de productos con stock bajo: stock <= punto de reorden si ya se
+    calculó, o <= STOCK_BAJO_DEFECTO si no. `prefijo` permite usarlo desde
+    otro modelo (p. ej. 'producto__'). Cada rama exige o excluye el punto
+    de reorden, así ~stock_bajo_q() no pierde los productos sin punto.
+    """
+    return (
+        Q(**{f'{prefijo}reorden__isnull': True, f'{prefijo}stock__lte': STOCK_BAJO_DEFECTO})
+        | Q(**{f'{prefijo}reorden__isnull': False, f'{prefijo}stock__lte': F(f'{prefijo}reorden__punto_reorden')})
+    )
+
+
+def esta_bajo(producto):
+    """stock_bajo_q() para un producto ya cargado con select_related('reorden')."""
+    reorden = getattr(producto, 'reorden', None)
+    return producto.stock <= (reorden.punto_reorden if reorden else STOCK_BAJO_DEFECTO)
+
+
+# ─────────────────────────────────────────────
+# Cálculo
+# ─────────────────────────────────────────────
+
+def matriz_demanda(ids, desde, hasta):
+    """
+    Unidades vendidas por producto y día local: array (len(ids), días) con
+    una fila por id en el mismo orden y 0 en los días sin ventas (1 consulta).
+    """
+    dias   = (hasta - desde).days + 1
+    fila   = {pid: i for i, pid in enumerate(ids)}
+    matriz = np.zeros((len(ids), dias), dtype=np.float64)
+    inicio, fin = limites(desde, hasta)
+    for venta in (DetalleVenta.objects
+                  .filter(venta__fecha__gte=inicio, venta__fecha__lt=fin, producto__isnull=False)
+                  .values('producto_id', dia=TruncDate('venta__fecha', tzinfo=zona()))
+                  .annotate(unidades=Sum('cantidad')).order_by()):
+        i = fila.get(venta['producto_id'])
+        if i is not None:
+            matriz[i, (venta['dia'] - desde).days] = venta['unidades']
+    return matriz
+
+
+def calcular(demanda, dias_entrega, z=None, cobertura=None):
+    """
+    Aplica las fórmulas a toda la matriz. `demanda` es (productos, días) y
+    `dias_entrega` un vector (productos,). Retorna un dict de vectores.
+    """
+    z         = settings.REORDEN_NIVEL_SERVICIO if z is None else z
+    cobertura = settings.REORDEN_DIAS_COBERTURA if cobertura is None else cobertura
+    media      = demanda.mean(axis=1)
+    desviacion = demanda.std(axis=1, ddof=1) if demanda.shape[1] > 1 else np.zeros(len(demanda))
+    seguridad  = np.ceil(z * desviacion * np.sqrt(dias_entrega))
+    punto      = np.ceil(media * dias_entrega + seguridad)
+    return {
+        'demanda_diaria':  media,
+        'desviacion':      desviacion,
+        'stock_seguridad': seguridad.astype(np.int64),
+        'punto_reorden':   punto.astype(np.int64),
+        'nivel_objetivo':  np.ceil(punto + media * cobertura).astype(np.int64),
+    }
+
+
+def _proveedores():
+    """[(producto_id, proveedor_id, envio)] del proveedor de la última compra de cada producto (1 consulta)."""
+    ultima = Compra.objects.filter(Producto=OuterRef('pk')).order_by('-fechaCompra', '-idCompra')
+    return list(
+        Producto.objects.order_by('pk')
+        .annotate(proveedor_id=Subquery(ultima.values('Proveedor_id')[:1]),
+                  envio=Subquery(ultima.values('Proveedor__envio')[:1]))
+        .values_list('pk', 'proveedor_id', 'envio')
+    )
+
+
+def calcular_puntos_reorden(hasta=None, lote=1000):
+    """
+    Recalcula la tabla punto_reorden para todos los productos. `hasta` es el
+    último día (local) de la ventana; por defecto ayer, el último día
+    completo. Retorna el número de productos calculados.
+    """
+    hasta = hasta or timezone.localdate(timezone=zona()) - datetime.timedelta(days=1)
+    desde = hasta - datetime.timedelta(days=settings.REORDEN_DIAS_DEMANDA - 1)
+
+    productos = _proveedores()
+    if not productos:
+        return 0
+    ids     = [pid for pid, _, _ in productos]
+    entrega = np.array([envio if envio and envio > 0 else settings.REORDEN_DIAS_ENTREGA
+                        for _, _, envio in productos], dtype=np.float64)
+    r = calcular(matriz_demanda(ids, desde, hasta), entrega)
+
+    ahora = timezone.now()
+    filas = [
+        PuntoReorden(
+            producto_id=pid, proveedor_id=proveedor_id, dias_entrega=int(entrega[i]),
+            demanda_diaria=round(float(r['demanda_diaria'][i]), 3), desviacion=round(float(r['desviacion'][i]), 3),
+            stock_seguridad=int(r['stock_seguridad'][i]), punto_reorden=int(r['punto_reorden'][i]),
+            nivel_objetivo=int(r['nivel_objetivo'][i]), fecha_calculo=ahora,
+        )
+        for i, (pid, proveedor_id, _) in enumerate(productos)
+    ]
+    with transaction.atomic():
+        PuntoReorden.objects.bulk_create(
+            filas, batch_size=lote, update_conflicts=True, unique_fields=['producto'],
+            update_fields=['proveedor', 'demanda_diaria', 'desviacion', 'dias_entrega', 'stock_seguridad',
+                           'punto_reorden', 'nivel_objetivo', 'fecha_calculo'],
+        )
+        # bulk_create no dispara señales: las alertas de los reportes cambian
+        cache_reportes.invalidar()
+    return len(filas)
+
+
+# ─────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────
+
+def compras_sugeridas():
+    """
+    Productos con stock <= punto de reorden y la cantidad a pedir para
+    llegar al nivel objetivo, de mayor a menor urgencia (1 consulta).
+    """
+    return list(
+        PuntoReorden.objects
+        .select_related('producto', 'proveedor')
+        .filter(producto__stock__lte=F('punto_reorden'), nivel_objetivo__gt=0)
+        .annotate(cantidad_sugerida=F('nivel_objetivo') - F('producto__stock'))
+        .order_by('producto__stock', '-demanda_diaria')
+    )
@@ -0,0 +1,456 @@
+"""
+Secciones de la página de reportes.
+
+Cada sección (KPIs, productos, clientes, ventas, proveedores, compras y
+"todo") se sirve como un JSON independiente (ReporteSeccionView) que
+reporte.js carga en paralelo. Cada función arma su sección con un número
+fijo de consultas, sin importar cuántos registros haya:
+
+  - los totales por cliente y por proveedor salen de un GROUP BY (annotate)
+  - el primer detalle de cada venta llega como Subquery/OuterRef en la misma
+    consulta de ventas, en lugar de un v.detalles.first() por venta
+  - los KPIs se leen de los contadores incrementales (app/services/kpis.py)
+  - las gráficas por día salen de app/services/series.py: los últimos
+    DIAS_GRAFICA días en hora local, con los días sin movimientos en 0
+  - el ranking ABC sale de un GROUP BY por producto (app/services/ranking.py)
+  - "todo" es la primera página del feed UNION ALL de app/services/actividad.py
+  - el stock bajo compara contra el punto de reorden de cada producto
+    (app/services/reabastecimiento.py), unido a producto por su clave
+
+calcular_secciones() arma varias secciones a la vez, en serie o en un pool
+de hilos acotado (settings.REPORTES_HILOS), cada hilo con su propia conexión
+que se cierra al terminar; la usa la precarga opcional de ReportesView y
+el comando benchmark_reportes.
+
+firma() calcula el ETag y el Last-Modified de una sección con sondas
+baratas (MAX(pk) y MAX(fecha) sobre índices) más la versión de datos de
+app/services/cache_reportes.py, para responder 304 a los refrescos.
+
+El presupuesto de consultas está fijado en app/tests.py.
+"""
+import datetime
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum, Count, Max, OuterRef, Subquery
+from django.utils import timezone
+from app.models import (
+    Producto, Cliente, Venta, DetalleVenta, Compra, Proveedor, MovimientoInventario,
+)
+from app.services import cache_reportes
+from app.services.kpis import contadores, resumen_ventas
+from app.services.series import serie, zona
+from app.services.ranking import ranking_productos
+from app.services.actividad import pagina_actividad
+from app.services.reabastecimiento import stock_bajo_q, esta_bajo
+
+LIMITE_VENTAS    = 50
+LIMITE_COMPRAS   = 50
+LIMITE_ACTIVIDAD = 100
+LIMITE_RANKING   = 50
+DIAS_GRAFICA     = 14
+
+
+def _hoy():
+    return timezone.localdate(timezone=zona())
+
+
+def _ultimos_dias():
+    """(desde, hasta) de las gráficas por día: los últimos DIAS_GRAFICA días hasta hoy."""
+    hasta = _hoy()
+    return hasta - datetime.timedelta(days=DIAS_GRAFICA - 1), hasta
+
+
+def _fecha_local(valor):
+    """datetime → 'YYYY-MM-DD HH:MM' en hora local; date → 'YYYY-MM-DD'."""
+    if isinstance(valor, datetime.datetime):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M')
+    return str(valor) if valor else ''
+
+
+# ─────────────────────────────────────────────
+# KPIs
+# ─────────────────────────────────────────────
+
+def seccion_kpis():
+    """KPIs de la cabecera, leídos de las tablas KPI (4 consultas)."""
+    kpi     = contadores()
+    resumen = resumen_ventas()
+    return {
+        'total_productos':     kpi['productos'],
+        'total_clientes':      kpi['clientes'],
+        'total_proveedores':   kpi['proveedores'],
+        'total_compras':       kpi['compras'],
+        'total_ventas_mes':    float(resumen['total_mes']),
+        'transacciones_mes':   resumen['transacciones_mes'],
+        'ingreso_total':       float(kpi['ingreso_total']),
+        'ventas_completadas':  kpi['ventas_completadas'],
+        'ventas_pendientes':   kpi['ventas_pendientes'],
+        'compras_completadas': kpi['compras_completadas'],
+        'compras_pendientes':  kpi['compras_pendientes'],
+    }
+
+
+# ─────────────────────────────────────────────
+# Productos
+# ─────────────────────────────────────────────
+
+def seccion_productos():
+    """Productos con su estado de stock (1 consulta)."""
+    productos = list(Producto.objects.select_related('idTipo', 'idMarca', 'idUnidad', 'reorden').all())
+    max_stock = max((p.stock for p in productos), default=1) or 1
+    productos_data = []
+    for p in productos:
+        if p.stock == 0:       estado, label = 'out', 'Sin stock'
+        elif esta_bajo(p):     estado, label = 'low', 'Bajo'
+        else:                  estado, label = 'ok',  'Normal'
+        productos_data.append({
+            'id': p.idProducto, 'nombre': p.nombre, 'precio': float(p.precio),
+            'stock': p.stock, 'pct': int((p.stock / max_stock) * 100),
+            'estado': estado, 'label': label,
+            'punto_reorden': p.reorden.punto_reorden if hasattr(p, 'reorden') else None,
+        })
+    alertas_stock = [p for p in productos_data if p['estado'] in ('low', 'out')]
+    sin_stock     = sum(1 for p in alertas_stock if p['estado'] == 'out')
+
+    return {
+        'productos_data':         productos_data,
+        'productos_mini':         productos_data[:5],
+        'alertas_stock':          alertas_stock,
+        # Ya están todos en memoria: no hace falta otro COUNT
+        'stock_bajo':             len(alertas_stock),
+        'productos_estado':       [len(productos_data) - len(alertas_stock), len(alertas_stock) - sin_stock, sin_stock],
+        'graf_productos_labels':  [p['nombre'] for p in productos_data],
+        'graf_productos_stock':   [p['stock']  for p in productos_data],
+        'graf_productos_colores': [
+            '#ef4444' if p['estado'] == 'out' else
+            '#f59e0b' if p['estado'] == 'low' else '#22c55e'
+            for p in productos_data
+        ],
+    }
+
+
+# ─────────────────────────────────────────────
+# Clientes
+# ─────────────────────────────────────────────
+
+def seccion_clientes():
+    """Clientes con sus totales de venta: un solo GROUP BY sobre venta.cliente_id."""
+    clientes_data = []
+    for c in Cliente.objects.annotate(
+        tc=Sum('ventas__total'), nv=Count('ventas'), ultima=Max('ventas__fecha'),
+    ):
+        clientes_data.append({
+            'id': c.id, 'nombre': c.nombre, 'email': c.email,
+            'telefono': c.telefono, 'total_compras': float(c.tc or 0), 'estado': c.estado,
+            'num_ventas': c.nv, 'ultima_compra': _fecha_local(c.ultima),
+        })
+
+    top_clientes     = sorted(clientes_data, key=lambda x: x['total_compras'], reverse=True)
+    clientes_activos = sum(1 for c in clientes_data if c['estado'] == 'activo')
+    return {
+        'clientes_data':         clientes_data,
+        'clientes_mini':         top_clientes[:5],
+        'graf_clientes_labels':  [c['nombre'] for c in top_clientes[:8]],
+        'graf_clientes_valores': [c['total_compras'] for c in top_clientes[:8]],
+        'clientes_activos':      clientes_activos,
+        'clientes_inactivos':    len(clientes_data) - clientes_activos,
+    }
+
+
+# ─────────────────────────────────────────────
+# Ventas
+# ─────────────────────────────────────────────
+
+def ventas_recientes(limite):
+    """
+    Últimas ventas con el producto y la cantidad de su primera línea,
+    resueltos con subconsultas correlacionadas (1 consulta en total).
+    """
+    primera = DetalleVenta.objects.filter(venta=OuterRef('pk')).order_by('pk')
+    return list(
+        Venta.objects
+        .annotate(
+            primer_producto=Subquery(primera.values('producto_nombre')[:1]),
+            primera_cantidad=Subquery(primera.values('cantidad')[:1]),
+        )
+        .order_by('-fecha')
+        .values('id', 'cliente', 'total', 'fecha', 'estado', 'primer_producto', 'primera_cantidad')[:limite]
+    )
+
+
+def ventas_por_dia():
+    """Total vendido en cada uno de los últimos DIAS_GRAFICA días locales (1 consulta)."""
+    datos = serie('ventas_total', *_ultimos_dias())
+    return datos['labels'], datos['valores']
+
+
+def seccion_ventas():
+    """Últimas ventas, gráfica por día y estados (3 consultas)."""
+    ventas_data = [{
+        'id': v['id'], 'cliente': v['cliente'],
+        'producto': v['primer_producto'] or '-',
+        'cantidad': v['primera_cantidad'] or 0,
+        'total': float(v['total']), 'fecha': _fecha_local(v['fecha'])[:10], 'estado': v['estado'],
+    } for v in ventas_recientes(LIMITE_VENTAS)]
+
+    labels, valores = ventas_por_dia()
+    kpi = contadores('ventas_completadas', 'ventas_pendientes')
+    return {
+        'ventas_data':         ventas_data,
+        'ventas_mini':         ventas_data[:5],
+        'graf_ventas_labels':  labels,
+        'graf_ventas_valores': valores,
+        'ventas_completadas':  kpi['ventas_completadas'],
+        'ventas_pendientes':   kpi['ventas_pendientes'],
+    }
+
+
+# ─────────────────────────────────────────────
+# Proveedores
+# ─────────────────────────────────────────────
+
+def seccion_proveedores():
+    """Proveedores con su número de compras: un solo GROUP BY sobre compra.Proveedor."""
+    proveedores_data = [{
+        'id': p.id, 'nombre': p.nombre, 'telefono': p.telefono,
+        'email': p.email, 'envio': p.envio,
+        'num_compras': p.nc, 'fecha': _fecha_local(p.fechaRegistro),
+    } for p in Proveedor.objects.annotate(nc=Count('compra'))]
+
+    return {
+        'proveedores_data':         proveedores_data,
+        'proveedores_mini':         proveedores_data[:5],
+        'graf_proveedores_labels':  [p['nombre']      for p in proveedores_data],
+        'graf_proveedores_valores': [p['num_compras'] for p in proveedores_data],
+    }
+
+
+# ─────────────────────────────────────────────
+# Compras
+# ─────────────────────────────────────────────
+
+def compras_recientes(limite):
+    """Últimas compras con producto, proveedor y usuario (1 consulta)."""
+    return list(
+        Compra.objects.select_related('Producto', 'Proveedor', 'usuario').order_by('-fechaCompra')[:limite]
+    )
+
+
+def compras_por_dia():
+    """Número de compras en cada uno de los últimos DIAS_GRAFICA días (1 consulta)."""
+    datos = serie('compras_num', *_ultimos_dias())
+    return datos['labels'], datos['valores']
+
+
+def seccion_compras():
+    """Últimas compras, gráfica por día y estados (3 consultas)."""
+    compras_data = [{
+        'id':        c.idCompra,
+        'producto':  c.Producto.nombre      if c.Producto      else '-',
+        'proveedor': c.Proveedor.nombre     if c.Proveedor     else '-',
+        'admin':     c.usuario.get_full_name() or c.usuario.username if c.usuario else '-',
+        'fecha':     _fecha_local(c.fechaCompra),
+        'estado':    c.estado,
+    } for c in compras_recientes(LIMITE_COMPRAS)]
+
+    labels, valores = compras_por_dia()
+    kpi = contadores('compras_completadas', 'compras_pendientes')
+    return {
+        'compras_data':         compras_data,
+        'graf_compras_labels':  labels,
+        'graf_compras_valores': valores,
+        'compras_completadas':  kpi['compras_completadas'],
+        'compras_pendientes':   kpi['compras_pendientes'],
+    }
+
+
+# ─────────────────────────────────────────────
+# Todo (actividad combinada)
+# ─────────────────────────────────────────────
+
+def seccion_todo():
+    """Primera página del feed de movimientos y eje común de fechas (3 consultas)."""
+    todas, siguiente = pagina_actividad(limite=LIMITE_ACTIVIDAD)
+
+    ventas_por_fecha  = dict(zip(*ventas_por_dia()))
+    compras_por_fecha = dict(zip(*compras_por_dia()))
+    todas_fechas      = sorted(set(ventas_por_fecha) | set(compras_por_fecha))
+    return {
+        'todas':             todas,
+        'todas_siguiente':   siguiente,
+        'graf_todo_labels':  todas_fechas,
+        'graf_todo_ventas':  [ventas_por_fecha.get(f, 0)  for f in todas_fechas],
+        'graf_todo_compras': [compras_por_fecha.get(f, 0) for f in todas_fechas],
+    }
+
+
+# ─────────────────────────────────────────────
+# Refresco periódico (ReportesDataView)
+# ─────────────────────────────────────────────
+
+def datos_reportes():
+    """Resumen para el refresco periódico de la página."""
+    resumen = resumen_ventas()
+    grafica_labels, grafica_valores = ventas_por_dia()
+    alertas = [
+        {'nombre': p.nombre, 'stock': p.stock, 'estado': 'out' if p.stock == 0 else 'low'}
+        for p in Producto.objects.filter(stock_bajo_q())
+    ]
+    return {
+        'total_ventas_mes':  float(resumen['total_mes']),
+        'transacciones_mes': resumen['transacciones_mes'],
+        'ingreso_total':     float(contadores('ingreso_total')['ingreso_total']),
+        'stock_bajo':        len(alertas),
+        'grafica_labels':    grafica_labels,
+        'grafica_valores':   grafica_valores,
+        'alertas':           alertas,
+    }
+
+
+# ─────────────────────────────────────────────
+# Ranking ABC
+# ─────────────────────────────────────────────
+
+def seccion_ranking():
+    """Ranking de productos por ingresos de los últimos DIAS_RANKING días, con clase ABC (1 consulta)."""
+    ranking = ranking_productos()
+    return {
+        'ranking_desde':   ranking['desde'],
+        'ranking_hasta':   ranking['hasta'],
+        'ranking_total':   ranking['total_ingresos'],
+        'ranking_data':    ranking['productos'][:LIMITE_RANKING],
+        'ranking_resumen': ranking['resumen'],
+    }
+
+
+# Nombre en la URL → (función, tablas que sondea firma())
+SECCIONES = {
+    'kpis':        (seccion_kpis,        (Venta, Compra, Producto, Cliente, Proveedor)),
+    'productos':   (seccion_productos,   (Producto, MovimientoInventario)),
+    'clientes':    (seccion_clientes,    (Cliente, Venta)),
+    'ventas':      (seccion_ventas,      (Venta, DetalleVenta)),
+    'proveedores': (seccion_proveedores, (Proveedor, Compra)),
+    'compras':     (seccion_compras,     (Compra,)),
+    'todo':        (seccion_todo,        (Venta, Compra)),
+    'ranking':     (seccion_ranking,     (Venta, DetalleVenta)),
+    'datos':       (datos_reportes,      (Venta, MovimientoInventario)),
+}
+
+# Campo de fecha de las tablas que lo tienen, para el Last-Modified
+CAMPO_FECHA = {
+    Venta:                'fecha',
+    MovimientoInventario: 'fecha',
+}
+
+
+# ─────────────────────────────────────────────
+# GET condicional
+# ─────────────────────────────────────────────
+
+def firma(nombre):
+    """
+    Retorna (etag, last_modified) de una sección, o (None, None) si no existe.
+
+    El ETag combina MAX(pk) de cada tabla de la sección (una consulta por
+    tabla, sobre la clave primaria) con la versión de datos de la caché,
+    que cubre ediciones y borrados, y con el día local: las gráficas y el
+    ranking terminan hoy, así que cambian a medianoche aunque no haya
+    cambios en los datos. Last-Modified es el mayor entre la hora del
+    último cambio registrado por la caché y MAX(fecha) de las tablas que
+    tienen fecha.
+    """
+    if nombre not in SECCIONES:
+        return None, None
+
+    partes   = [nombre, str(cache_reportes.version_datos()), _hoy().isoformat()]
+    momentos = []
+    for modelo in SECCIONES[nombre][1]:
+        campos = {'ultimo': Max('pk')}
+        if modelo in CAMPO_FECHA:
+            campos['fecha'] = Max(CAMPO_FECHA[modelo])
+        sonda = modelo.objects.aggregate(**campos)
+        partes.append(str(sonda['ultimo']))
+        if sonda.get('fecha'):
+            momentos.append(sonda['fecha'])
+
+    modificado = cache_reportes.ultima_modificacion()
+    if modificado:
+        momentos.append(modificado)
+    etag = hashlib.md5('|'.join(partes).encode()).hexdigest()
+    return etag, max(momentos, default=None)
+
+
+# ─────────────────────────────────────────────
+# Ejecución de varias secciones (serie o hilos)
+# ─────────────────────────────────────────────
+
+_tiempos      = {}
+_tiempos_lock = threading.Lock()
+
+
+def metricas_secciones():
+    """Tiempos por sección del proceso actual: {sección: {n, promedio_ms, max_ms, ultimo_ms}}."""
+    with _tiempos_lock:
+        return {
+            nombre: {
+                'n':           t['n'],
+                'promedio_ms': round(t['total_ms'] / t['n'], 2),
+                'max_ms':      round(t['max_ms'], 2),
+                'ultimo_ms':   round(t['ultimo_ms'], 2),
+            }
+            for nombre, t in _tiempos.items()
+        }
+
+
+def _registrar_tiempo(nombre, ms):
+    with _tiempos_lock:
+        t = _tiempos.setdefault(nombre, {'n': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'ultimo_ms': 0.0})
+        t['n']        += 1
+        t['total_ms'] += ms
+        t['max_ms']    = max(t['max_ms'], ms)
+        t['ultimo_ms'] = ms
+
+
+def calcular_seccion(nombre, usar_cache=True):
+    """Retorna (datos, ms) de una sección, pasando por la caché de reportes si usar_cache."""
+    calcular = SECCIONES[nombre][0]
+    inicio   = time.perf_counter()
+    datos    = cache_reportes.obtener(f'seccion:{nombre}:{_hoy()}', calcular) if usar_cache else calcular()
+    ms       = (time.perf_counter() - inicio) * 1000
+    _registrar_tiempo(nombre, ms)
+    return datos, ms
+
+
+def _calcular_en_hilo(nombre, usar_cache):
+    try:
+        return calcular_seccion(nombre, usar_cache)
+    finally:
+        # Cada hilo abre su propia conexión; se cierra para no dejarla colgada
+        connection.close()
+
+
+def calcular_secciones(nombres=None, hilos=None, usar_cache=True):
+    """
+    Arma las secciones pedidas (todas las de la página por defecto).
+    Retorna ({sección: datos}, {sección: ms}).
+
+    Con hilos <= 1 corre en serie en la conexión actual. Con más hilos cada
+    sección corre en un hilo del pool con su propia conexión: cada una ve
+    los datos confirmados en su propia transacción, no una foto común.
+    """
+    nombres = list(nombres or [n for n in SECCIONES if n != 'datos'])
+    hilos   = getattr(settings, 'REPORTES_HILOS', 4) if hilos is None else hilos
+
+    if hilos <= 1 or len(nombres) <= 1:
+        resultados = [calcular_seccion(nombre, usar_cache) for nombre in nombres]
+    else:
+        with ThreadPoolExecutor(max_workers=min(hilos, len(nombres))) as pool:
+            resultados = list(pool.map(lambda nombre: _calcular_en_hilo(nombre, usar_cache), nombres))
+
+    datos   = {nombre: r[0] for nombre, r in zip(nombres, resultados)}
+    tiempos = {nombre: r[1] for nombre, r in zip(nombres, resultados)}
+    return datos, tiempos
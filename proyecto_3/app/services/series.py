@@ -0,0 +1,184 @@
+"""
+Series de tiempo de ventas y compras.
+
+serie() agrega una métrica entre dos fechas locales con una granularidad
+(hora, día, semana o mes):
+
+  - el truncado se hace en la base de datos en la zona del proyecto
+    (settings.TIME_ZONE), no en UTC: una venta de las 23:30 en Bogotá cae
+    en su día local aunque en UTC ya sea el día siguiente
+  - el rango se filtra como fecha >= inicio AND fecha < fin, así la
+    consulta usa el índice de venta.fecha / compra.fecha en lugar de
+    recorrer toda la tabla
+  - los periodos sin movimientos se rellenan con 0, así las gráficas
+    siempre muestran el eje completo
+
+Compra.fechaCompra es un DateField: sus métricas no admiten granularidad
+por hora.
+"""
+import datetime
+import zoneinfo
+from django.conf import settings
+from django.db.models import Sum, Count, F, DateField
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from app.models import Venta, Compra
+
+GRANULARIDADES = ('hora', 'dia', 'semana', 'mes')
+_TRUNC         = {'hora': 'hour', 'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+# Rango por defecto (en días hacia atrás desde hoy, inclusive) por granularidad
+RANGO_POR_DEFECTO = {'hora': 1, 'dia': 14, 'semana': 7 * 12, 'mes': 365}
+
+# Tope de puntos por serie: evita que un rango enorme por hora arme una respuesta gigante
+MAX_PUNTOS = 2000
+
+# Nombre → (modelo, campo de fecha, agregado)
+METRICAS = {
+    'ventas_total':  (Venta,  'fecha',       Sum('total')),
+    'ventas_num':    (Venta,  'fecha',       Count('pk')),
+    'compras_total': (Compra, 'fechaCompra', Sum(F('cantidad') * F('precio_unitario'))),
+    'compras_num':   (Compra, 'fechaCompra', Count('pk')),
+}
+
+
+def zona():
+    """Zona horaria del negocio (no la activada en la petición)."""
+    return zoneinfo.ZoneInfo(settings.TIME_ZONE)
+
+
+def rango(desde=None, hasta=None, granularidad='dia', dias=None):
+    """
+    Completa y valida el rango (fechas locales, ambas inclusive). Acepta
+    date o 'YYYY-MM-DD'. Sin `hasta` se toma hoy; sin `desde`, los `dias`
+    anteriores (por defecto, el rango usual de la granularidad). Lanza
+    ValueError si algo no es válido.
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f'Granularidad no válida: {granularidad}. Use {", ".join(GRANULARIDADES)}.')
+    desde, hasta = _a_fecha(desde), _a_fecha(hasta)
+    hasta = hasta or timezone.localdate(timezone=zona())
+    desde = desde or hasta - datetime.timedelta(days=(dias or RANGO_POR_DEFECTO[granularidad]) - 1)
+    if desde > hasta:
+        raise ValueError('La fecha inicial es posterior a la final.')
+    return desde, hasta
+
+
+def limites(desde, hasta):
+    """[inicio, fin) con zona del proyecto para filtrar un DateTimeField entre dos días locales."""
+    tz = zona()
+    return (timezone.make_aware(datetime.datetime.combine(desde, datetime.time.min), tz),
+            timezone.make_aware(datetime.datetime.combine(hasta + datetime.timedelta(days=1), datetime.time.min), tz))
+
+
+def _a_fecha(valor):
+    if not valor or isinstance(valor, datetime.date):
+        return valor or None
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise ValueError(f'Fecha no válida: {valor}.')
+    return fecha
+
+
+# ─────────────────────────────────────────────
+# Periodos
+# ─────────────────────────────────────────────
+
+def _inicio_periodo(fecha, granularidad):
+    if granularidad == 'semana':
+        return fecha - datetime.timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def _siguiente(periodo, granularidad):
+    if granularidad == 'hora':
+        return periodo + datetime.timedelta(hours=1)
+    if granularidad == 'dia':
+        return periodo + datetime.timedelta(days=1)
+    if granularidad == 'semana':
+        return periodo + datetime.timedelta(weeks=1)
+    return (periodo.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def periodos(desde, hasta, granularidad):
+    """Inicio de cada periodo del rango: datetime local sin zona por hora, date en el resto."""
+    if granularidad == 'hora':
+        actual = datetime.datetime.combine(desde, datetime.time.min)
+        fin    = datetime.datetime.combine(hasta + datetime.timedelta(days=1), datetime.time.min)
+    else:
+        actual = _inicio_periodo(desde, granularidad)
+        fin    = hasta + datetime.timedelta(days=1)
+    lista = []
+    while actual < fin:
+        lista.append(actual)
+        if len(lista) > MAX_PUNTOS:
+            raise ValueError(f'El rango supera el máximo de {MAX_PUNTOS} puntos; use una granularidad mayor.')
+        actual = _siguiente(actual, granularidad)
+    return lista
+
+
+def etiqueta(periodo, granularidad):
+    if granularidad == 'hora':
+        return periodo.strftime('%Y-%m-%d %H:00')
+    if granularidad == 'mes':
+        return periodo.strftime('%Y-%m')
+    return periodo.isoformat()
+
+
+# ─────────────────────────────────────────────
+# Serie
+# ─────────────────────────────────────────────
+
+def serie(metrica, desde=None, hasta=None, granularidad='dia'):
+    """
+    Retorna {'metrica', 'granularidad', 'desde', 'hasta', 'labels',
+    'valores', 'total'} con un punto por periodo (1 consulta). Las semanas
+    (lunes) y los meses de los extremos se cuentan completos. Lanza
+    ValueError si la métrica, la granularidad o el rango no son válidos.
+    """
+    if metrica not in METRICAS:
+        raise ValueError(f'Métrica no válida: {metrica}.')
+    modelo, campo, agregado = METRICAS[metrica]
+    desde, hasta = rango(desde, hasta, granularidad)
+    es_fecha = modelo._meta.get_field(campo).get_internal_type() == 'DateField'
+    if es_fecha and granularidad == 'hora':
+        raise ValueError(f'{metrica} se registra por día: no admite granularidad por hora.')
+
+    lista = periodos(desde, hasta, granularidad)
+    tz    = zona()
+    inicio, fin = lista[0], _siguiente(lista[-1], granularidad)
+    if es_fecha:
+        filtro = {f'{campo}__gte': inicio, f'{campo}__lt': fin}
+        trunc  = Trunc(campo, _TRUNC[granularidad], output_field=DateField())
+    else:
+        if granularidad != 'hora':
+            inicio = datetime.datetime.combine(inicio, datetime.time.min)
+            fin    = datetime.datetime.combine(fin, datetime.time.min)
+        filtro = {f'{campo}__gte': timezone.make_aware(inicio, tz), f'{campo}__lt': timezone.make_aware(fin, tz)}
+        trunc  = (Trunc(campo, 'hour', tzinfo=tz) if granularidad == 'hora'
+                  else Trunc(campo, _TRUNC[granularidad], output_field=DateField(), tzinfo=tz))
+
+    filas = (modelo.objects.filter(**filtro)
+             .annotate(periodo=trunc).values('periodo')
+             .annotate(valor=agregado).order_by())
+    por_periodo = {}
+    for fila in filas:
+        periodo = fila['periodo']
+        if granularidad == 'hora':
+            periodo = timezone.localtime(periodo, tz).replace(tzinfo=None)
+        valor   = fila['valor'] or 0
+        por_periodo[periodo] = valor if isinstance(valor, int) else float(valor)
+
+    valores = [por_periodo.get(p, 0) for p in lista]
+    return {
+        'metrica':      metrica,
+        'granularidad': granularidad,
+        'desde':        desde.isoformat(),
+        'hasta':        hasta.isoformat(),
+        'labels':       [etiqueta(p, granularidad) for p in lista],
+        'valores':      valores,
+        'total':        sum(valores),
+    }
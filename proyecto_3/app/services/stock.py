@@ -0,0 +1,513 @@
+"""
+Servicio de stock.
+
+Única capa autorizada para modificar Producto.stock. Todas las operaciones:
+  - bloquean los productos involucrados con una sola consulta y SIEMPRE en
+    orden de clave primaria, para que dos transacciones concurrentes nunca
+    se esperen en orden inverso (deadlock);
+  - validan en memoria y escriben los cambios en una sola sentencia;
+  - se ejecutan a través de ejecutar_transaccion(), que reintenta los
+    deadlocks y los lock wait timeout de MySQL con espera aleatoria.
+
+Con settings.STOCK_MODO = 'optimista' los movimientos estrictos no leen ni
+bloquean antes de escribir: cada producto se actualiza con un UPDATE
+condicional (stock = stock - n WHERE stock >= n) y un rowcount de 0
+significa stock insuficiente. El CheckConstraint de Producto garantiza
+en ambos modos que el stock nunca sea negativo.
+
+Cada cambio queda registrado en el libro MovimientoInventario (motivo y
+referencia) con un INSERT por operación. Cuando la referencia aún no
+existe al mover el stock (la venta se crea después de descontar), la
+operación se envuelve en libro_inventario() y la referencia se completa
+antes de escribir el libro.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection, transaction, OperationalError
+from django.db.models import F, Sum
+from django.utils import timezone
+from app.models import Producto, DetalleVenta, MovimientoInventario
+from app.services import cache_reportes, cubo, columnar
+from app.services.notifications import notificacion_stock_bajo
+from app.services.reabastecimiento import esta_bajo
+
+MODO_BLOQUEO   = 'bloqueo'
+MODO_OPTIMISTA = 'optimista'
+
+# Códigos de error de MySQL que se pueden reintentar
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK     = 1213
+
+_metricas      = {'transacciones': 0, 'reintentos': 0, 'deadlocks': 0, 'lock_wait_timeouts': 0, 'fallos': 0}
+_metricas_lock = threading.Lock()
+
+
+# ─────────────────────────────────────────────
+# Reintentos y métricas
+# ─────────────────────────────────────────────
+
+def _contar(clave, n=1):
+    with _metricas_lock:
+        _metricas[clave] += n
+
+
+def metricas_stock():
+    """Copia de los contadores del proceso actual."""
+    with _metricas_lock:
+        return dict(_metricas)
+
+
+def _codigo_bloqueo(error):
+    """Retorna el código MySQL si el error es un deadlock o lock wait timeout."""
+    codigo = error.args[0] if error.args else None
+    return codigo if codigo in (ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT) else None
+
+
+def ejecutar_transaccion(operacion, *args, **kwargs):
+    """
+    Ejecuta operacion(*args, **kwargs) dentro de transaction.atomic().
+    Si MySQL aborta la transacción por deadlock o lock wait timeout se
+    reintenta desde cero, con backoff exponencial y jitter.
+    Si ya hay una transacción abierta no se reintenta: la decisión le
+    corresponde a quien la abrió.
+    """
+    max_intentos = getattr(settings, 'STOCK_REINTENTOS', 3)
+    espera_base  = getattr(settings, 'STOCK_REINTENTO_ESPERA', 0.05)
+    anidada      = connection.in_atomic_block
+
+    _contar('transacciones')
+    intento = 1
+    while True:
+        try:
+            with transaction.atomic():
+                return operacion(*args, **kwargs)
+        except OperationalError as e:
+            codigo = _codigo_bloqueo(e)
+            if codigo is None:
+                raise
+            _contar('deadlocks' if codigo == ER_LOCK_DEADLOCK else 'lock_wait_timeouts')
+            if anidada or intento >= max_intentos:
+                _contar('fallos')
+                raise
+            _contar('reintentos')
+            time.sleep(random.uniform(0, espera_base * (2 ** (intento - 1))))
+            intento += 1
+
+
+# ─────────────────────────────────────────────
+# Libro de movimientos
+# ─────────────────────────────────────────────
+
+_libros = threading.local()
+
+
+class _Libro:
+    def __init__(self, motivo, referencia):
+        self.motivo     = motivo
+        self.referencia = referencia
+        self.filas      = []
+
+    def guardar(self):
+        _insertar_movimientos([
+            (pid, cantidad, resultante, motivo or self.motivo, referencia or self.referencia)
+            for pid, cantidad, resultante, motivo, referencia in self.filas
+        ])
+
+
+@contextmanager
+def libro_inventario(motivo, referencia=''):
+    """
+    Agrupa los movimientos de stock del bloque y los escribe con un solo
+    INSERT al salir (si no hubo excepción). La referencia se puede asignar
+    dentro del bloque, cuando el objeto que la origina ya tiene pk:
+
+        with libro_inventario('venta') as libro:
+            descontar_stock(demanda)
+            venta = Venta.objects.create(...)
+            libro.referencia = f'venta:{venta.pk}'
+
+    Usar dentro de transaction.atomic() (o de ejecutar_transaccion()).
+    """
+    libro = _Libro(motivo, referencia)
+    pila  = _libros.__dict__.setdefault('pila', [])
+    pila.append(libro)
+    try:
+        yield libro
+    finally:
+        pila.pop()
+    libro.guardar()
+
+
+def _insertar_movimientos(filas):
+    if filas:
+        ahora = timezone.now()
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                producto_id=pid, cantidad=cantidad, stock_resultante=resultante,
+                motivo=motivo, referencia=referencia, fecha=ahora,
+            )
+            for pid, cantidad, resultante, motivo, referencia in filas
+        ], batch_size=1000)
+        # El stock se mueve con UPDATE, que no dispara las señales de Producto
+        cache_reportes.invalidar()
+
+
+def _anotar(filas, motivo=None, referencia=''):
+    """Registra [(producto_id, cantidad, stock_resultante)] con un mismo motivo y referencia."""
+    _encolar([(pid, cantidad, resultante, motivo, referencia) for pid, cantidad, resultante in filas if cantidad])
+
+
+def _encolar(filas):
+    """
+    Agrega [(producto_id, cantidad, stock_resultante, motivo, referencia)] al
+    libro activo o, si no hay ninguno, las inserta de inmediato.
+    """
+    pila = getattr(_libros, 'pila', None)
+    if pila:
+        pila[-1].filas.extend(filas)
+    else:
+        _insertar_movimientos([
+            (pid, cantidad, resultante, motivo or 'ajuste', referencia)
+            for pid, cantidad, resultante, motivo, referencia in filas
+        ])
+
+
+# ─────────────────────────────────────────────
+# Helpers internos
+# ─────────────────────────────────────────────
+
+def normalizar_demanda(ids, cantidades):
+    """
+    Agrupa las líneas del carrito por producto.
+    Retorna {producto_id: cantidad_total}; los ids repetidos se suman.
+    """
+    demanda = {}
+    for pid, cant in zip(ids, cantidades):
+        pid = int(pid)
+        demanda[pid] = demanda.get(pid, 0) + int(cant)
+    return demanda
+
+
+def bloquear_productos(ids):
+    """
+    Bloquea (SELECT ... FOR UPDATE) todos los productos indicados con una
+    sola consulta, en orden de clave primaria. Retorna {producto_id: Producto}.
+    El punto de reorden viene en la misma consulta (para esta_bajo()) sin
+    bloquearse: OF limita el bloqueo a producto.
+    Llamar SIEMPRE dentro de transaction.atomic().
+    """
+    if not ids:
+        return {}
+    return {
+        p.idProducto: p
+        for p in Producto.objects.select_for_update(of=('self',)).select_related('reorden')
+        .filter(pk__in=sorted(ids)).order_by('pk')
+    }
+
+
+def _guardar_stock(productos):
+    """Escribe el stock de varios productos en una sola sentencia UPDATE."""
+    if productos:
+        Producto.objects.bulk_update(productos, ['stock'], batch_size=500)
+
+
+def modo_stock():
+    return getattr(settings, 'STOCK_MODO', MODO_BLOQUEO)
+
+
+def _aplicar_condicional(salidas, entradas, motivo=None, referencia=''):
+    """
+    Ruta optimista: un UPDATE por producto, en orden de pk, sin SELECT previo.
+    Las salidas solo se aplican si el stock alcanza (WHERE stock >= n); si
+    alguna no afecta filas se lanza ValueError y la transacción se revierte.
+    """
+    ids = sorted(set(salidas) | set(entradas))
+    for pid in ids:
+        neto = entradas.get(pid, 0) - salidas.get(pid, 0)
+        if neto >= 0:
+            if neto:
+                Producto.objects.filter(pk=pid).update(stock=F('stock') + neto)
+            continue
+        if not Producto.objects.filter(pk=pid, stock__gte=-neto).update(stock=F('stock') + neto):
+            producto = Producto.objects.filter(pk=pid).first()
+            if producto is None:
+                raise ValueError(f'El producto #{pid} no existe.')
+            raise ValueError(
+                f'Stock insuficiente para "{producto.nombre}". '
+                f'Disponible: {producto.stock + entradas.get(pid, 0)}, solicitado: {salidas.get(pid, 0)}.'
+            )
+
+    productos = list(Producto.objects.filter(pk__in=ids).select_related('reorden').order_by('pk'))
+    _anotar(
+        [(p.idProducto, entradas.get(p.idProducto, 0) - salidas.get(p.idProducto, 0), p.stock) for p in productos],
+        motivo, referencia,
+    )
+    _avisar_stock_bajo([p for p in productos if p.idProducto in salidas])
+    return productos
+
+
+def _avisar_stock_bajo(productos):
+    for producto in productos:
+        if esta_bajo(producto):
+            notificacion_stock_bajo(producto)
+
+
+# ─────────────────────────────────────────────
+# API pública
+# ─────────────────────────────────────────────
+
+def aplicar_movimientos(salidas=None, entradas=None, estricto=True, limite=None, motivo=None, referencia=''):
+    """
+    Aplica entradas y salidas de stock ({producto_id: cantidad}) bloqueando
+    una sola vez, en orden de pk, la unión de productos involucrados.
+
+    Para cada producto se suman primero las entradas y luego se restan las
+    salidas. Con estricto=True una salida sin stock suficiente o sobre un
+    producto inexistente lanza ValueError y no se modifica nada; con
+    estricto=False el stock se recorta a 0. limite (opcional) es el stock
+    máximo permitido tras aplicar los movimientos. motivo y referencia
+    quedan en el libro de movimientos (por defecto, los de libro_inventario()).
+    Llamar dentro de transaction.atomic() (o de ejecutar_transaccion()).
+    """
+    salidas   = salidas or {}
+    entradas  = entradas or {}
+    if estricto and limite is None and modo_stock() == MODO_OPTIMISTA:
+        return _aplicar_condicional(salidas, entradas, motivo, referencia)
+
+    productos = bloquear_productos(set(salidas) | set(entradas))
+
+    if estricto:
+        for pid in salidas:
+            if pid not in productos:
+                raise ValueError(f'El producto #{pid} no existe.')
+
+    nuevos = {}
+    for pid, producto in productos.items():
+        disponible = producto.stock + entradas.get(pid, 0)
+        solicitado = salidas.get(pid, 0)
+        if estricto and disponible < solicitado:
+            raise ValueError(
+                f'Stock insuficiente para "{producto.nombre}". '
+                f'Disponible: {disponible}, solicitado: {solicitado}.'
+            )
+        nuevo = max(0, disponible - solicitado)
+        if limite is not None and nuevo > limite:
+            raise ValueError(f'El stock de "{producto.nombre}" no puede superar {limite} unidades.')
+        nuevos[pid] = nuevo
+
+    modificados, filas = [], []
+    for pid, nuevo in nuevos.items():
+        if productos[pid].stock != nuevo:
+            filas.append((pid, nuevo - productos[pid].stock, nuevo))
+            productos[pid].stock = nuevo
+            modificados.append(productos[pid])
+
+    _guardar_stock(modificados)
+    _anotar(filas, motivo, referencia)
+    _avisar_stock_bajo([productos[pid] for pid in salidas if pid in productos])
+    return list(productos.values())
+
+
+def descontar_stock(demanda, motivo='venta', referencia=''):
+    """
+    Descuenta stock según {producto_id: cantidad}.
+    Lanza ValueError si algún producto no existe o no tiene stock suficiente;
+    en ese caso no se modifica nada.
+    """
+    return aplicar_movimientos(salidas=demanda, motivo=motivo, referencia=referencia)
+
+
+def devolver_stock(demanda, motivo='venta_eliminada', referencia=''):
+    """Devuelve stock según {producto_id: cantidad}. Los productos que ya no existen se ignoran."""
+    return aplicar_movimientos(entradas=demanda, motivo=motivo, referencia=referencia)
+
+
+def sumar_stock(demanda, limite=None, motivo='compra', referencia=''):
+    """Aumenta stock según {producto_id: cantidad} (compras completadas, escáner)."""
+    return aplicar_movimientos(entradas=demanda, limite=limite, motivo=motivo, referencia=referencia)
+
+
+def restar_stock(demanda, motivo='compra_eliminada', referencia=''):
+    """Reduce stock según {producto_id: cantidad} sin bajar de 0 (compras anuladas)."""
+    return aplicar_movimientos(salidas=demanda, estricto=False, motivo=motivo, referencia=referencia)
+
+
+def fijar_stock(producto_id, valor, motivo='ajuste', referencia=''):
+    """Establece el stock absoluto de un producto (edición manual)."""
+    producto = bloquear_productos([producto_id]).get(producto_id)
+    if producto is None:
+        raise ValueError(f'El producto #{producto_id} no existe.')
+    diferencia = valor - producto.stock
+    if diferencia > 0:
+        return aplicar_movimientos(entradas={producto_id: diferencia}, motivo=motivo, referencia=referencia)
+    if diferencia < 0:
+        return aplicar_movimientos(salidas={producto_id: -diferencia}, motivo=motivo, referencia=referencia)
+    return [producto]
+
+
+def registrar_stock_inicial(producto):
+    """Primer movimiento del libro para un producto recién creado con stock."""
+    _anotar([(producto.idProducto, producto.stock, producto.stock)], 'inicial', f'producto:{producto.idProducto}')
+
+
+def repartir_stock(pedidos, motivo='importacion', referencias=None):
+    """
+    Reserva stock para varios pedidos ({producto_id: cantidad} cada uno) con
+    un solo bloqueo, en orden de pk, y un solo UPDATE.
+
+    Los pedidos se atienden en el orden recibido; uno que pide un producto
+    inexistente o sin stock suficiente se rechaza completo sin afectar a
+    los demás. Retorna (errores, productos): errores[i] es None si el pedido
+    i quedó reservado o el mensaje de error si no; productos es
+    {producto_id: Producto} con el stock ya descontado. referencias[i]
+    (opcional) es la referencia del pedido i en el libro de movimientos.
+    Llamar dentro de transaction.atomic() (o de ejecutar_transaccion()).
+    """
+    productos  = bloquear_productos(set().union(*pedidos) if pedidos else set())
+    disponible = {pid: p.stock for pid, p in productos.items()}
+
+    errores, filas = [], []
+    for i, demanda in enumerate(pedidos):
+        error = None
+        for pid, cantidad in demanda.items():
+            if pid not in productos:
+                error = f'El producto #{pid} no existe.'
+                break
+            if disponible[pid] < cantidad:
+                error = (
+                    f'Stock insuficiente para "{productos[pid].nombre}". '
+                    f'Disponible: {disponible[pid]}, solicitado: {cantidad}.'
+                )
+                break
+        if error is None:
+            for pid, cantidad in demanda.items():
+                disponible[pid] -= cantidad
+                filas.append((pid, -cantidad, disponible[pid], motivo, referencias[i] if referencias else ''))
+        errores.append(error)
+
+    modificados = []
+    for pid, producto in productos.items():
+        if producto.stock != disponible[pid]:
+            producto.stock = disponible[pid]
+            modificados.append(producto)
+
+    _guardar_stock(modificados)
+    _encolar(filas)
+    _avisar_stock_bajo(modificados)
+    return errores, productos
+
+
+def conciliar_libro(producto_ids):
+    """
+    Ajusta el libro de movimientos de los productos indicados para que su
+    suma vuelva a coincidir con Producto.stock (el stock no se toca).
+    Bloquea los productos mientras recalcula. Retorna {producto_id: ajuste}.
+    """
+    productos = bloquear_productos(producto_ids)
+    sumas     = dict(
+        MovimientoInventario.objects.filter(producto_id__in=list(productos))
+        .values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't')
+    )
+    filas = [
+        (pid, p.stock - (sumas.get(pid) or 0), p.stock, 'conciliacion', 'conciliar_inventario')
+        for pid, p in productos.items() if p.stock != (sumas.get(pid) or 0)
+    ]
+    _encolar(filas)
+    return {pid: ajuste for pid, ajuste, _, _, _ in filas}
+
+
+def demanda_de_detalles(detalles_qs):
+    """
+    Calcula {producto_id: cantidad} a partir de un queryset de DetalleVenta.
+    Los detalles cuyo producto fue eliminado (producto_id nulo) se omiten.
+    """
+    demanda = {}
+    for pid, cant in detalles_qs.filter(producto__isnull=False).values_list('producto_id', 'cantidad'):
+        demanda[pid] = demanda.get(pid, 0) + (cant or 0)
+    return demanda
+
+
+def crear_detalles(venta, ids, nombres, precios, cantidades):
+    """Inserta todas las líneas de la venta con un único INSERT."""
+    detalles = [
+        DetalleVenta(
+            venta           = venta,
+            producto_id     = int(ids[i]),
+            producto_nombre = nombres[i],
+            precio          = precios[i],
+            cantidad        = cantidades[i],
+        )
+        for i in range(len(ids))
+    ]
+    DetalleVenta.objects.bulk_create(detalles, batch_size=500)
+    # bulk_create no dispara las señales del cubo de ventas; la venta ya está en memoria
+    cubo.registrar_lineas(detalles, ventas={venta.pk: (cubo.dia_local(venta.fecha), venta.idCliente_id)})
+
+
+def editar_detalles(venta, ids, nombres, precios, cantidades):
+    """
+    Sincroniza las líneas guardadas de la venta con las enviadas en la edición.
+
+    Solo se bloquean y modifican los productos cuya cantidad neta cambió, y
+    solo se escriben las filas de DetalleVenta que realmente cambian: las
+    líneas se emparejan por producto, se actualizan si difieren, se insertan
+    las nuevas y se eliminan las que ya no están.
+    Lanza ValueError si algún aumento no tiene stock suficiente.
+    """
+    actuales = list(venta.detalles.all().order_by('pk'))
+
+    anterior = {}
+    for detalle in actuales:
+        if detalle.producto_id:
+            anterior[detalle.producto_id] = anterior.get(detalle.producto_id, 0) + (detalle.cantidad or 0)
+    nueva    = normalizar_demanda(ids, cantidades)
+    entradas = {
+        pid: cant - nueva.get(pid, 0)
+        for pid, cant in anterior.items() if cant > nueva.get(pid, 0)
+    }
+    salidas  = {
+        pid: cant - anterior.get(pid, 0)
+        for pid, cant in nueva.items() if cant > anterior.get(pid, 0)
+    }
+    if entradas or salidas:
+        aplicar_movimientos(salidas=salidas, entradas=entradas,
+                            motivo='venta_edicion', referencia=f'venta:{venta.pk}')
+
+    por_producto = {}
+    for detalle in actuales:
+        por_producto.setdefault(detalle.producto_id, []).append(detalle)
+
+    actualizar, anteriores, crear = [], [], []
+    for i in range(len(ids)):
+        pid    = int(ids[i])
+        precio = Decimal(str(precios[i])).quantize(Decimal('0.01'))
+        libres = por_producto.get(pid)
+        if libres:
+            detalle = libres.pop(0)
+            if (detalle.producto_nombre, detalle.precio, detalle.cantidad) != (nombres[i], precio, cantidades[i]):
+                anteriores.append(cubo.linea(detalle))
+                detalle.producto_nombre = nombres[i]
+                detalle.precio          = precio
+                detalle.cantidad        = cantidades[i]
+                actualizar.append(detalle)
+        else:
+            crear.append(DetalleVenta(
+                venta=venta, producto_id=pid, producto_nombre=nombres[i],
+                precio=precio, cantidad=cantidades[i],
+            ))
+
+    eliminar = [d.pk for restantes in por_producto.values() for d in restantes]
+    if eliminar:
+        DetalleVenta.objects.filter(pk__in=eliminar).delete()
+    if actualizar:
+        DetalleVenta.objects.bulk_update(actualizar, ['producto_nombre', 'precio', 'cantidad'], batch_size=500)
+    if crear:
+        DetalleVenta.objects.bulk_create(crear, batch_size=500)
+    # El DELETE dispara las señales del cubo; bulk_update y bulk_create no
+    cubo.registrar_cambio(anteriores, actualizar + crear)
+    if actualizar:
+        columnar.marcar_cambio()
@@ -0,0 +1,103 @@
+"""
+Lectura de ventas para integraciones externas (BI).
+
+Recorre las ventas en orden (fecha, id) con un cursor por clave (keyset):
+cada bloque es un `WHERE (fecha, id) > (cursor) ORDER BY fecha, id LIMIT n`
+sobre el índice venta_fecha_id_idx, así el costo por bloque no crece con
+el desplazamiento y la memoria queda acotada al tamaño del bloque. Las
+líneas de cada bloque se traen con una sola consulta adicional.
+
+El cursor es opaco para el cliente (base64 de "fecha|id"); cada venta
+emitida trae el suyo, así una descarga interrumpida se reanuda desde la
+última línea recibida.
+"""
+import base64
+import datetime
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from app.models import Venta, DetalleVenta
+
+CAMPOS_VENTA   = ('id', 'fecha', 'cliente', 'idCliente_id', 'estado', 'total')
+CAMPOS_DETALLE = ('venta_id', 'producto_id', 'producto_nombre', 'precio', 'cantidad')
+
+
+def codificar_cursor(fecha, venta_id):
+    texto = f'{fecha.isoformat()}|{venta_id}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (fecha, id). Lanza ValueError si el cursor no es válido."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, venta_id = texto.rsplit('|', 1)
+        fecha = datetime.datetime.fromisoformat(fecha)
+        if timezone.is_naive(fecha):
+            raise ValueError
+        return fecha, int(venta_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor no válido.')
+
+
+def parsear_fecha(valor, fin_de_dia=False):
+    """
+    Convierte 'YYYY-MM-DD' (día local completo) o una fecha ISO 8601 en un
+    datetime con zona horaria. Vacío → None. Lanza ValueError si no se entiende.
+    """
+    if not valor:
+        return None
+    momento = parse_datetime(valor)
+    if momento is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(f'Fecha no válida: {valor}.')
+        momento = datetime.datetime.combine(dia, datetime.time.max if fin_de_dia else datetime.time.min)
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def _consulta(desde=None, hasta=None, cursor=None):
+    qs = Venta.objects.order_by('fecha', 'id')
+    if desde:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha__lte=hasta)
+    if cursor:
+        fecha, venta_id = cursor
+        qs = qs.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, id__gt=venta_id))
+    return qs.values(*CAMPOS_VENTA)
+
+
+def _con_lineas(ventas):
+    """Agrega a cada venta sus líneas y su cursor (una consulta por bloque)."""
+    lineas = {}
+    for detalle in (DetalleVenta.objects.filter(venta_id__in=[v['id'] for v in ventas])
+                    .order_by('venta_id', 'id').values(*CAMPOS_DETALLE)):
+        lineas.setdefault(detalle.pop('venta_id'), []).append(detalle)
+    for venta in ventas:
+        venta['cliente_id'] = venta.pop('idCliente_id')
+        venta['lineas']     = lineas.get(venta['id'], [])
+        venta['cursor']     = codificar_cursor(venta['fecha'], venta['id'])
+    return ventas
+
+
+def pagina_ventas(desde=None, hasta=None, cursor=None, limite=500):
+    """Retorna (ventas, cursor_siguiente). cursor_siguiente es None en la última página."""
+    ventas = list(_consulta(desde, hasta, cursor)[:limite + 1])
+    hay_mas = len(ventas) > limite
+    ventas  = _con_lineas(ventas[:limite])
+    return ventas, (ventas[-1]['cursor'] if hay_mas else None)
+
+
+def iterar_ventas(desde=None, hasta=None, cursor=None, bloque=1000):
+    """Genera todas las ventas del rango, de a `bloque` por consulta."""
+    while True:
+        ventas = list(_consulta(desde, hasta, cursor)[:bloque])
+        if not ventas:
+            return
+        yield from _con_lineas(ventas)
+        if len(ventas) < bloque:
+            return
+        cursor = (ventas[-1]['fecha'], ventas[-1]['id'])
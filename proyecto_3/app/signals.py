@@ -0,0 +1,218 @@
+"""
+Señales del módulo app.
+
+Mantienen los KPIs incrementales (app.services.kpis) al crear, editar,
+completar o eliminar ventas y compras, y al crear o eliminar catálogos,
+abren el libro de movimientos de inventario de cada producto nuevo,
+mantienen el cubo de ventas (app.services.cubo), avisan a la caché
+columnar de líneas de venta (app.services.columnar) e invalidan la caché
+de reportes (app.services.cache_reportes).
+Se conectan en AppConfig.ready().
+
+Ojo: bulk_create() y QuerySet.update() no disparan señales; quien los use
+sobre estos modelos debe llamar a app.services.kpis, a
+cubo.registrar_lineas() y a cache_reportes.invalidar() directamente.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from app.models import Venta, DetalleVenta, Compra, Producto, Cliente, Proveedor
+from app.services import kpis, cubo, columnar, cache_reportes
+from app.services.stock import registrar_stock_inicial
+
+
+# ─────────────────────────────────────────────
+# Ventas
+# ─────────────────────────────────────────────
+
+@receiver(pre_save, sender=Venta)
+def _venta_anterior(sender, instance, **kwargs):
+    instance._kpi_anterior  = None
+    instance._cubo_anterior = None
+    if instance.pk:
+        fila = Venta.objects.filter(pk=instance.pk).values_list('fecha', 'total', 'estado', 'idCliente_id').first()
+        if fila:
+            instance._kpi_anterior  = fila[:3]
+            instance._cubo_anterior = (cubo.dia_local(fila[0]), fila[3])
+
+
+@receiver(post_save, sender=Venta)
+def _venta_guardada(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_kpi_anterior', None)
+    actual   = (instance.fecha, instance.total, instance.estado)
+    if anterior and tuple(anterior) == actual:
+        return
+    if anterior:
+        kpis.registrar_venta(*anterior, signo=-1)
+    kpis.registrar_venta(*actual)
+
+
+@receiver(post_delete, sender=Venta)
+def _venta_eliminada(sender, instance, **kwargs):
+    kpis.registrar_venta(instance.fecha, instance.total, instance.estado, signo=-1)
+
+
+# ─────────────────────────────────────────────
+# Compras
+# ─────────────────────────────────────────────
+
+def _fecha_compra(compra):
+    # default=datetime.now entrega un datetime; desde formularios llega un date
+    fecha = Compra._meta.get_field('fechaCompra').to_python(compra.fechaCompra)
+    return fecha.date() if hasattr(fecha, 'date') else fecha
+
+
+@receiver(pre_save, sender=Compra)
+def _compra_anterior(sender, instance, **kwargs):
+    instance._kpi_anterior = None
+    if instance.pk:
+        fila = (
+            Compra.objects.filter(pk=instance.pk)
+            .values_list('fechaCompra', 'cantidad', 'precio_unitario', 'estado').first()
+        )
+        if fila:
+            instance._kpi_anterior = (fila[0], fila[1] * fila[2], fila[3])
+
+
+@receiver(post_save, sender=Compra)
+def _compra_guardada(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_kpi_anterior', None)
+    actual   = (_fecha_compra(instance), instance.total, instance.estado)
+    if anterior and tuple(anterior) == actual:
+        return
+    if anterior:
+        kpis.registrar_compra(*anterior, signo=-1)
+    kpis.registrar_compra(*actual)
+
+
+@receiver(post_delete, sender=Compra)
+def _compra_eliminada(sender, instance, **kwargs):
+    kpis.registrar_compra(_fecha_compra(instance), instance.total, instance.estado, signo=-1)
+
+
+# ─────────────────────────────────────────────
+# Catálogos: solo contadores de filas
+# ─────────────────────────────────────────────
+
+def _catalogo_guardado(sender, instance, created, **kwargs):
+    if created:
+        kpis.sumar_contadores({kpis.CONTADOR_POR_MODELO[sender]: 1})
+
+
+def _catalogo_eliminado(sender, instance, **kwargs):
+    kpis.sumar_contadores({kpis.CONTADOR_POR_MODELO[sender]: -1})
+
+
+for _modelo in kpis.CONTADOR_POR_MODELO:
+    post_save.connect(_catalogo_guardado, sender=_modelo, dispatch_uid=f'kpi_alta_{_modelo.__name__}')
+    post_delete.connect(_catalogo_eliminado, sender=_modelo, dispatch_uid=f'kpi_baja_{_modelo.__name__}')
+
+
+# ─────────────────────────────────────────────
+# Cubo de ventas
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=Venta)
+def _venta_movida(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_cubo_anterior', None)
+    actual   = (cubo.dia_local(instance.fecha), instance.idCliente_id)
+    if anterior and anterior != actual:
+        cubo.mover_venta(instance.pk, anterior, actual)
+
+
+@receiver(pre_save, sender=DetalleVenta)
+def _detalle_anterior(sender, instance, **kwargs):
+    instance._cubo_anterior = None
+    if instance.pk:
+        instance._cubo_anterior = (
+            DetalleVenta.objects.filter(pk=instance.pk)
+            .values_list('venta_id', 'producto_id', 'precio', 'cantidad').first()
+        )
+
+
+@receiver(post_save, sender=DetalleVenta)
+def _detalle_guardado(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_cubo_anterior', None)
+    if anterior and tuple(anterior) == cubo.linea(instance):
+        return
+    cubo.registrar_cambio([tuple(anterior)] if anterior else [], [instance])
+
+
+@receiver(post_delete, sender=DetalleVenta)
+def _detalle_eliminado(sender, instance, **kwargs):
+    # Al borrar una venta sus líneas se borran antes que ella: la venta aún se puede leer
+    cubo.registrar_lineas([instance], signo=-1)
+
+
+@receiver(pre_save, sender=Producto)
+def _producto_anterior(sender, instance, **kwargs):
+    instance._cubo_anterior = None
+    if instance.pk:
+        instance._cubo_anterior = (
+            Producto.objects.filter(pk=instance.pk).values_list('idMarca_id', 'idTipo_id').first()
+        )
+
+
+@receiver(post_save, sender=Producto)
+def _producto_reclasificado(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_cubo_anterior', None)
+    if anterior and tuple(anterior) != (instance.idMarca_id, instance.idTipo_id):
+        cubo.reasignar({'producto': instance.pk}, marca=instance.idMarca_id, tipo=instance.idTipo_id)
+
+
+@receiver(post_delete, sender=Producto)
+def _producto_eliminado(sender, instance, **kwargs):
+    # Sus líneas quedan con producto nulo (SET_NULL)
+    cubo.reasignar({'producto': instance.pk}, producto=0, marca=0, tipo=0)
+
+
+@receiver(post_delete, sender=Cliente)
+def _cliente_eliminado(sender, instance, **kwargs):
+    cubo.reasignar({'cliente': instance.pk}, cliente=0)
+
+
+# ─────────────────────────────────────────────
+# Caché columnar: las líneas nuevas se anexan solas; el resto obliga a recargar
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=DetalleVenta)
+def _detalle_editado(sender, instance, created, **kwargs):
+    if not created:
+        columnar.marcar_cambio()
+
+
+@receiver(post_save, sender=Venta)
+def _venta_fechada(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_kpi_anterior', None)
+    if anterior and anterior[0] != instance.fecha:
+        columnar.marcar_cambio()
+
+
+def _linea_perdida(sender, **kwargs):
+    columnar.marcar_cambio()
+
+
+post_delete.connect(_linea_perdida, sender=DetalleVenta, dispatch_uid='columnar_detalle_eliminado')
+post_delete.connect(_linea_perdida, sender=Producto,     dispatch_uid='columnar_producto_eliminado')
+
+
+# ─────────────────────────────────────────────
+# Inventario: primer movimiento del libro
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=Producto)
+def _producto_creado(sender, instance, created, **kwargs):
+    if created and instance.stock:
+        registrar_stock_inicial(instance)
+
+
+# ─────────────────────────────────────────────
+# Caché de reportes: nueva versión de datos
+# ─────────────────────────────────────────────
+
+def _datos_cambiados(sender, **kwargs):
+    cache_reportes.invalidar()
+
+
+for _modelo in (Venta, DetalleVenta, Compra, Producto, Cliente, Proveedor):
+    post_save.connect(_datos_cambiados, sender=_modelo, dispatch_uid=f'reportes_guardado_{_modelo.__name__}')
+    post_delete.connect(_datos_cambiados, sender=_modelo, dispatch_uid=f'reportes_eliminado_{_modelo.__name__}')
@@ -14,13 +14,25 @@ document.addEventListener('DOMContentLoaded', function () {
                 validarCliente(this, document.getElementById('feedbackCliente'), document.getElementById('contadorCliente'));
             };
         }
+        var selectCliente = document.getElementById('selectClienteCrear');
+        if (selectCliente && input) {
+            selectCliente.onchange = function () {
+                var opcion = this.options[this.selectedIndex];
+                input.value    = this.value ? opcion.getAttribute('data-nombre') : '';
+                input.readOnly = !!this.value;
+                var fc = document.getElementById('feedbackCliente');
+                if (fc) fc.textContent = '';
+            };
+        }
     });
 
     modalCrear.addEventListener('hidden.bs.modal', function () {
         carrito = [];
         renderCarrito();
         var input = document.getElementById('inputClienteCrear');
-        if (input) input.value = '';
+        if (input) { input.value = ''; input.readOnly = false; }
+        var sc = document.getElementById('selectClienteCrear');
+        if (sc) sc.value = '';
         var fc = document.getElementById('feedbackCliente');
         if (fc) fc.textContent = '';
         var cc = document.getElementById('contadorCliente');
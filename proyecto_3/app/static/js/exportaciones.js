@@ -0,0 +1,73 @@
+/*
+ * Exportaciones en segundo plano.
+ *
+ * Los enlaces con data-entidad y data-formato (botones PDF/Excel) no
+ * descargan directo: encolan el trabajo en /reportes/exportar/, consultan
+ * su estado cada INTERVALO ms y, al quedar listo, abren la descarga. Si
+ * el script no carga, el href del enlace sigue exportando en la petición.
+ */
+(function () {
+    const INTERVALO = 1500;
+
+    function csrf() {
+        const c = document.cookie.split('; ').find(function (r) { return r.startsWith('csrftoken='); });
+        return c ? decodeURIComponent(c.split('=')[1]) : '';
+    }
+
+    function error(mensaje) {
+        Swal.fire({ icon: 'error', title: 'No se pudo exportar', text: mensaje || 'Intenta de nuevo.' });
+    }
+
+    function seguir(url) {
+        fetch(url, { credentials: 'same-origin' })
+            .then(function (r) { return r.json(); })
+            .then(function (datos) {
+                const job = datos.exportacion;
+                if (!job) return error(datos.mensaje);
+                if (job.estado === 'error') return error(job.error);
+                if (job.descarga) {
+                    Swal.close();
+                    window.location = job.descarga;
+                    return;
+                }
+                setTimeout(function () { seguir(url); }, INTERVALO);
+            })
+            .catch(function () { error(); });
+    }
+
+    function exportar(enlace) {
+        const cuerpo = new FormData();
+        cuerpo.append('entidad', enlace.dataset.entidad);
+        cuerpo.append('formato', enlace.dataset.formato);
+        // Los filtros viajan en la query del enlace (p. ej. desde/hasta del ranking)
+        new URL(enlace.href, window.location.href).searchParams.forEach(function (valor, clave) {
+            cuerpo.append(clave, valor);
+        });
+
+        Swal.fire({
+            title: 'Generando ' + enlace.dataset.formato.toUpperCase() + '...',
+            text: 'La descarga empieza sola cuando el archivo esté listo.',
+            allowOutsideClick: false,
+            didOpen: function () { Swal.showLoading(); }
+        });
+        fetch('/reportes/exportar/', {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'X-CSRFToken': csrf() },
+            body: cuerpo
+        })
+            .then(function (r) { return r.json(); })
+            .then(function (datos) {
+                if (!datos.exportacion) return error(datos.mensaje);
+                seguir('/reportes/exportar/' + datos.exportacion.id + '/');
+            })
+            .catch(function () { error(); });
+    }
+
+    document.addEventListener('click', function (e) {
+        const enlace = e.target.closest('a[data-entidad][data-formato]');
+        if (!enlace || typeof Swal === 'undefined') return;
+        e.preventDefault();
+        exportar(enlace);
+    });
+})();
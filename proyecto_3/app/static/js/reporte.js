@@ -1,6 +1,8 @@
 /* ══════════════════════════════════════════════════════════════
    reporte.js — Charts compactos, light minimalista premium
-   Requiere: window.CHART_DATA (inyectado desde el template)
+   Cada sección se pide en paralelo a /reportes/seccion/<nombre>/ y se
+   pinta apenas llega (o viene embebida si REPORTES_PRECARGA está activo). Los refrescos mandan If-None-Match: si la sección
+   no cambió el servidor responde 304 y no se vuelve a pintar.
    ══════════════════════════════════════════════════════════════ */
 
 // ── Tab switcher ────────────────────────────────────────────────
@@ -38,6 +40,41 @@ function cleanSeries(labels, values) {
   return out;
 }
 
+/** Escapa texto para insertarlo como HTML */
+function esc(v) {
+  return String(v ?? '').replace(/[&<>"']/g, ch => ({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;',
+  }[ch]));
+}
+
+const pesos = v => '$ ' + Math.round(v || 0).toLocaleString('es-CO');
+const id3   = v => String(v).padStart(3, '0');
+
+/** Filas de una tabla, o "Sin datos" si viene vacía */
+function llenarTabla(id, filas, columnas, fila) {
+  document.getElementById(id).innerHTML = filas.length
+    ? filas.map(fila).join('')
+    : `<tr><td colspan="${columnas}" style="text-align:center;padding:24px;color:#94a3b8">Sin datos</td></tr>`;
+}
+
+function badgeEstado(estado) {
+  return estado === 'Completada'
+    ? '<span class="badge badge-paid">Completada</span>'
+    : '<span class="badge badge-pend">Pendiente</span>';
+}
+
+function texto(id, valor) {
+  document.getElementById(id).textContent = valor;
+}
+
+/** Crea la gráfica del canvas, o la reemplaza si la sección se volvió a pintar */
+const graficas = {};
+function grafica(canvasId, config) {
+  if (graficas[canvasId]) graficas[canvasId].destroy();
+  graficas[canvasId] = new Chart(document.getElementById(canvasId), config);
+  return graficas[canvasId];
+}
+
 /** Gradiente vertical de área para gráficas de línea */
 function areaGrad(ctx, hex, a0 = 0.14, a1 = 0.01) {
   const g = ctx.createLinearGradient(0, 0, 0, 160);
@@ -115,135 +152,47 @@ Chart.register({
   }
 });
 
-// ══ PRODUCTOS: stock por producto ════════════════════════════════
-(function () {
-  const d = window.CHART_DATA;
-  const { labels, values } = cleanSeries(d.graf_productos_labels, d.graf_productos_stock);
-  const colors = values.map(v => v === 0 ? C.red : v <= 10 ? C.yellow : C.blue);
 
-  new Chart(document.getElementById('chartProductosStock'), {
-    type: 'bar',
+/** Dona con texto central (estado de inventario, clientes, ventas, compras) */
+function dona(canvasId, labels, data, colores) {
+  return grafica(canvasId, {
+    type: 'doughnut',
     data: {
       labels,
       datasets: [{
-        label: 'Stock',
-        data: values,
-        backgroundColor: colors.map(c => c + '22'),
-        borderColor: colors,
+        data,
+        backgroundColor: colores.map(c => c + '22'),
+        borderColor:     colores,
         borderWidth: 1.5,
-        borderRadius: 5,
-        borderSkipped: false,
+        hoverOffset: 5,
       }]
     },
     options: {
       responsive: true,
-      maintainAspectRatio: true,
+      cutout: '72%',
       plugins: {
-        legend: { display: false },
-        tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.parsed.y} uds` } }
-      },
-      scales: { y: SCALE_Y, x: SCALE_X }
-    }
-  });
-})();
-
-// ══ PRODUCTOS: estado inventario (dona) ══════════════════════════
-new Chart(document.getElementById('chartProductosEstado'), {
-  type: 'doughnut',
-  data: {
-    labels: ['Normal', 'Stock bajo', 'Sin stock'],
-    datasets: [{
-      data: window.CHART_DATA.productos_estado,
-      backgroundColor: [C.green + '22', C.yellow + '22', C.red + '22'],
-      borderColor:      [C.green,        C.yellow,        C.red],
-      borderWidth: 1.5,
-      hoverOffset: 5,
-    }]
-  },
-  options: {
-    responsive: true,
-    cutout: '72%',
-    plugins: {
-      legend: LEGEND,
-      tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.label}: ${c.parsed}` } }
-    }
-  }
-});
-
-// ══ CLIENTES: top por compras (barras horizontales) ══════════════
-(function () {
-  const d = window.CHART_DATA;
-  const { labels, values } = cleanSeries(d.graf_clientes_labels, d.graf_clientes_valores);
-
-  new Chart(document.getElementById('chartClientesTop'), {
-    type: 'bar',
-    data: {
-      labels,
-      datasets: [{
-        label: 'Total ($)',
-        data: values,
-        backgroundColor: C.blue + '18',
-        borderColor: C.blue,
-        borderWidth: 1.5,
-        borderRadius: 5,
-        borderSkipped: false,
-      }]
-    },
-    options: {
-      indexAxis: 'y',
-      responsive: true,
-      plugins: {
-        legend: { display: false },
-        tooltip: { ...TOOLTIP, callbacks: { label: c => ` $${c.parsed.x.toLocaleString('es-CO')}` } }
-      },
-      scales: {
-        x: { ...SCALE_Y, ticks: { ...SCALE_Y.ticks, callback: v => '$' + (v >= 1000 ? (v / 1000) + 'K' : v) } },
-        y: SCALE_X
+        legend: LEGEND,
+        tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.label}: ${c.parsed}` } }
       }
     }
   });
-})();
-
-// ══ CLIENTES: activos vs inactivos (dona) ════════════════════════
-new Chart(document.getElementById('chartClientesEstado'), {
-  type: 'doughnut',
-  data: {
-    labels: ['Activos', 'Inactivos'],
-    datasets: [{
-      data: [window.CHART_DATA.clientes_activos, window.CHART_DATA.clientes_inactivos],
-      backgroundColor: [C.green + '22', C.red + '22'],
-      borderColor:     [C.green,        C.red],
-      borderWidth: 1.5,
-      hoverOffset: 5,
-    }]
-  },
-  options: {
-    responsive: true,
-    cutout: '72%',
-    plugins: { legend: LEGEND, tooltip: { ...TOOLTIP } }
-  }
-});
-
-// ══ VENTAS: por día (línea) ══════════════════════════════════════
-let ventasChart;
-(function () {
-  const d = window.CHART_DATA;
-  const { labels, values } = cleanSeries(d.graf_ventas_labels, d.graf_ventas_valores);
-  const canvas = document.getElementById('chartVentasDia');
-  const ctx = canvas.getContext('2d');
+}
 
-  ventasChart = new Chart(canvas, {
+/** Línea con área (ventas y compras por día) */
+function linea(canvasId, labels, values, color, label, etiqueta, ejeY) {
+  const canvas = document.getElementById(canvasId);
+  return grafica(canvasId, {
     type: 'line',
     data: {
       labels,
       datasets: [{
-        label: 'Ventas ($)',
+        label,
         data: values,
-        borderColor: C.blue,
-        backgroundColor: areaGrad(ctx, '#2563eb'),
+        borderColor: color,
+        backgroundColor: areaGrad(canvas.getContext('2d'), color),
         borderWidth: 2,
         pointBackgroundColor: '#fff',
-        pointBorderColor: C.blue,
+        pointBorderColor: color,
         pointBorderWidth: 1.5,
         pointRadius: 3,
         pointHoverRadius: 5,
@@ -255,194 +204,358 @@ let ventasChart;
       responsive: true,
       plugins: {
         legend: { display: false },
-        tooltip: { ...TOOLTIP, callbacks: { label: c => ` $${c.parsed.y.toLocaleString('es-CO')}` } }
+        tooltip: { ...TOOLTIP, callbacks: { label: etiqueta } }
       },
-      scales: {
-        y: { ...SCALE_Y, ticks: { ...SCALE_Y.ticks, callback: v => '$' + (v >= 1000 ? (v / 1000) + 'K' : v) } },
-        x: SCALE_X
-      }
+      scales: { y: ejeY, x: SCALE_X }
     }
   });
-})();
-
-// ══ VENTAS: estado (dona) ════════════════════════════════════════
-new Chart(document.getElementById('chartVentasEstado'), {
-  type: 'doughnut',
-  data: {
-    labels: ['Completadas', 'Pendientes'],
-    datasets: [{
-      data: [window.CHART_DATA.ventas_completadas, window.CHART_DATA.ventas_pendientes],
-      backgroundColor: [C.green + '22', C.yellow + '22'],
-      borderColor:     [C.green,        C.yellow],
-      borderWidth: 1.5,
-      hoverOffset: 5,
-    }]
-  },
-  options: {
-    responsive: true,
-    cutout: '72%',
-    plugins: { legend: LEGEND, tooltip: { ...TOOLTIP } }
-  }
-});
+}
 
-// ══ PROVEEDORES: compras por proveedor ═══════════════════════════
-(function () {
-  const d = window.CHART_DATA;
-  const { labels, values } = cleanSeries(d.graf_proveedores_labels, d.graf_proveedores_valores);
+const EJE_PESOS = { ...SCALE_Y, ticks: { ...SCALE_Y.ticks, callback: v => '$' + (v >= 1000 ? (v / 1000) + 'K' : v) } };
+const EJE_ENTERO = { ...SCALE_Y, ticks: { ...SCALE_Y.ticks, stepSize: 1 } };
+
+// ── Alertas de stock ────────────────────────────────────────────
+function pintarAlertas(alertas) {
+  const banner = document.getElementById('alertas-container');
+  if (!alertas.length) { banner.style.display = 'none'; return; }
+  const n = alertas.length;
+  texto('alertas-titulo', `¡Acción requerida! — ${n} producto${n === 1 ? '' : 's'} con problemas de inventario`);
+  document.getElementById('alertas-tags').innerHTML = alertas.map(a =>
+    `<span class="alert-tag alert-tag-${a.estado}">
+       <span class="alert-tag-dot dot-${a.estado}"></span>
+       ${esc(a.nombre)}
+       <span class="alert-tag-label">${a.estado === 'out' ? 'Sin stock' : a.stock + ' uds'}</span>
+     </span>`
+  ).join('');
+  banner.style.display = '';
+}
 
-  new Chart(document.getElementById('chartProveedores'), {
-    type: 'bar',
-    data: {
-      labels,
-      datasets: [{
-        label: 'Compras',
-        data: values,
-        backgroundColor: PALETTE.map(c => c + '1e'),
-        borderColor:     PALETTE,
-        borderWidth: 1.5,
-        borderRadius: 5,
-        borderSkipped: false,
-      }]
-    },
-    options: {
-      responsive: true,
-      plugins: {
-        legend: { display: false },
-        tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.parsed.y} compras` } }
-      },
-      scales: { y: { ...SCALE_Y, ticks: { ...SCALE_Y.ticks, stepSize: 1 } }, x: SCALE_X }
-    }
-  });
-})();
+// ══ Secciones ════════════════════════════════════════════════════
+let ventasChart;
 
-// ══ COMPRAS: por día (línea) ═════════════════════════════════════
-(function () {
-  const d = window.CHART_DATA;
-  const { labels, values } = cleanSeries(d.graf_compras_labels, d.graf_compras_valores);
-  const canvas = document.getElementById('chartComprasDia');
-  const ctx = canvas.getContext('2d');
+/** Fila de la tabla "Todas las transacciones" */
+function filaActividad(t) {
+  return `
+      <tr><td>${t.id}</td>
+      <td>${t.tipo === 'venta' ? '<span class="badge badge-venta">Venta</span>' : '<span class="badge badge-compra">Compra</span>'}</td>
+      <td>${esc(t.descripcion)}</td>
+      <td class="price">${t.valor ? pesos(t.valor) : '—'}</td>
+      <td>${t.fecha}</td><td>${badgeEstado(t.estado)}</td></tr>`;
+}
 
-  new Chart(canvas, {
-    type: 'line',
-    data: {
-      labels,
-      datasets: [{
-        label: 'Compras',
-        data: values,
-        borderColor: C.purple,
-        backgroundColor: areaGrad(ctx, '#7c3aed'),
-        borderWidth: 2,
-        pointBackgroundColor: '#fff',
-        pointBorderColor: C.purple,
-        pointBorderWidth: 1.5,
-        pointRadius: 3,
-        pointHoverRadius: 5,
-        tension: 0.4,
-        fill: true,
-      }]
-    },
-    options: {
-      responsive: true,
-      plugins: {
-        legend: { display: false },
-        tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.parsed.y} compras` } }
-      },
-      scales: { y: { ...SCALE_Y, ticks: { ...SCALE_Y.ticks, stepSize: 1 } }, x: SCALE_X }
-    }
-  });
-})();
-
-// ══ COMPRAS: estado (dona) ═══════════════════════════════════════
-new Chart(document.getElementById('chartComprasEstado'), {
-  type: 'doughnut',
-  data: {
-    labels: ['Completadas', 'Pendientes'],
-    datasets: [{
-      data: [window.CHART_DATA.compras_completadas, window.CHART_DATA.compras_pendientes],
-      backgroundColor: [C.green + '22', C.yellow + '22'],
-      borderColor:     [C.green,        C.yellow],
-      borderWidth: 1.5,
-      hoverOffset: 5,
-    }]
+// Cursor de la siguiente página del feed (null en la última)
+let cursorActividad = null;
+function siguienteActividad(cursor) {
+  cursorActividad = cursor;
+  document.getElementById('todas-mas').style.display = cursor ? '' : 'none';
+}
+
+function cargarMasActividad() {
+  if (!cursorActividad) return;
+  fetch(`/reportes/actividad/?cursor=${encodeURIComponent(cursorActividad)}`, { credentials: 'same-origin' })
+    .then(r => { if (!r.ok) throw new Error(`HTTP ${r.status}`); return r.json(); })
+    .then(d => {
+      document.getElementById('tabla-todas').insertAdjacentHTML('beforeend', d.movimientos.map(filaActividad).join(''));
+      siguienteActividad(d.siguiente);
+    })
+    .catch(e => console.warn('[reportes] Error al cargar más movimientos:', e));
+}
+
+const PINTAR = {
+
+  kpis(d) {
+    texto('kpi-productos',     d.total_productos);
+    texto('kpi-clientes',      d.total_clientes);
+    texto('kpi-proveedores',   d.total_proveedores);
+    texto('kpi-compras',       d.total_compras);
+    texto('kpi-ventas-mes',    pesos(d.total_ventas_mes));
+    texto('kpi-transacciones', d.transacciones_mes + ' transacciones');
+    texto('kpi-ingreso-total', pesos(d.ingreso_total));
   },
-  options: {
-    responsive: true,
-    cutout: '72%',
-    plugins: { legend: LEGEND, tooltip: { ...TOOLTIP } }
-  }
-});
 
-// ══ TODO: Ventas vs Compras ══════════════════════════════════════
-let todoChart;
-(function () {
-  const d = window.CHART_DATA;
-  const ventas  = cleanSeries(d.graf_todo_labels, d.graf_todo_ventas);
-  const compras = cleanSeries(d.graf_todo_labels, d.graf_todo_compras);
-  const labels  = ventas.labels.length >= compras.labels.length ? ventas.labels : compras.labels;
+  productos(d) {
+    texto('kpi-stock-bajo', d.stock_bajo + ' con stock bajo');
+    pintarAlertas(d.alertas_stock);
+
+    llenarTabla('tabla-productos', d.productos_data, 6, p => `
+      <tr><td>#${p.id}</td><td>${esc(p.nombre)}</td><td class="price">${pesos(p.precio)}</td><td>${p.stock}</td>
+      <td><div class="sbar"><div class="sbar-track"><div class="sbar-fill sf-${p.estado}" style="width:${p.pct}%"></div></div><span class="sbar-pct">${p.pct}%</span></div></td>
+      <td><span class="badge badge-${p.estado}">${p.label}</span></td></tr>`);
+
+    document.getElementById('mini-productos').innerHTML = d.productos_mini.map(p => `
+      <div class="mc-row"><span class="mc-name">${esc(p.nombre)}</span><span class="mc-val mv-${p.estado}">${p.estado === 'out' ? 'Sin stock' : p.stock + ' uds'}</span></div>`).join('');
+
+    const { labels, values } = cleanSeries(d.graf_productos_labels, d.graf_productos_stock);
+    const colors = values.map(v => v === 0 ? C.red : v <= 10 ? C.yellow : C.blue);
+    grafica('chartProductosStock', {
+      type: 'bar',
+      data: {
+        labels,
+        datasets: [{
+          label: 'Stock',
+          data: values,
+          backgroundColor: colors.map(c => c + '22'),
+          borderColor: colors,
+          borderWidth: 1.5,
+          borderRadius: 5,
+          borderSkipped: false,
+        }]
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        plugins: {
+          legend: { display: false },
+          tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.parsed.y} uds` } }
+        },
+        scales: { y: SCALE_Y, x: SCALE_X }
+      }
+    });
+    dona('chartProductosEstado', ['Normal', 'Stock bajo', 'Sin stock'], d.productos_estado, [C.green, C.yellow, C.red]);
+  },
 
-  todoChart = new Chart(document.getElementById('chartTodo'), {
-    type: 'bar',
-    data: {
-      labels,
-      datasets: [
-        {
-          label: 'Ventas ($)',
-          data: ventas.values,
-          backgroundColor: C.blue + '22',
+  clientes(d) {
+    llenarTabla('tabla-clientes', d.clientes_data, 6, c => `
+      <tr><td>#${c.id}</td><td>${esc(c.nombre)}</td><td>${esc(c.email)}</td><td>${esc(c.telefono)}</td>
+      <td class="price">${pesos(c.total_compras)}</td>
+      <td>${c.estado === 'activo' ? '<span class="badge badge-activo">Activo</span>' : '<span class="badge badge-inactivo">Inactivo</span>'}</td></tr>`);
+
+    document.getElementById('mini-clientes').innerHTML = d.clientes_mini.map(c => `
+      <div class="mc-row"><span class="mc-name">${esc(c.nombre)}</span><span class="mc-val mv-ok">${pesos(c.total_compras)}</span></div>`).join('');
+
+    const { labels, values } = cleanSeries(d.graf_clientes_labels, d.graf_clientes_valores);
+    grafica('chartClientesTop', {
+      type: 'bar',
+      data: {
+        labels,
+        datasets: [{
+          label: 'Total ($)',
+          data: values,
+          backgroundColor: C.blue + '18',
           borderColor: C.blue,
           borderWidth: 1.5,
           borderRadius: 5,
           borderSkipped: false,
+        }]
+      },
+      options: {
+        indexAxis: 'y',
+        responsive: true,
+        plugins: {
+          legend: { display: false },
+          tooltip: { ...TOOLTIP, callbacks: { label: c => ` $${c.parsed.x.toLocaleString('es-CO')}` } }
         },
-        {
+        scales: { x: EJE_PESOS, y: SCALE_X }
+      }
+    });
+    dona('chartClientesEstado', ['Activos', 'Inactivos'], [d.clientes_activos, d.clientes_inactivos], [C.green, C.red]);
+  },
+
+  ventas(d) {
+    llenarTabla('tabla-ventas', d.ventas_data, 7, v => `
+      <tr><td>V${id3(v.id)}</td><td>${esc(v.cliente)}</td><td>${esc(v.producto)}</td><td>${v.cantidad}</td>
+      <td class="price">${pesos(v.total)}</td><td>${v.fecha}</td><td>${badgeEstado(v.estado)}</td></tr>`);
+
+    document.getElementById('mini-ventas').innerHTML = d.ventas_mini.map(v => `
+      <div class="mc-row"><span class="mc-name">V${id3(v.id)} · ${esc(v.producto)}</span><span class="mc-val ${v.estado === 'Completada' ? 'mv-ok' : 'mv-low'}">${v.estado === 'Completada' ? pesos(v.total) : 'Pendiente'}</span></div>`).join('');
+
+    const { labels, values } = cleanSeries(d.graf_ventas_labels, d.graf_ventas_valores);
+    ventasChart = linea('chartVentasDia', labels, values, C.blue, 'Ventas ($)',
+                        c => ` $${c.parsed.y.toLocaleString('es-CO')}`, EJE_PESOS);
+    dona('chartVentasEstado', ['Completadas', 'Pendientes'], [d.ventas_completadas, d.ventas_pendientes], [C.green, C.yellow]);
+  },
+
+  proveedores(d) {
+    llenarTabla('tabla-proveedores', d.proveedores_data, 7, p => `
+      <tr><td>#${p.id}</td><td>${esc(p.nombre)}</td><td>${esc(p.email)}</td><td>${esc(p.telefono)}</td>
+      <td>${p.envio} días</td><td><span class="badge badge-compra">${p.num_compras}</span></td><td>${p.fecha}</td></tr>`);
+
+    document.getElementById('mini-proveedores').innerHTML = d.proveedores_mini.map(p => `
+      <div class="mc-row"><span class="mc-name">${esc(p.nombre)}</span><span class="mc-val mv-def">${p.num_compras} compras</span></div>`).join('');
+
+    const { labels, values } = cleanSeries(d.graf_proveedores_labels, d.graf_proveedores_valores);
+    grafica('chartProveedores', {
+      type: 'bar',
+      data: {
+        labels,
+        datasets: [{
           label: 'Compras',
-          data: compras.values,
-          backgroundColor: C.purple + '22',
-          borderColor: C.purple,
+          data: values,
+          backgroundColor: PALETTE.map(c => c + '1e'),
+          borderColor:     PALETTE,
           borderWidth: 1.5,
           borderRadius: 5,
           borderSkipped: false,
+        }]
+      },
+      options: {
+        responsive: true,
+        plugins: {
+          legend: { display: false },
+          tooltip: { ...TOOLTIP, callbacks: { label: c => ` ${c.parsed.y} compras` } }
+        },
+        scales: { y: EJE_ENTERO, x: SCALE_X }
+      }
+    });
+  },
+
+  compras(d) {
+    llenarTabla('tabla-compras', d.compras_data, 6, c => `
+      <tr><td>C${id3(c.id)}</td><td>${esc(c.producto)}</td><td>${esc(c.proveedor)}</td><td>${esc(c.admin)}</td>
+      <td>${c.fecha}</td><td>${badgeEstado(c.estado)}</td></tr>`);
+
+    const { labels, values } = cleanSeries(d.graf_compras_labels, d.graf_compras_valores);
+    linea('chartComprasDia', labels, values, C.purple, 'Compras', c => ` ${c.parsed.y} compras`, EJE_ENTERO);
+    dona('chartComprasEstado', ['Completadas', 'Pendientes'], [d.compras_completadas, d.compras_pendientes], [C.green, C.yellow]);
+  },
+
+  ranking(d) {
+    const CLASE = { A: 'badge-ok', B: 'badge-low', C: 'badge-out' };
+    texto('ranking-ventana', `(${d.ranking_desde} a ${d.ranking_hasta})`);
+    llenarTabla('tabla-ranking', d.ranking_data, 7, p => `
+      <tr><td>${p.posicion}</td><td>${esc(p.nombre)}</td><td>${p.unidades}</td>
+      <td class="price">${pesos(p.ingresos)}</td><td>${p.participacion.toFixed(1)}%</td><td>${p.acumulado.toFixed(1)}%</td>
+      <td><span class="badge ${CLASE[p.clase]}">${p.clase}</span></td></tr>`);
+
+    const top = d.ranking_data.slice(0, 20);
+    grafica('chartRankingPareto', {
+      type: 'bar',
+      data: {
+        labels: top.map(p => p.nombre),
+        datasets: [
+          {
+            label: 'Ingresos ($)',
+            data: top.map(p => p.ingresos),
+            backgroundColor: top.map(p => (p.clase === 'A' ? C.green : p.clase === 'B' ? C.yellow : C.red) + '22'),
+            borderColor:     top.map(p => p.clase === 'A' ? C.green : p.clase === 'B' ? C.yellow : C.red),
+            borderWidth: 1.5,
+            borderRadius: 5,
+            borderSkipped: false,
+            yAxisID: 'y',
+          },
+          {
+            type: 'line',
+            label: '% acumulado',
+            data: top.map(p => p.acumulado),
+            borderColor: C.blue,
+            borderWidth: 2,
+            pointRadius: 2,
+            yAxisID: 'y1',
+          }
+        ]
+      },
+      options: {
+        responsive: true,
+        plugins: { legend: LEGEND, tooltip: { ...TOOLTIP } },
+        scales: {
+          y:  EJE_PESOS,
+          y1: { ...SCALE_Y, position: 'right', min: 0, max: 100, grid: { display: false },
+                ticks: { ...SCALE_Y.ticks, callback: v => v + '%' } },
+          x:  { ...SCALE_X, ticks: { ...SCALE_X.ticks, display: false } },
         }
-      ]
-    },
-    options: {
-      responsive: true,
-      plugins: { legend: LEGEND, tooltip: { ...TOOLTIP } },
-      scales: { y: SCALE_Y, x: SCALE_X }
-    }
-  });
-})();
+      }
+    });
+    const r = d.ranking_resumen;
+    dona('chartRankingClases', ['Clase A', 'Clase B', 'Clase C'],
+         [r.A.productos, r.B.productos, r.C.productos], [C.green, C.yellow, C.red]);
+  },
+
+  todo(d) {
+    llenarTabla('tabla-todas', d.todas, 6, filaActividad);
+    siguienteActividad(d.todas_siguiente);
+
+    const ventas  = cleanSeries(d.graf_todo_labels, d.graf_todo_ventas);
+    const compras = cleanSeries(d.graf_todo_labels, d.graf_todo_compras);
+    const labels  = ventas.labels.length >= compras.labels.length ? ventas.labels : compras.labels;
+    grafica('chartTodo', {
+      type: 'bar',
+      data: {
+        labels,
+        datasets: [
+          {
+            label: 'Ventas ($)',
+            data: ventas.values,
+            backgroundColor: C.blue + '22',
+            borderColor: C.blue,
+            borderWidth: 1.5,
+            borderRadius: 5,
+            borderSkipped: false,
+          },
+          {
+            label: 'Compras',
+            data: compras.values,
+            backgroundColor: C.purple + '22',
+            borderColor: C.purple,
+            borderWidth: 1.5,
+            borderRadius: 5,
+            borderSkipped: false,
+          }
+        ]
+      },
+      options: {
+        responsive: true,
+        plugins: { legend: LEGEND, tooltip: { ...TOOLTIP } },
+        scales: { y: SCALE_Y, x: SCALE_X }
+      }
+    });
+  },
+};
+
+// ══ Carga con GET condicional ════════════════════════════════════
+const etags = {};
+
+/** Pide una URL con el ETag anterior. Resuelve con los datos, o null si no cambió (304). */
+function pedir(url) {
+  const headers = etags[url] ? { 'If-None-Match': etags[url] } : {};
+  return fetch(url, { headers, cache: 'no-store', credentials: 'same-origin' })
+    .then(r => {
+      if (r.status === 304) return null;
+      if (!r.ok) throw new Error(`${url}: HTTP ${r.status}`);
+      const etag = r.headers.get('ETag');
+      if (etag) etags[url] = etag;
+      return r.json();
+    });
+}
+
+function cargarSeccion(nombre) {
+  return pedir(`/reportes/seccion/${nombre}/`)
+    .then(data => { if (data) PINTAR[nombre](data); })
+    .catch(e => console.warn(`[reportes] Error en la sección ${nombre}:`, e));
+}
+
+// Con REPORTES_PRECARGA las secciones vienen embebidas en la página;
+// si no, se piden todas a la vez y cada una se pinta apenas llega
+const precarga = document.getElementById('reportes-precarga');
+if (precarga) {
+  const datos = JSON.parse(precarga.textContent);
+  Object.keys(PINTAR).forEach(nombre => { if (datos[nombre]) PINTAR[nombre](datos[nombre]); });
+} else {
+  Object.keys(PINTAR).forEach(cargarSeccion);
+}
 
 // ══ Polling 30s ══════════════════════════════════════════════════
 function actualizarDatos() {
-  fetch('/reportes/data/')
-    .then(r => r.json())
+  pedir('/reportes/data/')
     .then(data => {
-      document.getElementById('kpi-ventas-mes').textContent    = '$ ' + Math.round(data.total_ventas_mes).toLocaleString('es-CO');
-      document.getElementById('kpi-transacciones').textContent = data.transacciones_mes + ' transacciones';
-      document.getElementById('kpi-ingreso-total').textContent = '$ ' + Math.round(data.ingreso_total).toLocaleString('es-CO');
-      document.getElementById('kpi-stock-bajo').textContent    = data.stock_bajo + ' con stock bajo';
-
-      const v = cleanSeries(data.grafica_labels, data.grafica_valores);
-      ventasChart.data.labels = v.labels;
-      ventasChart.data.datasets[0].data = v.values;
-      ventasChart.update('active');
-
-      const t = cleanSeries(data.grafica_labels, data.grafica_valores);
-      todoChart.data.labels = t.labels;
-      todoChart.data.datasets[0].data = t.values;
-      todoChart.update('active');
-
-      const c = document.getElementById('alertas-container');
-      if (c && data.alertas?.length)
-        c.innerHTML = data.alertas.map(a =>
-          `<div class="alerta-item alerta-${a.estado}">
-             <span class="alerta-dot dot-${a.estado}"></span>
-             ${a.nombre} — ${a.estado === 'out' ? 'Sin stock' : a.stock + ' uds'}
-           </div>`
-        ).join('');
+      if (!data) return;   // 304: nada cambió
+      texto('kpi-ventas-mes',    pesos(data.total_ventas_mes));
+      texto('kpi-transacciones', data.transacciones_mes + ' transacciones');
+      texto('kpi-ingreso-total', pesos(data.ingreso_total));
+      texto('kpi-stock-bajo',    data.stock_bajo + ' con stock bajo');
+
+      if (ventasChart) {
+        const v = cleanSeries(data.grafica_labels, data.grafica_valores);
+        ventasChart.data.labels = v.labels;
+        ventasChart.data.datasets[0].data = v.values;
+        ventasChart.update('active');
+      }
+
+      pintarAlertas(data.alertas);
+
+      // Las tablas solo se vuelven a pintar si su sección cambió
+      Object.keys(PINTAR).forEach(cargarSeccion);
     })
     .catch(e => console.warn('[reportes] Error al actualizar:', e));
 }
 
-setInterval(actualizarDatos, 30000);
\ No newline at end of file
+setInterval(actualizarDatos, 30000);
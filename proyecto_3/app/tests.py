@@ -1,3 +1,1498 @@
-from django.test import TestCase
+import base64
+import contextlib
+import csv
+import datetime
+import importlib
+import gzip
+import io
+import json
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.db import connection, connections, OperationalError
+from django.db.models import Sum
+from django.core import mail
+from django.core.cache import caches
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from app.models import (
+    Cliente, Marca, TipoProductos, UnidadMedida, Producto, Proveedor, Venta, DetalleVenta, Compra, PuntoReorden,
+    CuboVenta, ExportacionJob, KpiContador, KpiDiario, KpiPendiente, MovimientoInventario, NotificacionEmail,
+    NotificacionOutbox, SnapshotInventario,
+)
+from app.services.reportes import SECCIONES, ventas_por_dia
+from app.services.series import serie, zona
+from app.services.ranking import ranking_productos
+from app.services.actividad import pagina_actividad
+from app.services.reabastecimiento import calcular_puntos_reorden, compras_sugeridas, stock_bajo_q, esta_bajo
+from app.services.stock import (
+    crear_detalles, editar_detalles, descontar_stock, sumar_stock, fijar_stock, conciliar_libro, ejecutar_transaccion,
+    bloquear_productos, metricas_stock, ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT,
+)
+from app.services.importacion import importar_ventas
+from app.services import (
+    cubo, columnar, especificaciones, exportaciones, filtros, inventario, kpis, notifications, ventas_api,
+)
+from app.utils import escribir_excel, filas_por_lotes, MUESTRA_ANCHO
 
-# Create your tests here.
+
+# ─────────────────────────────────────────────
+# Reserva de stock al crear una venta
+# ─────────────────────────────────────────────
+
+class ReservaStockTests(TestCase):
+    """Un bloqueo y un UPDATE por carrito, sin importar sus líneas; las líneas repetidas se suman."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.productos = [
+            Producto.objects.create(nombre=f'P{i}', precio=10, stock=50, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+            for i in range(20)
+        ]
+        cls.usuario = User.objects.create_user('cajero', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _vender(self, lineas):
+        respuesta = self.client.post(reverse('crear_venta'), {
+            'cliente':             'Cliente Mostrador',
+            'estado':              'Pendiente',
+            'producto_id[]':       [p.pk for p, _ in lineas],
+            'producto_nombre[]':   [p.nombre for p, _ in lineas],
+            'producto_precio[]':   ['10'] * len(lineas),
+            'producto_cantidad[]': [str(cantidad) for _, cantidad in lineas],
+        })
+        return [str(m) for m in get_messages(respuesta.wsgi_request)]
+
+    def _stock(self, *productos):
+        return [Producto.objects.get(pk=p.pk).stock for p in productos]
+
+    def test_lineas_repetidas(self):
+        a, b = self.productos[:2]
+        self.assertIn('creada', self._vender([(a, 2), (b, 1), (a, 3)])[-1])
+        venta = Venta.objects.get()
+        self.assertEqual(self._stock(a, b), [45, 49])
+        self.assertEqual(venta.detalles.count(), 3)
+        # Un movimiento por producto con el total de sus líneas
+        self.assertEqual(sorted(MovimientoInventario.objects.filter(referencia=f'venta:{venta.pk}')
+                                .values_list('producto_id', 'cantidad')), [(a.pk, -5), (b.pk, -1)])
+
+    def test_sin_stock_no_modifica_nada(self):
+        a, b = self.productos[:2]
+        # Cada línea alcanza, la suma de las dos no
+        self.assertIn('Stock insuficiente', self._vender([(a, 1), (b, 30), (b, 30)])[-1])
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(self._stock(a, b), [50, 50])
+
+    def test_consultas_constantes(self):
+        def consultas(productos):
+            with CaptureQueriesContext(connection) as ctx:
+                ejecutar_transaccion(descontar_stock, {p.pk: 1 for p in productos})
+            return len(ctx.captured_queries)
+
+        self.assertEqual(consultas(self.productos[:2]), consultas(self.productos[2:]))
+        self.assertEqual(self._stock(*self.productos), [49] * 20)
+
+
+# ─────────────────────────────────────────────
+# Bloqueo ordenado y reintentos
+# ─────────────────────────────────────────────
+
+def _bloqueo(codigo):
+    return OperationalError(codigo, 'Deadlock found when trying to get lock')
+
+
+class BloqueoStockTests(TestCase):
+    """Productos bloqueados en orden de pk; sin reintentos dentro de una transacción ajena."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.marca, cls.tipo, cls.unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                                           UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.productos = [
+            Producto.objects.create(nombre=f'P{i}', precio=10, stock=20, idMarca=cls.marca, idTipo=cls.tipo,
+                                    idUnidad=cls.unidad)
+            for i in range(3)
+        ]
+
+    def test_orden_de_bloqueo(self):
+        ids = [p.pk for p in reversed(self.productos)]
+        with CaptureQueriesContext(connection) as ctx:
+            bloqueados = bloquear_productos(set(ids))
+        self.assertEqual(list(bloqueados), sorted(ids))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('ORDER BY', ctx.captured_queries[0]['sql'])
+
+    def test_sin_reintento_anidado(self):
+        intentos = []
+
+        def operacion():
+            intentos.append(1)
+            raise _bloqueo(ER_LOCK_DEADLOCK)
+
+        with self.assertRaises(OperationalError):
+            ejecutar_transaccion(operacion)
+        self.assertEqual(len(intentos), 1)
+
+    def test_edicion_de_producto_con_bloqueo(self):
+        producto = self.productos[0]
+        self.client.force_login(User.objects.create_user('stock', password='x'))
+        with mock.patch('app.views.Productos.views.fijar_stock', side_effect=_bloqueo(ER_LOCK_WAIT_TIMEOUT)):
+            respuesta = self.client.post(reverse('editar_producto', args=[producto.pk]), {
+                'nombre': 'Nuevo', 'precio': '12', 'stock': '5',
+                'idMarca': self.marca.pk, 'idTipo': self.tipo.pk, 'idUnidad': self.unidad.pk,
+            })
+        self.assertRedirects(respuesta, reverse('productos'), fetch_redirect_response=False)
+        self.assertIn('Error al actualizar el producto', str(list(get_messages(respuesta.wsgi_request))[-1]))
+        producto.refresh_from_db()
+        self.assertEqual((producto.nombre, producto.stock), ('P0', 20))
+
+    def test_escaner_con_producto_eliminado(self):
+        self.client.force_login(User.objects.create_user('stock', password='x'))
+        url = reverse('actualizar_stock_escaner')
+
+        respuesta = self.client.post(url, {'id': self.productos[1].pk, 'cantidad': 5000}, content_type='application/json')
+        self.assertEqual(respuesta.json()['mensaje'], 'El stock no puede superar 1.000 unidades.')
+
+        # Eliminado entre la lectura de la vista y el bloqueo
+        producto = self.productos[2]
+        Producto.objects.filter(pk=producto.pk).delete()
+        with mock.patch('app.views.Productos.views.get_object_or_404', return_value=producto):
+            respuesta = self.client.post(url, {'id': producto.pk, 'cantidad': 1}, content_type='application/json')
+        self.assertEqual((respuesta.status_code, respuesta.json()['mensaje']), (404, 'El producto no existe.'))
+
+
+@override_settings(STOCK_REINTENTOS=3, STOCK_REINTENTO_ESPERA=0)
+class ReintentosStockTests(TransactionTestCase):
+    """1213 y 1205 se reintentan desde cero hasta STOCK_REINTENTOS; el resto de errores no."""
+
+    def _ejecutar(self, errores):
+        intentos = []
+
+        def operacion():
+            intentos.append(1)
+            if len(intentos) <= len(errores):
+                raise errores[len(intentos) - 1]
+            return 'ok'
+
+        antes = metricas_stock()
+        try:
+            return ejecutar_transaccion(operacion), len(intentos), self._delta(antes)
+        except OperationalError:
+            return None, len(intentos), self._delta(antes)
+
+    def _delta(self, antes):
+        return {clave: valor - antes[clave] for clave, valor in metricas_stock().items() if valor != antes[clave]}
+
+    def test_reintenta_deadlock_y_timeout(self):
+        resultado, intentos, metricas = self._ejecutar([_bloqueo(ER_LOCK_DEADLOCK), _bloqueo(ER_LOCK_WAIT_TIMEOUT)])
+        self.assertEqual((resultado, intentos), ('ok', 3))
+        self.assertEqual(metricas, {'transacciones': 1, 'reintentos': 2, 'deadlocks': 1, 'lock_wait_timeouts': 1})
+
+    def test_se_rinde_al_agotar_intentos(self):
+        resultado, intentos, metricas = self._ejecutar([_bloqueo(ER_LOCK_DEADLOCK)] * 3)
+        self.assertEqual((resultado, intentos), (None, 3))
+        self.assertEqual(metricas, {'transacciones': 1, 'reintentos': 2, 'deadlocks': 3, 'fallos': 1})
+
+    def test_otros_errores_no_se_reintentan(self):
+        resultado, intentos, metricas = self._ejecutar([OperationalError(2006, 'MySQL server has gone away')])
+        self.assertEqual((resultado, intentos), (None, 1))
+        self.assertEqual(metricas, {'transacciones': 1})
+
+    def test_edicion_de_compra_reintentada(self):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        producto  = Producto.objects.create(nombre='P', precio=10, stock=20, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        proveedor = Proveedor.objects.create(nombre='V', telefono='1', email='v@x.com')
+        compra    = Compra.objects.create(Producto=producto, Proveedor=proveedor, cantidad=5,
+                                          precio_unitario=Decimal('3'), estado='Completada')
+        stock     = Producto.objects.get(pk=producto.pk).stock
+
+        # El primer save choca con un deadlock después de asignar los campos nuevos
+        guardar, fallos = Compra.save, []
+
+        def save(instancia, *args, **kwargs):
+            if not fallos:
+                fallos.append(1)
+                raise _bloqueo(ER_LOCK_DEADLOCK)
+            return guardar(instancia, *args, **kwargs)
+
+        self.client.force_login(User.objects.create_user('compras', password='x'))
+        with mock.patch.object(Compra, 'save', save):
+            self.client.post(reverse('modal_editar_compra', args=[compra.pk]), {
+                'fecha': timezone.localdate().isoformat(), 'estado': 'Completada', 'producto_id': producto.pk,
+                'proveedor_id': proveedor.pk, 'cantidad': '8', 'precio_unitario': '3',
+            })
+        self.assertEqual(fallos, [1])
+        self.assertEqual(Compra.objects.get(pk=compra.pk).cantidad, 8)
+        self.assertEqual(Producto.objects.get(pk=producto.pk).stock, stock + 3)
+
+
+# ─────────────────────────────────────────────
+# Modo optimista: UPDATE condicional
+# ─────────────────────────────────────────────
+
+@override_settings(STOCK_MODO='optimista')
+class StockOptimistaTests(TestCase):
+    """stock = stock - n WHERE stock >= n, sin SELECT previo; un UPDATE sin filas revierte todo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.a = Producto.objects.create(nombre='A', precio=10, stock=20, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        cls.b = Producto.objects.create(nombre='B', precio=10, stock=3,  idMarca=marca, idTipo=tipo, idUnidad=unidad)
+
+    def _stock(self):
+        return list(Producto.objects.filter(pk__in=[self.a.pk, self.b.pk]).order_by('pk').values_list('stock', flat=True))
+
+    def test_descuento_condicional(self):
+        with CaptureQueriesContext(connection) as ctx:
+            ejecutar_transaccion(descontar_stock, {self.b.pk: 3, self.a.pk: 5})
+        self.assertEqual(self._stock(), [15, 0])
+        actualizaciones = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "producto"')]
+        self.assertEqual(len(actualizaciones), 2)
+        self.assertTrue(all('"stock" >=' in sql for sql in actualizaciones))
+        # El primer UPDATE es el del pk menor: mismo orden que el modo con bloqueo
+        self.assertIn(f'= {self.a.pk}', actualizaciones[0])
+        self.assertEqual(sorted(MovimientoInventario.objects.filter(motivo='venta').values_list('producto_id', 'cantidad')),
+                         [(self.a.pk, -5), (self.b.pk, -3)])
+
+    def test_sin_stock_revierte_todo(self):
+        with self.assertRaisesMessage(ValueError, 'Stock insuficiente para "B". Disponible: 3, solicitado: 4.'):
+            ejecutar_transaccion(descontar_stock, {self.a.pk: 5, self.b.pk: 4})
+        self.assertEqual(self._stock(), [20, 3])
+        self.assertFalse(MovimientoInventario.objects.filter(motivo='venta').exists())
+
+        with self.assertRaisesMessage(ValueError, 'no existe'):
+            ejecutar_transaccion(descontar_stock, {self.a.pk: 1, 999999: 1})
+        self.assertEqual(self._stock(), [20, 3])
+
+
+# ─────────────────────────────────────────────
+# Edición de ventas por diferencias
+# ─────────────────────────────────────────────
+
+class EdicionVentaTests(TestCase):
+    """Solo se mueve el stock neto que cambió y solo se escriben las líneas distintas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.a, cls.b, cls.c, cls.d = [
+            Producto.objects.create(nombre=nombre, precio=10, stock=20, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+            for nombre in 'ABCD'
+        ]
+
+    def setUp(self):
+        self.venta = Venta.objects.create(cliente='C', total=0, estado='Pendiente')
+        lineas = [(self.a, 2), (self.b, 1), (self.c, 4)]
+        ejecutar_transaccion(descontar_stock, {p.pk: n for p, n in lineas})
+        crear_detalles(self.venta, [p.pk for p, _ in lineas], [p.nombre for p, _ in lineas],
+                       [10] * len(lineas), [n for _, n in lineas])
+        self.lineas = dict(self.venta.detalles.values_list('producto_id', 'pk'))
+
+    def _editar(self, lineas):
+        ejecutar_transaccion(editar_detalles, self.venta, [p.pk for p, _ in lineas], [p.nombre for p, _ in lineas],
+                             [10] * len(lineas), [n for _, n in lineas])
+
+    def _stock(self):
+        return dict(Producto.objects.values_list('nombre', 'stock'))
+
+    def test_solo_cambia_lo_necesario(self):
+        self._editar([(self.a, 2), (self.b, 3), (self.d, 1)])
+
+        self.assertEqual(self._stock(), {'A': 18, 'B': 17, 'C': 20, 'D': 19})
+        self.assertEqual(sorted(MovimientoInventario.objects.filter(motivo='venta_edicion')
+                                .values_list('producto_id', 'cantidad')),
+                         [(self.b.pk, -2), (self.c.pk, 4), (self.d.pk, -1)])
+        lineas = dict(self.venta.detalles.values_list('producto_id', 'pk'))
+        # A y B conservan su fila, C se borra y D es nueva
+        self.assertEqual((lineas[self.a.pk], lineas[self.b.pk]), (self.lineas[self.a.pk], self.lineas[self.b.pk]))
+        self.assertNotIn(self.c.pk, lineas)
+        self.assertNotIn(lineas[self.d.pk], self.lineas.values())
+        self.assertEqual(cubo.verificar(), [])
+
+    def test_edicion_sin_cambios_no_escribe(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._editar([(self.a, 2), (self.b, 1), (self.c, 4)])
+        escrituras = [q['sql'] for q in ctx.captured_queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(escrituras, [])
+
+    def test_aumento_sin_stock(self):
+        with self.assertRaisesMessage(ValueError, 'Stock insuficiente para "B"'):
+            self._editar([(self.a, 1), (self.b, 25)])
+        self.assertEqual(self._stock(), {'A': 18, 'B': 19, 'C': 16, 'D': 20})
+        self.assertEqual(dict(self.venta.detalles.values_list('producto_id', 'pk')), self.lineas)
+
+
+# ─────────────────────────────────────────────
+# Bandeja de salida de notificaciones
+# ─────────────────────────────────────────────
+
+@override_settings(NOTIFICACIONES_MAX_INTENTOS=3, NOTIFICACIONES_REINTENTO_ESPERA=60)
+class OutboxTests(TestCase):
+    """Un evento por notificación, despachado después del commit, con reserva temporal y backoff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana  = User.objects.create_user('ana',  email='ana@x.com')
+        cls.beto = User.objects.create_user('beto', email='beto@x.com')
+        cls.yo   = User.objects.create_user('yo',   email='yo@x.com')
+        User.objects.create_user('inactivo', email='inactivo@x.com', is_active=False)
+
+    def _encolar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            evento = notifications.enviar_notificacion_a_activos('Asunto', 'Mensaje', excluir_usuario=self.yo)
+        # Dentro de la transacción solo se escribe el evento; el envío espera al commit
+        self.assertEqual((len(callbacks), len(mail.outbox), NotificacionEmail.objects.count()), (1, 0, 0))
+        return evento
+
+    def _vencer(self, evento):
+        NotificacionOutbox.objects.filter(pk=evento.pk).update(proximo_intento=timezone.now())
+
+    def test_envio(self):
+        evento = self._encolar()
+        self.assertEqual(notifications.procesar_outbox(), 1)
+        evento.refresh_from_db()
+        self.assertEqual((evento.estado, evento.intentos), ('enviada', 1))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ana@x.com', 'beto@x.com'])
+        self.assertFalse(NotificacionEmail.objects.filter(enviada=False).exists())
+
+    def test_reserva(self):
+        evento = self._encolar()
+        self.assertEqual(notifications._reclamar(None, 10), [evento])
+        # Reservado por unos minutos: otro proceso no lo toma
+        self.assertEqual(notifications._reclamar(None, 10), [])
+        self.assertEqual(notifications.procesar_outbox(), 0)
+
+    def test_backoff_y_reintento(self):
+        evento = self._encolar()
+
+        def enviar(destino, asunto, mensaje):
+            if destino == 'beto@x.com':
+                raise OSError('SMTP caído')
+            mail.send_mail(asunto, mensaje, None, [destino])
+
+        with mock.patch('app.services.notifications._enviar', side_effect=enviar):
+            inicio = timezone.now()
+            self.assertEqual(notifications.procesar_outbox(), 1)
+        evento.refresh_from_db()
+        self.assertEqual((evento.estado, evento.intentos, evento.ultimo_error), ('pendiente', 1, 'SMTP caído'))
+        self.assertGreaterEqual(evento.proximo_intento, inicio + datetime.timedelta(seconds=60))
+        self.assertEqual(notifications.procesar_outbox(), 0)
+
+        # Al reintentar solo se envía lo que falló
+        self._vencer(evento)
+        self.assertEqual(notifications.procesar_outbox(), 1)
+        evento.refresh_from_db()
+        self.assertEqual((evento.estado, evento.intentos), ('enviada', 2))
+        self.assertEqual([m.to[0] for m in mail.outbox], ['ana@x.com', 'beto@x.com'])
+        self.assertEqual(NotificacionEmail.objects.filter(outbox=evento).count(), 2)
+
+    def test_error_al_agotar_intentos(self):
+        evento = self._encolar()
+        with mock.patch('app.services.notifications._enviar', side_effect=OSError('SMTP caído')):
+            for intento in range(3):
+                self._vencer(evento)
+                notifications.procesar_outbox()
+        evento.refresh_from_db()
+        self.assertEqual((evento.estado, evento.intentos), ('error', 3))
+        self.assertIsNotNone(evento.fecha_procesado)
+
+
+# ─────────────────────────────────────────────
+# Enlace de ventas con clientes (migración 0009)
+# ─────────────────────────────────────────────
+
+class ClienteFkTests(TestCase):
+    """poblar_cliente_fk enlaza por nombre normalizado, por lotes, sin tocar las ventas ya enlazadas."""
+
+    def test_poblar_por_lotes(self):
+        migracion = importlib.import_module('app.migrations.0009_venta_cliente_fk')
+        ana, _, beto = (Cliente.objects.create(nombre='Ana Pérez', telefono='1', email='a@x.com'),
+                        Cliente.objects.create(nombre='ana pérez', telefono='2', email='b@x.com'),
+                        Cliente.objects.create(nombre='Beto', telefono='3', email='c@x.com'))
+        ventas = {nombre: Venta.objects.create(cliente=nombre, total=1, estado='Pendiente')
+                  for nombre in ('  ANA   Pérez ', 'Beto', 'Beto', 'Desconocido')}
+        enlazada = Venta.objects.create(cliente='Ana Pérez', idCliente=beto, total=1, estado='Pendiente')
+
+        with mock.patch.object(migracion, 'LOTE', 2), contextlib.redirect_stdout(io.StringIO()) as salida:
+            migracion.poblar_cliente_fk(django_apps, None)
+
+        self.assertIn('3 enlazada(s), 1 sin cliente', salida.getvalue())
+        enlaces = dict(Venta.objects.values_list('pk', 'idCliente_id'))
+        # Con nombres repetidos gana el cliente más antiguo
+        self.assertEqual(enlaces[ventas['  ANA   Pérez '].pk], ana.pk)
+        self.assertEqual(Venta.objects.filter(cliente='Beto', idCliente=beto).count(), 2)
+        self.assertIsNone(enlaces[ventas['Desconocido'].pk])
+        self.assertEqual(enlaces[enlazada.pk], beto.pk)
+
+
+# ─────────────────────────────────────────────
+# Importación masiva de ventas
+# ─────────────────────────────────────────────
+
+class ImportacionTests(TestCase):
+    """Reenviar un lote no duplica ventas; el stock se valida venta por venta y el cliente se busca sin mayúsculas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.producto = Producto.objects.create(nombre='P', precio=10, stock=5, idMarca=marca, idTipo=tipo,
+                                               idUnidad=unidad)
+        cls.ana      = Cliente.objects.create(nombre='Ana', telefono='1', email='a@x.com')
+
+    def _lote(self):
+        return [
+            {'clave': 'pos-1', 'cliente': 'ana', 'lineas': [{'producto_id': self.producto.pk, 'cantidad': 2}]},
+            {'clave': 'pos-2', 'cliente': 'ANA', 'lineas': [{'producto_id': self.producto.pk, 'cantidad': 2}]},
+            {'clave': 'pos-3', 'cliente': 'Otro', 'lineas': [{'producto_id': self.producto.pk, 'cantidad': 2}]},
+            {'clave': 'pos-1', 'cliente': 'ana', 'lineas': [{'producto_id': self.producto.pk, 'cantidad': 2}]},
+        ]
+
+    def test_reenvio_idempotente(self):
+        resultado = importar_ventas(self._lote())
+        self.assertEqual((resultado['recibidas'], resultado['creadas'], resultado['duplicadas']), (4, 2, 1))
+        # La tercera venta ya no tiene stock: se rechaza sola, sin deshacer las otras
+        self.assertEqual([(r['indice'], r['clave']) for r in resultado['rechazadas']], [(2, 'pos-3')])
+        self.assertIn('Stock insuficiente', resultado['rechazadas'][0]['error'])
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 1)
+        self.assertEqual(sorted(Venta.objects.values_list('clave_idempotencia', 'cliente', 'idCliente_id')),
+                         [('pos-1', 'ana', self.ana.pk), ('pos-2', 'ANA', self.ana.pk)])
+
+        resultado = importar_ventas(self._lote(), lote=1)
+        self.assertEqual((resultado['creadas'], resultado['duplicadas']), (0, 3))
+        self.assertEqual([r['clave'] for r in resultado['rechazadas']], ['pos-3'])
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(DetalleVenta.objects.count(), 2)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 1)
+
+    def test_validacion(self):
+        resultado = importar_ventas([
+            'no es un objeto',
+            {'cliente_id': 999, 'lineas': [{'producto_id': self.producto.pk, 'cantidad': 1}]},
+            {'cliente': 'Ana', 'lineas': []},
+        ])
+        self.assertEqual(resultado['creadas'], 0)
+        self.assertEqual([r['indice'] for r in resultado['rechazadas']], [0, 1, 2])
+        self.assertIn('#999 no existe', resultado['rechazadas'][1]['error'])
+        self.assertFalse(Venta.objects.exists())
+
+    @override_settings(VENTAS_IMPORTACION_TOKENS=['caja-3'])
+    def test_endpoint_con_token(self):
+        terminal = Client(enforce_csrf_checks=True)
+        url, cuerpo = reverse('importar_ventas'), json.dumps(self._lote()[:1])
+
+        respuesta = terminal.post(url, cuerpo, content_type='application/json')
+        self.assertEqual((respuesta.status_code, respuesta['WWW-Authenticate']), (401, 'Bearer'))
+        respuesta = terminal.post(url, cuerpo, content_type='application/json', HTTP_AUTHORIZATION='Bearer otro')
+        self.assertEqual((respuesta.status_code, respuesta.json()['status']), (403, 'error'))
+        self.assertFalse(Venta.objects.exists())
+
+        # Sin sesión ni token CSRF: la respuesta es el resumen en JSON
+        respuesta = terminal.post(url, cuerpo, content_type='application/json', HTTP_AUTHORIZATION='Bearer caja-3')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.json()['status'], respuesta.json()['creadas']), ('ok', 1))
+
+
+# ─────────────────────────────────────────────
+# Libro de movimientos de inventario
+# ─────────────────────────────────────────────
+
+class InventarioTests(TestCase):
+    """La suma del libro es el stock; la foto corta por id confirmado y la conciliación detecta los UPDATE sueltos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.a, cls.b = (
+            Producto.objects.create(nombre=f'P{i}', precio=10, stock=10, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+            for i in range(2)
+        )
+
+    def _libro(self):
+        return dict(MovimientoInventario.objects.values('producto_id').annotate(t=Sum('cantidad'))
+                    .values_list('producto_id', 't'))
+
+    def test_libro_igual_al_stock(self):
+        descontar_stock({self.a.pk: 3, self.b.pk: 1}, referencia='venta:1')
+        sumar_stock({self.b.pk: 5})
+        fijar_stock(self.a.pk, 2)
+        self.assertEqual(self._libro(), dict(Producto.objects.values_list('pk', 'stock')))
+        self.assertEqual(self._libro(), {self.a.pk: 2, self.b.pk: 14})
+        self.assertEqual(inventario.conciliar(bloque=1), [])
+
+        # Un UPDATE fuera de app.services.stock no deja movimiento
+        Producto.objects.filter(pk=self.b.pk).update(stock=20)
+        self.assertEqual(inventario.conciliar(),
+                         [{'producto_id': self.b.pk, 'stock': 20, 'libro': 14, 'diferencia': 6}])
+        self.assertEqual(conciliar_libro([self.b.pk]), {self.b.pk: 6})
+        self.assertEqual(inventario.conciliar(), [])
+
+    def test_marca_de_agua(self):
+        base  = MovimientoInventario.objects.order_by('-pk').values_list('pk', flat=True).first()
+        viejo = timezone.now() - datetime.timedelta(minutes=5)
+        for salto, fecha in ((1, viejo), (3, viejo), (5, timezone.now())):
+            MovimientoInventario.objects.create(pk=base + salto, producto_id=self.a.pk, cantidad=1,
+                                                stock_resultante=0, motivo='ajuste', fecha=fecha)
+        # El hueco viejo (base + 2) se salta; el reciente (base + 4) puede ser una transacción en curso
+        self.assertEqual(inventario.marca_de_agua(base), base + 3)
+        self.assertEqual(inventario.marca_de_agua(base, retraso=-60), base + 5)
+
+    def test_snapshot_y_stock_en(self):
+        fecha, filas = inventario.tomar_snapshot(retraso=0)
+        self.assertEqual(filas, 2)
+        descontar_stock({self.a.pk: 4})
+        self.assertEqual(inventario.stock_en(self.a.pk, fecha), 10)
+        self.assertEqual(inventario.stock_en(self.a.pk, timezone.now()), 6)
+
+        # Un movimiento que confirma después de la foto con fecha anterior no se pierde
+        MovimientoInventario.objects.create(producto_id=self.b.pk, cantidad=-2, stock_resultante=8, motivo='ajuste',
+                                            fecha=fecha - datetime.timedelta(seconds=1))
+        self.assertEqual(inventario.stock_en(self.b.pk, timezone.now()), 8)
+        inventario.tomar_snapshot(retraso=0)
+        self.assertEqual(inventario.stock_en(self.b.pk, timezone.now()), 8)
+        self.assertEqual(dict(SnapshotInventario.objects.exclude(fecha=fecha).values_list('producto_id', 'stock')),
+                         {self.a.pk: 6, self.b.pk: 8})
+
+
+# ─────────────────────────────────────────────
+# API de ventas en NDJSON
+# ─────────────────────────────────────────────
+
+class VentasApiTests(TestCase):
+    """Las páginas y la reanudación por cursor recorren (fecha, id) sin repetir ni saltar ventas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        fecha = timezone.now().replace(microsecond=0) - datetime.timedelta(days=1)
+        # Tres ventas comparten fecha: el id desempata
+        cls.ids = [
+            Venta.objects.create(cliente=f'C{i}', total=1, estado='Pendiente',
+                                 fecha=fecha + datetime.timedelta(hours=min(i, 2))).pk
+            for i in range(5)
+        ]
+        cls.usuario = User.objects.create_user('bi', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _leer(self, **params):
+        respuesta = self.client.get(reverse('ventas_api'), params)
+        self.assertEqual(respuesta.status_code, 200)
+        contenido = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        return [json.loads(linea) for linea in contenido.decode().splitlines()], respuesta
+
+    def test_paginas_y_reanudacion(self):
+        vistos, cursor = [], None
+        while True:
+            ventas, respuesta = self._leer(limite=2, **({'cursor': cursor} if cursor else {}))
+            vistos += [v['id'] for v in ventas]
+            cursor = respuesta.get('X-Cursor-Siguiente')
+            if not cursor:
+                break
+        self.assertEqual(vistos, self.ids)
+
+        # Una descarga cortada se reanuda con el cursor de la última línea recibida
+        ventas, _ = self._leer(stream='1')
+        resto, _  = self._leer(stream='1', cursor=ventas[2]['cursor'])
+        self.assertEqual([v['id'] for v in resto], self.ids[3:])
+
+    def test_cursor_invalido(self):
+        ingenuo = base64.urlsafe_b64encode(b'2026-01-01T00:00:00|3').decode()
+        with self.assertRaises(ValueError):
+            ventas_api.decodificar_cursor(ingenuo)
+        for cursor in (ingenuo, 'no-es-un-cursor'):
+            respuesta = self.client.get(reverse('ventas_api'), {'cursor': cursor})
+            self.assertEqual(respuesta.status_code, 400)
+
+
+# ─────────────────────────────────────────────
+# KPIs incrementales
+# ─────────────────────────────────────────────
+
+class KpisTests(TestCase):
+    """Los deltas se guardan como pendientes en la transacción y se pliegan al confirmar."""
+
+    def test_plegado_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            venta = Venta.objects.create(cliente='C', total=Decimal('12.50'), estado='Completada')
+            # Dentro de la transacción solo hay pendientes: ninguna fila de contador se toca
+            self.assertEqual(KpiContador.objects.get(clave='ingreso_total').valor, 0)
+            self.assertEqual(KpiPendiente.objects.count(), 5)
+        self.assertFalse(KpiPendiente.objects.exists())
+        self.assertEqual(kpis.contadores('ventas', 'ventas_completadas', 'ingreso_total'),
+                         {'ventas': 1, 'ventas_completadas': 1, 'ingreso_total': Decimal('12.50')})
+        self.assertEqual(KpiDiario.objects.get(fecha=timezone.localdate(venta.fecha)).ventas_num, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.delete()
+        self.assertEqual(kpis.contadores('ventas')['ventas'], 0)
+        self.assertEqual(kpis.verificar(), [])
+
+    def test_verificar_y_reconstruir_con_pendientes(self):
+        Venta.objects.create(cliente='C', total=Decimal('7'), estado='Pendiente')
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        producto  = Producto.objects.create(nombre='P', precio=10, stock=0, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        proveedor = Proveedor.objects.create(nombre='V', telefono='1', email='v@x.com')
+        Compra.objects.create(Producto=producto, Proveedor=proveedor, cantidad=2, precio_unitario=Decimal('3'),
+                              estado='Completada')
+        # Sin ejecutar los on_commit: los pendientes cuentan en la verificación
+        self.assertTrue(KpiPendiente.objects.exists())
+        self.assertEqual(kpis.verificar(), [])
+
+        KpiContador.objects.filter(clave='ventas').update(valor=99)
+        self.assertIn('contador ventas: guardado 100.00, esperado 1', kpis.verificar()[0])
+        kpis.reconstruir()
+        self.assertFalse(KpiPendiente.objects.exists())
+        self.assertEqual(kpis.contadores('ventas', 'compras_completadas'), {'ventas': 1, 'compras_completadas': 1})
+        self.assertEqual(kpis.verificar(), [])
+
+
+# ─────────────────────────────────────────────
+# Presupuesto de consultas de la página de reportes
+# ─────────────────────────────────────────────
+
+@override_settings(REPORTES_CACHE_TTL=0)
+class ReportesConsultasTests(TestCase):
+    """
+    Las secciones del reporte deben usar el mismo número de consultas con
+    pocos o muchos registros. Si este test falla, alguna sección volvió a
+    consultar por fila (ver app/services/reportes.py). Se mide sin caché.
+    """
+    # Todas las secciones y reportes_data: sesión, usuario, sondas y datos
+    PRESUPUESTO = 61
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('reportes', password='x', is_superuser=True)
+        cls.marca   = Marca.objects.create(nombreMarca='Marca')
+        cls.tipo    = TipoProductos.objects.create(nombre_tipo='Tipo')
+        cls.unidad  = UnidadMedida.objects.create(nombre_unidad='Unidad')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _poblar(self, n):
+        """Crea n productos, clientes y proveedores, 3n ventas con 2 líneas y 2n compras."""
+        base = Producto.objects.count()
+        Producto.objects.bulk_create([
+            Producto(nombre=f'P{base + i}', precio=10, stock=i % 15,
+                     idMarca=self.marca, idTipo=self.tipo, idUnidad=self.unidad)
+            for i in range(n)
+        ])
+        Cliente.objects.bulk_create([
+            Cliente(nombre=f'C{base + i}', telefono='1', email='c@x.com') for i in range(n)
+        ])
+        Proveedor.objects.bulk_create([
+            Proveedor(nombre=f'V{base + i}', telefono='1', email='v@x.com') for i in range(n)
+        ])
+        # MySQL no devuelve los pk de bulk_create: se vuelven a leer
+        productos   = list(Producto.objects.order_by('-pk')[:n])
+        clientes    = list(Cliente.objects.order_by('-pk')[:n])
+        proveedores = list(Proveedor.objects.order_by('-pk')[:n])
+
+        ventas = [
+            Venta.objects.create(cliente=c.nombre, idCliente=c, total=Decimal('30'), estado='Completada')
+            for c in clientes for _ in range(3)
+        ]
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=v, producto=p, producto_nombre=p.nombre, precio=10, cantidad=cantidad)
+            for i, v in enumerate(ventas)
+            for p, cantidad in ((productos[i % n], 1), (productos[(i + 1) % n], 2))
+        ])
+        Compra.objects.bulk_create([
+            Compra(Producto=productos[i % n], Proveedor=proveedores[i % n], usuario=self.usuario,
+                   cantidad=1, precio_unitario=5)
+            for i in range(2 * n)
+        ])
+
+    def _consultas(self):
+        """Pide todas las secciones; retorna (consultas en total, {sección: json})."""
+        datos = {}
+        with CaptureQueriesContext(connection) as ctx:
+            for seccion in SECCIONES:
+                url = reverse('reportes_data') if seccion == 'datos' else reverse('reporte_seccion', args=[seccion])
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                datos[seccion] = respuesta.json()
+        return len(ctx.captured_queries), datos
+
+    def test_presupuesto_fijo(self):
+        self._poblar(3)
+        pocas, _ = self._consultas()
+        self.assertLessEqual(pocas, self.PRESUPUESTO)
+
+        self._poblar(60)
+        muchas, _ = self._consultas()
+        self.assertEqual(muchas, pocas)
+
+    def test_primer_detalle_y_conteos(self):
+        self._poblar(3)
+        _, datos = self._consultas()
+
+        venta   = Venta.objects.order_by('-fecha', '-pk').first()
+        primera = venta.detalles.order_by('pk').first()
+        fila    = next(v for v in datos['ventas']['ventas_data'] if v['id'] == venta.pk)
+        self.assertEqual((fila['producto'], fila['cantidad']), (primera.producto_nombre, primera.cantidad))
+
+        por_proveedor = {p['id']: p['num_compras'] for p in datos['proveedores']['proveedores_data']}
+        for proveedor in Proveedor.objects.all():
+            self.assertEqual(por_proveedor[proveedor.pk], Compra.objects.filter(Proveedor=proveedor).count())
+
+        stock_bajo = Producto.objects.filter(stock__lte=10).count()
+        self.assertEqual(datos['productos']['stock_bajo'], stock_bajo)
+        self.assertEqual(datos['datos']['stock_bajo'], stock_bajo)
+
+
+@override_settings(REPORTES_CACHE_TTL=300)
+class ReportesCacheTests(TestCase):
+    """La caché de reportes se sirve hasta que un cambio confirmado sube la versión."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('reportes', password='x', is_superuser=True)
+
+    def setUp(self):
+        caches['reportes'].clear()
+        self.client.force_login(self.usuario)
+
+    def _pedir(self, etag=None):
+        cabeceras = {'If-None-Match': etag} if etag else {}
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(reverse('reporte_seccion', args=['clientes']), headers=cabeceras)
+        return respuesta, len(ctx.captured_queries)
+
+    def test_acierto_e_invalidacion(self):
+        primera, consultas = self._pedir()
+        self.assertEqual(primera.status_code, 200)
+        # Acierto: sesión, usuario y sondas, sin recalcular la sección
+        segunda, en_cache = self._pedir()
+        self.assertLess(en_cache, consultas)
+        self.assertEqual(segunda.json(), primera.json())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(nombre='Nuevo', telefono='1', email='n@x.com')
+        tercera, _ = self._pedir()
+        self.assertEqual(len(tercera.json()['clientes_data']), 1)
+
+    def test_get_condicional(self):
+        primera, _ = self._pedir()
+        self.assertTrue(primera.has_header('ETag'))
+
+        sin_cambios, _ = self._pedir(primera['ETag'])
+        self.assertEqual(sin_cambios.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(nombre='Nuevo', telefono='1', email='n@x.com')
+        con_cambios, _ = self._pedir(primera['ETag'])
+        self.assertEqual(con_cambios.status_code, 200)
+        self.assertNotEqual(con_cambios['ETag'], primera['ETag'])
+
+
+@override_settings(REPORTES_PRECARGA=True, REPORTES_HILOS=4, REPORTES_CACHE_TTL=0)
+class ReportesPrecargaTests(TransactionTestCase):
+    """Con REPORTES_PRECARGA la página embebe todas las secciones, armadas en hilos que cierran su conexión."""
+
+    def test_precarga_en_hilos(self):
+        Cliente.objects.create(nombre='Ana', telefono='1', email='a@x.com')
+        self.client.force_login(User.objects.create_user('reportes', password='x', is_superuser=True))
+
+        principal, cerradas = threading.get_ident(), []
+        clase  = type(connections['default'])
+        cerrar = clase.close
+
+        def close(conexion):
+            if threading.get_ident() != principal:
+                cerradas.append(threading.get_ident())
+            return cerrar(conexion)
+
+        with mock.patch.object(clase, 'close', close):
+            respuesta = self.client.get(reverse('reportes'))
+
+        secciones = [nombre for nombre in SECCIONES if nombre != 'datos']
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(sorted(respuesta.context['precarga']), sorted(secciones))
+        self.assertEqual(len(respuesta.context['precarga']['clientes']['clientes_data']), 1)
+        self.assertIn('id="reportes-precarga"', respuesta.content.decode())
+        # Un tiempo por sección en una sola cabecera Server-Timing
+        self.assertEqual([parte.split(';')[0] for parte in respuesta['Server-Timing'].split(', ')], secciones)
+        # Cada sección cierra la conexión de su hilo al terminar
+        self.assertEqual(len(cerradas), len(secciones))
+
+
+# ─────────────────────────────────────────────
+# Series de tiempo
+# ─────────────────────────────────────────────
+
+class SeriesTests(TestCase):
+    """Agrupación en hora local, periodos vacíos en 0 y rango acotado."""
+
+    def _venta(self, dia, hora, total):
+        fecha = timezone.make_aware(datetime.datetime.combine(dia, hora), zona())
+        return Venta.objects.create(cliente='C', total=Decimal(total), estado='Completada', fecha=fecha)
+
+    def test_dia_local_y_relleno(self):
+        hoy = datetime.date(2026, 3, 10)
+        # 23:30 en Bogotá ya es el día siguiente en UTC
+        self._venta(hoy - datetime.timedelta(days=2), datetime.time(23, 30), '100')
+        self._venta(hoy, datetime.time(8, 0), '50')
+        self._venta(hoy - datetime.timedelta(days=30), datetime.time(12, 0), '999')  # fuera del rango
+
+        datos = serie('ventas_total', hoy - datetime.timedelta(days=3), hoy, 'dia')
+        self.assertEqual(datos['labels'], ['2026-03-07', '2026-03-08', '2026-03-09', '2026-03-10'])
+        self.assertEqual(datos['valores'], [0, 100.0, 0, 50.0])
+
+        por_hora = serie('ventas_num', hoy, hoy, 'hora')
+        self.assertEqual(len(por_hora['valores']), 24)
+        self.assertEqual(por_hora['valores'][8], 1)
+
+    def test_semana_mes_y_ultimos_dias(self):
+        hoy = timezone.localdate(timezone=zona())
+        self._venta(hoy - datetime.timedelta(days=40), datetime.time(12, 0), '10')
+        self._venta(hoy, datetime.time(0, 5), '20')
+
+        mensual = serie('ventas_total', hoy - datetime.timedelta(days=40), hoy, 'mes')
+        self.assertEqual(mensual['total'], 30.0)
+        self.assertEqual(mensual['labels'][-1], hoy.strftime('%Y-%m'))
+
+        semanal = serie('ventas_total', hoy - datetime.timedelta(days=40), hoy, 'semana')
+        lunes   = [datetime.date.fromisoformat(label).weekday() for label in semanal['labels']]
+        self.assertEqual(set(lunes), {0})
+        self.assertEqual(semanal['total'], 30.0)
+
+        # La gráfica del tablero termina hoy, no en los días más antiguos
+        labels, valores = ventas_por_dia()
+        self.assertEqual(labels[-1], hoy.isoformat())
+        self.assertEqual(valores[-1], 20.0)
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(ValueError):
+            serie('ventas_total', granularidad='anio')
+        with self.assertRaises(ValueError):
+            serie('compras_num', granularidad='hora')
+        with self.assertRaises(ValueError):
+            serie('ventas_total', '2026-03-10', '2026-03-01')
+
+
+# ─────────────────────────────────────────────
+# Ranking ABC
+# ─────────────────────────────────────────────
+
+class RankingTests(TestCase):
+    """Un solo GROUP BY por producto y clases por participación acumulada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        # Ingresos 700, 150, 100, 50: acumulado previo 0 %, 70 %, 85 %, 95 %
+        cls.productos = [
+            Producto.objects.create(nombre=f'P{i}', precio=precio, stock=100, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+            for i, precio in enumerate((70, 15, 10, 5))
+        ]
+        venta = Venta.objects.create(cliente='C', total=Decimal('1000'), estado='Completada')
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=venta, producto=p, producto_nombre=p.nombre, precio=p.precio, cantidad=10)
+            for p in cls.productos
+        ])
+        vieja = Venta.objects.create(cliente='C', total=Decimal('9999'), estado='Completada',
+                                     fecha=timezone.now() - datetime.timedelta(days=400))
+        DetalleVenta.objects.create(venta=vieja, producto=cls.productos[3], producto_nombre='P3',
+                                    precio=Decimal('9999'), cantidad=1)
+
+    def test_clases_y_una_consulta(self):
+        with self.assertNumQueries(1):
+            ranking = ranking_productos()
+        self.assertEqual([p['producto_id'] for p in ranking['productos']], [p.pk for p in self.productos])
+        self.assertEqual([p['clase'] for p in ranking['productos']], ['A', 'A', 'B', 'C'])
+        self.assertEqual(ranking['total_ingresos'], 1000.0)
+        self.assertEqual(ranking['productos'][0]['participacion'], 70.0)
+        self.assertEqual(ranking['resumen']['A']['productos'], 2)
+
+    def test_endpoint(self):
+        usuario = User.objects.create_user('ranking', password='x', is_superuser=True)
+        self.client.force_login(usuario)
+        respuesta = self.client.get(reverse('reporte_ranking'), {'desde': '2026-13-01'})
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.get(reverse('reporte_ranking'))
+        self.assertEqual(len(respuesta.json()['productos']), 4)
+
+
+# ─────────────────────────────────────────────
+# Feed de actividad
+# ─────────────────────────────────────────────
+
+class ActividadTests(TestCase):
+    """UNION ALL de ventas y compras en orden cronológico, paginado por cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        producto  = Producto.objects.create(nombre='P', precio=10, stock=100, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        proveedor = Proveedor.objects.create(nombre='V', telefono='1', email='v@x.com')
+        dia = datetime.date(2026, 3, 10)
+
+        def venta(fecha, hora):
+            momento = timezone.make_aware(datetime.datetime.combine(fecha, hora), zona())
+            return Venta.objects.create(cliente='C', total=Decimal('10'), estado='Completada', fecha=momento)
+
+        def compra(fecha):
+            return Compra.objects.create(Producto=producto, Proveedor=proveedor, cantidad=2,
+                                         precio_unitario=5, fechaCompra=fecha)
+
+        # Orden esperado, del más reciente al más antiguo
+        cls.esperado = [
+            f'V{venta(dia, datetime.time(8, 0)).pk:03d}',
+            f'V{venta(dia, datetime.time(0, 0)).pk:03d}',       # mismo instante que la compra: venta primero
+            *reversed([f'C{compra(dia).pk:03d}' for _ in range(2)]),
+            f'V{venta(dia - datetime.timedelta(days=1), datetime.time(23, 30)).pk:03d}',
+            f'C{compra(dia - datetime.timedelta(days=1)).pk:03d}',
+        ]
+
+    def test_orden_y_paginas(self):
+        with self.assertNumQueries(1):
+            todos, siguiente = pagina_actividad(limite=50)
+        self.assertIsNone(siguiente)
+        self.assertEqual([m['id'] for m in todos], self.esperado)
+        self.assertEqual(todos[2]['valor'], 10.0)
+
+        vistos, cursor = [], None
+        while True:
+            pagina, cursor = pagina_actividad(cursor, limite=2)
+            vistos += [m['id'] for m in pagina]
+            if not cursor:
+                break
+        self.assertEqual(vistos, self.esperado)
+
+    def test_cursor_invalido(self):
+        with self.assertRaises(ValueError):
+            pagina_actividad('no-es-un-cursor')
+
+
+# ─────────────────────────────────────────────
+# Puntos de reorden
+# ─────────────────────────────────────────────
+
+@override_settings(REORDEN_DIAS_DEMANDA=4, REORDEN_NIVEL_SERVICIO=1.0, REORDEN_DIAS_ENTREGA=7,
+                   REORDEN_DIAS_COBERTURA=10)
+class ReordenTests(TestCase):
+    """Demanda diaria, stock de seguridad y punto de reorden de todos los productos en un lote."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.vendido = Producto.objects.create(nombre='Vendido', precio=10, stock=12, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        cls.quieto  = Producto.objects.create(nombre='Quieto',  precio=10, stock=3,  idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        proveedor   = Proveedor.objects.create(nombre='V', telefono='1', email='v@x.com', envio=4)
+        Compra.objects.create(Producto=cls.vendido, Proveedor=proveedor, cantidad=1, precio_unitario=1)
+
+        # Ventana de 4 días terminando el 10/03: 2, 0, 4, 2 unidades (media 2, desviación muestral 1.633)
+        cls.hasta = datetime.date(2026, 3, 10)
+        for atras, cantidad in ((3, 2), (1, 4), (0, 2), (10, 50)):
+            dia   = cls.hasta - datetime.timedelta(days=atras)
+            venta = Venta.objects.create(cliente='C', total=Decimal('1'), estado='Completada',
+                                         fecha=timezone.make_aware(datetime.datetime.combine(dia, datetime.time(23, 0)), zona()))
+            DetalleVenta.objects.create(venta=venta, producto=cls.vendido, producto_nombre='Vendido', precio=1, cantidad=cantidad)
+
+    def test_calculo_y_sugeridas(self):
+        self.assertEqual(calcular_puntos_reorden(hasta=self.hasta), 2)
+
+        punto = PuntoReorden.objects.get(producto=self.vendido)
+        self.assertEqual(punto.dias_entrega, 4)
+        self.assertEqual(punto.demanda_diaria, Decimal('2.000'))
+        self.assertEqual(punto.stock_seguridad, 4)      # ceil(1.0 · 1.633 · √4)
+        self.assertEqual(punto.punto_reorden, 12)       # ceil(2 · 4 + 4)
+        self.assertEqual(punto.nivel_objetivo, 32)      # 12 + 2 · 10
+
+        quieto = PuntoReorden.objects.get(producto=self.quieto)
+        self.assertEqual((quieto.dias_entrega, quieto.punto_reorden), (7, 0))
+
+        with self.assertNumQueries(1):
+            sugeridas = compras_sugeridas()
+        self.assertEqual([(s.producto_id, s.cantidad_sugerida) for s in sugeridas], [(self.vendido.pk, 20)])
+
+        # Con punto calculado manda el punto de reorden, no el umbral fijo
+        self.assertEqual(list(Producto.objects.filter(stock_bajo_q()).order_by('pk')), [self.vendido])
+
+    def test_umbral_unico(self):
+        def por_filtro():
+            return {valor: [p.nombre for p in filtros.filtrar('productos', Producto.objects.order_by('pk'), {'stock': valor})]
+                    for valor in ('disponible', 'bajo')}
+
+        def por_producto():
+            return [p.nombre for p in Producto.objects.select_related('reorden').order_by('pk') if esta_bajo(p)]
+
+        # Sin puntos calculados: umbral fijo (12 > 10, 3 <= 10)
+        self.assertEqual(por_filtro(), {'disponible': ['Vendido'], 'bajo': ['Quieto']})
+        self.assertEqual(por_producto(), ['Quieto'])
+
+        calcular_puntos_reorden(hasta=self.hasta)
+        self.assertEqual(por_filtro(), {'disponible': ['Quieto'], 'bajo': ['Vendido']})
+        self.assertEqual(por_producto(), ['Vendido'])
+
+
+# ─────────────────────────────────────────────
+# Cubo de ventas
+# ─────────────────────────────────────────────
+
+class CuboTests(TestCase):
+    """Celdas (día, producto, marca, tipo, cliente) mantenidas al vuelo y consultas solo sobre el cubo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.marca, cls.otra = Marca.objects.create(nombreMarca='M'), Marca.objects.create(nombreMarca='N')
+        tipo, unidad = TipoProductos.objects.create(nombre_tipo='T'), UnidadMedida.objects.create(nombre_unidad='U')
+        cls.p1 = Producto.objects.create(nombre='P1', precio=10, stock=100, idMarca=cls.marca, idTipo=tipo, idUnidad=unidad)
+        cls.p2 = Producto.objects.create(nombre='P2', precio=5,  stock=100, idMarca=cls.otra,  idTipo=tipo, idUnidad=unidad)
+        cls.ana, cls.beto = (Cliente.objects.create(nombre='Ana', telefono='1', email='a@x.com'),
+                             Cliente.objects.create(nombre='Beto', telefono='2', email='b@x.com'))
+
+    def _venta(self, dia, cliente, lineas):
+        fecha = timezone.make_aware(datetime.datetime.combine(dia, datetime.time(23, 30)), zona())
+        venta = Venta.objects.create(cliente=cliente.nombre, idCliente=cliente, total=0, estado='Completada', fecha=fecha)
+        crear_detalles(venta, [p.pk for p, _, _ in lineas], [p.nombre for p, _, _ in lineas],
+                       [precio for _, precio, _ in lineas], [cantidad for _, _, cantidad in lineas])
+        return venta
+
+    def test_mantenimiento_incremental(self):
+        dia   = datetime.date(2026, 3, 10)
+        venta = self._venta(dia, self.ana, [(self.p1, 10, 2), (self.p2, 5, 1)])
+        otra  = self._venta(dia, self.beto, [(self.p1, 10, 1)])
+        DetalleVenta.objects.create(venta=otra, producto=self.p2, producto_nombre='P2', precio=5, cantidad=4)
+        self.assertEqual(cubo.verificar(), [])
+        # 23:30 en Bogotá ya es el día siguiente en UTC: la celda es del día local
+        self.assertEqual(set(CuboVenta.objects.values_list('dia', flat=True)), {dia})
+
+        editar_detalles(venta, [self.p1.pk], ['P1'], [12], [3])
+        self.assertEqual(cubo.verificar(), [])
+
+        venta.fecha     = venta.fecha - datetime.timedelta(days=1)
+        venta.idCliente = self.beto
+        venta.save()
+        self.assertEqual(cubo.verificar(), [])
+
+        self.p2.idMarca = self.marca
+        self.p2.save()
+        self.assertEqual(cubo.verificar(), [])
+
+        self.p2.delete()
+        self.beto.delete()
+        self.assertEqual(cubo.verificar(), [])
+
+        otra.delete()
+        self.assertEqual(cubo.verificar(), [])
+        self.assertEqual(list(CuboVenta.objects.values_list('producto', 'cliente', 'unidades', 'ingresos')),
+                         [(self.p1.pk, 0, 3, Decimal('36.00'))])
+
+    def test_escritura_en_una_sentencia(self):
+        # INSERT de líneas + marca y tipo de los productos + upsert del cubo, sin importar las líneas
+        for n in (1, 50):
+            fecha = timezone.make_aware(datetime.datetime(2026, 3, 10, 12), zona())
+            venta = Venta.objects.create(cliente='Ana', idCliente=self.ana, total=0, estado='Completada', fecha=fecha)
+            productos = [(self.p1, self.p2)[i % 2] for i in range(n)]
+            with self.assertNumQueries(3):
+                crear_detalles(venta, [p.pk for p in productos], [p.nombre for p in productos], [10] * n, [1] * n)
+        self.assertEqual(cubo.verificar(), [])
+        self.assertEqual(sorted(CuboVenta.objects.values_list('producto', 'unidades', 'lineas')),
+                         sorted([(self.p1.pk, 26, 26), (self.p2.pk, 25, 25)]))
+
+    def test_consultar(self):
+        self._venta(datetime.date(2026, 3, 10), self.ana,  [(self.p1, 10, 2), (self.p2, 5, 1)])
+        self._venta(datetime.date(2026, 3, 11), self.beto, [(self.p1, 10, 1)])
+        self._venta(datetime.date(2026, 4, 2),  self.ana,  [(self.p2, 5, 6)])
+
+        with self.assertNumQueries(3):
+            datos = cubo.consultar(['marca', 'mes'], desde='2026-03-01', hasta='2026-04-30')
+        self.assertEqual([(f['mes'], f['marca_nombre'], f['unidades'], f['ingresos']) for f in datos['filas']],
+                         [('2026-03', 'M', 3, 30.0), ('2026-03', 'N', 1, 5.0), ('2026-04', 'N', 6, 30.0)])
+        self.assertEqual(datos['total'], {'unidades': 10, 'ingresos': 65.0, 'lineas': 4})
+
+        datos = cubo.consultar(['cliente'], {'producto': [self.p1.pk]}, '2026-03-01', '2026-04-30')
+        self.assertEqual([(f['cliente_nombre'], f['ingresos']) for f in datos['filas']], [('Ana', 20.0), ('Beto', 10.0)])
+
+        with self.assertRaises(ValueError):
+            cubo.consultar(['dia', 'mes'])
+        with self.assertRaises(ValueError):
+            cubo.consultar(['color'])
+
+    def test_reconstruir(self):
+        self._venta(datetime.date(2026, 3, 10), self.ana,  [(self.p1, 10, 2)])
+        self._venta(datetime.date(2026, 3, 20), self.beto, [(self.p2, 5, 1)])
+        CuboVenta.objects.filter(cliente=self.ana.pk).delete()
+        CuboVenta.objects.create(dia=datetime.date(2020, 1, 1), producto=self.p1.pk, unidades=1, ingresos=1, lineas=1)
+        self.assertEqual(len(cubo.verificar()), 2)
+
+        self.assertEqual(cubo.reconstruir(hilos=1, dias_bloque=7), (2, 2))
+        self.assertEqual(cubo.verificar(), [])
+
+
+# ─────────────────────────────────────────────
+# Caché columnar de líneas de venta
+# ─────────────────────────────────────────────
+
+@override_settings(COLUMNAR_REFRESCO=0)
+class ColumnarTests(TestCase):
+    """Arrays en memoria: carga, anexo por marca de agua, recarga por generación y tope de memoria."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        cls.p1 = Producto.objects.create(nombre='P1', precio=10, stock=100, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        cls.p2 = Producto.objects.create(nombre='P2', precio=5,  stock=100, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        cls.dia = timezone.localdate()
+        # Lunes 09:15 y 23:30 locales de la semana en curso
+        lunes = cls.dia - datetime.timedelta(days=cls.dia.weekday())
+        cls.ventas = []
+        for hora, producto, precio, cantidad in ((datetime.time(9, 15), cls.p1, 10, 2), (datetime.time(23, 30), cls.p2, 5, 7)):
+            venta = Venta.objects.create(cliente='C', total=precio * cantidad, estado='Completada',
+                                         fecha=timezone.make_aware(datetime.datetime.combine(lunes, hora), zona()))
+            DetalleVenta.objects.create(venta=venta, producto=producto, producto_nombre=producto.nombre,
+                                        precio=precio, cantidad=cantidad)
+            cls.ventas.append(venta)
+
+    def setUp(self):
+        columnar.reiniciar()
+        self.addCleanup(columnar.reiniciar)
+
+    def test_consultas_y_refresco(self):
+        self.assertEqual(columnar.totales()['ingresos'], 55.0)
+        self.assertEqual([(p['nombre'], p['ingresos']) for p in columnar.top_productos(5)], [('P2', 35.0), ('P1', 20.0)])
+        self.assertEqual([p['nombre'] for p in columnar.top_productos(1, por='unidades')], ['P2'])
+        mapa = columnar.mapa_calor(medida='unidades')['valores']
+        self.assertEqual((mapa[0][9], mapa[0][23], sum(map(sum, mapa))), (2, 7, 9))
+
+        # Línea nueva: se anexa por marca de agua, sin recargar
+        DetalleVenta.objects.create(venta=self.ventas[0], producto=self.p1, producto_nombre='P1', precio=10, cantidad=1)
+        self.assertEqual(columnar.totales()['unidades'], 10)
+        self.assertEqual((columnar.estado()['cargas'], columnar.estado()['anexos']), (1, 1))
+
+        # Línea editada: la generación compartida obliga a recargar
+        detalle = DetalleVenta.objects.get(producto=self.p2)
+        detalle.cantidad = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            detalle.save()
+        self.assertEqual(columnar.totales()['unidades'], 4)
+        self.assertEqual(columnar.estado()['cargas'], 2)
+
+    @override_settings(COLUMNAR_MAX_MB=columnar.BYTES_POR_FILA / 2 ** 20)
+    def test_tope_de_memoria(self):
+        datos = columnar.columnas()
+        self.assertEqual(len(datos.ids), 1)
+        self.assertTrue(columnar.estado()['recortado'])
+        self.assertEqual(columnar.top_productos(5, nombres=False, datos=datos)[0]['producto_id'], self.p2.pk)
+
+
+# ─────────────────────────────────────────────
+# Exportación a Excel en streaming
+# ─────────────────────────────────────────────
+
+class ExcelExportTests(TestCase):
+    """Libro write-only desde un iterador: filas, anchos por muestra, tabla y fila de total."""
+
+    def test_escribir_desde_generador(self):
+        n      = MUESTRA_ANCHO + 20
+        filas  = ((f'V{i}', 'x' * (60 if i == n - 1 else 3), i * 1.5) for i in range(n))
+        salida = io.BytesIO()
+        self.assertEqual(escribir_excel('REPORTE', ['ID', 'Cliente', 'Total'], filas, salida), n)
+
+        salida.seek(0)
+        hoja = load_workbook(salida).active
+        self.assertEqual(hoja['A1'].value, 'REPORTE')
+        self.assertEqual([c.value for c in hoja[3]], ['ID', 'Cliente', 'Total'])
+        self.assertEqual((hoja['A4'].value, hoja[f'C{n + 3}'].value), ('V0', (n - 1) * 1.5))
+        self.assertEqual(hoja[f'A{n + 4}'].value, f'Total de registros: {n}')
+        self.assertIn(f'A{n + 4}:C{n + 4}', {str(r) for r in hoja.merged_cells.ranges})
+        self.assertEqual(hoja.freeze_panes, 'A4')
+        self.assertEqual(hoja.tables['Reporte'].ref, f'A3:C{n + 3}')
+        # La fila larga queda fuera de la muestra: el ancho sale de las primeras filas
+        self.assertEqual(hoja.column_dimensions['B'].width, 12)
+
+    def test_vista_sin_filas(self):
+        self.client.force_login(User.objects.create_user('excel', password='x'))
+        respuesta = self.client.get(reverse('exportar_ventas_excel'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        hoja = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        self.assertEqual(hoja['A4'].value, 'Total de registros: 0')
+        self.assertFalse(hoja.tables)
+
+
+# ─────────────────────────────────────────────
+# Exportación a CSV en streaming
+# ─────────────────────────────────────────────
+
+class CsvExportTests(TestCase):
+    """values_list paginado por id y respuesta en streaming, plana o gzip."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        producto = Producto.objects.create(nombre='Café', precio=10, stock=100, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        for i in range(5):
+            venta = Venta.objects.create(cliente=f'C{i}', total=10 * (i + 1), estado='Completada')
+            DetalleVenta.objects.create(venta=venta, producto=producto, producto_nombre='Café', precio=10, cantidad=i + 1)
+
+    def _leer(self, respuesta):
+        self.assertTrue(respuesta.streaming)
+        contenido = b''.join(respuesta.streaming_content)
+        if respuesta['Content-Type'] == 'application/gzip':
+            contenido = gzip.decompress(contenido)
+        return list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+
+    def test_lotes_por_id(self):
+        ventas = Venta.objects.values_list('id', 'cliente')
+        self.assertEqual([c for _, c in filas_por_lotes(ventas, lote=2)], [f'C{i}' for i in range(5)])
+
+        # Con orden: los campos del orden y el pk van primero; los empates se desempatan por pk
+        ventas = Venta.objects.values_list('estado', 'pk', 'cliente')
+        self.assertEqual([c for _, _, c in filas_por_lotes(ventas, lote=2, orden=('estado',))],
+                         [f'C{i}' for i in range(5)])
+        ventas = Venta.objects.values_list('total', 'pk', 'cliente')
+        with self.assertNumQueries(3):
+            self.assertEqual([c for _, _, c in filas_por_lotes(ventas, lote=2, orden=('-total',))],
+                             [f'C{i}' for i in reversed(range(5))])
+
+    def test_vistas(self):
+        # Sin sesión redirige al login sin generar nada
+        self.assertRedirects(self.client.get(reverse('exportar_ventas_csv')), reverse('login'),
+                             fetch_redirect_response=False)
+        self.client.force_login(User.objects.create_user('csv', password='x'))
+
+        filas = self._leer(self.client.get(reverse('exportar_ventas_csv')))
+        self.assertEqual(filas[0], ['ID', 'Cliente', 'Fecha', 'Total', 'Estado'])
+        self.assertEqual([f[1] for f in filas[1:]], [f'C{i}' for i in range(5)])
+
+        respuesta = self.client.get(reverse('exportar_ventas_lineas_csv'), {'gzip': '1'})
+        self.assertIn('.csv.gz', respuesta['Content-Disposition'])
+        filas = self._leer(respuesta)
+        self.assertEqual((len(filas), filas[1][6], filas[5][7]), (6, 'Café', '5'))
+
+        # El contenido se consume para que las consultas corran de verdad
+        totales = {nombre: len(self._leer(self.client.get(reverse(f'exportar_{nombre}_csv'))))
+                   for nombre in ('proveedores', 'productos', 'clientes', 'compras')}
+        self.assertEqual(totales, {'proveedores': 1, 'productos': 2, 'clientes': 1, 'compras': 1})
+
+
+# ─────────────────────────────────────────────
+# Exportaciones en segundo plano
+# ─────────────────────────────────────────────
+
+class ExportacionesTests(TestCase):
+    """Pedido, deduplicación, generación, descarga y vencimiento (sin pool: se procesa en el test)."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(EXPORTACIONES_DIR=directorio.name, EXPORTACIONES_INMEDIATO=False, REPORTES_CACHE_TTL=0)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client.force_login(User.objects.create_user('exportador', password='x'))
+        Venta.objects.create(cliente='C', total=10, estado='Completada')
+
+    def _pedir(self, **datos):
+        return self.client.post(reverse('exportacion_crear'), datos)
+
+    def test_pedido_deduplicado_y_descarga(self):
+        primero = self._pedir(entidad='ventas', formato='excel')
+        segundo = self._pedir(entidad='ventas', formato='excel')
+        otro    = self._pedir(entidad='ventas', formato='pdf')
+        self.assertEqual((primero.status_code, segundo.status_code, otro.status_code), (202, 200, 202))
+        job_id = primero.json()['exportacion']['id']
+        self.assertEqual(segundo.json()['exportacion']['id'], job_id)
+        self.assertNotEqual(otro.json()['exportacion']['id'], job_id)
+
+        estado = self.client.get(reverse('exportacion_estado', args=[job_id])).json()['exportacion']
+        self.assertEqual((estado['estado'], estado['descarga']), ('pendiente', None))
+        self.assertEqual(self.client.get(reverse('exportacion_descargar', args=[job_id])).status_code, 404)
+
+        self.assertEqual(exportaciones.procesar(job_id), 'lista')
+        self.assertIsNone(exportaciones.procesar(job_id))
+        estado = self.client.get(reverse('exportacion_estado', args=[job_id])).json()['exportacion']
+        self.assertEqual((estado['estado'], estado['filas']), ('lista', 1))
+        respuesta = self.client.get(estado['descarga'])
+        self.assertIn('.xlsx', respuesta['Content-Disposition'])
+        hoja = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        self.assertEqual(hoja['B4'].value, 'C')
+
+        # Listo: un pedido igual genera otro archivo con los datos actuales
+        nuevo = self._pedir(entidad='ventas', formato='excel')
+        self.assertEqual(nuevo.status_code, 202)
+        self.assertNotEqual(nuevo.json()['exportacion']['id'], job_id)
+
+    def test_vencimiento_y_filtros(self):
+        job, _ = exportaciones.solicitar('ranking', 'pdf', especificaciones.normalizar_filtros('ranking', {}))
+
+        # Las fechas por defecto y las mismas fechas explícitas son el mismo pedido
+        mismo = self._pedir(entidad='ranking', formato='pdf', **job.filtros)
+        self.assertEqual(mismo.json()['exportacion']['id'], job.pk)
+        self.assertEqual(self._pedir(entidad='ranking', formato='pdf', desde='2026-13-01').status_code, 400)
+        self.assertEqual(self._pedir(entidad='otra', formato='pdf').status_code, 400)
+
+        self.assertEqual(exportaciones.procesar(job.pk), 'lista')
+        job.refresh_from_db()
+        self.assertIsNone(job.clave_activa)
+        archivo = exportaciones.ruta(job)
+        self.assertTrue(archivo.is_file())
+
+        ExportacionJob.objects.filter(pk=job.pk).update(expira=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(self.client.get(reverse('exportacion_descargar', args=[job.pk])).status_code, 404)
+        self.assertEqual(exportaciones.vencer(), 1)
+        self.assertFalse(ExportacionJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(archivo.exists())
+
+    def test_reencolado_mientras_corre(self):
+        job, _  = exportaciones.solicitar('ventas', 'csv')
+        escribir, llamadas, resultados = especificaciones.escribir, [], []
+
+        def escribir_y_reencolar(*args):
+            # Mientras esta ejecución escribe, el trabajo se da por atascado y otra lo toma y lo termina
+            llamadas.append(1)
+            if len(llamadas) == 1:
+                self.assertEqual(exportaciones.reencolar_atascados(segundos=-60), 1)
+                resultados.append(exportaciones.procesar(job.pk))
+            return escribir(*args)
+
+        with mock.patch.object(especificaciones, 'escribir', side_effect=escribir_y_reencolar):
+            self.assertIsNone(exportaciones.procesar(job.pk))
+        self.assertEqual(resultados, ['lista'])
+
+        # Queda el archivo de la ejecución que cerró el trabajo; el de la otra se borra
+        job.refresh_from_db()
+        self.assertEqual(job.estado, 'lista')
+        self.assertEqual([f.name for f in exportaciones.ruta(job).parent.iterdir()], [job.archivo])
+
+
+# ─────────────────────────────────────────────
+# Filtros de las listas en las exportaciones
+# ─────────────────────────────────────────────
+
+@override_settings(REPORTES_CACHE_TTL=0)
+class FiltrosExportacionTests(TestCase):
+    """La lista y sus exportaciones usan la misma especificación de filtros."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('filtros', password='x')
+        hoy = timezone.localdate()
+        for cliente, dias in (('Ana', 0), ('Ana', 10), ('Beto', 0)):
+            Venta.objects.create(cliente=cliente, total=10, estado='Completada',
+                                 fecha=timezone.make_aware(datetime.datetime.combine(
+                                     hoy - datetime.timedelta(days=dias), datetime.time(12))))
+        cls.desde = (hoy - datetime.timedelta(days=1)).isoformat()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_normalizar_y_describir(self):
+        parametros = {'buscar': ' Ana ', 'fecha_desde': '2026-02-30', 'fecha_hasta': '2026-10-18', 'otro': 'x'}
+        self.assertEqual(filtros.normalizar('ventas', parametros), {'buscar': 'Ana', 'fecha_hasta': '2026-10-18'})
+        self.assertEqual(filtros.normalizar('compras', {'estado': 'Anulada'}), {})
+        self.assertEqual(filtros.descripcion('ventas', {'buscar': 'Ana', 'fecha_hasta': '2026-10-18'}),
+                         'Cliente: Ana · Hasta: 18/10/2026')
+        self.assertEqual(filtros.query('clientes', {'estado': 'activo', 'busqueda': ''}), '?estado=activo')
+
+    def test_lista_y_exportaciones_filtradas(self):
+        parametros = {'buscar': 'ana', 'fecha_desde': self.desde}
+        lista = self.client.get(reverse('ventas'), parametros)
+        self.assertEqual([v.cliente for v in lista.context['ventas']], ['Ana'])
+        self.assertEqual(lista.context['filtros_export'], f'?buscar=ana&fecha_desde={self.desde}')
+
+        respuesta = self.client.get(reverse('exportar_ventas_csv'), parametros)
+        filas = list(csv.reader(io.StringIO(b''.join(respuesta.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([f[1] for f in filas[1:]], ['Ana'])
+        respuesta = self.client.get(reverse('exportar_ventas_lineas_csv'), {'buscar': 'beto'})
+        self.assertEqual(len(b''.join(respuesta.streaming_content).splitlines()), 1)
+
+        respuesta = self.client.get(reverse('exportar_ventas_excel'), parametros)
+        hoja = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        self.assertIn('Filtros: Cliente: ana', hoja['A2'].value)
+        self.assertEqual(hoja['A5'].value, 'TOTAL')
+        self.assertEqual(hoja['A6'].value, 'Total de registros: 1')
+
+    @override_settings(EXPORTACIONES_INMEDIATO=False)
+    def test_trabajos_por_filtros(self):
+        url  = reverse('exportacion_crear')
+        uno  = self.client.post(url, {'entidad': 'ventas', 'formato': 'pdf', 'buscar': 'Ana', 'pagina': '2'})
+        otro = self.client.post(url, {'entidad': 'ventas', 'formato': 'pdf', 'buscar': 'Ana', 'fecha_desde': 'x'})
+        todo = self.client.post(url, {'entidad': 'ventas', 'formato': 'pdf'})
+        self.assertEqual(uno.json()['exportacion']['id'], otro.json()['exportacion']['id'])
+        self.assertEqual(uno.json()['exportacion']['filtros'], {'buscar': 'Ana'})
+        self.assertNotEqual(uno.json()['exportacion']['id'], todo.json()['exportacion']['id'])
+
+
+# ─────────────────────────────────────────────
+# Especificaciones de exportación
+# ─────────────────────────────────────────────
+
+@override_settings(REPORTES_CACHE_TTL=0)
+class EspecificacionesTests(TestCase):
+    """Cada exportación es una sola consulta values_list(); totales y columnas por modo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo, unidad = (Marca.objects.create(nombreMarca='M'), TipoProductos.objects.create(nombre_tipo='T'),
+                               UnidadMedida.objects.create(nombre_unidad='U'))
+        producto  = Producto.objects.create(nombre='Café', precio=10, stock=100, idMarca=marca, idTipo=tipo, idUnidad=unidad)
+        proveedor = Proveedor.objects.create(nombre='V', telefono='1', email='v@x.com', envio=4)
+        Cliente.objects.create(nombre='Ana', telefono='1', email='a@x.com')
+        Compra.objects.create(Producto=producto, Proveedor=proveedor, cantidad=3, precio_unitario=Decimal('2.50'))
+        for i in range(3):
+            venta = Venta.objects.create(cliente=f'C{i}', total=Decimal('10.25') * (i + 1), estado='Completada')
+            DetalleVenta.objects.create(venta=venta, producto=producto, producto_nombre='Café', precio=10, cantidad=i + 1)
+
+    def _escribir(self, entidad, formato):
+        salida = io.BytesIO()
+        with CaptureQueriesContext(connection) as consultas:
+            filas, _ = especificaciones.escribir(entidad, formato, {}, salida)
+        return filas, len(consultas), salida.getvalue()
+
+    def test_una_consulta_por_exportacion(self):
+        for entidad, spec in especificaciones.ESPECIFICACIONES.items():
+            if spec.modelo is None:
+                continue
+            for formato in especificaciones.BACKENDS:
+                with self.subTest(entidad=entidad, formato=formato):
+                    filas, consultas, _ = self._escribir(entidad, formato)
+                    self.assertEqual(consultas, 1)
+                    self.assertEqual(filas, spec.modelo.objects.count())
+
+    def test_totales_en_excel(self):
+        filas, _, contenido = self._escribir('ventas_lineas', 'excel')
+        hoja = load_workbook(io.BytesIO(contenido)).active
+        self.assertEqual(hoja[3][9].value, 'Importe')
+        suma = [c.value for c in hoja[filas + 4]]
+        self.assertEqual((suma[0], suma[7], suma[9]), ('TOTAL', 6, 60.0))
+        self.assertEqual(hoja[f'A{filas + 5}'].value, f'Total de registros: {filas}')
+
+    def test_formatos_por_modo(self):
+        pdf = especificaciones.documento('compras', 'pdf', {})
+        self.assertEqual(list(pdf.filas)[0][5:7], ['$2.50', '$7.50'])
+        self.assertEqual(pdf.totales()[0], 'TOTAL')
+        csv_ = especificaciones.documento('compras', 'csv', {})
+        self.assertEqual(list(csv_.filas)[0][6], Decimal('7.50'))
+
+        ranking = especificaciones.normalizar_filtros('ranking', {})
+        self.assertNotIn('ID Producto', especificaciones.documento('ranking', 'pdf', ranking).columnas)
+        self.assertIn('ID Producto', especificaciones.documento('ranking', 'excel', ranking).columnas)
+        with self.assertRaises(ValueError):
+            especificaciones.normalizar_filtros('inexistente', {})
@@ -1,20 +1,35 @@
 """
 UTILIDADES PARA EXPORTACION DE REPORTES
-Modulo con funciones para exportar datos a PDF y Excel
+Modulo con funciones para exportar datos a PDF, Excel y CSV
 """
 
+import csv
+import io
+import tempfile
+import zlib
+import warnings
+from itertools import chain, islice
 from weasyprint import HTML
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from django.http import HttpResponse
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+from django.db.models import Q
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from datetime import datetime
 
 
 # ====== EXPORTACION A PDF ======
-def exportar_pdf(titulo, columnas, datos, nombre_archivo):
+def escribir_pdf(titulo, columnas, datos, destino, filtros='', totales=None):
     """
-    Exporta datos a PDF usando WeasyPrint.
+    Escribe el reporte en PDF con WeasyPrint en `destino` (ruta o archivo
+    binario). `filtros` describe los filtros aplicados y va bajo el título.
+    `totales`, si se pasa, es una función que retorna la fila de totales
+    (o None) una vez recorridos los datos; va al pie de la tabla.
+    Retorna el número de filas.
 
     ─── CORRECCIÓN ──────────────────────────────────────────────────────────
     La versión anterior usaba {{ 'now'|date:'...' }} en el template, que no
@@ -24,145 +39,290 @@ def exportar_pdf(titulo, columnas, datos, nombre_archivo):
     ─────────────────────────────────────────────────────────────────────────
     """
     fecha_generacion = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+    datos            = list(datos)
 
     contexto = {
         'titulo':            titulo,
         'columnas':          columnas,
         'datos':             datos,
         'fecha_generacion':  fecha_generacion,   # ← corregido
+        'filtros':           filtros,
+        'totales':           totales() if totales else None,
     }
 
     html_string = render_to_string('Reportes/reporte_pdf.html', contexto)
     html_object = HTML(string=html_string, base_url='.')
-    pdf_bytes   = html_object.write_pdf()
+    html_object.write_pdf(destino)
+    return len(datos)
 
-    response = HttpResponse(pdf_bytes, content_type='application/pdf')
+
+def exportar_pdf(titulo, columnas, datos, nombre_archivo, filtros='', totales=None):
+    """Exporta datos a PDF usando WeasyPrint. Ver escribir_pdf()."""
+    pdf_bytes = io.BytesIO()
+    escribir_pdf(titulo, columnas, datos, pdf_bytes, filtros, totales)
+
+    response = HttpResponse(pdf_bytes.getvalue(), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.pdf"'
     return response
 
 
 # ====== EXPORTACION A EXCEL ======
-def exportar_excel(titulo, columnas, datos, nombre_archivo):
+
+COLOR_AZUL_OSCURO = '1E3A5F'
+COLOR_AZUL_MEDIO  = '4472C4'
+COLOR_BLANCO      = 'FFFFFF'
+
+# Filas del principio que se miran para calcular el ancho de cada columna
+MUESTRA_ANCHO = 500
+
+CONTENT_TYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _estilos_excel():
+    """Estilos con nombre: se registran una vez por libro y cada celda solo guarda la referencia."""
+    borde = Side(style='thin')
+    return [
+        NamedStyle(name='reporte_titulo',
+                   font=Font(name='Arial', size=14, bold=True, color=COLOR_BLANCO),
+                   fill=PatternFill(start_color=COLOR_AZUL_OSCURO, end_color=COLOR_AZUL_OSCURO, fill_type='solid'),
+                   alignment=Alignment(horizontal='center', vertical='center')),
+        NamedStyle(name='reporte_fecha',
+                   font=Font(name='Arial', size=9, italic=True, color='555555'),
+                   alignment=Alignment(horizontal='right', vertical='center')),
+        NamedStyle(name='reporte_encabezado',
+                   font=Font(name='Arial', size=10, bold=True, color=COLOR_BLANCO),
+                   fill=PatternFill(start_color=COLOR_AZUL_MEDIO, end_color=COLOR_AZUL_MEDIO, fill_type='solid'),
+                   alignment=Alignment(horizontal='center', vertical='center', wrap_text=False),
+                   border=Border(left=borde, right=borde, top=borde, bottom=borde)),
+        NamedStyle(name='reporte_suma',
+                   font=Font(name='Arial', size=10, bold=True, color=COLOR_AZUL_OSCURO),
+                   border=Border(top=Side(style='medium', color=COLOR_AZUL_OSCURO))),
+        NamedStyle(name='reporte_total',
+                   font=Font(name='Arial', size=10, bold=True, color=COLOR_AZUL_OSCURO),
+                   alignment=Alignment(horizontal='left', vertical='center')),
+    ]
+
+
+def _celda(hoja, valor, estilo):
+    celda       = WriteOnlyCell(hoja, value=valor)
+    celda.style = estilo
+    return celda
+
+
+def _valores(fila):
+    return list(fila.values()) if isinstance(fila, dict) else list(fila)
+
+
+def escribir_excel(titulo, columnas, datos, destino, filtros='', totales=None):
     """
-    Exporta datos a Excel usando openpyxl.
+    Escribe el reporte en `destino` (ruta o archivo binario) recorriendo
+    `datos` una sola vez; `datos` puede ser un generador. `filtros`
+    describe los filtros aplicados y va en la fila de la fecha. `totales`
+    (ver escribir_pdf) agrega una fila de sumas bajo la tabla. Retorna el
+    número de filas escritas.
 
-    ─── CORRECCIÓN ──────────────────────────────────────────────────────────
-    La versión anterior calculaba el ancho de columna solo mirando el header
-    y los datos, pero usaba chr(64 + col_num) para las letras — eso falla
-    para más de 26 columnas (Z+1 = '[', no 'AA'). Se reemplazó por
-    get_column_letter() de openpyxl que maneja correctamente columnas múltiples.
+    ─── STREAMING ───────────────────────────────────────────────────────────
+    La versión anterior armaba el Workbook completo en memoria, asignaba
+    Font/Border/Alignment/PatternFill nuevos a cada celda y al final volvía
+    a recorrer cada columna con iter_rows para calcular el ancho: la
+    exportación completa de ventas tardaba minutos y ocupaba gigabytes.
 
-    Además se agrega fila de fecha de generación y ancho mínimo de 12.
+    Ahora el libro es write-only (cada fila se escribe al disco al
+    agregarla) y la memoria no depende del número de filas:
+      - título, fecha, encabezados y total usan estilos con nombre
+      - las filas de datos van sin estilo propio: el bandeado, los bordes
+        y el filtro los pone una tabla de Excel (TableStyleMedium2)
+      - el ancho de cada columna se calcula con las primeras
+        MUESTRA_ANCHO filas, que se retienen antes de escribir (en
+        write-only los anchos deben ir antes que los datos)
     ─────────────────────────────────────────────────────────────────────────
     """
-    from openpyxl.utils import get_column_letter
-
     fecha_generacion = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    num_cols = len(columnas)
-
-    workbook  = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Reporte"
-
-    # ── Estilos ──
-    COLOR_AZUL_OSCURO = '1E3A5F'
-    COLOR_AZUL_MEDIO  = '4472C4'
-    COLOR_AZUL_CLARO  = 'DCE6F1'
-    COLOR_BLANCO      = 'FFFFFF'
-
-    titulo_font     = Font(name='Arial', size=14, bold=True, color=COLOR_BLANCO)
-    titulo_fill     = PatternFill(start_color=COLOR_AZUL_OSCURO, end_color=COLOR_AZUL_OSCURO, fill_type='solid')
-    titulo_align    = Alignment(horizontal='center', vertical='center')
-
-    fecha_font      = Font(name='Arial', size=9, italic=True, color='555555')
-    fecha_align     = Alignment(horizontal='right', vertical='center')
-
-    header_font     = Font(name='Arial', size=10, bold=True, color=COLOR_BLANCO)
-    header_fill     = PatternFill(start_color=COLOR_AZUL_MEDIO, end_color=COLOR_AZUL_MEDIO, fill_type='solid')
-    header_align    = Alignment(horizontal='center', vertical='center', wrap_text=False)
-
-    data_align      = Alignment(horizontal='left', vertical='center')
-    data_align_num  = Alignment(horizontal='right', vertical='center')
-    data_fill_par   = PatternFill(start_color=COLOR_AZUL_CLARO, end_color=COLOR_AZUL_CLARO, fill_type='solid')
-    data_border     = Border(
-        left=Side(style='thin'),   right=Side(style='thin'),
-        top=Side(style='thin'),    bottom=Side(style='thin'),
-    )
-    last_col_letter = get_column_letter(num_cols)
-
-    # ── Fila 1: Título ──
-    worksheet.merge_cells(f'A1:{last_col_letter}1')
-    cell = worksheet['A1']
-    cell.value     = titulo
-    cell.font      = titulo_font
-    cell.fill      = titulo_fill
-    cell.alignment = titulo_align
-    worksheet.row_dimensions[1].height = 28
+    num_cols         = len(columnas)
+    last_col_letter  = get_column_letter(num_cols)
 
-    # ── Fila 2: Fecha de generación ──
-    worksheet.merge_cells(f'A2:{last_col_letter}2')
-    cell = worksheet['A2']
-    cell.value     = f'Generado el: {fecha_generacion}'
-    cell.font      = fecha_font
-    cell.alignment = fecha_align
-    worksheet.row_dimensions[2].height = 16
+    workbook = Workbook(write_only=True)
+    for estilo in _estilos_excel():
+        workbook.add_named_style(estilo)
+    worksheet = workbook.create_sheet('Reporte')
 
-    # ── Fila 3: Encabezados ──
+    # ── Anchos: muestra del principio (mínimo 12, máximo 45) ──
+    datos   = iter(datos)
+    muestra = [_valores(fila) for fila in islice(datos, MUESTRA_ANCHO)]
     for col_num, columna in enumerate(columnas, 1):
-        cell = worksheet.cell(row=3, column=col_num)
-        cell.value     = columna
-        cell.font      = header_font
-        cell.fill      = header_fill
-        cell.alignment = header_align
-        cell.border    = data_border
+        max_len = max([len(str(columna))] + [len(str(f[col_num - 1])) for f in muestra
+                                              if len(f) >= col_num and f[col_num - 1] is not None])
+        worksheet.column_dimensions[get_column_letter(col_num)].width = min(max(max_len + 4, 12), 45)
+
+    # ── Freeze pane en fila 4 (encabezados siempre visibles) ──
+    worksheet.freeze_panes = 'A4'
+    worksheet.row_dimensions[1].height = 28
+    worksheet.row_dimensions[2].height = 16
     worksheet.row_dimensions[3].height = 22
+    if num_cols > 1:
+        worksheet.merged_cells.add(f'A1:{last_col_letter}1')
+        worksheet.merged_cells.add(f'A2:{last_col_letter}2')
+
+    # ── Filas 1-3: título, fecha de generación y encabezados ──
+    worksheet.append([_celda(worksheet, titulo, 'reporte_titulo')])
+    subtitulo = f'Generado el: {fecha_generacion}' + (f'   ·   Filtros: {filtros}' if filtros else '')
+    worksheet.append([_celda(worksheet, subtitulo, 'reporte_fecha')])
+    worksheet.append([_celda(worksheet, columna, 'reporte_encabezado') for columna in columnas])
+
+    # ── Filas 4+: datos ──
+    total = 0
+    for fila in chain(muestra, (_valores(f) for f in datos)):
+        worksheet.append(fila)
+        total += 1
+
+    if total:
+        ref = f'A3:{last_col_letter}{total + 3}'
+        tabla = Table(
+            displayName='Reporte', ref=ref, autoFilter=AutoFilter(ref=ref),
+            tableColumns=[TableColumn(id=i, name=str(columna)) for i, columna in enumerate(columnas, 1)],
+            tableStyleInfo=TableStyleInfo(name='TableStyleMedium2', showRowStripes=True),
+        )
+        with warnings.catch_warnings():
+            # openpyxl avisa siempre en write-only; las columnas ya van completas
+            warnings.simplefilter('ignore', UserWarning)
+            worksheet.add_table(tabla)
 
-    # ── Filas 4+: Datos ──
-    for row_num, fila in enumerate(datos, 4):
-        valores = list(fila.values()) if isinstance(fila, dict) else list(fila)
-        for col_num, valor in enumerate(valores, 1):
-            cell        = worksheet.cell(row=row_num, column=col_num)
-            cell.value  = valor
-            cell.border = data_border
-            # Números alineados a la derecha
-            if isinstance(valor, (int, float)):
-                cell.alignment = data_align_num
-            else:
-                cell.alignment = data_align
-            # Filas alternas
-            if (row_num - 4) % 2 == 0:
-                cell.fill = data_fill_par
-        worksheet.row_dimensions[row_num].height = 16
+    # ── Fila de sumas (fuera de la tabla, para no alterar su filtro) ──
+    total_row = total + 4
+    sumas     = totales() if totales else None
+    if sumas:
+        worksheet.append([_celda(worksheet, valor, 'reporte_suma') for valor in sumas])
+        total_row += 1
 
     # ── Fila total al final ──
-    total_row = len(datos) + 4
-    worksheet.merge_cells(f'A{total_row}:{last_col_letter}{total_row}')
-    cell_total           = worksheet[f'A{total_row}']
-    cell_total.value     = f'Total de registros: {len(datos)}'
-    cell_total.font      = Font(name='Arial', size=10, bold=True, color=COLOR_AZUL_OSCURO)
-    cell_total.alignment = Alignment(horizontal='left', vertical='center')
+    if num_cols > 1:
+        worksheet.merged_cells.add(f'A{total_row}:{last_col_letter}{total_row}')
     worksheet.row_dimensions[total_row].height = 18
+    worksheet.append([_celda(worksheet, f'Total de registros: {total}', 'reporte_total')])
 
-    # ── Ancho automático de columnas ──
-    for col_num, columna in enumerate(columnas, 1):
-        col_letter = get_column_letter(col_num)
-        max_len    = len(str(columna))
+    workbook.save(destino)
+    return total
 
-        for row in worksheet.iter_rows(min_row=4, max_row=len(datos) + 3,
-                                       min_col=col_num, max_col=col_num):
-            for cell in row:
-                if cell.value is not None:
-                    max_len = max(max_len, len(str(cell.value)))
 
-        # Ancho mínimo 12, máximo 45
-        worksheet.column_dimensions[col_letter].width = min(max(max_len + 4, 12), 45)
+def exportar_excel(titulo, columnas, datos, nombre_archivo, filtros='', totales=None):
+    """
+    Exporta datos a Excel usando openpyxl en modo write-only.
 
-    # ── Freeze pane en fila 4 (encabezados siempre visibles) ──
-    worksheet.freeze_panes = 'A4'
+    El libro se escribe en un archivo temporal (no en la memoria del
+    worker) y se entrega con FileResponse, que lo envía por bloques y lo
+    borra al cerrarlo. Ver escribir_excel().
+    """
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        escribir_excel(titulo, columnas, datos, archivo, filtros, totales)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=f'{nombre_archivo}.xlsx',
+                        content_type=CONTENT_TYPE_EXCEL)
+
+
+# ====== EXPORTACION A CSV ======
+
+# Filas por consulta al paginar y filas por bloque enviado al cliente
+CSV_LOTE   = 2000
+CSV_BLOQUE = 500
+
+
+def filas_por_lotes(queryset, lote=CSV_LOTE, orden=()):
+    """
+    Recorre un values_list() en páginas de `lote` filas (keyset). No
+    construye objetos del modelo y, a diferencia de iterator(), tampoco
+    retiene el resultado completo en el driver: mysqlclient no hace
+    streaming del cursor.
+
+    Sin `orden` el primer campo es la clave primaria y se recorre por id.
+    Con `orden` (campos no nulos, '-' para descendente) los primeros campos
+    son esos mismos seguidos del pk: se recorre en ese orden, desempatando
+    por pk, y cada página sigue a la última fila de la anterior.
+    """
+    claves       = [campo.lstrip('-') for campo in orden] + ['pk']
+    descendentes = [campo.startswith('-') for campo in orden] + [False]
+    ultimo = None
+    while True:
+        pagina = queryset.order_by(*orden, 'pk')
+        if ultimo is not None:
+            pagina = pagina.filter(_despues(claves, descendentes, ultimo))
+        filas = list(pagina[:lote])
+        yield from filas
+        if len(filas) < lote:
+            return
+        ultimo = filas[-1][:len(claves)]
+
+
+def _despues(claves, descendentes, valores):
+    """Filas posteriores a `valores` en el orden de `claves`: (a > x) OR (a = x AND b > y) OR ..."""
+    condicion = Q()
+    for i, (clave, descendente) in enumerate(zip(claves, descendentes)):
+        iguales = dict(zip(claves[:i], valores[:i]))
+        condicion |= Q(**iguales, **{f'{clave}__{"lt" if descendente else "gt"}': valores[i]})
+    return condicion
+
+
+def _bloques_csv(columnas, datos):
+    """Bytes UTF-8 (con BOM, para que Excel respete los acentos) en bloques de CSV_BLOQUE filas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columnas)
+    for num, fila in enumerate(datos, 1):
+        writer.writerow(fila)
+        if num % CSV_BLOQUE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.xlsx"'
-    workbook.save(response)
-    return response
\ No newline at end of file
+
+def _comprimir(bloques):
+    """Gzip al vuelo: cada bloque se comprime al pasar, sin juntar el archivo."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloque in bloques:
+        salida = compresor.compress(bloque)
+        if salida:
+            yield salida
+    yield compresor.flush()
+
+
+def escribir_csv(titulo, columnas, datos, destino, filtros='', totales=None):
+    """
+    Escribe el CSV en `destino` (archivo binario), para los trabajos en
+    segundo plano. Misma firma que escribir_pdf/escribir_excel: el CSV no
+    lleva título, filtros ni totales, solo encabezados y filas. Retorna el
+    número de filas.
+    """
+    filas = 0
+
+    def contar():
+        nonlocal filas
+        for fila in datos:
+            filas += 1
+            yield fila
+
+    for bloque in _bloques_csv(columnas, contar()):
+        destino.write(bloque)
+    return filas
+
+
+def exportar_csv(columnas, datos, nombre_archivo, comprimir=False):
+    """
+    Exporta datos a CSV con StreamingHttpResponse.
+
+    `datos` se recorre a medida que el cliente descarga (normalmente un
+    generador sobre filas_por_lotes()), así que la memoria no depende del
+    número de filas. Con comprimir=True se entrega un .csv.gz.
+    """
+    contenido = _bloques_csv(columnas, datos)
+    if comprimir:
+        response = StreamingHttpResponse(_comprimir(contenido), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.csv.gz"'
+    else:
+        response = StreamingHttpResponse(contenido, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.csv"'
+    return response
@@ -6,6 +6,7 @@ from django.views import View
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse
 from app.decorators import admin_login_required
+from app.services import filtros
 from ...models import Cliente
 
 PATRON_EMAIL = r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$'
@@ -61,14 +62,11 @@ def _validar_cliente(nombre, documento, telefono, email, direccion, estado, clie
 @method_decorator(admin_login_required, name='dispatch')
 class ClientesView(View):
     def get(self, request):
-        clientes_list = Cliente.objects.all()
-        busqueda = request.GET.get('busqueda', '').strip()
-        if busqueda:
-            clientes_list = clientes_list.filter(nombre__icontains=busqueda)
-        estado = request.GET.get('estado', '').strip()
-        if estado:
-            clientes_list = clientes_list.filter(estado=estado)
-        return render(request, 'Clientes/clientes.html', {'clientes': clientes_list})
+        clientes_list = filtros.filtrar('clientes', Cliente.objects.all(), request.GET)
+        return render(request, 'Clientes/clientes.html', {
+            'clientes':       clientes_list,
+            'filtros_export': filtros.query('clientes', request.GET),
+        })
 
 
 @method_decorator(admin_login_required, name='dispatch')
@@ -4,34 +4,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views import View
 from django.utils.decorators import method_decorator
-from django.db import transaction
 from django.http import JsonResponse
 from app.decorators import admin_login_required
-from app.services.notifications import notificacion_stock_bajo, notificacion_compra_creada, notificacion_compra_proxima_vencer
+from app.services import filtros
+from app.services.notifications import notificacion_compra_creada, notificacion_compra_proxima_vencer
+from app.services.stock import ejecutar_transaccion, aplicar_movimientos, sumar_stock, restar_stock
+from app.services.reabastecimiento import compras_sugeridas
 from ...models import Compra, Proveedor, Producto
 
 
-# ─────────────────────────────────────────────
-# Helpers de stock
-# ─────────────────────────────────────────────
-
-def _sumar_stock(producto_id, cantidad):
-    """Aumenta el stock del producto. Llamar dentro de transaction.atomic()."""
-    producto = Producto.objects.select_for_update().get(pk=producto_id)
-    producto.stock += cantidad
-    producto.save()
-
-
-def _restar_stock(producto_id, cantidad):
-    """Reduce el stock del producto. Llamar dentro de transaction.atomic()."""
-    producto = Producto.objects.select_for_update().get(pk=producto_id)
-    producto.stock = max(0, producto.stock - cantidad)
-    producto.save()
-    # Notificar si stock queda bajo
-    if producto.stock <= 5:
-        notificacion_stock_bajo(producto)
-
-
 # ─────────────────────────────────────────────
 # Helpers de validación
 # ─────────────────────────────────────────────
@@ -82,36 +63,12 @@ class ComprasView(View):
             'usuario', 'Producto', 'Proveedor'
         ).all().order_by('-fechaCompra')
 
-        busqueda = request.GET.get('busqueda', '').strip()
-        if busqueda:
-            lista_compras = (
-                lista_compras.filter(Proveedor__nombre__icontains=busqueda) |
-                lista_compras.filter(Producto__nombre__icontains=busqueda)
-            )
-
-        estado_filtro = request.GET.get('estado', '').strip()
-        if estado_filtro in ('Completada', 'Pendiente'):
-            lista_compras = lista_compras.filter(estado=estado_filtro)
-
-        fecha_desde = request.GET.get('fecha_desde', '').strip()
-        fecha_hasta = request.GET.get('fecha_hasta', '').strip()
-
-        if fecha_desde:
-            try:
-                desde_date = date.fromisoformat(fecha_desde)
-                lista_compras = lista_compras.filter(fechaCompra__gte=desde_date)
-            except ValueError:
-                pass
-
-        if fecha_hasta:
-            try:
-                hasta_date = date.fromisoformat(fecha_hasta)
-                lista_compras = lista_compras.filter(fechaCompra__lte=hasta_date)
-            except ValueError:
-                pass
+        # busqueda, estado, fecha_desde y fecha_hasta (ver app/services/filtros.py)
+        lista_compras = filtros.filtrar('compras', lista_compras, request.GET)
 
         return render(request, 'Compras/Compras.html', {
             'compras':     lista_compras,
+            'filtros_export': filtros.query('compras', request.GET),
             'proveedores': Proveedor.objects.all(),
             'productos':   Producto.objects.all(),
             'fecha_min':   hoy.strftime('%Y-%m-%d'),
@@ -143,20 +100,22 @@ class CrearCompraView(View):
             messages.error(request, error)
             return redirect('compras')
 
-        try:
-            with transaction.atomic():
-                compra = Compra.objects.create(
-                    fechaCompra     = fecha,
-                    estado          = estado_str,
-                    cantidad        = cantidad,
-                    precio_unitario = precio,
-                    usuario         = request.user,   # ← CORRECCIÓN: usa auth.User directamente
-                    Producto_id     = int(producto_id),
-                    Proveedor_id    = int(proveedor_id),
-                )
-                if estado_str == 'Completada':
-                    _sumar_stock(int(producto_id), cantidad)
+        def _registrar():
+            compra = Compra.objects.create(
+                fechaCompra     = fecha,
+                estado          = estado_str,
+                cantidad        = cantidad,
+                precio_unitario = precio,
+                usuario         = request.user,   # ← CORRECCIÓN: usa auth.User directamente
+                Producto_id     = int(producto_id),
+                Proveedor_id    = int(proveedor_id),
+            )
+            if estado_str == 'Completada':
+                sumar_stock({int(producto_id): cantidad}, referencia=f'compra:{compra.idCompra}')
+            return compra
 
+        try:
+            compra = ejecutar_transaccion(_registrar)
             # Enviar notificación de nueva compra
             notificacion_compra_creada(compra)
             messages.success(request, f'Compra #{compra.idCompra} registrada exitosamente.')
@@ -191,28 +150,34 @@ class EditarCompraView(View):
             messages.error(request, error)
             return redirect('compras')
 
-        try:
-            with transaction.atomic():
-                estado_anterior   = compra.estado
-                producto_anterior = compra.Producto_id
-                cantidad_anterior = compra.cantidad
-                producto_nuevo    = int(producto_id)
-
-                if estado_anterior == 'Completada' and producto_anterior:
-                    _restar_stock(producto_anterior, cantidad_anterior)
-
-                if estado_nuevo == 'Completada':
-                    _sumar_stock(producto_nuevo, cantidad_nueva)
-
-                compra.fechaCompra     = fecha
-                compra.estado          = estado_nuevo
-                compra.cantidad        = cantidad_nueva
-                compra.precio_unitario = precio_nuevo
-                compra.usuario         = request.user   # ← CORRECCIÓN
-                compra.Producto_id     = producto_nuevo
-                compra.Proveedor_id    = int(proveedor_id)
-                compra.save()
+        def _actualizar():
+            # Se relee bloqueada en cada intento: si ejecutar_transaccion
+            # reintenta, la instancia en memoria ya tendría los valores nuevos
+            compra         = Compra.objects.select_for_update().get(pk=id)
+            producto_nuevo = int(producto_id)
+            salidas, entradas = {}, {}
+
+            if compra.estado == 'Completada' and compra.Producto_id:
+                salidas[compra.Producto_id] = compra.cantidad
+
+            if estado_nuevo == 'Completada':
+                entradas[producto_nuevo] = cantidad_nueva
 
+            # Producto anterior y nuevo se bloquean juntos, en orden de pk
+            aplicar_movimientos(salidas=salidas, entradas=entradas, estricto=False,
+                                motivo='compra_edicion', referencia=f'compra:{compra.idCompra}')
+
+            compra.fechaCompra     = fecha
+            compra.estado          = estado_nuevo
+            compra.cantidad        = cantidad_nueva
+            compra.precio_unitario = precio_nuevo
+            compra.usuario         = request.user   # ← CORRECCIÓN
+            compra.Producto_id     = producto_nuevo
+            compra.Proveedor_id    = int(proveedor_id)
+            compra.save()
+
+        try:
+            ejecutar_transaccion(_actualizar)
             messages.success(request, f'Compra #{compra.idCompra} actualizada exitosamente.')
         except Exception as e:
             messages.error(request, f'Error al actualizar: {str(e)}')
@@ -223,12 +188,15 @@ class EditarCompraView(View):
 class EliminarCompraView(View):
     def post(self, request, id):
         compra = get_object_or_404(Compra, idCompra=id)
+        compra_id = compra.idCompra
+
+        def _eliminar():
+            if compra.estado == 'Completada' and compra.Producto_id:
+                restar_stock({compra.Producto_id: compra.cantidad}, referencia=f'compra:{compra_id}')
+            compra.delete()
+
         try:
-            with transaction.atomic():
-                if compra.estado == 'Completada' and compra.Producto_id:
-                    _restar_stock(compra.Producto_id, compra.cantidad)
-                compra_id = compra.idCompra
-                compra.delete()
+            ejecutar_transaccion(_eliminar)
             messages.success(request, f'Compra #{compra_id} eliminada exitosamente.')
         except Exception as e:
             messages.error(request, f'Error al eliminar: {str(e)}')
@@ -257,8 +225,16 @@ class ComprasJsonView(View):
         return JsonResponse({'compras': lista})
 
 
+@method_decorator(admin_login_required, name='dispatch')
+class ComprasSugeridasView(View):
+    """Productos en o bajo su punto de reorden (comando calcular_reorden) con la cantidad a pedir."""
+    def get(self, request):
+        return render(request, 'Compras/sugeridas.html', {'sugeridas': compras_sugeridas()})
+
+
 compras               = ComprasView.as_view()
 crear_compra          = CrearCompraView.as_view()
 modal_editar_compra   = EditarCompraView.as_view()
 modal_eliminar_compra = EliminarCompraView.as_view()
 compras_json          = ComprasJsonView.as_view()
+sugeridas             = ComprasSugeridasView.as_view()
@@ -5,6 +5,7 @@ import requests
 import json
 
 from app.models import Producto, Cliente, Venta, DetalleVenta, Compra, Proveedor
+from app.services.reabastecimiento import stock_bajo_q
 
 def obtener_contexto():
     try:
@@ -16,7 +17,7 @@ def obtener_contexto():
         ])
 
         # Productos con stock bajo
-        stock_bajo = Producto.objects.filter(stock__lte=5).values_list('nombre', 'stock')
+        stock_bajo = Producto.objects.filter(stock_bajo_q()).values_list('nombre', 'stock')
         lista_stock_bajo = "\n".join([f"- {n}: {s} unidades" for n, s in stock_bajo]) or "Ninguno"
 
         # Clientes
@@ -4,38 +4,52 @@ from django.http import JsonResponse
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
-from app.decorators import admin_login_required
+from app.decorators import admin_login_required, superadmin_required
 from app.context_processors import notificaciones
-from ...models import Producto, Cliente, Venta, Proveedor, Compra, Reporte
+from app.services.stock import metricas_stock
+from app.services.cache_reportes import metricas_cache
+from app.services.reportes import metricas_secciones
+from app.services.kpis import contadores
 
 
 @method_decorator(admin_login_required, name='dispatch')
 class IndexView(View):
     def get(self, request):
+        claves = ('productos', 'clientes', 'ventas', 'proveedores', 'compras', 'reportes')
         try:
-            total_productos  = Producto.objects.count()
-            total_clientes   = Cliente.objects.count()
-            total_ventas     = Venta.objects.count()
-            total_proveedores = Proveedor.objects.count()
-            total_compras    = Compra.objects.count()
-            total_reportes   = Reporte.objects.count()
+            # Contadores incrementales: una consulta en lugar de seis COUNT(*)
+            kpi = contadores(*claves)
         except Exception:
-            total_productos = total_clientes = total_ventas = 0
-            total_proveedores = total_compras = total_reportes = 0
+            kpi = dict.fromkeys(claves, 0)
 
         return render(request, 'Inicio/index.html', {
-            'total_productos':  total_productos,
-            'total_clientes':   total_clientes,
-            'total_ventas':     total_ventas,
-            'total_proveedores': total_proveedores,
-            'total_compras':    total_compras,
-            'total_reportes':   total_reportes,
+            'total_productos':  kpi['productos'],
+            'total_clientes':   kpi['clientes'],
+            'total_ventas':     kpi['ventas'],
+            'total_proveedores': kpi['proveedores'],
+            'total_compras':    kpi['compras'],
+            'total_reportes':   kpi['reportes'],
         })
 
 
 index = IndexView.as_view()
 
 
+@superadmin_required
+def metricas_data(request):
+    """
+    Contadores internos del proceso (reintentos de stock, caché y tiempos
+    por sección de los reportes).
+    Son por proceso: con varios workers cada uno reporta los suyos.
+    """
+    return JsonResponse({
+        'ok':             True,
+        'stock':          metricas_stock(),
+        'cache_reportes': metricas_cache(),
+        'secciones':      metricas_secciones(),
+    })
+
+
 @admin_login_required
 def notificaciones_data(request):
     """
@@ -9,23 +9,20 @@ from django.views import View
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from app.decorators import admin_login_required
+from app.services import filtros
 from app.models import Producto, Marca, TipoProductos, unidad_medida
 from app.services.notifications import notificacion_stock_bajo
+from app.services.reabastecimiento import esta_bajo
+from app.services.stock import ejecutar_transaccion, sumar_stock, fijar_stock
 
 
 def _contexto_productos(query='', stock_filter='', form_data=None):
     """Construye el contexto base. form_data preserva valores del modal si hay error."""
-    lista = Producto.objects.all()
-    if query:
-        lista = lista.filter(nombre__icontains=query)
-    if stock_filter == 'disponible':
-        lista = lista.filter(stock__gt=5)
-    elif stock_filter == 'bajo':
-        lista = lista.filter(stock__gt=0, stock__lte=5)
-    elif stock_filter == 'agotado':
-        lista = lista.filter(stock=0)
+    parametros = {'q': query, 'stock': stock_filter}
+    lista      = filtros.filtrar('productos', Producto.objects.all(), parametros)
     return {
         'productos': lista,
+        'filtros_export': filtros.query('productos', parametros),
         'marcas':    Marca.objects.all(),
         'tipos':     TipoProductos.objects.all(),
         'unidades':  unidad_medida.objects.all(),
@@ -101,7 +98,7 @@ class CrearProductoView(View):
                 idUnidad=get_object_or_404(unidad_medida, idUnidad=idUnidad),
                 codigo_barras=codigo_barras,
             )
-            if producto.stock <= 5:
+            if esta_bajo(producto):
                 notificacion_stock_bajo(producto)
             messages.success(request, f'Producto "{nombre}" creado correctamente.')
         except Exception as e:
@@ -154,12 +151,20 @@ class EditarProductoView(View):
 
         producto.nombre   = nombre
         producto.precio   = precio_val
-        producto.stock    = int(stock)
         producto.idMarca  = get_object_or_404(Marca, idMarca=idMarca)
         producto.idTipo   = get_object_or_404(TipoProductos, idTipo=idTipo)
         producto.idUnidad = get_object_or_404(unidad_medida, idUnidad=idUnidad)
-        producto.save()
-        messages.success(request, f'Producto "{nombre}" actualizado correctamente.')
+
+        def _actualizar():
+            # El stock pasa por la capa de stock; el resto de campos se guarda aparte
+            producto.save(update_fields=['nombre', 'precio', 'idMarca', 'idTipo', 'idUnidad'])
+            fijar_stock(producto.idProducto, int(stock), referencia=f'producto:{producto.idProducto}')
+
+        try:
+            ejecutar_transaccion(_actualizar)
+            messages.success(request, f'Producto "{nombre}" actualizado correctamente.')
+        except Exception as e:
+            messages.error(request, f'Error al actualizar el producto: {str(e)}')
         return redirect('productos')
 
 
@@ -230,12 +235,19 @@ class ActualizarStockEscanerView(View):
             return JsonResponse({'status': 'error', 'mensaje': 'La cantidad debe ser mayor a 0.'})
 
         producto = get_object_or_404(Producto, idProducto=prod_id)
-        nuevo_stock = producto.stock + cantidad
-        if nuevo_stock > 1000:
+        try:
+            actualizados = ejecutar_transaccion(
+                sumar_stock, {producto.idProducto: cantidad}, limite=1000,
+                motivo='escaner', referencia=f'producto:{producto.idProducto}',
+            )
+        except ValueError:
             return JsonResponse({'status': 'error', 'mensaje': 'El stock no puede superar 1.000 unidades.'})
 
-        producto.stock = nuevo_stock
-        producto.save()
+        # Vacío si el producto se eliminó entre la lectura y el bloqueo
+        if not actualizados:
+            return JsonResponse({'status': 'error', 'mensaje': 'El producto no existe.'}, status=404)
+        producto = actualizados[0]
+
         return JsonResponse({
             'status': 'ok',
             'nombre': producto.nombre,
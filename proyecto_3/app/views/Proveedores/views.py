@@ -1,12 +1,12 @@
 """Vistas para gestión de proveedores"""
 import re
-from datetime import date
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse
 from app.decorators import admin_login_required
+from app.services import filtros
 from ...models import Proveedor
 
 
@@ -54,40 +54,16 @@ def _validar_proveedor(nombre, telefono, email, envio, proveedor_id=None):
 @method_decorator(admin_login_required, name='dispatch')
 class ProveedoresView(View):
     def get(self, request):
-        lista = Proveedor.objects.all()
         busqueda = request.GET.get('busqueda', '').strip()
         envio_filtro = request.GET.get('envio', '').strip()
-        fecha_desde = request.GET.get('fecha_desde', '').strip()
-        fecha_hasta = request.GET.get('fecha_hasta', '').strip()
-
-        if busqueda:
-            lista = lista.filter(nombre__icontains=busqueda)
-
-        if envio_filtro == 'rapido':
-            lista = lista.filter(envio__lte=7)
-        elif envio_filtro == 'normal':
-            lista = lista.filter(envio__gte=8, envio__lte=15)
-        elif envio_filtro == 'lento':
-            lista = lista.filter(envio__gt=15)
-
-        if fecha_desde:
-            try:
-                desde_date = date.fromisoformat(fecha_desde)
-                lista = lista.filter(fechaRegistro__gte=desde_date)
-            except ValueError:
-                pass
-
-        if fecha_hasta:
-            try:
-                hasta_date = date.fromisoformat(fecha_hasta)
-                lista = lista.filter(fechaRegistro__lte=hasta_date)
-            except ValueError:
-                pass
+        # busqueda, envio, fecha_desde y fecha_hasta (ver app/services/filtros.py)
+        lista = filtros.filtrar('proveedores', Proveedor.objects.all(), request.GET)
 
         return render(request, 'proveedores/proveedores.html', {
             'proveedores': lista,
             'busqueda': busqueda,
             'envio_filtro': envio_filtro,
+            'filtros_export': filtros.query('proveedores', request.GET),
         })
 
 
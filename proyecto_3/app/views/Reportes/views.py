@@ -1,239 +1,254 @@
 """Vistas para reportes"""
+from django.conf import settings
 from django.shortcuts import render
 from django.views import View
 from django.utils.decorators import method_decorator
-from django.utils import timezone
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncDate
-from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.http import JsonResponse, FileResponse
+from django.urls import reverse
 from app.decorators import admin_login_required
-from app.models import Producto, Cliente, Venta, Compra, Proveedor
+from app.services import cache_reportes
+from app.services.reportes import SECCIONES, firma, calcular_seccion, calcular_secciones
+from app.services.series import serie, rango
+from app.services.ranking import ranking_cacheado
+from app.services.actividad import pagina_actividad
+from app.services.cubo import DIMENSIONES, MAX_FILAS, consultar
+from app.services import columnar, especificaciones, exportaciones
+from app.models import ExportacionJob
 
 
+# ─────────────────────────────────────────────
+# GET condicional: la firma se calcula una vez por petición
+# ─────────────────────────────────────────────
+
+def _firma(request, seccion):
+    if not hasattr(request, '_firma_reporte'):
+        request._firma_reporte = firma(seccion)
+    return request._firma_reporte
+
+
+def _etag(request, seccion='datos'):
+    return _firma(request, seccion)[0]
+
+
+def _modificado(request, seccion='datos'):
+    return _firma(request, seccion)[1]
+
+
+def _server_timing(tiempos):
+    return ', '.join(f'{seccion};dur={ms:.1f}' for seccion, ms in tiempos.items())
+
+
+def _respuesta_seccion(seccion):
+    datos, ms = calcular_seccion(seccion)
+    respuesta = JsonResponse(datos)
+    respuesta['Server-Timing'] = _server_timing({seccion: ms})
+    return respuesta
+
+
+# ─────────────────────────────────────────────
+# Vistas
+# ─────────────────────────────────────────────
+
 @method_decorator(admin_login_required, name='dispatch')
 class ReportesView(View):
     def get(self, request):
-        # ── Fecha en UTC (las fechas en DB están guardadas en UTC) ──
-        hoy        = timezone.now()
-        mes_inicio = hoy.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # ── KPIs ──
-        total_productos   = Producto.objects.count()
-        stock_bajo        = Producto.objects.filter(stock__lte=10).count()
-        total_clientes    = Cliente.objects.count()
-        total_proveedores = Proveedor.objects.count()
-        total_compras     = Compra.objects.count()
-        ventas_mes        = Venta.objects.filter(fecha__gte=mes_inicio, fecha__lte=hoy)
-        total_ventas_mes  = ventas_mes.aggregate(t=Sum('total'))['t'] or 0
-        transacciones_mes = ventas_mes.count()
-        ingreso_total     = Venta.objects.aggregate(t=Sum('total'))['t'] or 0
-
-        # ── PRODUCTOS ──
-        productos = Producto.objects.select_related('idTipo', 'idMarca', 'idUnidad').all()
-        max_stock = max((p.stock for p in productos), default=1) or 1
-        productos_data = []
-        for p in productos:
-            if p.stock == 0:    estado, label = 'out', 'Sin stock'
-            elif p.stock <= 10: estado, label = 'low', 'Bajo'
-            else:               estado, label = 'ok',  'Normal'
-            productos_data.append({
-                'id': p.idProducto, 'nombre': p.nombre, 'precio': float(p.precio),
-                'stock': p.stock, 'pct': int((p.stock / max_stock) * 100),
-                'estado': estado, 'label': label,
-            })
-
-        graf_productos_labels  = [p['nombre'] for p in productos_data]
-        graf_productos_stock   = [p['stock']  for p in productos_data]
-        graf_productos_colores = [
-            '#ef4444' if p['estado'] == 'out' else
-            '#f59e0b' if p['estado'] == 'low' else '#22c55e'
-            for p in productos_data
-        ]
-
-        # ── CLIENTES ──
-        clientes_data = []
-        for c in Cliente.objects.all():
-            tc = Venta.objects.filter(cliente=c.nombre).aggregate(t=Sum('total'))['t'] or 0
-            clientes_data.append({
-                'id': c.id, 'nombre': c.nombre, 'email': c.email,
-                'telefono': c.telefono, 'total_compras': float(tc), 'estado': c.estado,
-            })
-
-        top_clientes          = sorted(clientes_data, key=lambda x: x['total_compras'], reverse=True)[:8]
-        graf_clientes_labels  = [c['nombre'] for c in top_clientes]
-        graf_clientes_valores = [c['total_compras'] for c in top_clientes]
-        clientes_activos      = sum(1 for c in clientes_data if c['estado'] == 'activo')
-        clientes_inactivos    = len(clientes_data) - clientes_activos
-
-        # ── VENTAS ──
-        ventas_data = []
-        for v in Venta.objects.prefetch_related('detalles').order_by('-fecha')[:50]:
-            d = v.detalles.first()
-            ventas_data.append({
-                'id': v.id, 'cliente': v.cliente,
-                'producto': d.producto_nombre if d else '-',
-                'cantidad': d.cantidad if d else 0,
-                'total': float(v.total), 'fecha': v.fecha, 'estado': v.estado,
-            })
-
-        ventas_por_dia = (
-            Venta.objects
-            .annotate(dia=TruncDate('fecha'))
-            .values('dia').annotate(total_dia=Sum('total'))
-            .order_by('dia')
-        )[:14]
-        graf_ventas_labels    = [str(v['dia']) for v in ventas_por_dia]
-        graf_ventas_valores   = [float(v['total_dia']) for v in ventas_por_dia]
-        ventas_completadas    = Venta.objects.filter(estado='Completada').count()
-        ventas_pendientes     = Venta.objects.filter(estado='Pendiente').count()
-
-        # ── PROVEEDORES ──
-        proveedores_data = []
-        for p in Proveedor.objects.all():
-            nc = Compra.objects.filter(Proveedor=p).count()
-            proveedores_data.append({
-                'id': p.id, 'nombre': p.nombre, 'telefono': p.telefono,
-                'email': p.email, 'envio': p.envio,
-                'num_compras': nc, 'fecha': p.fechaRegistro,
-            })
-
-        graf_proveedores_labels  = [p['nombre']     for p in proveedores_data]
-        graf_proveedores_valores = [p['num_compras'] for p in proveedores_data]
-
-        # ── COMPRAS ──
-        compras_data = []
-        for c in Compra.objects.select_related('Producto', 'Proveedor', 'usuario').order_by('-fechaCompra')[:50]:
-            compras_data.append({
-                'id':        c.idCompra,
-                'producto':  c.Producto.nombre      if c.Producto      else '-',
-                'proveedor': c.Proveedor.nombre     if c.Proveedor     else '-',
-                'admin':     c.usuario.get_full_name() or c.usuario.username if c.usuario else '-',
-                'fecha':     str(c.fechaCompra),
-                'estado':    c.estado,
-            })
-
-        compras_por_dia = (
-            Compra.objects
-            .values('fechaCompra').annotate(total_dia=Count('pk'))
-            .order_by('fechaCompra')
-        )[:14]
-        graf_compras_labels  = [str(c['fechaCompra']) for c in compras_por_dia]
-        graf_compras_valores = [c['total_dia']        for c in compras_por_dia]
-        compras_completadas  = Compra.objects.filter(estado='Completada').count()
-        compras_pendientes   = Compra.objects.filter(estado='Pendiente').count()
-
-        # ── TODO ──
-        productos_mini   = productos_data[:5]
-        clientes_mini    = sorted(clientes_data, key=lambda x: x['total_compras'], reverse=True)[:5]
-        ventas_mini      = ventas_data[:5]
-        proveedores_mini = proveedores_data[:5]
-
-        todas = []
-        for v in Venta.objects.prefetch_related('detalles').order_by('-fecha')[:100]:
-            d = v.detalles.first()
-            desc = f"{d.producto_nombre} × {d.cantidad} — {v.cliente}" if d else v.cliente
-            todas.append({
-                'id': f"V{str(v.id).zfill(3)}", 'modulo': 'Venta', 'tipo': 'venta',
-                'descripcion': desc, 'valor': float(v.total),
-                'fecha': v.fecha, 'estado': v.estado,
-            })
-        for c in Compra.objects.select_related('Producto', 'Proveedor').order_by('-fechaCompra')[:50]:
-            todas.append({
-                'id': f"C{str(c.idCompra).zfill(3)}", 'modulo': 'Compra', 'tipo': 'compra',
-                'descripcion': f"{c.Producto.nombre if c.Producto else '-'} — {c.Proveedor.nombre if c.Proveedor else '-'}",
-                'valor': None, 'fecha': c.fechaCompra, 'estado': c.estado,
-            })
-        todas.sort(key=lambda x: str(x['fecha']), reverse=True)
-
-        # ── TODO: unir fechas de ventas y compras en un eje común ──
-        todas_fechas = sorted(set(graf_ventas_labels) | set(graf_compras_labels))
-
-        ventas_por_fecha  = dict(zip(graf_ventas_labels,  graf_ventas_valores))
-        compras_por_fecha = dict(zip(graf_compras_labels, graf_compras_valores))
-
-        graf_todo_labels  = todas_fechas
-        graf_todo_ventas  = [ventas_por_fecha.get(f, 0)  for f in todas_fechas]
-        graf_todo_compras = [compras_por_fecha.get(f, 0) for f in todas_fechas]
-
-        alertas_stock = [p for p in productos_data if p['estado'] in ('low', 'out')]
-
-        context = {
-            # KPIs
-            'total_productos':  total_productos,  'stock_bajo':        stock_bajo,
-            'total_clientes':   total_clientes,   'total_proveedores': total_proveedores,
-            'total_compras':    total_compras,
-            'total_ventas_mes': total_ventas_mes, 'transacciones_mes': transacciones_mes,
-            'ingreso_total':    ingreso_total,
-            # Tablas
-            'productos_data':   productos_data,   'clientes_data':    clientes_data,
-            'ventas_data':      ventas_data,       'proveedores_data': proveedores_data,
-            'compras_data':     compras_data,
-            # Mini
-            'productos_mini':   productos_mini,   'clientes_mini':    clientes_mini,
-            'ventas_mini':      ventas_mini,       'proveedores_mini': proveedores_mini,
-            'todas':            todas,
-            # Alertas
-            'alertas_stock': alertas_stock,
-            # Gráficas
-            'graf_productos_labels':    graf_productos_labels,
-            'graf_productos_stock':     graf_productos_stock,
-            'graf_productos_colores':   graf_productos_colores,
-            'graf_clientes_labels':     graf_clientes_labels,
-            'graf_clientes_valores':    graf_clientes_valores,
-            'clientes_activos':         clientes_activos,
-            'clientes_inactivos':       clientes_inactivos,
-            'graf_ventas_labels':       graf_ventas_labels,
-            'graf_ventas_valores':      graf_ventas_valores,
-            'ventas_completadas':       ventas_completadas,
-            'ventas_pendientes':        ventas_pendientes,
-            'graf_proveedores_labels':  graf_proveedores_labels,
-            'graf_proveedores_valores': graf_proveedores_valores,
-            'graf_compras_labels':      graf_compras_labels,
-            'graf_compras_valores':     graf_compras_valores,
-            'compras_completadas':      compras_completadas,
-            'compras_pendientes':       compras_pendientes,
-            'graf_todo_labels':         graf_todo_labels,
-            'graf_todo_ventas':         graf_todo_ventas,
-            'graf_todo_compras':        graf_todo_compras,
-        }
-        return render(request, 'Reportes/reportes.html', context)
+        if not getattr(settings, 'REPORTES_PRECARGA', False):
+            # Solo el esqueleto: reporte.js pide cada sección en paralelo
+            return render(request, 'Reportes/reportes.html')
+
+        # Precarga: todas las secciones en el pool de hilos, embebidas en la página
+        precarga, tiempos = calcular_secciones()
+        respuesta = render(request, 'Reportes/reportes.html', {'precarga': precarga})
+        respuesta['Server-Timing'] = _server_timing(tiempos)
+        return respuesta
+
+
+@method_decorator(admin_login_required, name='dispatch')
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=_etag, last_modified_func=_modificado), name='get')
+class ReporteSeccionView(View):
+    def get(self, request, seccion):
+        if seccion not in SECCIONES or seccion == 'datos':
+            return JsonResponse({'status': 'error', 'mensaje': 'Sección no válida.'}, status=404)
+        return _respuesta_seccion(seccion)
 
 
 @method_decorator(admin_login_required, name='dispatch')
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=_etag, last_modified_func=_modificado), name='get')
 class ReportesDataView(View):
     def get(self, request):
-        # ── Fecha en UTC (las fechas en DB están guardadas en UTC) ──
-        hoy        = timezone.now()
-        mes_inicio = hoy.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        ventas_mes        = Venta.objects.filter(fecha__gte=mes_inicio, fecha__lte=hoy)
-        total_ventas_mes  = float(ventas_mes.aggregate(t=Sum('total'))['t'] or 0)
-        transacciones_mes = ventas_mes.count()
-        ingreso_total     = float(Venta.objects.aggregate(t=Sum('total'))['t'] or 0)
-        stock_bajo        = Producto.objects.filter(stock__lte=10).count()
-
-        ventas_por_dia = (
-            Venta.objects.annotate(dia=TruncDate('fecha'))
-            .values('dia').annotate(total_dia=Sum('total')).order_by('dia')
-        )[:14]
-        grafica_labels  = [str(v['dia']) for v in ventas_por_dia]
-        grafica_valores = [float(v['total_dia']) for v in ventas_por_dia]
-
-        alertas = [
-            {'nombre': p.nombre, 'stock': p.stock, 'estado': 'out' if p.stock == 0 else 'low'}
-            for p in Producto.objects.filter(stock__lte=10)
-        ]
-
-        return JsonResponse({
-            'total_ventas_mes':  total_ventas_mes,
-            'transacciones_mes': transacciones_mes,
-            'ingreso_total':     ingreso_total,
-            'stock_bajo':        stock_bajo,
-            'grafica_labels':    grafica_labels,
-            'grafica_valores':   grafica_valores,
-            'alertas':           alertas,
-        })
-
-
-reportes      = ReportesView.as_view()
-reportes_data = ReportesDataView.as_view()
\ No newline at end of file
+        return _respuesta_seccion('datos')
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ReporteSerieView(View):
+    """
+    Serie de tiempo de una métrica (ventas_total, ventas_num, compras_total,
+    compras_num) con los periodos vacíos en 0. Parámetros GET:
+      granularidad  hora, dia (por defecto), semana o mes
+      desde, hasta  YYYY-MM-DD en hora local, ambas inclusive (por defecto
+                    el rango usual de la granularidad hasta hoy)
+    """
+    def get(self, request, metrica):
+        granularidad = request.GET.get('granularidad', '').strip() or 'dia'
+        try:
+            desde, hasta = rango(request.GET.get('desde', '').strip(), request.GET.get('hasta', '').strip(),
+                                 granularidad)
+            datos = cache_reportes.obtener(
+                f'serie:{metrica}:{granularidad}:{desde}:{hasta}',
+                lambda: serie(metrica, desde, hasta, granularidad),
+            )
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+        return JsonResponse(datos)
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ReporteRankingView(View):
+    """
+    Ranking de productos por ingresos con su clase ABC. Parámetros GET:
+      desde, hasta  YYYY-MM-DD en hora local, ambas inclusive (por defecto
+                    los últimos 90 días hasta hoy)
+    """
+    def get(self, request):
+        try:
+            datos = ranking_cacheado(request.GET.get('desde', '').strip(), request.GET.get('hasta', '').strip())
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+        return JsonResponse(datos)
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ReporteActividadView(View):
+    """
+    Feed de ventas y compras, del más reciente al más antiguo. Parámetros GET:
+      cursor  continúa después del movimiento que lo emitió
+      limite  tamaño de página (por defecto 100, máximo 500)
+    """
+    def get(self, request):
+        try:
+            limite = max(1, min(int(request.GET.get('limite') or 100), 500))
+            movimientos, siguiente = pagina_actividad(request.GET.get('cursor', '').strip(), limite)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e) or 'Parámetros inválidos.'}, status=400)
+        return JsonResponse({'movimientos': movimientos, 'siguiente': siguiente})
+
+
+def _ids(texto):
+    try:
+        return [int(valor) for valor in texto.split(',') if valor.strip()]
+    except ValueError:
+        raise ValueError(f'Ids no válidos: {texto}.')
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ReporteCuboView(View):
+    """
+    Ventas agregadas desde el cubo. Parámetros GET:
+      agrupar       dimensiones separadas por coma: producto, marca, tipo,
+                    cliente y, opcional, un nivel de tiempo (dia, semana, mes)
+      producto, marca, tipo, cliente
+                    ids separados por coma para filtrar (0 = sin producto /
+                    sin cliente)
+      desde, hasta  YYYY-MM-DD en hora local, ambas inclusive (por defecto
+                    los últimos 90 días hasta hoy)
+      limite        máximo de filas (por defecto y como tope 5000)
+    """
+    def get(self, request):
+        try:
+            agrupar = [d.strip() for d in request.GET.get('agrupar', '').split(',') if d.strip()]
+            filtros = {dim: _ids(request.GET[dim]) for dim in DIMENSIONES if request.GET.get(dim, '').strip()}
+            limite  = max(1, min(int(request.GET.get('limite') or MAX_FILAS), MAX_FILAS))
+            datos   = consultar(agrupar, filtros, request.GET.get('desde', '').strip(),
+                                request.GET.get('hasta', '').strip(), limite)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e) or 'Parámetros inválidos.'}, status=400)
+        return JsonResponse(datos)
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ReporteAnaliticaView(View):
+    """
+    Análisis interactivo sobre la caché columnar de líneas de venta de este
+    proceso. Parámetros GET:
+      desde, hasta  YYYY-MM-DD en hora local, ambas inclusive (por defecto
+                    los últimos 30 días hasta hoy)
+      n             tamaño del top de productos (por defecto 10, máximo 100)
+      por           ingresos | unidades (orden del top)
+      medida        ingresos | unidades | lineas (mapa de calor)
+    """
+    def get(self, request):
+        desde, hasta = request.GET.get('desde', '').strip(), request.GET.get('hasta', '').strip()
+        try:
+            n     = max(1, min(int(request.GET.get('n') or 10), 100))
+            datos = columnar.columnas()
+            respuesta = {
+                'totales':    columnar.totales(desde, hasta, datos=datos),
+                'top':        columnar.top_productos(n, desde, hasta, request.GET.get('por') or 'ingresos', datos=datos),
+                'mapa_calor': columnar.mapa_calor(desde, hasta, request.GET.get('medida') or 'ingresos', datos=datos),
+            }
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e) or 'Parámetros inválidos.'}, status=400)
+        respuesta['cache'] = columnar.estado()
+        return JsonResponse(respuesta)
+
+
+def _estado_exportacion(job):
+    datos = exportaciones.estado(job)
+    datos['descarga'] = reverse('exportacion_descargar', args=[job.pk]) if exportaciones.disponible(job) else None
+    return datos
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ExportacionCrearView(View):
+    """
+    Encola una exportación en segundo plano. Parámetros POST:
+      entidad       una de app.services.especificaciones.ESPECIFICACIONES
+      formato       pdf | excel | csv
+      filtros       los de la lista de la entidad; desde, hasta en ranking
+    Un pedido igual a otro pendiente o en proceso recibe ese mismo trabajo (200
+    en vez de 202). La interfaz consulta /reportes/exportar/<id>/.
+    """
+    def post(self, request):
+        entidad = request.POST.get('entidad', '').strip()
+        formato = request.POST.get('formato', '').strip()
+        try:
+            filtros     = especificaciones.normalizar_filtros(entidad, request.POST)
+            job, creado = exportaciones.solicitar(entidad, formato, filtros, usuario=request.user)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+        return JsonResponse({'status': 'ok', 'exportacion': _estado_exportacion(job)}, status=202 if creado else 200)
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ExportacionEstadoView(View):
+    def get(self, request, id):
+        job = ExportacionJob.objects.filter(pk=id).first()
+        if job is None:
+            return JsonResponse({'status': 'error', 'mensaje': 'La exportación no existe o ya venció.'}, status=404)
+        return JsonResponse({'status': 'ok', 'exportacion': _estado_exportacion(job)})
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class ExportacionDescargarView(View):
+    def get(self, request, id):
+        job = ExportacionJob.objects.filter(pk=id).first()
+        if job is None or not exportaciones.disponible(job):
+            return JsonResponse({'status': 'error', 'mensaje': 'La exportación no está lista o ya venció.'}, status=404)
+        return FileResponse(open(exportaciones.ruta(job), 'rb'), as_attachment=True, filename=job.nombre_archivo)
+
+
+reportes              = ReportesView.as_view()
+reporte_seccion       = ReporteSeccionView.as_view()
+reportes_data         = ReportesDataView.as_view()
+reporte_serie         = ReporteSerieView.as_view()
+reporte_ranking       = ReporteRankingView.as_view()
+reporte_actividad     = ReporteActividadView.as_view()
+reporte_cubo          = ReporteCuboView.as_view()
+reporte_analitica     = ReporteAnaliticaView.as_view()
+exportacion_crear     = ExportacionCrearView.as_view()
+exportacion_estado    = ExportacionEstadoView.as_view()
+exportacion_descargar = ExportacionDescargarView.as_view()
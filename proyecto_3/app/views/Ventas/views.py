@@ -1,54 +1,43 @@
 """Vistas para gestión de ventas"""
 import re
+import json
 import datetime
 import calendar
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views import View
 from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Sum
-from django.http import JsonResponse
-from app.decorators import admin_login_required
-from app.services.notifications import notificacion_stock_bajo, notificacion_venta_completada
-from ...models import Venta, DetalleVenta, Producto, Cliente
-
-
-def _descontar_stock(ids, cantidades):
-    """
-    Descuenta stock de los productos. Usa select_for_update para evitar
-    condiciones de carrera. Lanza ValueError si algún producto no tiene
-    suficiente stock. Llamar SIEMPRE dentro de transaction.atomic().
-    """
-    for pid, cant in zip(ids, cantidades):
-        producto = Producto.objects.select_for_update().get(pk=int(pid))
-        if producto.stock < cant:
-            raise ValueError(
-                f'Stock insuficiente para "{producto.nombre}". '
-                f'Disponible: {producto.stock}, solicitado: {cant}.'
-            )
-        producto.stock -= cant
-        producto.save()
-        # Notificar si stock queda bajo
-        if producto.stock <= 5:
-            notificacion_stock_bajo(producto)
-
-
-def _devolver_stock(detalles_qs):
-    """
-    Devuelve el stock de los productos a partir de un queryset de DetalleVenta.
-    Usa la FK producto_id guardada en el detalle para identificar el producto
-    de forma exacta, sin ambigüedad por nombre.
-    """
-    for detalle in detalles_qs:
-        try:
-            if detalle.producto_id:
-                producto = Producto.objects.select_for_update().get(pk=detalle.producto_id)
-                producto.stock += detalle.cantidad or 0
-                producto.save()
-        except Producto.DoesNotExist:
-            pass  # El producto fue eliminado, no hay stock que devolver
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from app.decorators import admin_login_required, pos_token_required
+from app.services import filtros
+from app.services.notifications import notificacion_venta_completada
+from app.services.kpis import resumen_ventas
+from app.services.importacion import importar_ventas
+from app.services.ventas_api import parsear_fecha, decodificar_cursor, pagina_ventas, iterar_ventas
+from app.services.stock import (
+    ejecutar_transaccion, normalizar_demanda, descontar_stock, devolver_stock,
+    demanda_de_detalles, crear_detalles, editar_detalles, libro_inventario,
+)
+from ...models import Venta, Producto, Cliente
+
+
+def _cliente_por_id(cliente_id):
+    """Cliente elegido en el formulario. Retorna (cliente, error)."""
+    if not cliente_id.isdigit():
+        return None, 'El cliente seleccionado no es válido.'
+    cliente = Cliente.objects.filter(pk=int(cliente_id)).first()
+    if cliente is None:
+        return None, 'El cliente seleccionado no existe.'
+    return cliente, None
+
+
+def _cliente_por_nombre(nombre):
+    """Enlaza ventas escritas a mano con el cliente del mismo nombre (el más antiguo)."""
+    return Cliente.objects.filter(nombre__iexact=nombre).order_by('pk').first()
 
 
 def rango_dia(fecha):
@@ -60,46 +49,17 @@ def rango_dia(fecha):
 @method_decorator(admin_login_required, name='dispatch')
 class VentasView(View):
     def get(self, request):
-        ahora = timezone.localtime(timezone.now())
-        hoy   = ahora.date()
-
-        inicio_hoy, fin_hoy = rango_dia(hoy)
-        ventas_hoy = Venta.objects.filter(fecha__range=(inicio_hoy, fin_hoy)).aggregate(total=Sum('total'))['total'] or 0
-
-        inicio_mes = timezone.make_aware(datetime.datetime(hoy.year, hoy.month, 1))
-        total_mes  = Venta.objects.filter(fecha__gte=inicio_mes).aggregate(total=Sum('total'))['total'] or 0
-
-        buscar       = request.GET.get('buscar', '').strip()
-        fecha_desde  = request.GET.get('fecha_desde', '').strip()
-        fecha_hasta  = request.GET.get('fecha_hasta', '').strip()
-        lista_ventas = Venta.objects.prefetch_related('detalles').all()
+        resumen = resumen_ventas()
 
-        if buscar:
-            lista_ventas = lista_ventas.filter(cliente__icontains=buscar)
-
-        if fecha_desde:
-            try:
-                desde_date = datetime.datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                lista_ventas = lista_ventas.filter(
-                    fecha__gte=timezone.make_aware(datetime.datetime.combine(desde_date, datetime.time.min))
-                )
-            except ValueError:
-                pass
-
-        if fecha_hasta:
-            try:
-                hasta_date = datetime.datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                lista_ventas = lista_ventas.filter(
-                    fecha__lte=timezone.make_aware(datetime.datetime.combine(hasta_date, datetime.time.max))
-                )
-            except ValueError:
-                pass
+        # buscar, fecha_desde y fecha_hasta (ver app/services/filtros.py)
+        lista_ventas = filtros.filtrar('ventas', Venta.objects.prefetch_related('detalles').all(), request.GET)
 
         return render(request, 'Ventas/Ventas.html', {
             'ventas':       lista_ventas,
-            'ventas_hoy':   ventas_hoy,
-            'total_mes':    total_mes,
-            'total_ventas': Venta.objects.count(),
+            'filtros_export': filtros.query('ventas', request.GET),
+            'ventas_hoy':   resumen['ventas_hoy'],
+            'total_mes':    resumen['total_mes'],
+            'total_ventas': resumen['total_ventas'],
             'clientes':     Cliente.objects.filter(estado='activo'),
             'productos':    Producto.objects.all(),
         })
@@ -108,18 +68,27 @@ class VentasView(View):
 @method_decorator(admin_login_required, name='dispatch')
 class CrearVentaView(View):
     def post(self, request):
+        cliente_id     = request.POST.get('cliente_id', '').strip()
         cliente_nombre = request.POST.get('cliente', '').strip()
         estado         = request.POST.get('estado', 'Pendiente')
 
-        if not cliente_nombre or len(cliente_nombre) < 3:
-            messages.error(request, 'El nombre del cliente debe tener al menos 3 caracteres.')
-            return redirect('ventas')
-        if len(cliente_nombre) > 50:
-            messages.error(request, 'El nombre no puede superar 50 caracteres.')
-            return redirect('ventas')
-        if not re.match(r'^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$', cliente_nombre):
-            messages.error(request, 'El nombre solo puede contener letras y espacios.')
-            return redirect('ventas')
+        if cliente_id:
+            cliente, error = _cliente_por_id(cliente_id)
+            if error:
+                messages.error(request, error)
+                return redirect('ventas')
+            cliente_nombre = cliente.nombre
+        else:
+            if not cliente_nombre or len(cliente_nombre) < 3:
+                messages.error(request, 'El nombre del cliente debe tener al menos 3 caracteres.')
+                return redirect('ventas')
+            if len(cliente_nombre) > 50:
+                messages.error(request, 'El nombre no puede superar 50 caracteres.')
+                return redirect('ventas')
+            if not re.match(r'^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$', cliente_nombre):
+                messages.error(request, 'El nombre solo puede contener letras y espacios.')
+                return redirect('ventas')
+            cliente = _cliente_por_nombre(cliente_nombre)
 
         ids        = request.POST.getlist('producto_id[]')
         nombres    = request.POST.getlist('producto_nombre[]')
@@ -146,19 +115,19 @@ class CrearVentaView(View):
             cant_int.append(int(cantidades[i]))
             prec_float.append(p)
 
-        try:
-            with transaction.atomic():
-                _descontar_stock(ids, cant_int)
+        def _registrar():
+            # El stock se descuenta antes de crear la venta: la referencia
+            # del libro de movimientos se completa cuando ya existe el pk
+            with libro_inventario('venta') as libro:
+                descontar_stock(normalizar_demanda(ids, cant_int))
                 total = sum(prec_float[i] * cant_int[i] for i in range(len(ids)))
-                venta = Venta.objects.create(cliente=cliente_nombre, estado=estado, total=total)
-                for i in range(len(ids)):
-                    DetalleVenta.objects.create(
-                        venta           = venta,
-                        producto_id     = int(ids[i]),
-                        producto_nombre = nombres[i],
-                        precio          = prec_float[i],
-                        cantidad        = cant_int[i],
-                    )
+                venta = Venta.objects.create(cliente=cliente_nombre, idCliente=cliente, estado=estado, total=total)
+                libro.referencia = f'venta:{venta.pk}'
+            crear_detalles(venta, ids, nombres, prec_float, cant_int)
+            return venta
+
+        try:
+            venta = ejecutar_transaccion(_registrar)
             messages.success(request, f'Venta #{venta.id} creada exitosamente.')
         except ValueError as e:
             messages.error(request, str(e))
@@ -177,18 +146,31 @@ class DetalleVentaView(View):
 class EditarVentaView(View):
     def post(self, request, id):
         venta          = get_object_or_404(Venta, id=id)
+        cliente_id     = request.POST.get('cliente_id', '').strip()
         cliente_nombre = request.POST.get('cliente', '').strip()
         estado         = request.POST.get('estado', 'Pendiente')
 
-        if not cliente_nombre or len(cliente_nombre) < 3:
-            messages.error(request, 'El nombre debe tener al menos 3 caracteres.')
-            return redirect('ventas')
-        if len(cliente_nombre) > 50:
-            messages.error(request, 'El nombre no puede superar 50 caracteres.')
-            return redirect('ventas')
-        if not re.match(r'^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$', cliente_nombre):
-            messages.error(request, 'El nombre solo puede contener letras y espacios.')
-            return redirect('ventas')
+        if cliente_id:
+            cliente, error = _cliente_por_id(cliente_id)
+            if error:
+                messages.error(request, error)
+                return redirect('ventas')
+            cliente_nombre = cliente.nombre
+        else:
+            if not cliente_nombre or len(cliente_nombre) < 3:
+                messages.error(request, 'El nombre debe tener al menos 3 caracteres.')
+                return redirect('ventas')
+            if len(cliente_nombre) > 50:
+                messages.error(request, 'El nombre no puede superar 50 caracteres.')
+                return redirect('ventas')
+            if not re.match(r'^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$', cliente_nombre):
+                messages.error(request, 'El nombre solo puede contener letras y espacios.')
+                return redirect('ventas')
+            # Si el nombre no cambió se conserva el cliente enlazado
+            if cliente_nombre == venta.cliente and venta.idCliente_id:
+                cliente = venta.idCliente
+            else:
+                cliente = _cliente_por_nombre(cliente_nombre)
 
         ids        = request.POST.getlist('producto_id[]')
         nombres    = request.POST.getlist('producto_nombre[]')
@@ -202,6 +184,9 @@ class EditarVentaView(View):
         cant_int   = []
         prec_float = []
         for i in range(len(ids)):
+            if not ids[i].isdigit():
+                messages.error(request, 'Uno de los productos de la venta ya no existe. Retírelo antes de guardar.')
+                return redirect('ventas')
             if not cantidades[i].isdigit() or int(cantidades[i]) < 1:
                 messages.error(request, 'Las cantidades deben ser números enteros mayores a 0.')
                 return redirect('ventas')
@@ -215,26 +200,19 @@ class EditarVentaView(View):
             cant_int.append(int(cantidades[i]))
             prec_float.append(p)
 
+        def _actualizar():
+            # Solo se tocan los productos y las líneas que cambiaron
+            editar_detalles(venta, ids, nombres, prec_float, cant_int)
+
+            total         = sum(prec_float[i] * cant_int[i] for i in range(len(ids)))
+            venta.cliente   = cliente_nombre
+            venta.idCliente = cliente
+            venta.estado    = estado
+            venta.total     = total
+            venta.save(update_fields=['cliente', 'idCliente', 'estado', 'total'])
+
         try:
-            with transaction.atomic():
-                _devolver_stock(venta.detalles.all())
-                _descontar_stock(ids, cant_int)
-
-                total         = sum(prec_float[i] * cant_int[i] for i in range(len(ids)))
-                venta.cliente = cliente_nombre
-                venta.estado  = estado
-                venta.total   = total
-                venta.save()
-
-                venta.detalles.all().delete()
-                for i in range(len(ids)):
-                    DetalleVenta.objects.create(
-                        venta           = venta,
-                        producto_id     = int(ids[i]),
-                        producto_nombre = nombres[i],
-                        precio          = prec_float[i],
-                        cantidad        = cant_int[i],
-                    )
+            ejecutar_transaccion(_actualizar)
             messages.success(request, f'Venta #{venta.id} actualizada exitosamente.')
         except ValueError as e:
             messages.error(request, str(e))
@@ -265,10 +243,12 @@ class EliminarVentaView(View):
     def post(self, request, id):
         venta    = get_object_or_404(Venta, id=id)
         venta_id = venta.id
+        def _eliminar():
+            devolver_stock(demanda_de_detalles(venta.detalles.all()), referencia=f'venta:{venta_id}')
+            venta.delete()
+
         try:
-            with transaction.atomic():
-                _devolver_stock(venta.detalles.all())
-                venta.delete()
+            ejecutar_transaccion(_eliminar)
             messages.success(request, f'Venta #{venta_id} eliminada y stock restaurado.')
         except Exception as e:
             messages.error(request, f'Error al eliminar: {str(e)}')
@@ -278,23 +258,112 @@ class EliminarVentaView(View):
 @method_decorator(admin_login_required, name='dispatch')
 class EstadisticasVentasView(View):
     def get(self, request):
-        ahora = timezone.localtime(timezone.now())
-        hoy   = ahora.date()
-        inicio_hoy, fin_hoy = rango_dia(hoy)
-        ventas_hoy = Venta.objects.filter(fecha__range=(inicio_hoy, fin_hoy)).aggregate(total=Sum('total'))['total'] or 0
-        inicio_mes = timezone.make_aware(datetime.datetime(hoy.year, hoy.month, 1))
-        total_mes  = Venta.objects.filter(fecha__gte=inicio_mes).aggregate(total=Sum('total'))['total'] or 0
+        resumen = resumen_ventas()
         return JsonResponse({
-            'ventas_hoy':   float(ventas_hoy),
-            'total_mes':    float(total_mes),
-            'total_ventas': Venta.objects.count(),
+            'ventas_hoy':   float(resumen['ventas_hoy']),
+            'total_mes':    float(resumen['total_mes']),
+            'total_ventas': resumen['total_ventas'],
         })
 
 
+def leer_lote_ventas(contenido, ndjson=False):
+    """
+    Convierte el cuerpo recibido en una lista de ventas.
+    Acepta un arreglo JSON, {"ventas": [...]} o NDJSON (una venta por línea).
+    Lanza ValueError si el formato no es válido.
+    """
+    if ndjson:
+        try:
+            return [json.loads(linea) for linea in contenido.splitlines() if linea.strip()]
+        except json.JSONDecodeError as e:
+            raise ValueError(f'NDJSON inválido en la línea {e.lineno}: {e.msg}.')
+    try:
+        datos = json.loads(contenido)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'JSON inválido: {e.msg}.')
+    if isinstance(datos, dict):
+        datos = datos.get('ventas')
+    if not isinstance(datos, list):
+        raise ValueError('Se esperaba una lista de ventas o {"ventas": [...]}.')
+    return datos
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(pos_token_required, name='dispatch')
+class ImportarVentasView(View):
+    """
+    Endpoint para terminales POS: importa un lote de ventas registradas
+    fuera de línea (ver app/services/importacion.py). Con Content-Type
+    application/x-ndjson se lee una venta por línea. Se autentica con el
+    token de la terminal, no con la sesión: sin CSRF ni redirección al login.
+    """
+    def post(self, request):
+        ndjson = request.content_type in ('application/x-ndjson', 'application/jsonl')
+        try:
+            registros = leer_lote_ventas(request.body.decode('utf-8'), ndjson=ndjson)
+        except (ValueError, UnicodeDecodeError) as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+
+        maximo = getattr(settings, 'VENTAS_IMPORTACION_MAX', 10000)
+        if len(registros) > maximo:
+            return JsonResponse(
+                {'status': 'error', 'mensaje': f'El lote supera el máximo de {maximo} ventas.'}, status=413,
+            )
+
+        try:
+            resultado = importar_ventas(registros)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'mensaje': f'Error al importar: {str(e)}'}, status=500)
+        return JsonResponse({'status': 'ok', **resultado})
+
+
+def _linea_ndjson(venta):
+    return json.dumps(venta, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+@method_decorator(admin_login_required, name='dispatch')
+class VentasApiView(View):
+    """
+    Ventas con sus líneas en NDJSON (una venta por línea), en orden
+    (fecha, id). Parámetros GET:
+      desde, hasta  YYYY-MM-DD (día local completo) o fecha ISO 8601
+      cursor        reanuda después de la venta que lo emitió
+      limite        tamaño de página (por defecto 500, máximo 5000)
+      stream=1      sin paginar: emite todo el rango por bloques
+    En modo paginado el cursor de la siguiente página va en la cabecera
+    X-Cursor-Siguiente (ausente en la última página).
+    """
+    def get(self, request):
+        try:
+            desde  = parsear_fecha(request.GET.get('desde', '').strip())
+            hasta  = parsear_fecha(request.GET.get('hasta', '').strip(), fin_de_dia=True)
+            cursor = request.GET.get('cursor', '').strip()
+            cursor = decodificar_cursor(cursor) if cursor else None
+            limite = int(request.GET.get('limite') or 500)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e) or 'Parámetros inválidos.'}, status=400)
+        limite = max(1, min(limite, 5000))
+
+        if request.GET.get('stream') == '1':
+            filas     = iterar_ventas(desde, hasta, cursor, bloque=1000)
+            respuesta = StreamingHttpResponse(
+                (_linea_ndjson(v) for v in filas), content_type='application/x-ndjson',
+            )
+        else:
+            ventas, siguiente = pagina_ventas(desde, hasta, cursor, limite)
+            respuesta = HttpResponse(''.join(_linea_ndjson(v) for v in ventas), content_type='application/x-ndjson')
+            if siguiente:
+                respuesta['X-Cursor-Siguiente'] = siguiente
+        respuesta['Cache-Control'] = 'no-store'
+        return respuesta
+
+
 ventas              = VentasView.as_view()
 crear_venta         = CrearVentaView.as_view()
 detalle_venta       = DetalleVentaView.as_view()
 editar_venta        = EditarVentaView.as_view()
 completar_venta     = CompletarVentaView.as_view()
 eliminar_venta      = EliminarVentaView.as_view()
-estadisticas_ventas = EstadisticasVentasView.as_view()
\ No newline at end of file
+estadisticas_ventas = EstadisticasVentasView.as_view()
+importar_ventas_api = ImportarVentasView.as_view()
+ventas_api          = VentasApiView.as_view()
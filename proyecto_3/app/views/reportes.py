@@ -1,214 +1,33 @@
 from django.views import View
-from django.http import HttpResponse
-from app.models import Proveedor, Producto, Cliente, Venta, Compra
-from app.utils import exportar_pdf, exportar_excel
-from datetime import datetime
-
-
-# ====== PROVEEDORES ======
-
-class ExportarProveedoresPDF(View):
-    def get(self, request):
-        proveedores = Proveedor.objects.all().order_by('nombre')
-        columnas    = ['ID', 'Nombre', 'Teléfono', 'Email', 'Costo Envío', 'Fecha Registro']
-        datos       = [
-            (p.id, p.nombre, p.telefono, p.email,
-             f'${p.envio:,}', p.fechaRegistro.strftime('%d/%m/%Y'))
-            for p in proveedores
-        ]
-        return exportar_pdf(
-            titulo         = 'REPORTE DE PROVEEDORES',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Proveedores_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-class ExportarProveedoresExcel(View):
-    def get(self, request):
-        proveedores = Proveedor.objects.all().order_by('nombre')
-        columnas    = ['ID', 'Nombre', 'Teléfono', 'Email', 'Costo Envío', 'Fecha Registro']
-        datos       = [
-            (p.id, p.nombre, p.telefono, p.email,
-             p.envio, p.fechaRegistro.strftime('%d/%m/%Y'))
-            for p in proveedores
-        ]
-        return exportar_excel(
-            titulo         = 'REPORTE DE PROVEEDORES',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Proveedores_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-# ====== PRODUCTOS ======
-# ─── CORRECCIÓN: se agregaron las columnas Marca, Tipo y Unidad.
-# La versión anterior solo exportaba ID, Nombre, Precio y Stock,
-# perdiendo información clave del producto.
-
-class ExportarProductosPDF(View):
-    def get(self, request):
-        productos = Producto.objects.select_related('idMarca', 'idTipo', 'idUnidad').all().order_by('nombre')
-        columnas  = ['ID', 'Nombre', 'Marca', 'Tipo', 'Unidad', 'Precio', 'Stock']
-        datos     = [
-            (p.idProducto, p.nombre,
-             p.idMarca.nombreMarca,
-             p.idTipo.nombre_tipo,
-             p.idUnidad.nombre_unidad,
-             f'${float(p.precio):,.2f}',
-             p.stock)
-            for p in productos
-        ]
-        return exportar_pdf(
-            titulo         = 'REPORTE DE PRODUCTOS',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Productos_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-class ExportarProductosExcel(View):
-    def get(self, request):
-        productos = Producto.objects.select_related('idMarca', 'idTipo', 'idUnidad').all().order_by('nombre')
-        columnas  = ['ID', 'Nombre', 'Marca', 'Tipo', 'Unidad', 'Precio', 'Stock']
-        datos     = [
-            (p.idProducto, p.nombre,
-             p.idMarca.nombreMarca,
-             p.idTipo.nombre_tipo,
-             p.idUnidad.nombre_unidad,
-             float(p.precio),
-             p.stock)
-            for p in productos
-        ]
-        return exportar_excel(
-            titulo         = 'REPORTE DE PRODUCTOS',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Productos_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-# ====== CLIENTES ======
-
-class ExportarClientesPDF(View):
-    def get(self, request):
-        clientes = Cliente.objects.all().order_by('nombre')
-        columnas = ['ID', 'Nombre', 'Documento', 'Teléfono', 'Email', 'Dirección', 'Estado', 'Registro']
-        datos    = [
-            (c.id, c.nombre, c.documento, c.telefono, c.email,
-             c.direccion or '—', c.estado.capitalize(),
-             c.fechaRegistro.strftime('%d/%m/%Y'))
-            for c in clientes
-        ]
-        return exportar_pdf(
-            titulo         = 'REPORTE DE CLIENTES',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Clientes_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-class ExportarClientesExcel(View):
-    def get(self, request):
-        clientes = Cliente.objects.all().order_by('nombre')
-        columnas = ['ID', 'Nombre', 'Documento', 'Teléfono', 'Email', 'Dirección', 'Estado', 'Registro']
-        datos    = [
-            (c.id, c.nombre, c.documento, c.telefono, c.email,
-             c.direccion or '—', c.estado.capitalize(),
-             c.fechaRegistro.strftime('%d/%m/%Y'))
-            for c in clientes
-        ]
-        return exportar_excel(
-            titulo         = 'REPORTE DE CLIENTES',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Clientes_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-# ====== VENTAS ======
-
-class ExportarVentasPDF(View):
-    def get(self, request):
-        ventas   = Venta.objects.prefetch_related('detalles').all().order_by('-fecha')
-        columnas = ['ID', 'Cliente', 'Fecha', 'Total', 'Estado']
-        datos    = [
-            (f'V{v.id:03d}', v.cliente,
-             v.fecha.strftime('%d/%m/%Y %H:%M'),
-             f'${float(v.total):,.2f}',
-             v.estado)
-            for v in ventas
-        ]
-        return exportar_pdf(
-            titulo         = 'REPORTE DE VENTAS',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Ventas_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-class ExportarVentasExcel(View):
-    def get(self, request):
-        ventas   = Venta.objects.prefetch_related('detalles').all().order_by('-fecha')
-        columnas = ['ID', 'Cliente', 'Fecha', 'Total', 'Estado']
-        datos    = [
-            (f'V{v.id:03d}', v.cliente,
-             v.fecha.strftime('%d/%m/%Y %H:%M'),
-             float(v.total),
-             v.estado)
-            for v in ventas
-        ]
-        return exportar_excel(
-            titulo         = 'REPORTE DE VENTAS',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Ventas_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-# ====== COMPRAS ======
-
-class ExportarComprasPDF(View):
-    def get(self, request):
-        compras  = Compra.objects.select_related('Producto', 'Proveedor', 'usuario').all().order_by('-fechaCompra')
-        columnas = ['ID', 'Fecha', 'Producto', 'Proveedor', 'Cantidad', 'Precio Unit.', 'Total', 'Estado']
-        datos    = [
-            (f'C{c.idCompra:03d}',
-             c.fechaCompra.strftime('%d/%m/%Y'),
-             c.Producto.nombre      if c.Producto  else '—',
-             c.Proveedor.nombre     if c.Proveedor else '—',
-             c.cantidad,
-             f'${float(c.precio_unitario):,.2f}',
-             f'${float(c.total):,.2f}',
-             c.estado)
-            for c in compras
-        ]
-        return exportar_pdf(
-            titulo         = 'REPORTE DE COMPRAS',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Compras_{datetime.now().strftime("%d_%m_%Y")}',
-        )
-
-
-class ExportarComprasExcel(View):
-    def get(self, request):
-        compras  = Compra.objects.select_related('Producto', 'Proveedor', 'usuario').all().order_by('-fechaCompra')
-        columnas = ['ID', 'Fecha', 'Producto', 'Proveedor', 'Cantidad', 'Precio Unit.', 'Total', 'Estado']
-        datos    = [
-            (f'C{c.idCompra:03d}',
-             c.fechaCompra.strftime('%d/%m/%Y'),
-             c.Producto.nombre      if c.Producto  else '—',
-             c.Proveedor.nombre     if c.Proveedor else '—',
-             c.cantidad,
-             float(c.precio_unitario),
-             float(c.total),
-             c.estado)
-            for c in compras
-        ]
-        return exportar_excel(
-            titulo         = 'REPORTE DE COMPRAS',
-            columnas       = columnas,
-            datos          = datos,
-            nombre_archivo = f'Reporte_Compras_{datetime.now().strftime("%d_%m_%Y")}',
-        )
\ No newline at end of file
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from app.decorators import admin_login_required
+from app.services import especificaciones
+
+
+# ====== EXPORTACIONES ======
+# /reporte/<entidad>/<formato> para cada entidad de
+# especificaciones.ESPECIFICACIONES y formato de especificaciones.BACKENDS
+# (ver config/urls.py). Los filtros son los de la lista de la entidad; el
+# ranking usa la misma ventana que /reportes/ranking/
+# (?desde=YYYY-MM-DD&hasta=YYYY-MM-DD, por defecto los últimos 90 días) y
+# el CSV acepta ?gzip=1.
+#
+# ─── CORRECCIÓN: cada entidad tenía su clase PDF y su clase Excel, cada una
+# con su propia consulta (select_related, modelos completos, formato en
+# Python); ventas hacía prefetch_related('detalles') sin usarlo. Ahora
+# todas las columnas se declaran una vez en app.services.especificaciones
+# y cada exportación es una única consulta values_list().
+
+@method_decorator(admin_login_required, name='dispatch')
+class ExportarView(View):
+    """Exportación generada dentro de la petición; para tablas grandes, /reportes/exportar/."""
+    entidad = None
+    formato = None
+
+    def get(self, request):
+        try:
+            filtros = especificaciones.normalizar_filtros(self.entidad, request.GET)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'mensaje': str(e)}, status=400)
+        return especificaciones.responder(self.entidad, self.formato, filtros, request.GET)
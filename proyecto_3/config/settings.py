@@ -127,4 +127,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/login/'
+
+# ── Stock: reintentos ante deadlock / lock wait timeout de MySQL ──
+STOCK_REINTENTOS       = int(_env('STOCK_REINTENTOS', 3))
+STOCK_REINTENTO_ESPERA = float(_env('STOCK_REINTENTO_ESPERA', 0.05))   # segundos, base del backoff
+
+# 'bloqueo'   → SELECT ... FOR UPDATE + validación en memoria (por defecto)
+# 'optimista' → UPDATE condicional sin bloqueo previo (stock >= n)
+STOCK_MODO = _env('STOCK_MODO', 'bloqueo')
+
+# ── Notificaciones: bandeja de salida (app.services.notifications) ──
+NOTIFICACIONES_DESPACHO_INMEDIATO = _env('NOTIFICACIONES_DESPACHO_INMEDIATO', 'True') == 'True'
+NOTIFICACIONES_MAX_INTENTOS       = int(_env('NOTIFICACIONES_MAX_INTENTOS', 5))
+NOTIFICACIONES_REINTENTO_ESPERA   = int(_env('NOTIFICACIONES_REINTENTO_ESPERA', 60))   # segundos
+
+# ── Ventas: importación masiva desde terminales POS (app.services.importacion) ──
+VENTAS_IMPORTACION_LOTE = int(_env('VENTAS_IMPORTACION_LOTE', 500))     # ventas por transacción
+VENTAS_IMPORTACION_MAX  = int(_env('VENTAS_IMPORTACION_MAX', 10000))    # ventas por petición
+# Tokens de las terminales (separados por coma), enviados como Authorization: Bearer <token>
+VENTAS_IMPORTACION_TOKENS = [t.strip() for t in _env('VENTAS_IMPORTACION_TOKENS', '').split(',') if t.strip()]
+
+# ── Reportes: caché con versión global de datos (app.services.cache_reportes) ──
+# Con varios workers conviene un backend compartido, p. ej.
+# REPORTES_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# REPORTES_CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reportes': {
+        'BACKEND':  _env('REPORTES_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': _env('REPORTES_CACHE_LOCATION', 'reportes'),
+    },
+}
+REPORTES_CACHE         = 'reportes'
+REPORTES_CACHE_TTL     = int(_env('REPORTES_CACHE_TTL', 300))      # segundos; 0 desactiva la caché
+REPORTES_CACHE_SWR     = _env('REPORTES_CACHE_SWR', 'False') == 'True'   # stale-while-revalidate
+REPORTES_CACHE_CANDADO = int(_env('REPORTES_CACHE_CANDADO', 30))   # segundos máximos de una reconstrucción
+
+# ── Reportes: precarga de todas las secciones en paralelo (app.services.reportes) ──
+# Con REPORTES_PRECARGA=True la página trae las secciones embebidas, armadas
+# en un pool de REPORTES_HILOS hilos (una conexión a la BD por hilo).
+REPORTES_PRECARGA = _env('REPORTES_PRECARGA', 'False') == 'True'
+REPORTES_HILOS    = int(_env('REPORTES_HILOS', 4))
+
+# ── Reabastecimiento: puntos de reorden nocturnos (app.services.reabastecimiento) ──
+REORDEN_DIAS_DEMANDA   = int(_env('REORDEN_DIAS_DEMANDA', 28))       # ventana de la media móvil
+REORDEN_NIVEL_SERVICIO = float(_env('REORDEN_NIVEL_SERVICIO', 1.65))  # z del stock de seguridad (1.65 ≈ 95 %)
+REORDEN_DIAS_ENTREGA   = int(_env('REORDEN_DIAS_ENTREGA', 7))         # si el proveedor no tiene días de envío
+REORDEN_DIAS_COBERTURA = int(_env('REORDEN_DIAS_COBERTURA', 14))      # días de demanda que cubre una compra
+
+# ── Analítica: caché columnar en memoria de las líneas de venta (app.services.columnar) ──
+# Cada proceso guarda arrays NumPy de detalle_venta + venta.fecha. Cada
+# COLUMNAR_REFRESCO segundos anexa las líneas nuevas; si se editaron o
+# borraron líneas, recarga todo. Por encima de COLUMNAR_MAX_MB se
+# descartan las líneas más antiguas.
+COLUMNAR_MAX_MB   = float(_env('COLUMNAR_MAX_MB', 256))
+COLUMNAR_REFRESCO = int(_env('COLUMNAR_REFRESCO', 30))       # segundos; 0 revisa en cada consulta
+COLUMNAR_LOTE     = int(_env('COLUMNAR_LOTE', 50000))        # filas por consulta al cargar
+
+# ── Exportaciones en segundo plano (app.services.exportaciones) ──
+# Con varios servidores, EXPORTACIONES_DIR debe ser un disco compartido.
+EXPORTACIONES_DIR       = _env('EXPORTACIONES_DIR', str(BASE_DIR / 'exportaciones'))
+EXPORTACIONES_PROCESOS  = int(_env('EXPORTACIONES_PROCESOS', 2))       # workers del pool por proceso web
+EXPORTACIONES_TTL       = int(_env('EXPORTACIONES_TTL', 3600))         # segundos que se conserva un archivo listo
+EXPORTACIONES_ATASCO    = int(_env('EXPORTACIONES_ATASCO', 900))       # segundos en proceso antes de reencolar
+EXPORTACIONES_INMEDIATO = _env('EXPORTACIONES_INMEDIATO', 'True') == 'True'   # enviar al pool al confirmar
@@ -44,6 +44,9 @@ urlpatterns = [
     path('notificaciones/leer/<int:id>/', index_views.marcar_leida_notificacion, name='marcar_leida_notificacion'),
     path('notificaciones/eliminar/<int:id>/', index_views.eliminar_notificacion, name='eliminar_notificacion'),
 
+    # ── Métricas internas (solo superadmin) ────────────────────────
+    path('metricas/', index_views.metricas_data, name='metricas_data'),
+
     # ── Productos ──────────────────────────────────────────────────
     path('productos/',                    productos_views.productos,        name='productos'),
     path('productos/crear/',              productos_views.crear_producto,   name='crear_producto'),
@@ -53,8 +56,9 @@ urlpatterns = [
     path('productos/buscar-codigo/',         productos_views.buscar_codigo_barras,    name='buscar_codigo_barras'),
     path('productos/actualizar-stock-escaner/', productos_views.actualizar_stock_escaner, name='actualizar_stock_escaner'),
     # ──────────────────────────────────────────────────────────────
-    path('reporte/productos/pdf',   exportar_views.ExportarProductosPDF.as_view(),   name='exportar_productos_pdf'),
-    path('reporte/productos/excel', exportar_views.ExportarProductosExcel.as_view(), name='exportar_productos_excel'),
+    path('reporte/productos/pdf',   exportar_views.ExportarView.as_view(entidad='productos', formato='pdf'),   name='exportar_productos_pdf'),
+    path('reporte/productos/excel', exportar_views.ExportarView.as_view(entidad='productos', formato='excel'), name='exportar_productos_excel'),
+    path('reporte/productos/csv',   exportar_views.ExportarView.as_view(entidad='productos', formato='csv'),   name='exportar_productos_csv'),
 
     # ── Marcas ─────────────────────────────────────────────────────
     path('marcas/',                   marcas_views.marcas,       name='marcas'),
@@ -76,8 +80,9 @@ urlpatterns = [
     path('clientes/crear/',             clientes_views.crear_cliente,   name='crear_cliente'),
     path('clientes/editar/<int:id>/',   clientes_views.editar_cliente,  name='editar_cliente'),
     path('clientes/eliminar/<int:id>/', clientes_views.eliminar_cliente, name='eliminar_cliente'),
-    path('reporte/clientes/pdf',   exportar_views.ExportarClientesPDF.as_view(),   name='exportar_clientes_pdf'),
-    path('reporte/clientes/excel', exportar_views.ExportarClientesExcel.as_view(), name='exportar_clientes_excel'),
+    path('reporte/clientes/pdf',   exportar_views.ExportarView.as_view(entidad='clientes', formato='pdf'),   name='exportar_clientes_pdf'),
+    path('reporte/clientes/excel', exportar_views.ExportarView.as_view(entidad='clientes', formato='excel'), name='exportar_clientes_excel'),
+    path('reporte/clientes/csv',   exportar_views.ExportarView.as_view(entidad='clientes', formato='csv'),   name='exportar_clientes_csv'),
 
     # ── Ventas ─────────────────────────────────────────────────────
     path('ventas/',                      ventas_views.ventas,           name='ventas'),
@@ -87,28 +92,47 @@ urlpatterns = [
     path('ventas/completar/<int:id>/',   ventas_views.completar_venta,  name='completar_venta'),
     path('ventas/eliminar/<int:id>/',    ventas_views.eliminar_venta,   name='eliminar_venta'),
     path('ventas/estadisticas/',         ventas_views.estadisticas_ventas, name='estadisticas_ventas'),
-    path('reporte/ventas/pdf',   exportar_views.ExportarVentasPDF.as_view(),   name='exportar_ventas_pdf'),
-    path('reporte/ventas/excel', exportar_views.ExportarVentasExcel.as_view(), name='exportar_ventas_excel'),
+    path('ventas/api/',                  ventas_views.ventas_api,       name='ventas_api'),
+    path('ventas/api/importar/',         ventas_views.importar_ventas_api, name='importar_ventas'),
+    path('reporte/ventas/pdf',   exportar_views.ExportarView.as_view(entidad='ventas', formato='pdf'),   name='exportar_ventas_pdf'),
+    path('reporte/ventas/excel', exportar_views.ExportarView.as_view(entidad='ventas', formato='excel'), name='exportar_ventas_excel'),
+    path('reporte/ventas/csv',   exportar_views.ExportarView.as_view(entidad='ventas', formato='csv'),   name='exportar_ventas_csv'),
+    path('reporte/ventas/lineas/csv', exportar_views.ExportarView.as_view(entidad='ventas_lineas', formato='csv'), name='exportar_ventas_lineas_csv'),
+    path('reporte/ventas/lineas/excel', exportar_views.ExportarView.as_view(entidad='ventas_lineas', formato='excel'), name='exportar_ventas_lineas_excel'),
 
     # ── Proveedores ────────────────────────────────────────────────
     path('proveedores/',                   proveedores_views.proveedores,        name='proveedores'),
     path('proveedores/crear/',             proveedores_views.crear_proveedor,    name='crear_proveedor'),
     path('proveedores/editar/<int:id>/',   proveedores_views.editar_proveedor,   name='editar_proveedor'),
     path('proveedores/eliminar/<int:id>/', proveedores_views.eliminar_proveedor, name='eliminar_proveedor'),
-    path('reporte/proveedores/pdf',   exportar_views.ExportarProveedoresPDF.as_view(),   name='exportar_proveedores_pdf'),
-    path('reporte/proveedores/excel', exportar_views.ExportarProveedoresExcel.as_view(), name='exportar_proveedores_excel'),
+    path('reporte/proveedores/pdf',   exportar_views.ExportarView.as_view(entidad='proveedores', formato='pdf'),   name='exportar_proveedores_pdf'),
+    path('reporte/proveedores/excel', exportar_views.ExportarView.as_view(entidad='proveedores', formato='excel'), name='exportar_proveedores_excel'),
+    path('reporte/proveedores/csv',   exportar_views.ExportarView.as_view(entidad='proveedores', formato='csv'),   name='exportar_proveedores_csv'),
 
     # ── Compras ────────────────────────────────────────────────────
     path('compras/',                   compras_views.compras,             name='compras'),
     path('compras/crear/',             compras_views.crear_compra,        name='crear_compra'),
     path('compras/editar/<int:id>/',   compras_views.modal_editar_compra, name='modal_editar_compra'),
     path('compras/eliminar/<int:id>/', compras_views.modal_eliminar_compra, name='modal_eliminar_compra'),
-    path('reporte/compras/pdf',   exportar_views.ExportarComprasPDF.as_view(),   name='exportar_compras_pdf'),
-    path('reporte/compras/excel', exportar_views.ExportarComprasExcel.as_view(), name='exportar_compras_excel'),
+    path('compras/sugeridas/',         compras_views.sugeridas,           name='compras_sugeridas'),
+    path('reporte/compras/pdf',   exportar_views.ExportarView.as_view(entidad='compras', formato='pdf'),   name='exportar_compras_pdf'),
+    path('reporte/compras/excel', exportar_views.ExportarView.as_view(entidad='compras', formato='excel'), name='exportar_compras_excel'),
+    path('reporte/compras/csv',   exportar_views.ExportarView.as_view(entidad='compras', formato='csv'),   name='exportar_compras_csv'),
 
     # ── Reportes ───────────────────────────────────────────────────
     path('reportes/',       reportes_views.reportes,      name='reportes'),
     path('reportes/data/',  reportes_views.reportes_data, name='reportes_data'),
+    path('reportes/seccion/<str:seccion>/', reportes_views.reporte_seccion, name='reporte_seccion'),
+    path('reportes/serie/<str:metrica>/',   reportes_views.reporte_serie,     name='reporte_serie'),
+    path('reportes/ranking/',               reportes_views.reporte_ranking,   name='reporte_ranking'),
+    path('reportes/actividad/',             reportes_views.reporte_actividad, name='reporte_actividad'),
+    path('reportes/cubo/',                  reportes_views.reporte_cubo,      name='reporte_cubo'),
+    path('reportes/analitica/',             reportes_views.reporte_analitica, name='reporte_analitica'),
+    path('reportes/exportar/',                        reportes_views.exportacion_crear,     name='exportacion_crear'),
+    path('reportes/exportar/<int:id>/',               reportes_views.exportacion_estado,    name='exportacion_estado'),
+    path('reportes/exportar/<int:id>/descargar/',     reportes_views.exportacion_descargar, name='exportacion_descargar'),
+    path('reporte/ranking/pdf',   exportar_views.ExportarView.as_view(entidad='ranking', formato='pdf'),   name='exportar_ranking_pdf'),
+    path('reporte/ranking/excel', exportar_views.ExportarView.as_view(entidad='ranking', formato='excel'), name='exportar_ranking_excel'),
 
     # ── Backup y Restauración ──────────────────────────────────────
     path('backup/',             backup_views.backup,           name='backup'),